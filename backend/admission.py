@@ -0,0 +1,155 @@
+"""
+Admission control: a bound on requests in progress, with a short queue, so
+that overload is answered with fast 503s rather than ever longer latency
+for everyone.
+"""
+import asyncio
+import collections
+import threading
+import time
+from typing import Callable, Iterable, Optional
+from werkzeug.wsgi import ClosingIterator
+from metrics import ROUTE_KEY
+from serializers import dumps
+
+SHED_BODY = dumps({"error": "The server is overloaded; retry shortly"})
+# The route shed requests are recorded under (see metrics.RequestMetrics).
+SHED_ROUTE = 'shed'
+
+
+class AdmissionControl:
+    """
+    WSGI middleware letting at most `limit` requests through `wsgi_app` at
+    once.
+
+    A request arriving while `limit` are in progress waits for one to finish,
+    in a queue of at most `queue` requests, for up to `timeout` seconds.
+    When the queue is full it is turned away at once; when its wait runs out
+    it is turned away then. Either way the client gets 503 with a
+    Retry-After of `retry_after` seconds, and `on_shed(reason)`, if given,
+    is called with 'queue_full' or 'timeout'.
+
+    A request's slot is held until the server closes its response, so
+    streamed bodies count for as long as they are sent. Paths in `exempt`
+    are never queued or shed (see app.ADMISSION_EXEMPT). Shed requests are
+    recorded under the route SHED_ROUTE.
+
+    The ASGI app (asgi.py) limits its native reads with the same slots and
+    queue, through acquire_async and release.
+    """
+
+    def __init__(self, wsgi_app: Callable, limit: int, queue: int, timeout: float,
+                 retry_after: int = 1, exempt: Iterable[str] = (),
+                 on_shed: Optional[Callable[[str], None]] = None):
+        self.wsgi_app = wsgi_app
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.exempt = frozenset(exempt)
+        self.on_shed = on_shed
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+        # Coroutines waiting in the queue: (event loop, future set when a slot frees).
+        self._wakers: "collections.deque[tuple]" = collections.deque()
+
+    def acquire(self) -> Optional[str]:
+        """Take a slot, waiting in the queue if need be; the reason it was refused, or None."""
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                return None
+            if self.waiting >= self.queue:
+                return 'queue_full'
+            self.waiting += 1
+            try:
+                deadline = time.monotonic() + self.timeout
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return 'timeout'
+                    self._cond.wait(remaining)
+                self.active += 1
+                return None
+            finally:
+                self.waiting -= 1
+
+    async def acquire_async(self) -> Optional[str]:
+        """acquire for coroutines: waits in the same queue without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self.active < self.limit:
+                self.active += 1
+                return None
+            if self.waiting >= self.queue:
+                return 'queue_full'
+            self.waiting += 1
+        try:
+            deadline = loop.time() + self.timeout
+            while True:
+                waker = (loop, loop.create_future())
+                with self._cond:
+                    if self.active < self.limit:
+                        self.active += 1
+                        return None
+                    self._wakers.append(waker)
+                try:
+                    await asyncio.wait_for(waker[1], deadline - loop.time())
+                except BaseException as e:
+                    with self._cond:
+                        if waker in self._wakers:
+                            self._wakers.remove(waker)
+                        elif self.active < self.limit:
+                            # The slot this waiter was woken for is still free.
+                            if isinstance(e, asyncio.TimeoutError):
+                                self.active += 1
+                                return None
+                            self._wake()
+                    if isinstance(e, asyncio.TimeoutError):
+                        return 'timeout'
+                    raise
+        finally:
+            with self._cond:
+                self.waiting -= 1
+
+    def _wake(self) -> None:
+        """Wake one waiting thread and one waiting coroutine; whichever is first takes the slot."""
+        self._cond.notify()
+        if self._wakers:
+            loop, woken = self._wakers.popleft()
+            loop.call_soon_threadsafe(_set_result, woken)
+
+    def release(self) -> None:
+        with self._cond:
+            self.active -= 1
+            self._wake()
+
+    def shed(self, reason: str) -> None:
+        """Note a request turned away for `reason`."""
+        if self.on_shed is not None:
+            self.on_shed(reason)
+
+    def __call__(self, environ, start_response):
+        if environ.get('PATH_INFO') in self.exempt:
+            return self.wsgi_app(environ, start_response)
+        reason = self.acquire()
+        if reason is not None:
+            self.shed(reason)
+            environ[ROUTE_KEY] = SHED_ROUTE
+            # The response bypasses the Flask app, and so flask_cors: browsers
+            # only let pages read it with this header.
+            start_response('503 Service Unavailable', [
+                ('Content-Type', 'application/json'), ('Content-Length', str(len(SHED_BODY))),
+                ('Retry-After', str(self.retry_after)), ('Access-Control-Allow-Origin', '*')])
+            return [SHED_BODY]
+        try:
+            return ClosingIterator(self.wsgi_app(environ, start_response), self.release)
+        except BaseException:
+            self.release()
+            raise
+
+
+def _set_result(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
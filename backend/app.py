@@ -1,70 +1,539 @@
-from flask import Flask, jsonify, request
+"""
+The hostel API as a Flask application factory:
+
+    app = create_app({'HOSTEL_STORE': HostelStore(), 'SEED_DEMO_DATA': False})
+
+Creating an app is cheap: it only registers the routes. The store, its
+indexes and the caches over it (a Backend) are built on the app's first
+request that needs them, or ahead of it by warm_up, so tests, workers and
+serverless cold starts pay for initialization only once and only when
+they use it. The module-level `app` is configured from the environment
+for `python app.py`, WSGI servers and asgi.py.
+"""
+from flask import Blueprint, Flask, Response, current_app, jsonify, request
 from flask_cors import CORS
 from werkzeug.exceptions import BadRequest
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+import io
 import os
+import threading
+import metrics
+from admission import AdmissionControl
+from cache import CachedBody, CompressionCache, ResponseCache, encoded_etag, make_etag, negotiate_encoding
+from changes import ChangeLog
+from indexes import MAX_CLUSTER_ZOOM, cluster_window
 from models import HostelStore
+from serializers import dumps, encode_hostel, hostel_encoder, loads
+from storage import LogStorage, load_snapshot
 from validation import (
     validate_hostel_create, 
     validate_hostel_update, 
     validate_hostel_id, 
-    ValidationError
+    validate_hostel_query,
+    validate_nearby_query,
+    validate_search_query,
+    validate_review_create,
+    validate_review_query,
+    validate_fields,
+    validate_changes_query,
+    validate_cluster_query,
+    validate_similar_query,
+    validate_stats_query,
+    encode_cursor,
+    ValidationError,
+    BULK_BATCH_SIZE,
+    MAX_BULK_ERRORS
 )
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
-
-# Initialize hostel store
-hostel_store = HostelStore()
-
-# Seed some initial data for testing/demo purposes
-hostel_store.create(
-    name="Stanza Living",
-    address="Navrangpura, Ahmedabad",
-    price_min=12000,
-    price_max=18000,
-    lat=23.0365,
-    long=72.5611,
-    amenities=["WiFi", "AC", "Laundry", "Meals"],
-    images=["https://images.unsplash.com/photo-1555854877-bab0e564b8d5?ixlib=rb-1.2.1&auto=format&fit=crop&w=1350&q=80"],
-    is_verified=True
-)
-hostel_store.create(
-    name="Your Space",
-    address="Vastrapur, Ahmedabad",
-    price_min=10000,
-    price_max=15000,
-    lat=23.0450,
-    long=72.5250,
-    amenities=["WiFi", "Laundry", "Gym"],
-    images=["https://images.unsplash.com/photo-1596276020587-8044fe049813?ixlib=rb-1.2.1&auto=format&fit=crop&w=1350&q=80"],
-    is_verified=True
-)
+# Configuration read by create_app, with the defaults below. HOSTEL_STORE is
+# a store or a callable returning one; by default, with VERISTAY_DATABASE
+# set hostels are kept in that SQLite database, with VERISTAY_DATA_DIR set
+# they are kept in memory and persisted there (write-ahead log + snapshots)
+# across restarts, and otherwise only in memory. SNAPSHOT is a snapshot file
+# (see storage.save_snapshot) that an empty in-memory store is preloaded
+# from, without decoding and validating import rows (building the indexes
+# still dominates). METRICS (VERISTAY_METRICS=0 turns them off) are request,
+# store and serialization metrics, served at /api/metrics; with PROFILE_DIR
+# set, the stacks of requests slower than PROFILE_SLOW_MS are sampled and
+# written there as folded stacks for flame graphs. WARM_UP builds the
+# backend in create_app rather than on first use.
+#
+# Two overload defences are off by default (benchmarks.bench_overload has
+# not shown a gain from either): with COALESCE_READS (VERISTAY_COALESCE=1)
+# concurrent identical reads share one body build, and with MAX_IN_FLIGHT
+# set at most that many requests run at once: up to MAX_QUEUED more wait up
+# to QUEUE_TIMEOUT_MS for a slot, and the rest get 503 with a Retry-After of
+# RETRY_AFTER_SECONDS (see admission.py).
+def default_config() -> Dict[str, Any]:
+    return {
+        'HOSTEL_STORE': None,
+        'SEED_DEMO_DATA': True,
+        'SNAPSHOT': os.environ.get('VERISTAY_SNAPSHOT'),
+        'METRICS': os.environ.get('VERISTAY_METRICS', '1') != '0',
+        'PROFILE_DIR': os.environ.get('VERISTAY_PROFILE_DIR'),
+        'PROFILE_SLOW_MS': int(os.environ.get('VERISTAY_PROFILE_SLOW_MS', 500)),
+        'WARM_UP': False,
+        'COALESCE_READS': os.environ.get('VERISTAY_COALESCE', '0') != '0',
+        'MAX_IN_FLIGHT': int(os.environ.get('VERISTAY_MAX_IN_FLIGHT', 0)),
+        'MAX_QUEUED': int(os.environ.get('VERISTAY_MAX_QUEUED', 128)),
+        'QUEUE_TIMEOUT_MS': int(os.environ.get('VERISTAY_QUEUE_TIMEOUT_MS', 1000)),
+        'RETRY_AFTER_SECONDS': 1,
+    }
+
+STORE_OPERATIONS = ['get_all', 'iter_all', 'get_by_id', 'query', '_plan', 'nearby', 'clusters', 'similar',
+                    'stats', 'search', 'get_reviews', 'create', 'create_many', 'update', 'delete', 'add_review']
+INDEX_OPERATIONS = {'geo': ['nearest', 'within_bbox'], 'text': ['search', 'matching'],
+                    'clustering': ['clusters'], 'similarity': ['similar'], 'statistics': ['stats']}
+
+
+def environment_store():
+    """The store the environment asks for (see default_config)."""
+    database = os.environ.get('VERISTAY_DATABASE')
+    if database:
+        # Imported here: the SQLite store pulls in NumPy at import time.
+        from sql_store import SqlHostelStore
+        return SqlHostelStore(database)
+    data_dir = os.environ.get('VERISTAY_DATA_DIR')
+    return HostelStore(LogStorage(data_dir) if data_dir else None)
+
+
+def seed_demo_data(hostel_store) -> None:
+    """Seed some initial data for testing/demo purposes."""
+    hostel_store.create(
+        name="Stanza Living",
+        address="Navrangpura, Ahmedabad",
+        price_min=12000,
+        price_max=18000,
+        lat=23.0365,
+        long=72.5611,
+        amenities=["WiFi", "AC", "Laundry", "Meals"],
+        images=["https://images.unsplash.com/photo-1555854877-bab0e564b8d5?ixlib=rb-1.2.1&auto=format&fit=crop&w=1350&q=80"],
+        is_verified=True
+    )
+    hostel_store.create(
+        name="Your Space",
+        address="Vastrapur, Ahmedabad",
+        price_min=10000,
+        price_max=15000,
+        lat=23.0450,
+        long=72.5250,
+        amenities=["WiFi", "Laundry", "Gym"],
+        images=["https://images.unsplash.com/photo-1596276020587-8044fe049813?ixlib=rb-1.2.1&auto=format&fit=crop&w=1350&q=80"],
+        is_verified=True
+    )
+
+
+# Server-sent events are separated by a blank line; a comment line keeps
+# idle connections (and proxies) from timing out.
+SSE_HEARTBEAT_SECONDS = 15
+SSE_HEARTBEAT = b': keep-alive\n\n'
+
+def change_event(version: int, body: bytes, event: str = 'changes') -> bytes:
+    """One server-sent event; its id is the version, so reconnecting clients resume from it."""
+    return b'id: %d\nevent: %s\ndata: %s\n\n' % (version, event.encode(), body)
+
+
+class Backend:
+    """
+    The store behind an app, with the response and compression caches and
+    the change log over it.
+
+    Read endpoints' bodies are built by its methods, shared with the ASGI
+    app (asgi.py): each takes the query parameters, raises ValidationError
+    for bad ones and returns the cached body (None when the hostel does not
+    exist).
+    """
+
+    def __init__(self, hostel_store, metrics_enabled: bool = False, coalesce: bool = False):
+        self.hostel_store = hostel_store
+        observe = observe_coalesced = None
+        if metrics_enabled:
+            metrics.instrument(hostel_store, STORE_OPERATIONS)
+            for index, operations in INDEX_OPERATIONS.items():
+                # The SQLite store has no Python-side indexes.
+                if hasattr(hostel_store, index):
+                    metrics.instrument(getattr(hostel_store, index), operations, prefix=f'{index}.')
+            metrics.REGISTRY.register(metrics.Gauge('veristay_hostels', 'Hostels in the store.',
+                                                    lambda: len(hostel_store)))
+            metrics.REGISTRY.register(metrics.Gauge('veristay_store_version', 'Changes applied to the store.',
+                                                    lambda: hostel_store.version))
+            observe, observe_coalesced = metrics.observe_build, metrics.observe_coalesced
+        self.response_cache = ResponseCache(hostel_store, observe=observe, coalesce=coalesce,
+                                            observe_coalesced=observe_coalesced)
+        self.compression_cache = CompressionCache(observe=observe)
+        self.change_log = ChangeLog(hostel_store)
+
+    def hostel_list_body(self, hostels, fields=None, **extra) -> bytes:
+        """
+        Assemble {"hostels": [...], "count": n, **extra} from cached hostel JSON,
+        or from just the hostels' `fields` (see validate_fields) when given.
+        """
+        if fields is None:
+            items = [self.response_cache.hostel(h).body for h in hostels]
+        else:
+            encode = hostel_encoder(fields)
+            items = [encode(h) for h in hostels]
+        parts = [b'{"hostels":[', b','.join(items),
+                 b'],"count":', str(len(hostels)).encode()]
+        for key, value in extra.items():
+            parts += [b',"', key.encode(), b'":', dumps(value)]
+        parts.append(b'}')
+        return b''.join(parts)
+
+    def hostels_body(self, args: Mapping[str, str]) -> CachedBody:
+        """A page of hostels, filtered and sorted by the query parameters."""
+        query = validate_hostel_query(args)
+        fields = validate_fields(args)
+
+        def build() -> bytes:
+            hostels, next_key = self.hostel_store.query(**query)
+            next_cursor = encode_cursor(query['sort'], next_key) if next_key else None
+            return self.hostel_list_body(hostels, fields, next_cursor=next_cursor)
+
+        return self.response_cache.body(('list', dumps(sorted(query.items())), fields), build)
+
+    def nearby_body(self, args: Mapping[str, str]) -> CachedBody:
+        """The hostels closest to a point, with their distance in meters."""
+        query = validate_nearby_query(args)
+
+        def build() -> bytes:
+            results = self.hostel_store.nearby(**query)
+            # Splice the distance into each cached hostel object.
+            hostels = [self.response_cache.hostel(hostel).body[:-1] + b',"dist_meters":'
+                       + dumps(round(dist, 1)) + b'}' for hostel, dist in results]
+            return b'{"hostels":[' + b','.join(hostels) + b'],"count":' + str(len(hostels)).encode() + b'}'
+
+        return self.response_cache.body(('nearby', dumps(sorted(query.items()))), build)
+
+    def clusters_body(self, args: Mapping[str, str]) -> CachedBody:
+        """Map clusters (count, centroid, lowest price) of the hostels in a viewport."""
+        query = validate_cluster_query(args)
+
+        def build() -> bytes:
+            clusters = [cluster._asdict() for cluster in self.hostel_store.clusters(**query)]
+            return dumps({"clusters": clusters, "count": len(clusters), "zoom": query['zoom']})
+
+        # The clusters only depend on the cells the bbox touches, so viewports
+        # panned within the same cells share a cache entry (and ETag).
+        window = cluster_window(min(query['zoom'], MAX_CLUSTER_ZOOM), *query['bbox'])
+        return self.response_cache.body(('clusters', query['zoom'], window), build)
+
+    def stats_body(self, args: Mapping[str, str]) -> CachedBody:
+        """Price, verification and amenity statistics of the catalog (or a viewport) by area or amenity."""
+        query = validate_stats_query(args)
+        # Cached per store version like every read: dashboards refreshing an
+        # unchanged catalog get the stored body (or a 304) without recomputing.
+        return self.response_cache.body(('stats', query['group_by'], query['bbox']),
+                                        lambda: dumps(self.hostel_store.stats(**query)))
+
+    def search_body(self, args: Mapping[str, str]) -> CachedBody:
+        """Hostels matching a text query, best match first."""
+        query = validate_search_query(args)
+        key = ('search', query['q'].lower(), query['limit'])
+        return self.response_cache.body(key,
+                                        lambda: self.hostel_list_body(self.hostel_store.search(**query)))
+
+    def hostel_body(self, hostel_id: str, args: Mapping[str, str]) -> Optional[CachedBody]:
+        """A single hostel, or the `fields` of it the query parameters ask for."""
+        id_int = validate_hostel_id(hostel_id)
+        fields = validate_fields(args)
+        hostel = self.hostel_store.get_by_id(id_int)
+        if not hostel:
+            return None
+        if fields is not None:
+            body = b'{"hostel":' + hostel_encoder(fields)(hostel) + b'}'
+            return CachedBody(body, make_etag(body))
+        cached = self.response_cache.hostel(hostel)
+        return CachedBody(b'{"hostel":' + cached.body + b'}', cached.etag)
+
+    def similar_body(self, hostel_id: str, args: Mapping[str, str]) -> Optional[CachedBody]:
+        """The hostels most like one, most similar first, each with its similarity score."""
+        id_int = validate_hostel_id(hostel_id)
+        query = validate_similar_query(args)
+        fields = validate_fields(args)
+        if self.hostel_store.get_by_id(id_int) is None:
+            return None
+
+        def build() -> bytes:
+            encode = (hostel_encoder(fields) if fields is not None
+                      else lambda h: self.response_cache.hostel(h).body)
+            # A hostel deleted since the check above has nothing similar left.
+            hostels = [encode(hostel)[:-1] + b',"similarity":' + dumps(round(score, 4)) + b'}'
+                       for hostel, score in self.hostel_store.similar(id_int, **query) or []]
+            return b'{"hostels":[' + b','.join(hostels) + b'],"count":' + str(len(hostels)).encode() + b'}'
+
+        return self.response_cache.body(('similar', id_int, query['limit'], fields), build)
+
+    def reviews_body(self, hostel_id: str, args: Mapping[str, str]) -> Optional[CachedBody]:
+        """A page of a hostel's reviews, newest first."""
+        id_int = validate_hostel_id(hostel_id)
+        query = validate_review_query(args)
+        if self.hostel_store.get_by_id(id_int) is None:
+            return None
+
+        def build() -> bytes:
+            # A hostel deleted since the check above has no reviews left.
+            reviews, next_id = self.hostel_store.get_reviews(id_int, **query) or ([], None)
+            next_cursor = encode_cursor('reviews', (reviews[-1].created_ts, next_id)) if next_id else None
+            return dumps({"reviews": [review.to_dict() for review in reviews],
+                          "count": len(reviews), "next_cursor": next_cursor})
+
+        return self.response_cache.body(('reviews', id_int, dumps(sorted(query.items()))), build)
 
+    def changes_body(self, args: Mapping[str, str]) -> Optional[Tuple[int, CachedBody]]:
+        """
+        The version a client is brought to and the hostels changed since the
+        `since` version ("hostels", with their current bodies, and ids of the
+        "deleted" ones); None if the client has to resync.
+        """
+        query = validate_changes_query(args)
+        fields = validate_fields(args)
+        since = self.change_log.version if query['since'] is None else query['since']
+        delta = self.change_log.since(since, query['epoch'])
+        if delta is None:
+            return None
+        ids, version = delta
 
-@app.route('/')
+        def build() -> bytes:
+            hostels, deleted = [], []
+            for hostel_id in ids:
+                hostel = self.hostel_store.get_by_id(hostel_id)
+                if hostel is None:
+                    deleted.append(hostel_id)
+                else:
+                    hostels.append(hostel)
+            return self.hostel_list_body(hostels, fields, deleted=deleted, version=version,
+                                         epoch=self.change_log.epoch)
+
+        return version, self.response_cache.body(('changes', since, version, fields), build)
+
+    def resync_body(self) -> bytes:
+        """The answer to a client too far behind for the change log."""
+        return dumps({"error": "Changes since this version are no longer available; refetch the catalog",
+                      "resync": True, "version": self.change_log.version, "epoch": self.change_log.epoch})
+
+    def change_events(self, args: Mapping[str, str]) -> Iterator[bytes]:
+        """
+        Server-sent events with the changes after `since` (the first one, at
+        once, even if there are none) and then each batch of changes as they
+        are made, ending with a `resync` event if the client falls behind.
+        """
+        args, sent = dict(args), None
+        while True:
+            delta = self.changes_body(args)
+            if delta is None:
+                yield change_event(self.change_log.version, self.resync_body(), 'resync')
+                return
+            version, cached = delta
+            if version != sent:
+                yield change_event(version, cached.body)
+            args['since'] = str(version)
+            sent = version
+            if not self.change_log.wait(version, SSE_HEARTBEAT_SECONDS):
+                yield SSE_HEARTBEAT
+
+    def export_chunks(self) -> Iterator[bytes]:
+        """Every hostel as NDJSON, in id order, 100 lines per chunk."""
+        lines = []
+        for hostel in self.hostel_store.iter_all():
+            lines.append(encode_hostel(hostel))
+            if len(lines) == 100:
+                yield b'\n'.join(lines) + b'\n'
+                lines = []
+        if lines:
+            yield b'\n'.join(lines) + b'\n'
+
+
+def build_backend(config: Mapping[str, Any]) -> Backend:
+    """Build the store an app's config asks for, preload or seed it, and wrap it in a Backend."""
+    hostel_store = config['HOSTEL_STORE']
+    if hostel_store is None:
+        hostel_store = environment_store()
+    elif callable(hostel_store):
+        hostel_store = hostel_store()
+    if config['SNAPSHOT'] and not len(hostel_store):
+        # A durable store recovers from its own snapshot; preloading one
+        # into it would leave hostels its log knows nothing about.
+        if not isinstance(hostel_store, HostelStore) or hostel_store.storage is not None:
+            raise ValueError("SNAPSHOT can only preload an in-memory store without durable storage")
+        load_snapshot(hostel_store, config['SNAPSHOT'])
+    state = Backend(hostel_store, config['METRICS'], config['COALESCE_READS'])
+    if config['SEED_DEMO_DATA'] and not len(hostel_store):
+        seed_demo_data(hostel_store)
+    return state
+
+
+class LazyBackend:
+    """An app's Backend, built once from its config on first use (see create_app)."""
+
+    def __init__(self, config: Mapping[str, Any]):
+        self.config = config
+        self.backend: Optional[Backend] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Backend:
+        state = self.backend
+        if state is None:
+            with self._lock:
+                if self.backend is None:
+                    self.backend = build_backend(self.config)
+                state = self.backend
+        return state
+
+    def close(self) -> None:
+        """Flush the store's durable storage, if the backend was ever built."""
+        if self.backend is not None and getattr(self.backend.hostel_store, 'storage', None) is not None:
+            self.backend.hostel_store.storage.close()
+
+
+def backend(flask_app: Optional[Flask] = None) -> Backend:
+    """The Backend of an app (the current one by default), built on first use."""
+    return (flask_app or current_app).extensions['veristay'].get()
+
+
+def warm_up(flask_app: Flask) -> Backend:
+    """
+    Build an app's Backend now rather than on its first request, and build
+    the first page of the catalog, the first thing most clients ask for.
+    """
+    state = backend(flask_app)
+    state.hostels_body({})
+    return state
+
+
+routes = Blueprint('veristay', __name__)
+# Never queued or shed: health checks and scrapes, so an overloaded server
+# still reports its state, and the long-lived streams, which would otherwise
+# hold a slot each for as long as a client stays subscribed.
+ADMISSION_EXEMPT = ('/api/health', '/api/metrics', '/api/hostels/export', '/api/hostels/changes/stream')
+
+
+def label_request():
+    """Label the request's metrics with the matched URL rule."""
+    if request.url_rule is not None:
+        request.environ[metrics.ROUTE_KEY] = request.url_rule.rule
+
+
+def create_app(config: Optional[Mapping[str, Any]] = None) -> Flask:
+    """A Flask app serving the hostel API; `config` overrides default_config."""
+    flask_app = Flask(__name__)
+    flask_app.config.update(default_config())
+    flask_app.config.update(config or {})
+    CORS(flask_app)  # Enable CORS for all routes
+    flask_app.register_blueprint(routes)
+    flask_app.extensions['veristay'] = LazyBackend(flask_app.config)
+    if flask_app.config['MAX_IN_FLIGHT']:
+        # Kept in extensions too, for the ASGI app's native reads (asgi.py).
+        flask_app.wsgi_app = flask_app.extensions['veristay_admission'] = AdmissionControl(
+            flask_app.wsgi_app, flask_app.config['MAX_IN_FLIGHT'], flask_app.config['MAX_QUEUED'],
+            flask_app.config['QUEUE_TIMEOUT_MS'] / 1000, flask_app.config['RETRY_AFTER_SECONDS'],
+            exempt=ADMISSION_EXEMPT, on_shed=metrics.observe_shed if flask_app.config['METRICS'] else None)
+    if flask_app.config['METRICS']:
+        profiler = None
+        if flask_app.config['PROFILE_DIR']:
+            profiler = metrics.SlowRequestProfiler(flask_app.config['PROFILE_DIR'],
+                                                   flask_app.config['PROFILE_SLOW_MS'] / 1000)
+            profiler.start()
+        flask_app.wsgi_app = metrics.RequestMetrics(flask_app.wsgi_app, profiler)
+        flask_app.before_request(label_request)
+    if flask_app.config['WARM_UP']:
+        warm_up(flask_app)
+    return flask_app
+
+
+@routes.route('/')
 def home():
     return jsonify({"message": "Welcome to the VeriStay Backend!"})
 
-@app.route('/api/health')
+@routes.route('/api/health')
 def health_check():
     return jsonify({"status": "healthy", "service": "veristay-backend"})
 
 
+@routes.route('/api/metrics')
+def get_metrics():
+    """Metrics of this process in the Prometheus text format."""
+    if not current_app.config['METRICS']:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def cached_response(cached: CachedBody) -> Response:
+    """
+    JSON response with a strong ETag, or 304 if the client already has it;
+    compressed if the client accepts it and the body is large enough.
+    """
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''), len(cached.body))
+    etag = encoded_etag(cached.etag, encoding)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        body = cached.body if encoding is None else backend().compression_cache.compressed(cached, encoding)
+        response = Response(body, status=200, mimetype='application/json')
+        if encoding is not None:
+            response.content_encoding = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def validation_error(error: ValidationError):
+    """400 response naming every invalid field of a request body."""
+    body = {"error": str(error)}
+    if error.errors:
+        body["errors"] = error.errors
+    return jsonify(body), 400
+
+
 # Hostel API Endpoints
 
-@app.route('/api/hostels', methods=['GET'])
+@routes.route('/api/hostels', methods=['GET'])
 def get_hostels():
-    """Get all verified hostels."""
-    hostels = hostel_store.get_all()
-    # In a real app, we might filter by is_verified=True by default for public view
-    # For now, we return all
-    return jsonify({
-        "hostels": [hostel.to_dict() for hostel in hostels],
-        "count": len(hostels)
-    }), 200
+    """Get a page of hostels, filtered and sorted by the query parameters."""
+    try:
+        return cached_response(backend().hostels_body(request.args))
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@routes.route('/api/hostels/nearby', methods=['GET'])
+def get_nearby_hostels():
+    """Get the hostels closest to a point, with their distance in meters."""
+    try:
+        return cached_response(backend().nearby_body(request.args))
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
 
 
-@app.route('/api/hostels', methods=['POST'])
+@routes.route('/api/hostels/clusters', methods=['GET'])
+def get_hostel_clusters():
+    """Get map clusters of the hostels in a viewport at a zoom level."""
+    try:
+        return cached_response(backend().clusters_body(request.args))
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@routes.route('/api/hostels/stats', methods=['GET'])
+def get_hostel_stats():
+    """Get price, verification and amenity statistics by area or amenity."""
+    try:
+        return cached_response(backend().stats_body(request.args))
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@routes.route('/api/hostels/search', methods=['GET'])
+def search_hostels():
+    """Search hostels by name, address and amenities, best match first."""
+    try:
+        return cached_response(backend().search_body(request.args))
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@routes.route('/api/hostels', methods=['POST'])
 def create_hostel():
     """Create a new hostel (Admin only)."""
     try:
@@ -78,21 +547,11 @@ def create_hostel():
             
         # Validate data
         try:
-            name, address, price_min, price_max, lat, long, amenities, images, is_verified = validate_hostel_create(data)
+            fields = validate_hostel_create(data)
         except ValidationError as e:
-            return jsonify({"error": str(e)}), 400
+            return validation_error(e)
 
-        hostel = hostel_store.create(
-            name=name,
-            address=address,
-            price_min=price_min,
-            price_max=price_max,
-            lat=lat,
-            long=long,
-            amenities=amenities,
-            images=images,
-            is_verified=is_verified
-        )
+        hostel = backend().hostel_store.create(**fields)
         
         return jsonify({
             "message": "Hostel created successfully",
@@ -103,25 +562,171 @@ def create_hostel():
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route('/api/hostels/<hostel_id>', methods=['GET'])
+def bulk_rows():
+    """
+    Yield (row number, parsed row or None) from a bulk request body: a JSON
+    array, or NDJSON (one object per line) read incrementally from the stream.
+    """
+    if request.mimetype == 'application/json':
+        data = request.get_json()
+        if not isinstance(data, list):
+            raise ValidationError("Request body must be a JSON array or NDJSON")
+        yield from enumerate(data, 1)
+        return
+    # request.stream reads lines a byte at a time; buffer it.
+    for number, line in enumerate(io.BufferedReader(request.stream, 1 << 16), 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, loads(line)
+        except ValueError:
+            yield number, None
+
+
+@routes.route('/api/hostels/bulk', methods=['POST'])
+def bulk_create_hostels():
+    """
+    Create many hostels from a JSON array or NDJSON body (Admin only).
+
+    Rows are validated one by one and inserted in batches of
+    BULK_BATCH_SIZE; invalid rows are skipped and reported by row number
+    (the first MAX_BULK_ERRORS of them).
+    """
+    created, failed, errors, batch = 0, 0, [], []
+
+    def flush():
+        nonlocal created
+        created += len(backend().hostel_store.create_many(batch))
+        batch.clear()
+
+    try:
+        for number, data in bulk_rows():
+            try:
+                if data is None:
+                    raise ValidationError("Invalid JSON")
+                batch.append(validate_hostel_create(data))
+            except ValidationError as e:
+                failed += 1
+                if len(errors) < MAX_BULK_ERRORS:
+                    errors.append({"row": number, "error": str(e)})
+                continue
+            if len(batch) >= BULK_BATCH_SIZE:
+                flush()
+        flush()
+    except BadRequest:
+        return jsonify({"error": "Invalid JSON"}), 400
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    status = 400 if failed and not created else 200
+    return jsonify({"created": created, "failed": failed, "errors": errors}), status
+
+
+@routes.route('/api/hostels/export', methods=['GET'])
+def export_hostels():
+    """Stream every hostel as NDJSON, one JSON object per line, in id order."""
+    return Response(backend().export_chunks(), mimetype='application/x-ndjson')
+
+
+@routes.route('/api/hostels/changes', methods=['GET'])
+def get_changes():
+    """Get the hostels changed since a version of the catalog (410 if it is too old)."""
+    try:
+        delta = backend().changes_body(request.args)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    if delta is None:
+        return Response(backend().resync_body(), status=410, mimetype='application/json')
+    return cached_response(delta[1])
+
+
+@routes.route('/api/hostels/changes/stream', methods=['GET'])
+def stream_changes():
+    """Stream the catalog's changes as server-sent events."""
+    args = request.args.to_dict()
+    # EventSource sends the id of the last event it saw when it reconnects.
+    if request.headers.get('Last-Event-ID'):
+        args['since'] = request.headers['Last-Event-ID']
+    try:
+        events = backend().change_events(args)
+        first = next(events)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def stream() -> Iterator[bytes]:
+        yield first
+        yield from events
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@routes.route('/api/hostels/<hostel_id>', methods=['GET'])
 def get_hostel(hostel_id):
     """Get a specific hostel by ID."""
     try:
-        id_int = validate_hostel_id(hostel_id)
-        hostel = hostel_store.get_by_id(id_int)
-        
-        if not hostel:
+        cached = backend().hostel_body(hostel_id, request.args)
+        if not cached:
             return jsonify({"error": "Hostel not found"}), 404
-        
-        return jsonify({"hostel": hostel.to_dict()}), 200
-        
+        return cached_response(cached)
+
     except ValidationError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route('/api/hostels/<hostel_id>', methods=['PUT'])
+@routes.route('/api/hostels/<hostel_id>/similar', methods=['GET'])
+def get_similar(hostel_id):
+    """Get the hostels most similar to one in price, location and amenities."""
+    try:
+        cached = backend().similar_body(hostel_id, request.args)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    if not cached:
+        return jsonify({"error": "Hostel not found"}), 404
+    return cached_response(cached)
+
+
+@routes.route('/api/hostels/<hostel_id>/reviews', methods=['GET'])
+def get_reviews(hostel_id):
+    """Get a page of a hostel's reviews, newest first."""
+    try:
+        cached = backend().reviews_body(hostel_id, request.args)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    if not cached:
+        return jsonify({"error": "Hostel not found"}), 404
+    return cached_response(cached)
+
+
+@routes.route('/api/hostels/<hostel_id>/reviews', methods=['POST'])
+def create_review(hostel_id):
+    """Add a review to a hostel."""
+    try:
+        id_int = validate_hostel_id(hostel_id)
+        try:
+            data = request.get_json()
+        except BadRequest:
+            return jsonify({"error": "Invalid JSON"}), 400
+        if data is None:
+            return jsonify({"error": "Invalid JSON"}), 400
+        user_id, rating, comment = validate_review_create(data)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+
+    hostel_store = backend().hostel_store
+    review = hostel_store.add_review(id_int, user_id, rating, comment)
+    hostel = hostel_store.get_by_id(id_int)
+    if review is None or hostel is None:
+        return jsonify({"error": "Hostel not found"}), 404
+    return jsonify({
+        "message": "Review added successfully",
+        "review": review.to_dict(),
+        "rating": hostel.rating_summary()
+    }), 201
+
+
+@routes.route('/api/hostels/<hostel_id>', methods=['PUT'])
 def update_hostel(hostel_id):
     """Update a hostel."""
     try:
@@ -137,11 +742,13 @@ def update_hostel(hostel_id):
             
         try:
             update_data = validate_hostel_update(data)
+            # The price bound not being updated is checked against the stored one.
+            hostel = backend().hostel_store.update(id_int, **update_data)
         except ValidationError as e:
+            return validation_error(e)
+        except ValueError as e:
             return jsonify({"error": str(e)}), 400
         
-        hostel = hostel_store.update(id_int, **update_data)
-        
         if not hostel:
             return jsonify({"error": "Hostel not found"}), 404
         
@@ -152,17 +759,17 @@ def update_hostel(hostel_id):
         
     except ValidationError as e:
         return jsonify({"error": str(e)}), 400
-    except Exception as e:
-        print(f"Error updating hostel: {e}")
+    except Exception:
+        current_app.logger.exception("Error updating hostel %s", hostel_id)
         return jsonify({"error": "Internal server error"}), 500
 
 
-@app.route('/api/hostels/<hostel_id>', methods=['DELETE'])
+@routes.route('/api/hostels/<hostel_id>', methods=['DELETE'])
 def delete_hostel(hostel_id):
     """Delete a hostel."""
     try:
         id_int = validate_hostel_id(hostel_id)
-        success = hostel_store.delete(id_int)
+        success = backend().hostel_store.delete(id_int)
         
         if not success:
             return jsonify({"error": "Hostel not found"}), 404
@@ -176,21 +783,27 @@ def delete_hostel(hostel_id):
 
 
 # Error handlers
-@app.errorhandler(404)
+@routes.app_errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint not found"}), 404
 
 
-@app.errorhandler(405)
+@routes.app_errorhandler(405)
 def method_not_allowed(error):
     return jsonify({"error": "Method not allowed"}), 405
 
 
-@app.errorhandler(500)
+@routes.app_errorhandler(500)
 def internal_error(error):
     return jsonify({"error": "Internal server error"}), 500
 
 
+# The app WSGI servers, asgi.py and cluster.py serve, configured from the
+# environment; its backend is built on first use.
+app = create_app()
+
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
+    warm_up(app)
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,477 @@
+"""
+ASGI entry point for the hostel API:
+
+    uvicorn asgi:application --port 5000
+
+Read endpoints (list, detail, nearby, search, reviews, export, change
+feed) are served natively by coroutines, using the same body builders as
+the Flask routes in app.py, so a slow client never holds a thread. Every other request (writes,
+bulk import, CORS preflight, unknown paths) is passed to the Flask app
+through a WSGI bridge running on a thread pool, so both modes share routes,
+validation, the store and the response cache.
+
+The app's backend (store, indexes, caches) is built during lifespan
+startup, before the server accepts connections, on the thread pool; under
+servers or adapters that skip lifespan events it is built by the first
+request instead, also on the thread pool.
+
+Bridged requests stream both ways: the Flask app reads the request body
+as it arrives, and responses larger than BRIDGE_BUFFER_LIMIT are sent a
+chunk at a time.
+
+Store reads and body building run on the thread pool, for either store:
+in-memory reads take the store's read lock, which waits for writers (a
+bulk import holds it for a whole batch), and a response cache miss may
+wait for another request's build of the same body. The event loop only
+parses requests, sends responses and waits. With MAX_IN_FLIGHT set,
+native reads wait for admission slots on the event loop, sharing the
+Flask app's limit and queue (admission.py).
+"""
+import asyncio
+import io
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl
+import app as api
+import metrics
+from admission import SHED_BODY, SHED_ROUTE, AdmissionControl
+from cache import CachedBody, encoded_etag, negotiate_encoding
+from serializers import dumps
+from validation import ValidationError
+
+# Threads for bridged Flask requests and blocking store reads.
+executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='veristay-asgi')
+
+
+HOSTEL_PATH = re.compile(r'^/api/hostels/([^/]+)$')
+REVIEWS_PATH = re.compile(r'^/api/hostels/([^/]+)/reviews$')
+SIMILAR_PATH = re.compile(r'^/api/hostels/([^/]+)/similar$')
+
+METRICS_ENABLED = api.app.config['METRICS']
+# The Flask app's admission control (MAX_IN_FLIGHT), if any: native reads
+# take their slots from it too, so the limit covers every request.
+ADMISSION: Optional[AdmissionControl] = api.app.extensions.get('veristay_admission')
+
+# Every response gets the header flask_cors adds to the Flask app's.
+CORS_HEADER = (b'access-control-allow-origin', b'*')
+
+
+def backend() -> api.Backend:
+    """The Flask app's Backend (see app.backend)."""
+    return api.backend(api.app)
+
+
+async def call_store(fn: Callable, *args) -> Any:
+    """Run a store read (which may block; see the module docstring) on the thread pool."""
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def ensure_backend() -> None:
+    """Build the Backend on the thread pool, if lifespan startup has not, before native reads use it."""
+    if api.app.extensions['veristay'].backend is None:
+        await call_store(backend)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header value covers `etag`."""
+    for tag in if_none_match.split(','):
+        tag = tag.strip()
+        if tag == '*' or tag.removeprefix('W/').strip('"') == etag:
+            return True
+    return False
+
+
+async def send_response(send, status: int, body: bytes, headers: List[Tuple[bytes, bytes]],
+                        content_type: bytes = b'application/json') -> None:
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode()),
+                            CORS_HEADER] + headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, status: int, data: Dict) -> None:
+    await send_response(send, status, dumps(data), [])
+
+
+async def send_cached(send, headers: Dict[str, str], cached: CachedBody) -> None:
+    """
+    Send a cached body with its ETag, or 304 if the client already has it;
+    compressed if the client accepts it and the body is large enough.
+    """
+    encoding = negotiate_encoding(headers.get('accept-encoding', ''), len(cached.body))
+    etag = encoded_etag(cached.etag, encoding)
+    cache_headers = [(b'etag', f'"{etag}"'.encode()), (b'cache-control', b'no-cache'),
+                     (b'vary', b'Accept-Encoding')]
+    if etag_matches(headers.get('if-none-match', ''), etag):
+        await send({'type': 'http.response.start', 'status': 304,
+                    'headers': [CORS_HEADER] + cache_headers})
+        await send({'type': 'http.response.body', 'body': b''})
+    elif encoding is None:
+        await send_response(send, 200, cached.body, cache_headers)
+    else:
+        body = backend().compression_cache.compressed(cached, encoding)
+        await send_response(send, 200, body, [(b'content-encoding', encoding.encode())] + cache_headers)
+
+
+async def send_export(send) -> None:
+    """Stream the NDJSON export, yielding to the event loop between chunks."""
+    await send({'type': 'http.response.start', 'status': 200,
+                'headers': [(b'content-type', b'application/x-ndjson'), CORS_HEADER]})
+    chunks: Iterator[bytes] = backend().export_chunks()
+    while True:
+        chunk = await call_store(next, chunks, None)
+        if chunk is None:
+            break
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await asyncio.sleep(0)
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+def read_route(path: str) -> Tuple[Optional[str], Optional[Callable[[Dict[str, str]], Optional[CachedBody]]]]:
+    """
+    The Flask URL rule of a natively served GET path, and its body builder
+    taking the query parameters ((None, None) for other paths).
+    """
+    if not path.startswith('/api/hostels'):
+        return None, None
+    state = backend()
+    if path == '/api/hostels':
+        return '/api/hostels', state.hostels_body
+    if path == '/api/hostels/nearby':
+        return '/api/hostels/nearby', state.nearby_body
+    if path == '/api/hostels/search':
+        return '/api/hostels/search', state.search_body
+    if path == '/api/hostels/clusters':
+        return '/api/hostels/clusters', state.clusters_body
+    if path == '/api/hostels/stats':
+        return '/api/hostels/stats', state.stats_body
+    match = REVIEWS_PATH.match(path)
+    if match:
+        return '/api/hostels/<hostel_id>/reviews', lambda args: state.reviews_body(match.group(1), args)
+    match = SIMILAR_PATH.match(path)
+    if match:
+        return '/api/hostels/<hostel_id>/similar', lambda args: state.similar_body(match.group(1), args)
+    match = HOSTEL_PATH.match(path)
+    if match:
+        return '/api/hostels/<hostel_id>', lambda args: state.hostel_body(match.group(1), args)
+    return None, None
+
+
+def recording(send, sent: Dict[str, int]):
+    """Wrap `send` to note the response status and body bytes in `sent`."""
+    async def wrapper(message):
+        if message['type'] == 'http.response.start':
+            sent['status'] = message['status']
+        else:
+            sent['bytes'] += len(message.get('body', b''))
+        await send(message)
+    return wrapper
+
+
+def request_headers(scope) -> Dict[str, str]:
+    return {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+
+
+def request_args(scope) -> Dict[str, str]:
+    args: Dict[str, str] = {}
+    # Like Flask's request.args.get, the first of repeated parameters wins.
+    for name, value in parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True):
+        args.setdefault(name, value)
+    return args
+
+
+async def serve_read(scope, send, build: Callable[[Dict[str, str]], Optional[CachedBody]]) -> None:
+    headers, args = request_headers(scope), request_args(scope)
+    try:
+        cached = await call_store(build, args)
+    except ValidationError as e:
+        await send_json(send, 400, {"error": str(e)})
+        return
+    if cached is None:
+        await send_json(send, 404, {"error": "Hostel not found"})
+        return
+    await send_cached(send, headers, cached)
+
+
+async def serve_route(scope, send, build: Callable[[Dict[str, str]], Optional[CachedBody]]) -> None:
+    try:
+        await serve_read(scope, send, build)
+    except Exception:
+        await send_json(send, 500, {"error": "Internal server error"})
+
+
+async def serve_changes(scope, send) -> None:
+    """The hostels changed since a version, or 410 if the client has to resync."""
+    try:
+        delta = await call_store(backend().changes_body, request_args(scope))
+    except ValidationError as e:
+        await send_json(send, 400, {"error": str(e)})
+        return
+    if delta is None:
+        await send_response(send, 410, backend().resync_body(), [])
+    else:
+        await send_cached(send, request_headers(scope), delta[1])
+
+
+# Change streams check the change log for new changes this often.
+STREAM_POLL_SECONDS = 0.25
+
+
+async def send_change_events(scope, receive, send) -> None:
+    """
+    The change feed as server-sent events, like app.change_events. Rather
+    than holding a thread in ChangeLog.wait, each stream polls the log's
+    version on the event loop, and stops when the client disconnects.
+    """
+    args = request_args(scope)
+    last_event_id = request_headers(scope).get('last-event-id')
+    if last_event_id:
+        args['since'] = last_event_id
+    state = backend()
+    try:
+        delta = await call_store(state.changes_body, args)
+    except ValidationError as e:
+        await send_json(send, 400, {"error": str(e)})
+        return
+    disconnected = asyncio.Event()
+
+    async def watch() -> None:
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                                CORS_HEADER]})
+        sent = None
+        while not disconnected.is_set():
+            if delta is None:
+                event = api.change_event(state.change_log.version, state.resync_body(), 'resync')
+                await send({'type': 'http.response.body', 'body': event, 'more_body': True})
+                break
+            version, cached = delta
+            if version != sent:
+                await send({'type': 'http.response.body', 'body': api.change_event(version, cached.body),
+                            'more_body': True})
+                sent = version
+            args['since'] = str(version)
+            idle = 0.0
+            while state.change_log.version == version and not disconnected.is_set():
+                try:
+                    await asyncio.wait_for(disconnected.wait(), STREAM_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    idle += STREAM_POLL_SECONDS
+                if idle >= api.SSE_HEARTBEAT_SECONDS:
+                    await send({'type': 'http.response.body', 'body': api.SSE_HEARTBEAT, 'more_body': True})
+                    idle = 0.0
+            delta = await call_store(state.changes_body, args)
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
+
+
+class RequestBody(io.RawIOBase):
+    """
+    wsgi.input of a bridged request: the ASGI request body, received as the
+    Flask app reads it (on its thread-pool thread) rather than buffered
+    before the app is called. A client disconnect ends it early.
+    """
+
+    def __init__(self, receive, loop: asyncio.AbstractEventLoop):
+        self.receive = receive
+        self.loop = loop
+        self.chunk = memoryview(b'')
+        self.done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.chunk and not self.done:
+            message = asyncio.run_coroutine_threadsafe(self.receive(), self.loop).result()
+            if message['type'] == 'http.disconnect':
+                self.done = True
+            else:
+                self.chunk = memoryview(message.get('body', b''))
+                self.done = not message.get('more_body')
+        n = min(len(buffer), len(self.chunk))
+        buffer[:n] = self.chunk[:n]
+        self.chunk = self.chunk[n:]
+        return n
+
+
+def wsgi_environ(scope, body: io.BufferedIOBase) -> Dict[str, Any]:
+    """A WSGI environ for an ASGI HTTP scope, reading the request body from `body`."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+        else:
+            key = 'HTTP_' + name
+            environ[key] = environ[key] + ',' + value if key in environ else value
+    if 'CONTENT_LENGTH' not in environ:
+        # A chunked body: the app reads the input until it ends.
+        environ['wsgi.input_terminated'] = True
+    return environ
+
+
+# Bridged responses up to this size are sent as one message; the rest of a
+# larger one is streamed a chunk at a time.
+BRIDGE_BUFFER_LIMIT = 1 << 16
+
+
+def start_wsgi(environ: Dict[str, Any]) -> Tuple[int, List[Tuple[bytes, bytes]], List[bytes],
+                                                 Optional[Tuple[Any, Iterator[bytes]]]]:
+    """
+    Call the Flask app and collect its response up to BRIDGE_BUFFER_LIMIT
+    bytes: (status, headers, chunks, rest), where rest is None once the
+    response is complete (and closed), else the response and an iterator
+    over its remaining chunks.
+    """
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'] = int(status.split(' ', 1)[0])
+        started['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                              for name, value in headers]
+
+    result = api.app(environ, start_response)
+    chunks: List[bytes] = []
+    size = 0
+    try:
+        chunk_iter = iter(result)
+        for chunk in chunk_iter:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size > BRIDGE_BUFFER_LIMIT:
+                return started['status'], started['headers'], chunks, (result, chunk_iter)
+    except BaseException:
+        if hasattr(result, 'close'):
+            result.close()
+        raise
+    if hasattr(result, 'close'):
+        result.close()
+    return started['status'], started['headers'], chunks, None
+
+
+async def serve_wsgi(scope, receive, send) -> None:
+    """Pass a request to the Flask app on the thread pool, streaming its body both ways."""
+    loop = asyncio.get_running_loop()
+    environ = wsgi_environ(scope, io.BufferedReader(RequestBody(receive, loop)))
+    status, headers, chunks, rest = await loop.run_in_executor(executor, start_wsgi, environ)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    if rest is None:
+        await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+        return
+    result, chunk_iter = rest
+    try:
+        await send({'type': 'http.response.body', 'body': b''.join(chunks), 'more_body': True})
+        while True:
+            chunk = await loop.run_in_executor(executor, next, chunk_iter, None)
+            if chunk is None:
+                break
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(result, 'close'):
+            await loop.run_in_executor(executor, result.close)
+
+
+# GET paths served natively by handlers of their own, rather than by
+# serve_read with a body builder.
+HANDLERS = {
+    '/api/hostels/export': lambda scope, receive, send: send_export(send),
+    '/api/hostels/changes': lambda scope, receive, send: serve_changes(scope, send),
+    '/api/hostels/changes/stream': send_change_events,
+}
+STREAMS = {'/api/hostels/export', '/api/hostels/changes/stream'}
+
+
+async def serve_admitted(handler, scope, receive, send) -> bool:
+    """
+    Run a native handler in an admission slot (when MAX_IN_FLIGHT is set and
+    the path is not exempt), or shed the request with 503; whether it ran.
+    """
+    admission = ADMISSION if ADMISSION is not None and scope['path'] not in ADMISSION.exempt else None
+    if admission is not None:
+        reason = await admission.acquire_async()
+        if reason is not None:
+            admission.shed(reason)
+            await send_response(send, 503, SHED_BODY, [(b'retry-after', str(admission.retry_after).encode())])
+            return False
+    try:
+        await handler(scope, receive, send)
+    finally:
+        if admission is not None:
+            admission.release()
+    return True
+
+
+async def lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await asyncio.get_running_loop().run_in_executor(executor, api.warm_up, api.app)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=True)
+            api.app.extensions['veristay'].close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send) -> None:
+    """The ASGI application."""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+    if scope['method'] == 'GET':
+        # Bridged requests are recorded by the Flask app; native ones here.
+        start = time.perf_counter()
+        sent = {'status': 500, 'bytes': 0}
+        if METRICS_ENABLED:
+            send = recording(send, sent)
+        path = scope['path']
+        if path.startswith('/api/hostels'):
+            await ensure_backend()
+        if path in HANDLERS:
+            route, handler = path, HANDLERS[path]
+        else:
+            route, build = read_route(path)
+            handler = None if build is None else lambda scope, receive, send: serve_route(scope, send, build)
+        if handler is not None:
+            if not await serve_admitted(handler, scope, receive, send):
+                route = SHED_ROUTE
+            if METRICS_ENABLED:
+                # Like the Flask app, streamed responses have no recorded size.
+                metrics.observe_request('GET', route, sent['status'], time.perf_counter() - start,
+                                        0, None if path in STREAMS else sent['bytes'])
+            return
+    await serve_wsgi(scope, receive, send)
@@ -0,0 +1,41 @@
+"""Rows/sec through POST /api/hostels one by one vs POST /api/hostels/bulk (NDJSON)."""
+import argparse
+import json
+import time
+from app import app, backend
+from benchmarks.catalog import hostel_rows
+
+hostel_store = backend(app).hostel_store
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    client = app.test_client()
+    data = list(hostel_rows(args.rows))
+
+    hostel_store.clear()
+    start = time.perf_counter()
+    for row in data:
+        client.post('/api/hostels', json=row)
+    single = args.rows / (time.perf_counter() - start)
+
+    hostel_store.clear()
+    body = "".join(json.dumps(row) + "\n" for row in data).encode()
+    start = time.perf_counter()
+    result = client.post('/api/hostels/bulk', data=body, content_type='application/x-ndjson').get_json()
+    bulk = args.rows / (time.perf_counter() - start)
+    assert result['created'] == args.rows, result
+
+    start = time.perf_counter()
+    exported = sum(1 for _ in client.get('/api/hostels/export').response)
+    export = time.perf_counter() - start
+
+    print(f"{args.rows} rows")
+    print(f"single POST: {single:10.0f} rows/s")
+    print(f"bulk NDJSON: {bulk:10.0f} rows/s  ({bulk / single:.1f}x)")
+    print(f"export:      {args.rows / export:10.0f} rows/s  ({exported} chunks)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Read throughput of the multi-process mode (cluster.py) by worker count.
+
+For each worker count the launcher is started on a fresh catalog, the
+catalog is bulk-imported through the public port (proxied to the writer),
+and once the first generation with every row is published, keep-alive
+connections drive a read mix served by the workers from the shared
+catalog (detail, list pages, nearby). Memory is reported as the workers'
+proportional set size: the catalog mapping is shared, so each worker is
+only charged its share of it.
+
+Throughput can only scale with worker count up to the number of CPUs the
+machine has; with fewer cores than workers the extra processes just share
+them.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from benchmarks.bench_serving import load, wait_for_port
+from benchmarks.catalog import hostel_rows
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def urls(count, hostels, seed=7):
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.5:
+            paths.append(f'/api/hostels/{rng.randrange(1, hostels + 1)}')
+        elif roll < 0.85:
+            paths.append(rng.choice(['/api/hostels?limit=20', '/api/hostels?limit=20&sort=price_min',
+                                     '/api/hostels?limit=20&is_verified=true&amenities=WiFi']))
+        else:
+            paths.append('/api/hostels/nearby?lat=23.02&long=72.57&radius_m=2000&limit=20')
+    return paths
+
+def import_catalog(port, hostels):
+    body = b''.join(json.dumps(row).encode() + b'\n' for row in hostel_rows(hostels))
+    request = urllib.request.Request(f'http://127.0.0.1:{port}/api/hostels/bulk', data=body,
+                                     headers={'Content-Type': 'application/x-ndjson'})
+    with urllib.request.urlopen(request) as response:
+        assert json.loads(response.read())['created'] == hostels
+
+def wait_for_publish(port, hostels, timeout=60):
+    """Until a worker serves the last imported hostel from the catalog."""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/hostels/{hostels}').close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit("catalog was not published")
+
+def children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as f:
+        return [int(child) for child in f.read().split()]
+
+def memory_kb(pid):
+    """(RSS, PSS) of a process in kB."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                values[name] = int(rest.split()[0])
+    return values['Rss'], values['Pss']
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hostels', type=int, default=10000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=5078)
+    args = parser.parse_args()
+
+    paths = urls(20000, args.hostels)
+    print(f"{args.hostels} hostels, {args.connections} connections, {args.seconds:.0f}s per run, "
+          f"{os.cpu_count()} CPUs")
+    for workers in args.workers:
+        proc = subprocess.Popen([sys.executable, 'cluster.py', '--workers', str(workers),
+                                 '--host', '127.0.0.1', '--port', str(args.port)],
+                                cwd=BACKEND, stdout=subprocess.DEVNULL)
+        try:
+            wait_for_port(args.port, proc)
+            import_catalog(args.port, args.hostels)
+            wait_for_publish(args.port, args.hostels)
+            asyncio.run(load(args.port, paths, args.connections, 1))
+            rps, p50, _, p99, errors = asyncio.run(load(args.port, paths, args.connections, args.seconds))
+            # The writer is the first child; the rest are workers.
+            memory = [memory_kb(pid) for pid in children(proc.pid)[1:]]
+            rss = sum(r for r, _ in memory) / len(memory) / 1024
+            pss = sum(p for _, p in memory) / len(memory) / 1024
+            print(f"{workers:2d} workers: {rps:8.0f} req/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   "
+                  f"5xx {errors}   per worker RSS {rss:5.1f} MB, PSS {pss:5.1f} MB")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Payload size and latency of hostel list pages by field projection and
+content coding.
+
+The whole catalog is paged through at limit=200 with the Flask test
+client, following next_cursor, as a map view loading every hostel would;
+times cover the requests only, not decompressing pages to read the cursor.
+"cold" walks start with empty response and compression caches, so they
+include encoding every hostel (or its projected fields) and compressing
+every page; "warm" walks repeat the same requests and are served from the
+caches. brotli is only measured when it is installed.
+"""
+import argparse
+import gzip
+import json
+import time
+from app import app, backend
+from benchmarks.catalog import add_reviews, populate
+from cache import ENCODINGS, brotli
+
+state = backend(app)
+hostel_store, response_cache, compression_cache = \
+    state.hostel_store, state.response_cache, state.compression_cache
+
+DECODERS = {'gzip': gzip.decompress, 'br': brotli.decompress if brotli is not None else None}
+
+# The fields the Explore page's map and cards use.
+CARD_FIELDS = 'name,address,price_min,lat,long,amenities,images,is_verified'
+
+def walk(client, fields, encoding):
+    """Page through every hostel; return (pages, bytes received, seconds in requests)."""
+    query = {'limit': 200}
+    if fields:
+        query['fields'] = fields
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    pages = size = 0
+    seconds = 0.0
+    while True:
+        start = time.perf_counter()
+        response = client.get('/api/hostels', query_string=query, headers=headers)
+        seconds += time.perf_counter() - start
+        assert response.status_code == 200
+        assert response.headers.get('Content-Encoding') == encoding
+        pages += 1
+        size += len(response.data)
+        body = DECODERS[encoding](response.data) if encoding else response.data
+        cursor = json.loads(body)['next_cursor']
+        if not cursor:
+            return pages, size, seconds
+        query['cursor'] = cursor
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hostels', type=int, default=5000)
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    hostel_store.clear()
+    populate(hostel_store, args.hostels)
+    add_reviews(hostel_store, args.reviews)
+    app.config['TESTING'] = True
+    print(f"{args.hostels} hostels, pages of 200; best of {args.repeat} walks (ms per walk)")
+    with app.test_client() as client:
+        for label, fields in (("all fields", None), ("card fields", CARD_FIELDS)):
+            for encoding in (None,) + ENCODINGS:
+                cold = warm = float('inf')
+                for _ in range(args.repeat):
+                    response_cache.invalidate()
+                    compression_cache.clear()
+                    pages, size, seconds = walk(client, fields, encoding)
+                    cold = min(cold, seconds)
+                    warm = min(warm, walk(client, fields, encoding)[2])
+                print(f"{label:11s} {encoding or 'identity':8s} {pages:3d} pages {size / 1024:8.0f} KB   "
+                      f"cold {cold * 1000:7.1f}   warm {warm * 1000:7.1f}")
+
+if __name__ == '__main__':
+    main()
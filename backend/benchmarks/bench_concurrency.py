@@ -0,0 +1,48 @@
+"""Store throughput for a read-heavy mixed workload across thread counts."""
+import argparse
+import random
+import threading
+import time
+from models import HostelStore
+from benchmarks.catalog import populate
+
+def worker(store, ops, write_ratio, seed, ids):
+    rng = random.Random(seed)
+    for _ in range(ops):
+        op = rng.random()
+        if op < write_ratio / 2:
+            price = rng.randrange(3000, 20000, 500)
+            store.update(rng.choice(ids), price_min=price, price_max=price + 2000)
+        elif op < write_ratio:
+            store.add_review(rng.choice(ids), "bench", 4.0, "ok")
+        elif op < 0.6:
+            store.get_by_id(rng.choice(ids))
+        elif op < 0.8:
+            store.query(limit=20, price_max=rng.randrange(4000, 8000), amenities=["wifi"])
+        else:
+            store.nearby(23.0225, 72.5714, 1000, 10)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hostels', type=int, default=20000)
+    parser.add_argument('--ops', type=int, default=5000, help="total operations per run")
+    parser.add_argument('--write-ratio', type=float, default=0.05)
+    args = parser.parse_args()
+
+    store = populate(HostelStore(), args.hostels)
+    ids = [h.id for h in store.get_all()]
+    print(f"{args.hostels} hostels, {args.ops} ops, {args.write_ratio:.0%} writes")
+    for threads in (1, 2, 4, 8, 16):
+        per_thread = args.ops // threads
+        pool = [threading.Thread(target=worker, args=(store, per_thread, args.write_ratio, i, ids))
+                for i in range(threads)]
+        start = time.perf_counter()
+        for t in pool:
+            t.start()
+        for t in pool:
+            t.join()
+        elapsed = time.perf_counter() - start
+        print(f"{threads:3d} threads: {per_thread * threads / elapsed:10.0f} ops/s")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Compare index-planned filtered queries with a full scan of the catalog."""
+import argparse
+import heapq
+import random
+import time
+from models import HostelStore
+from benchmarks.catalog import AMENITIES, populate
+
+def scan_query(store, limit, price_min=None, price_max=None, amenities=None, is_verified=None):
+    wanted = {a.lower() for a in amenities or ()}
+    hits = (h for h in store.get_all()
+            if (is_verified is None or h.is_verified == is_verified)
+            and (price_min is None or h.price_max >= price_min)
+            and (price_max is None or h.price_min <= price_max)
+            and wanted.issubset(a.lower() for a in h.amenities))
+    return heapq.nsmallest(limit + 1, hits, key=lambda h: h.id)
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for filters in queries:
+        fn(**filters)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hostels', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=100)
+    args = parser.parse_args()
+
+    store = populate(HostelStore(), args.hostels)
+    rng = random.Random(7)
+    shapes = {
+        "price band": lambda: {"price_min": (p := rng.randrange(3000, 20000, 500)), "price_max": p + 200},
+        "price band + verified": lambda: {"price_min": (p := rng.randrange(3000, 20000, 500)),
+                                          "price_max": p + 200, "is_verified": True},
+        "budget ceiling": lambda: {"price_max": rng.randrange(3000, 4000, 500)},
+        "3 amenities + verified": lambda: {"amenities": rng.sample(AMENITIES, 3), "is_verified": True},
+        "budget + amenity": lambda: {"price_max": rng.randrange(3000, 5000, 500), "amenities": [rng.choice(AMENITIES)]},
+    }
+    print(f"{args.hostels} hostels, {args.queries} queries per shape")
+    for label, make in shapes.items():
+        queries = [dict(make(), limit=50) for _ in range(args.queries)]
+        print(f"{label:24s} planned: {timed(store.query, queries):8.3f} ms   "
+              f"scan: {timed(lambda **f: scan_query(store, **f), queries):8.3f} ms")
+
+if __name__ == '__main__':
+    main()
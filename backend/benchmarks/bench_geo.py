@@ -0,0 +1,50 @@
+"""Compare geo index queries with a linear scan over the whole catalog."""
+import argparse
+import random
+import time
+from indexes import haversine_m
+from models import HostelStore
+from benchmarks.catalog import CENTER_LAT, CENTER_LONG, populate
+
+def linear_nearby(store, lat, long, radius_m, limit):
+    hits = []
+    for hostel in store.get_all():
+        dist = haversine_m(lat, long, hostel.lat, hostel.long)
+        if dist <= radius_m:
+            hits.append((dist, hostel.id))
+    return sorted(hits)[:limit]
+
+def linear_bbox(store, min_long, min_lat, max_long, max_lat):
+    return [h.id for h in store.get_all()
+            if min_lat <= h.lat <= max_lat and min_long <= h.long <= max_long]
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    for args in queries:
+        fn(*args)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hostels', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    store = populate(HostelStore(), args.hostels)
+    rng = random.Random(7)
+    points = [(CENTER_LAT + rng.uniform(-0.2, 0.2), CENTER_LONG + rng.uniform(-0.2, 0.2))
+              for _ in range(args.queries)]
+    nearby = [(lat, long, 2000, 20) for lat, long in points]
+    boxes = [(long - 0.02, lat - 0.02, long + 0.02, lat + 0.02) for lat, long in points]
+
+    for (dist, _), (expected, _) in zip(store.geo.nearest(*nearby[0]), linear_nearby(store, *nearby[0])):
+        assert abs(dist - expected) < 1e-6
+
+    print(f"{args.hostels} hostels, {args.queries} queries")
+    print(f"nearby  index: {timed(store.geo.nearest, nearby):8.3f} ms/query   "
+          f"linear: {timed(lambda *a: linear_nearby(store, *a), nearby):8.3f} ms/query")
+    print(f"bbox    index: {timed(lambda *a: list(store.geo.within_bbox(*a)), boxes):8.3f} ms/query   "
+          f"linear: {timed(lambda *a: linear_bbox(store, *a), boxes):8.3f} ms/query")
+
+if __name__ == '__main__':
+    main()
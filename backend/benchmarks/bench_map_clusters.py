@@ -0,0 +1,66 @@
+"""
+Map cluster queries from the incremental cluster index against clustering
+the hostels in view from scratch on every request.
+
+Viewports are a 1280x800 px screen centred around the city at several
+zoom levels. "from scratch" finds the hostels in the cells in view with
+the geo index and aggregates them (what the SQLite store does); its cost
+grows with the hostels in view, while the index only visits the cells
+in view. Updates are timed as moving a hostel and changing its price.
+"""
+import argparse
+import math
+import random
+import time
+from indexes import MAX_CLUSTER_ZOOM, cluster_points, cluster_window, window_bbox
+from models import HostelStore
+from benchmarks.catalog import CENTER_LAT, CENTER_LONG, populate
+
+def viewport(lat, long, zoom, width=1280, height=800):
+    """(min_long, min_lat, max_long, max_lat) of a screen centred on a point."""
+    deg_per_px = 360.0 / (256 * 2 ** zoom)
+    dlong = width / 2 * deg_per_px
+    dlat = height / 2 * deg_per_px * math.cos(math.radians(lat))
+    return long - dlong, lat - dlat, long + dlong, lat + dlat
+
+def from_scratch(store, zoom, bbox):
+    zoom = min(zoom, MAX_CLUSTER_ZOOM)
+    window = cluster_window(zoom, *bbox)
+    ids = store.geo.within_bbox(*window_bbox(zoom, *window))
+    rows = [(h.id, h.lat, h.long, h.price_min) for h in map(store.hostels.get, ids)]
+    return cluster_points(rows, zoom, window)
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for args in calls:
+        fn(*args)
+    return (time.perf_counter() - start) / len(calls) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hostels', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--zooms', type=int, nargs='+', default=[10, 12, 14, 16])
+    parser.add_argument('--queries', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    for count in args.hostels:
+        store = populate(HostelStore(), count)
+        cells = sum(len(level) for level in store.clustering.levels)
+        print(f"{count} hostels, {cells} cluster cells over {MAX_CLUSTER_ZOOM + 1} zoom levels")
+        for zoom in args.zooms:
+            views = [(zoom, viewport(CENTER_LAT + rng.uniform(-0.05, 0.05),
+                                     CENTER_LONG + rng.uniform(-0.05, 0.05), zoom))
+                     for _ in range(args.queries)]
+            clusters = sum(len(store.clusters(*view)) for view in views) / len(views)
+            in_view = sum(sum(c.count for c in store.clusters(*view)) for view in views) / len(views)
+            print(f"  zoom {zoom:2d}: {clusters:6.0f} clusters of {in_view:7.0f} hostels   "
+                  f"index {timed(store.clusters, views):7.3f} ms   "
+                  f"from scratch {timed(lambda *a: from_scratch(store, *a), views):8.3f} ms")
+        ids = rng.sample(sorted(store.hostels), min(2000, count))
+        moves = [(i, CENTER_LAT + rng.uniform(-0.2, 0.2), CENTER_LONG + rng.uniform(-0.2, 0.2),
+                  rng.randrange(3000, 20000, 500)) for i in ids]
+        print(f"  update: {timed(store.clustering.add, moves) * 1000:6.1f} us per move")
+
+if __name__ == '__main__':
+    main()
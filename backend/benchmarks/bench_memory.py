@@ -0,0 +1,69 @@
+"""Measure bytes per hostel record with tracemalloc, legacy layout vs current models."""
+import argparse
+import gc
+import random
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List
+from models import Hostel
+from benchmarks.catalog import AMENITIES, AREAS, NAME_WORDS
+
+@dataclass
+class LegacyHostel:
+    """The original record layout: __dict__, per-hostel lists and ISO strings."""
+    id: int
+    name: str
+    address: str
+    price_min: int
+    price_max: int
+    lat: float
+    long: float
+    amenities: List[str] = field(default_factory=list)
+    images: List[str] = field(default_factory=list)
+    is_verified: bool = False
+    reviews: list = field(default_factory=list)
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    updated_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+
+def rows(count):
+    rng = random.Random(42)
+    for i in range(1, count + 1):
+        price_min = rng.randrange(3000, 20000, 500)
+        yield dict(
+            id=i,
+            name=f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {rng.randrange(1000)}",
+            address=f"{rng.randrange(1, 500)} Main Road, {rng.choice(AREAS)}, Ahmedabad",
+            price_min=price_min,
+            price_max=price_min + rng.randrange(0, 10000, 500),
+            lat=23.0225 + rng.uniform(-0.25, 0.25),
+            long=72.5714 + rng.uniform(-0.25, 0.25),
+            # Fresh list per row, as decoded from a JSON request body.
+            amenities=[str(a) for a in rng.sample(AMENITIES, rng.randrange(1, 5))],
+            images=[f"https://example.com/hostels/{rng.randrange(10 ** 6)}.jpg"],
+            is_verified=rng.random() < 0.6,
+        )
+
+def measure(cls, count):
+    gc.collect()
+    tracemalloc.start()
+    records = [cls(**row) for row in rows(count)]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return current / count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=1000000)
+    args = parser.parse_args()
+
+    legacy = measure(LegacyHostel, args.count)
+    current = measure(Hostel, args.count)
+    print(f"{args.count} hostels")
+    print(f"legacy dataclass: {legacy:8.1f} bytes/hostel")
+    print(f"current Hostel:   {current:8.1f} bytes/hostel  ({100 * (1 - current / legacy):.0f}% smaller)")
+
+if __name__ == '__main__':
+    main()
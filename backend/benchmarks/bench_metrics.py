@@ -0,0 +1,80 @@
+"""
+Overhead of request/store metrics: CPU time per request through the Flask
+app with VERISTAY_METRICS off and on.
+
+app.py reads the variable at import, so it is loaded twice into this
+process, once per setting, each copy with its own store and cache holding
+the same catalog. Both are driven through the Flask test client with the
+same read-heavy URL mix as bench_serving (mostly cached reads, the
+cheapest requests and so the worst case for relative overhead) and a mix
+of updates and list pages. The two settings alternate in short slices and
+the best slice of each is reported, so drift in machine speed affects both
+alike; differences of a few microseconds are still within noise.
+"""
+import argparse
+import importlib.util
+import os
+import time
+from benchmarks.bench_serving import urls
+from benchmarks.catalog import populate
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_app(setting, hostels):
+    os.environ['VERISTAY_METRICS'] = setting
+    spec = importlib.util.spec_from_file_location(f'app_metrics_{setting}', os.path.join(BACKEND, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.hostel_store.clear()
+    populate(module.hostel_store, hostels)
+    for hostel in module.hostel_store.get_all()[:200]:
+        for i in range(5):
+            module.hostel_store.add_review(hostel.id, f"user-{i}", 4.0, "Decent place, good food")
+    return module.app.test_client()
+
+def cpu_us(fn, count):
+    start = time.process_time()
+    fn()
+    return (time.process_time() - start) / count * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hostels', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument('--slices', type=int, default=20)
+    args = parser.parse_args()
+
+    clients = {setting: load_app(setting, args.hostels) for setting in ('0', '1')}
+    paths = urls(args.requests, args.hostels)
+    for client in clients.values():
+        for path in paths[:2000]:
+            client.get(path)
+
+    best = {(setting, mix): float('inf') for setting in clients for mix in ('reads', 'mixed')}
+    for part in range(args.slices):
+        chunk = paths[part::args.slices]
+        updates = range(part, args.writes, args.slices)
+        # Alternate which setting goes first, so neither always runs on a warmer cache.
+        for setting in (('0', '1') if part % 2 else ('1', '0')):
+            client = clients[setting]
+            def reads():
+                for path in chunk:
+                    client.get(path)
+
+            def mixed():
+                for i in updates:
+                    client.put(f'/api/hostels/{i % args.hostels + 1}', json={"price_max": 30000 + i})
+                    client.get('/api/hostels?limit=20')
+
+            best[setting, 'reads'] = min(best[setting, 'reads'], cpu_us(reads, len(chunk)))
+            best[setting, 'mixed'] = min(best[setting, 'mixed'], cpu_us(mixed, 2 * len(updates)))
+
+    print(f"{args.hostels} hostels, {args.requests} reads, {args.writes} update + list pairs")
+    for mix, label in (('reads', 'read-heavy mix'), ('mixed', 'update + list')):
+        off, on = best['0', mix], best['1', mix]
+        print(f"{label:15s} metrics off {off:6.1f} us/req   on {on:6.1f} us/req   "
+              f"overhead {on - off:5.1f} us ({100 * (on - off) / off:4.1f}%)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Overload: a viral listing page. Every connection requests the same
+expensive page (GET /api/hostels?limit=200) while a writer updates a hostel
+--writes-per-sec times a second, so each write empties the response cache
+and the next burst of identical requests misses together.
+
+The threaded WSGI server (app.py) is started once per configuration:
+
+*   off: no coalescing, no admission control (every miss builds the page);
+*   coalesce: concurrent identical misses share one build;
+*   coalesce+admission: also at most --max-in-flight requests at once,
+    --max-queued more waiting up to --queue-timeout-ms, the rest shed
+    with 503 + Retry-After.
+
+Reported per configuration and connection count: successful reads per
+second, p50/p99 latency of successful reads, p99 over every response (503s
+included), shed (503) responses, and the server's CPU use (percent of one
+core, and CPU milliseconds per successful read) from /proc.
+
+    python -m benchmarks.bench_overload --hostels 10000 --connections 64 256 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+from benchmarks.bench_serving import wait_for_port
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOT_PAGE = '/api/hostels?limit=200'
+
+
+def cpu_seconds(pid: int) -> float:
+    """User + system CPU time of a process so far (Linux)."""
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+async def request(reader, writer, method: str, path: str, body: bytes = b'') -> Tuple[int, bool]:
+    """Send a request; its status, and whether the server closes the connection after it."""
+    head = f'{method} {path} HTTP/1.1\r\nHost: localhost\r\n'
+    if body:
+        head += f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+    writer.write(head.encode() + b'\r\n' + body)
+    response = await reader.readuntil(b'\r\n\r\n')
+    length, close = 0, False
+    for line in response.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        name = name.strip().lower()
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection':
+            close = value.strip().lower() == b'close'
+    await reader.readexactly(length)
+    return int(response.split(b' ', 2)[1]), close
+
+
+class Connection:
+    """A client connection, reopened whenever the server closes it (werkzeug's server does after every response)."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def send(self, method: str, path: str, body: bytes = b'') -> int:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        status, close = await request(self.reader, self.writer, method, path, body)
+        if close:
+            self.close()
+        return status
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def overload(port: int, connections: int, seconds: float, writes_per_sec: float,
+                   hostels: int) -> Tuple[List[float], List[float], int]:
+    """(latencies of successful reads, latencies of all reads, shed count) over `seconds`."""
+    ok, everything, shed = [], [], 0
+    deadline = time.perf_counter() + seconds
+
+    async def reader_loop():
+        nonlocal shed
+        connection = Connection(port)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = await connection.send('GET', HOT_PAGE)
+            elapsed = time.perf_counter() - start
+            everything.append(elapsed)
+            if status == 503:
+                shed += 1
+            elif status == 200:
+                ok.append(elapsed)
+        connection.close()
+
+    async def writer_loop():
+        connection = Connection(port)
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            body = json.dumps({"price_max": 30000 + i % 1000}).encode()
+            await connection.send('PUT', f'/api/hostels/{1 + i % hostels}', body)
+            await asyncio.sleep(1 / writes_per_sec)
+        connection.close()
+
+    tasks = [reader_loop() for _ in range(connections)]
+    if writes_per_sec > 0:
+        tasks.append(writer_loop())
+    await asyncio.gather(*tasks)
+    return ok, everything, shed
+
+
+def pct(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] * 1e3 if values else float('nan')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hostels', type=int, default=10000)
+    parser.add_argument('--connections', type=int, nargs='+', default=[64, 256])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--writes-per-sec', type=float, default=20)
+    parser.add_argument('--max-in-flight', type=int, default=8)
+    parser.add_argument('--max-queued', type=int, default=32)
+    parser.add_argument('--queue-timeout-ms', type=int, default=250)
+    parser.add_argument('--port', type=int, default=5078)
+    args = parser.parse_args()
+
+    configurations: Dict[str, Dict[str, str]] = {
+        'off': {'VERISTAY_COALESCE': '0', 'VERISTAY_MAX_IN_FLIGHT': '0'},
+        'coalesce': {'VERISTAY_COALESCE': '1', 'VERISTAY_MAX_IN_FLIGHT': '0'},
+        'coalesce+admission': {'VERISTAY_COALESCE': '1', 'VERISTAY_MAX_IN_FLIGHT': str(args.max_in_flight),
+                               'VERISTAY_MAX_QUEUED': str(args.max_queued),
+                               'VERISTAY_QUEUE_TIMEOUT_MS': str(args.queue_timeout_ms)},
+    }
+    print(f"{args.hostels} hostels, GET {HOT_PAGE} on every connection, "
+          f"{args.writes_per_sec:g} writes/s, {args.seconds:g}s per run")
+    for name, env in configurations.items():
+        server_env = {k: v for k, v in os.environ.items() if not k.startswith('VERISTAY_')}
+        server_env.update(env, VERISTAY_METRICS='0')
+        proc = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_serving', '--serve', 'sync',
+                                 '--port', str(args.port), '--hostels', str(args.hostels)],
+                                cwd=BACKEND, env=server_env)
+        try:
+            wait_for_port(args.port, proc)
+            asyncio.run(overload(args.port, 4, 1, 0, args.hostels))
+            for connections in args.connections:
+                cpu = cpu_seconds(proc.pid)
+                start = time.perf_counter()
+                ok, everything, shed = asyncio.run(overload(args.port, connections, args.seconds,
+                                                            args.writes_per_sec, args.hostels))
+                elapsed = time.perf_counter() - start
+                cpu = cpu_seconds(proc.pid) - cpu
+                print(f"{name:19s} {connections:4d} conns: {len(ok) / elapsed:7.0f} ok/s   "
+                      f"p50 {pct(ok, 0.5):7.1f} ms   p99 {pct(ok, 0.99):7.1f} ms   "
+                      f"p99 all {pct(everything, 0.99):7.1f} ms   shed {shed:6d}   "
+                      f"CPU {100 * cpu / elapsed:4.0f}%  {1e3 * cpu / max(1, len(ok)):6.2f} ms/ok", flush=True)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Restart time from snapshot and log, and fsync'd write throughput with group commit."""
+import argparse
+import random
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from models import Hostel, HostelStore
+from storage import LogStorage
+from benchmarks.catalog import AMENITIES, AREAS, CENTER_LAT, CENTER_LONG, NAME_WORDS
+
+def hostels(count, seed=42):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        price_min = rng.randrange(3000, 20000, 500)
+        yield Hostel(
+            id=i,
+            name=f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {rng.randrange(1000)}",
+            address=f"{rng.randrange(1, 500)} Main Road, {rng.choice(AREAS)}, Ahmedabad",
+            price_min=price_min,
+            price_max=price_min + rng.randrange(0, 10000, 500),
+            lat=CENTER_LAT + rng.uniform(-0.25, 0.25),
+            long=CENTER_LONG + rng.uniform(-0.25, 0.25),
+            amenities=rng.sample(AMENITIES, rng.randrange(1, 5)),
+            images=[f"https://example.com/hostels/{rng.randrange(10 ** 6)}.jpg"],
+            is_verified=rng.random() < 0.6,
+        )
+
+def create(store, n):
+    return store.create(name=f"Hostel {n}", address="Main Road, Bopal, Ahmedabad",
+                        price_min=5000, price_max=8000, lat=CENTER_LAT, long=CENTER_LONG,
+                        amenities=["WiFi"], images=[])
+
+def bench_restart(count, log_records):
+    path = tempfile.mkdtemp(prefix='veristay-bench-')
+    try:
+        # Log records for hostels created after the snapshot was taken.
+        store = HostelStore(LogStorage(path, fsync=False))
+        store.next_id = count + 1
+        for n in range(log_records):
+            create(store, n)
+        store.storage.close()
+        del store
+
+        start = time.perf_counter()
+        LogStorage(path).write_snapshot([(h, []) for h in hostels(count)], 1, count + 1, 1)
+        print(f"write snapshot of {count} hostels: {time.perf_counter() - start:6.2f} s")
+
+        start = time.perf_counter()
+        store = HostelStore(LogStorage(path))
+        elapsed = time.perf_counter() - start
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"restart ({count} snapshot + {log_records} log records): {elapsed:6.2f} s"
+              f"  -> {len(store.hostels)} hostels, peak RSS {peak_mb:.0f} MB")
+        # Search, clusters, similar and stats indexes are built by their first use.
+        for name, first_use in [('search', lambda: store.search('stay', 10)),
+                                ('clusters', lambda: store.clusters(12, (72.3, 22.8, 72.9, 23.3))),
+                                ('similar', lambda: store.similar(1, 10)),
+                                ('stats', lambda: store.stats('amenity'))]:
+            start = time.perf_counter()
+            first_use()
+            print(f"  first {name}: {time.perf_counter() - start:6.2f} s")
+        store.storage.close()
+    finally:
+        shutil.rmtree(path)
+
+def bench_writes(ops):
+    for threads in (1, 4, 16):
+        path = tempfile.mkdtemp(prefix='veristay-bench-')
+        try:
+            store = HostelStore(LogStorage(path))
+            per_thread = ops // threads
+            pool = [threading.Thread(target=lambda: [create(store, n) for n in range(per_thread)])
+                    for _ in range(threads)]
+            start = time.perf_counter()
+            for t in pool:
+                t.start()
+            for t in pool:
+                t.join()
+            elapsed = time.perf_counter() - start
+            store.storage.close()
+            print(f"{threads:3d} writers, fsync per commit: {per_thread * threads / elapsed:8.0f} creates/s")
+        finally:
+            shutil.rmtree(path)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--count', type=int, default=1000000, help="hostels in the snapshot")
+    parser.add_argument('--log-records', type=int, default=10000, help="log records after the snapshot")
+    parser.add_argument('--ops', type=int, default=2000, help="creates per write run")
+    args = parser.parse_args()
+
+    bench_restart(args.count, args.log_records)
+    bench_writes(args.ops)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Requests/sec for hostel reads with the response cache on and off."""
+import argparse
+import random
+import time
+from app import app, backend
+from benchmarks.catalog import populate
+
+hostel_store, response_cache = backend(app).hostel_store, backend(app).response_cache
+
+def run(client, urls, headers=None):
+    start = time.perf_counter()
+    for url in urls:
+        response = client.get(url, headers=headers)
+        assert response.status_code in (200, 304)
+    return len(urls) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hostels', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    hostel_store.clear()
+    populate(hostel_store, args.hostels)
+    for hostel in hostel_store.get_all()[:500]:
+        for i in range(5):
+            hostel_store.add_review(hostel.id, f"user-{i}", 4.0, "Decent place, good food")
+
+    rng = random.Random(7)
+    list_urls = [rng.choice(['/api/hostels?limit=50', '/api/hostels?limit=50&sort=price_min',
+                             '/api/hostels?limit=50&is_verified=true&amenities=WiFi',
+                             '/api/hostels?limit=200'])
+                 for _ in range(args.requests)]
+    detail_urls = [f'/api/hostels/{rng.randrange(1, 1001)}' for _ in range(args.requests)]
+
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        print(f"{args.hostels} hostels, {args.requests} requests per scenario (req/s)")
+        for label, urls in (("list", list_urls), ("detail", detail_urls)):
+            response_cache.enabled = False
+            response_cache.invalidate()
+            off = run(client, urls)
+            response_cache.enabled = True
+            on = run(client, urls)
+            etag = client.get(urls[0]).headers['ETag']
+            revalidate = run(client, [urls[0]] * len(urls), headers={'If-None-Match': etag})
+            print(f"{label:7s} cache off: {off:8.0f}   cache on: {on:8.0f}   304 revalidation: {revalidate:8.0f}")
+
+if __name__ == '__main__':
+    main()
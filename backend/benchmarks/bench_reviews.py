@@ -0,0 +1,58 @@
+"""List latency for hostels with 10k reviews each: rating aggregates vs inlined reviews."""
+import argparse
+import random
+import time
+from app import app, backend
+from benchmarks.catalog import populate
+from serializers import dumps_stdlib
+
+hostel_store, response_cache = backend(app).hostel_store, backend(app).response_cache
+
+def embedded_page(hostels) -> bytes:
+    """A list page in the old layout, with every review inlined in its hostel."""
+    return dumps_stdlib({"hostels": [dict(h.to_dict(), reviews=[r.to_dict() for r in hostel_store.reviews.get(h.id, [])])
+                                     for h in hostels]})
+
+def timed(fn, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        result = fn()
+    return (time.perf_counter() - start) / number * 1e3, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hostels', type=int, default=50)
+    parser.add_argument('--reviews', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    hostel_store.clear()
+    populate(hostel_store, args.hostels)
+    rng = random.Random(3)
+    start = time.perf_counter()
+    for hostel in hostel_store.get_all():
+        for i in range(args.reviews):
+            hostel_store.add_review(hostel.id, f"user-{i}", rng.randint(1, 5), "Decent place, good food")
+    add_rate = args.hostels * args.reviews / (time.perf_counter() - start)
+
+    response_cache.enabled = False
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        def get(url):
+            return lambda: client.get(url).data
+
+        print(f"{args.hostels} hostels x {args.reviews} reviews, {args.requests} requests (ms per request, cache off)")
+        page = hostel_store.query(limit=args.hostels)[0]
+        ms, body = timed(lambda: embedded_page(page), max(1, args.requests // 20))
+        print(f"list, reviews inlined:    {ms:9.3f}   {len(body) / 1e6:8.2f} MB")
+        for label, url in (("list, rating aggregates", f'/api/hostels?limit={args.hostels}'),
+                           ("list, sort=-rating", f'/api/hostels?limit={args.hostels}&sort=-rating'),
+                           ("list, rating_min=3", f'/api/hostels?limit={args.hostels}&rating_min=3'),
+                           ("review page (20)", '/api/hostels/1/reviews'),
+                           ("review page (100)", '/api/hostels/1/reviews?limit=100')):
+            ms, body = timed(get(url), args.requests)
+            print(f"{label + ':':25s} {ms:9.3f}   {len(body) / 1e6:8.2f} MB")
+    print(f"add_review: {add_rate:10.0f} reviews/s")
+
+if __name__ == '__main__':
+    main()
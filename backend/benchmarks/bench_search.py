@@ -0,0 +1,53 @@
+"""Compare text index search latency with a substring scan over the catalog."""
+import argparse
+import random
+import time
+from models import HostelStore
+from benchmarks.catalog import AMENITIES, AREAS, NAME_WORDS, populate
+
+def linear_search(store, q, limit):
+    needle = q.lower()
+    hits = [h for h in store.get_all()
+            if needle in h.name.lower() or needle in h.address.lower()
+            or any(needle in a.lower() for a in h.amenities)]
+    return hits[:limit]
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+    return f"p50 {pick(0.50):8.3f} ms   p99 {pick(0.99):8.3f} ms"
+
+def measure(fn, queries):
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q, 10)
+        samples.append(time.perf_counter() - start)
+    return percentiles(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hostels', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=300)
+    args = parser.parse_args()
+
+    store = populate(HostelStore(), args.hostels)
+    rng = random.Random(7)
+    words = NAME_WORDS + AREAS + AMENITIES
+    queries = []
+    for _ in range(args.queries):
+        kind = rng.random()
+        if kind < 0.4:
+            word = rng.choice(words)
+            queries.append(word[:rng.randrange(2, len(word) + 1)])  # typeahead prefix
+        elif kind < 0.8:
+            queries.append(f"{rng.choice(NAME_WORDS)} {rng.randrange(1000)}")
+        else:
+            queries.append(f"{rng.choice(NAME_WORDS)} {rng.choice(AREAS)}")
+
+    print(f"{args.hostels} hostels, {args.queries} queries")
+    print(f"index : {measure(store.search, queries)}")
+    print(f"linear: {measure(lambda q, limit: linear_search(store, q, limit), queries[:50])}")
+
+if __name__ == '__main__':
+    main()
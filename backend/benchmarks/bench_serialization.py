@@ -0,0 +1,59 @@
+"""Microbenchmark hostel serialization for hostels with 0/10/1000 reviews.
+
+Hostel bodies carry only the rating summary, so `encode_hostel` stays flat as
+reviews grow; the embedded variant shows what the old layout with every review
+inlined cost.
+"""
+import argparse
+import json
+import timeit
+from dataclasses import asdict
+from models import HostelStore
+from serializers import JSON_BACKEND, dumps_stdlib, encode_hostel
+
+def legacy_encode(hostel, reviews) -> bytes:
+    """The original path: asdict (deep copy), every review inlined, then json."""
+    data = asdict(hostel)
+    data['reviews'] = [asdict(review) for review in reviews]
+    return json.dumps(data, separators=(',', ':')).encode()
+
+def embedded_encode(hostel, reviews) -> bytes:
+    """The current fields plus every review inlined, as bodies looked before pagination."""
+    data = hostel.to_dict()
+    data['reviews'] = [review.to_dict() for review in reviews]
+    return dumps_stdlib(data)
+
+def make_hostel(store, reviews):
+    hostel = store.create(name="Stanza Living", address="Navrangpura, Ahmedabad",
+                          price_min=12000, price_max=18000, lat=23.0365, long=72.5611,
+                          amenities=["WiFi", "AC", "Laundry", "Meals"],
+                          images=["https://example.com/a.jpg", "https://example.com/b.jpg"],
+                          is_verified=True)
+    for i in range(reviews):
+        store.add_review(hostel.id, f"user-{i}", 4.5, "Clean rooms and friendly staff.")
+    return hostel
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    store = HostelStore()
+    print(f"fast encoder backend: {JSON_BACKEND}   (us per hostel, best of {args.repeat})")
+    for reviews in (0, 10, 1000):
+        hostel = make_hostel(store, reviews)
+        inlined = store.reviews.get(hostel.id, [])
+        number = max(1, 20000 // (reviews + 1))
+        variants = {
+            "legacy asdict+json": lambda: legacy_encode(hostel, inlined),
+            "embedded reviews": lambda: embedded_encode(hostel, inlined),
+            "to_dict+json": lambda: dumps_stdlib(hostel.to_dict()),
+            "encode_hostel": lambda: encode_hostel(hostel),
+        }
+        assert json.loads(encode_hostel(hostel)) == json.loads(dumps_stdlib(hostel.to_dict()))
+        timings = {label: min(timeit.repeat(fn, number=number, repeat=args.repeat)) / number * 1e6
+                   for label, fn in variants.items()}
+        print(f"{reviews:5d} reviews  " + "   ".join(f"{label}: {us:9.1f}" for label, us in timings.items()))
+
+if __name__ == '__main__':
+    main()
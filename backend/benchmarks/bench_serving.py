@@ -0,0 +1,146 @@
+"""
+Local load test: requests/sec and latency percentiles for the sync (Flask,
+threaded WSGI server) and async (uvicorn + asgi.py) serving modes.
+
+Each mode runs in its own server process over a populated catalog, and is
+driven by keep-alive HTTP/1.1 connections from an asyncio client with a
+read-heavy URL mix. The async mode needs uvicorn (`pip install uvicorn`).
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+def serve(mode, port, hostels):
+    """Server process: populate the store and serve it in `mode` until killed."""
+    from app import app, backend
+    hostel_store = backend(app).hostel_store
+    from benchmarks.catalog import populate
+    hostel_store.clear()
+    populate(hostel_store, hostels)
+    for hostel in hostel_store.get_all()[:200]:
+        for i in range(5):
+            hostel_store.add_review(hostel.id, f"user-{i}", 4.0, "Decent place, good food")
+    if mode == 'sync':
+        from werkzeug.serving import run_simple
+        import logging
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        run_simple('127.0.0.1', port, app, threaded=True)
+    else:
+        import uvicorn
+        uvicorn.run('asgi:application', host='127.0.0.1', port=port, log_level='warning',
+                    access_log=False)
+
+def urls(count, hostels, seed=7):
+    rng = random.Random(seed)
+    paths = []
+    for _ in range(count):
+        roll = rng.random()
+        if roll < 0.4:
+            paths.append(f'/api/hostels/{rng.randrange(1, hostels + 1)}')
+        elif roll < 0.7:
+            paths.append(rng.choice(['/api/hostels?limit=20', '/api/hostels?limit=20&sort=price_min',
+                                     '/api/hostels?limit=20&is_verified=true&amenities=WiFi']))
+        elif roll < 0.85:
+            paths.append(f'/api/hostels/search?q={rng.choice(["stanza", "zolo", "green", "nest"])}')
+        elif roll < 0.95:
+            paths.append('/api/hostels/nearby?lat=23.02&long=72.57&radius_m=2000&limit=20')
+        else:
+            paths.append(f'/api/hostels/{rng.randrange(1, 201)}/reviews')
+    return paths
+
+async def fetch(reader, writer, path):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    close = False
+    for line in head.split(b'\r\n')[1:]:
+        name, _, value = line.partition(b':')
+        name = name.strip().lower()
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection' and value.strip().lower() == b'close':
+            close = True
+    await reader.readexactly(length)
+    return status, close
+
+async def load(port, paths, connections, seconds):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker(n):
+        nonlocal errors
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        i = n
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, close = await fetch(reader, writer, paths[i % len(paths)])
+            latencies.append(time.perf_counter() - start)
+            errors += status >= 500
+            i += connections
+            if close:
+                writer.close()
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(connections)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e3
+
+    return len(latencies) / elapsed, pct(0.5), pct(0.95), pct(0.99), errors
+
+def wait_for_port(port, proc, timeout=300):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"server exited with {proc.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit("server did not start")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hostels', type=int, default=10000)
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--modes', nargs='+', default=['sync', 'async'])
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.hostels)
+        return
+
+    paths = urls(20000, args.hostels)
+    print(f"{args.hostels} hostels, {args.seconds:.0f}s per run, read-heavy mix")
+    for mode in args.modes:
+        proc = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_serving', '--serve', mode,
+                                 '--port', str(args.port), '--hostels', str(args.hostels)],
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        try:
+            wait_for_port(args.port, proc)
+            asyncio.run(load(args.port, paths, 4, 1))  # warm the response cache
+            for connections in args.connections:
+                rps, p50, _, p99, errors = asyncio.run(load(args.port, paths, connections, args.seconds))
+                print(f"{mode:5s} {connections:4d} connections: {rps:8.0f} req/s   "
+                      f"p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   5xx {errors}")
+        finally:
+            proc.terminate()
+            proc.wait()
+
+if __name__ == '__main__':
+    main()
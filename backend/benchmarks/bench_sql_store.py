@@ -0,0 +1,56 @@
+"""Compare the SQLite-backed store with the in-memory store for lists, filters and lookups."""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from models import HostelStore
+from sql_store import SqlHostelStore
+from benchmarks.catalog import AMENITIES, populate
+
+def timed(fn, calls):
+    start = time.perf_counter()
+    for kwargs in calls:
+        fn(**kwargs)
+    return (time.perf_counter() - start) / len(calls) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--hostels', type=int, default=20000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    path = tempfile.mkdtemp(prefix='veristay-bench-')
+    try:
+        memory = populate(HostelStore(), args.hostels)
+        start = time.perf_counter()
+        sql = populate(SqlHostelStore(os.path.join(path, 'hostels.db')), args.hostels)
+        print(f"{args.hostels} hostels, {args.queries} calls per workload "
+              f"(SQL load: {time.perf_counter() - start:.1f} s)")
+        for hostel_id in random.Random(3).sample(range(1, args.hostels + 1), args.hostels // 10):
+            memory.add_review(hostel_id, "bench", 4.0, "ok")
+            sql.add_review(hostel_id, "bench", 4.0, "ok")
+
+        rng = random.Random(7)
+        n = args.queries
+        workloads = {
+            "list page": [{"limit": 50}] * n,
+            "list page, by price": [{"limit": 50, "sort": "-price_min"}] * n,
+            "price band": [{"limit": 50, "price_min": (p := rng.randrange(3000, 20000, 500)),
+                            "price_max": p + 200} for _ in range(n)],
+            "amenities + verified": [{"limit": 50, "amenities": rng.sample(AMENITIES, 2),
+                                      "is_verified": True} for _ in range(n)],
+        }
+        for label, calls in workloads.items():
+            print(f"{label:22s} memory: {timed(memory.query, calls):8.3f} ms   "
+                  f"sql: {timed(sql.query, calls):8.3f} ms")
+        lookups = [{"hostel_id": rng.randrange(1, args.hostels + 1)} for _ in range(n * 10)]
+        print(f"{'point lookup':22s} memory: {timed(memory.get_by_id, lookups):8.3f} ms   "
+              f"sql: {timed(sql.get_by_id, lookups):8.3f} ms")
+        sql.close()
+    finally:
+        shutil.rmtree(path)
+
+if __name__ == '__main__':
+    main()
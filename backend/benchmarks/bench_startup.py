@@ -0,0 +1,149 @@
+"""
+Cold start: the time to import app.py, and from a fresh interpreter to the
+first response of GET /api/hostels through the Flask test client.
+
+Each run is a new Python process, so nothing is shared between runs but the
+OS page cache. Scenarios:
+
+*   import: `import app` only (creates the module-level app, builds nothing);
+*   first_response: import, create_app and the first request, which builds
+    the in-memory store and seeds it;
+*   first_response.warm_up: the same with warm_up before the request, timed
+    separately, as a server would do before accepting connections;
+*   first_response.bulk_load: a catalog of --hostels loaded from NDJSON
+    rows through create_many, as a process starting from an export would;
+*   first_response.snapshot: the same catalog preloaded from a snapshot
+    file (create_app's SNAPSHOT).
+
+    python -m benchmarks.bench_startup --hostels 10000 --runs 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, Iterable, List
+from benchmarks.catalog import hostel_rows
+from models import HostelStore
+from serializers import dumps
+from storage import save_snapshot
+from validation import validate_hostel_create
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter: argv[1] is the scenario, argv[2] a data file.
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+timings = {'import': imported - start, 'numpy_at_import': 'numpy' in sys.modules}
+scenario, path = sys.argv[1], sys.argv[2]
+if scenario == 'import':
+    print(json.dumps(timings))
+    sys.exit()
+config = {'METRICS': False}
+if scenario == 'bulk_load':
+    from models import HostelStore
+    from serializers import loads
+    from validation import validate_hostel_create
+
+    def load():
+        store = HostelStore()
+        with open(path, 'rb') as f:
+            store.create_many([validate_hostel_create(loads(line)) for line in f])
+        return store
+
+    config['HOSTEL_STORE'] = load
+elif scenario == 'snapshot':
+    config['SNAPSHOT'] = path
+flask_app = app.create_app(config)
+created = time.perf_counter()
+if scenario == 'warm_up':
+    app.warm_up(flask_app)
+ready = time.perf_counter()
+response = flask_app.test_client().get('/api/hostels?limit=20')
+assert response.status_code == 200, response.status_code
+done = time.perf_counter()
+timings.update(create_app=created - imported, warm_up=ready - created, request=done - ready,
+               total=done - start)
+print(json.dumps(timings))
+"""
+
+SCENARIOS = {
+    'startup.import': ('import', 'import'),
+    'startup.first_response': ('demo', 'total'),
+    'startup.first_response.warm_up': ('warm_up', 'total'),
+    'startup.first_response.bulk_load': ('bulk_load', 'total'),
+    'startup.first_response.snapshot': ('snapshot', 'total'),
+}
+
+
+def run(scenario: str, path: str, runs: int) -> List[Dict[str, Any]]:
+    # Children must not pick up a database or data directory from the environment.
+    env = {k: v for k, v in os.environ.items() if not k.startswith('VERISTAY_')}
+    results = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', CHILD, scenario, path], cwd=BACKEND, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out))
+    return results
+
+
+def write_catalog(directory: str, hostels: int) -> Dict[str, str]:
+    """The same catalog as NDJSON creation rows and as a snapshot file."""
+    rows = list(hostel_rows(hostels))
+    paths = {'bulk_load': os.path.join(directory, 'catalog.ndjson'),
+             'snapshot': os.path.join(directory, 'catalog.bin')}
+    with open(paths['bulk_load'], 'wb') as f:
+        f.writelines(dumps(row) + b'\n' for row in rows)
+    store = HostelStore()
+    store.create_many([validate_hostel_create(row) for row in rows])
+    save_snapshot(store, paths['snapshot'])
+    return paths
+
+
+def startup_cases(hostels: int, runs: int,
+                  names: Iterable[str] = tuple(SCENARIOS)) -> Dict[str, Dict[str, Any]]:
+    """
+    Per scenario (of `names`), the median and worst time over `runs`
+    processes, in the shape of benchmarks.suite results (ops_per_sec is
+    processes started per second) plus the median breakdown.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='veristay-startup-') as directory:
+        paths = write_catalog(directory, hostels)
+        for name in names:
+            scenario, total = SCENARIOS[name]
+            timings = run(scenario, paths.get(scenario, ''), runs)
+            seconds = sorted(t[total] for t in timings)
+            median = statistics.median(seconds)
+            results[name] = {
+                "ops_per_sec": round(1 / median, 2), "p50_us": round(median * 1e6, 1),
+                "p95_us": round(seconds[-1] * 1e6, 1), "p99_us": round(seconds[-1] * 1e6, 1),
+                "numpy_at_import": timings[0]['numpy_at_import'],
+                **{f"{step}_ms": round(statistics.median(t[step] for t in timings) * 1e3, 1)
+                   for step in ('import', 'create_app', 'warm_up', 'request') if step in timings[0]}}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hostels', type=int, default=10000, help="catalog size for bulk_load and snapshot")
+    parser.add_argument('--runs', type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'scenario':34s} {'median':>9s} {'worst':>9s} {'import':>8s} {'create':>8s} "
+          f"{'warm_up':>8s} {'request':>8s}")
+    results = startup_cases(args.hostels, args.runs)
+    for name, result in results.items():
+        steps = ' '.join(f"{result[f'{step}_ms']:6.1f}ms" if f'{step}_ms' in result else f"{'-':>8s}"
+                         for step in ('import', 'create_app', 'warm_up', 'request'))
+        print(f"{name:34s} {result['p50_us'] / 1e3:7.1f}ms {result['p95_us'] / 1e3:7.1f}ms {steps}")
+    print("NumPy imported by `import app`:", results['startup.import']['numpy_at_import'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Catalog statistics (GET /api/hostels/stats) from the columnar index against
+the same statistics computed in plain Python from the Hostel objects, and
+a repeated request served from the response cache.
+
+The Python version is what a dashboard pulling GET /api/hostels and
+aggregating it itself would do, minus the transfer.
+"""
+import argparse
+import statistics
+import time
+from app import app, backend
+from benchmarks.catalog import CENTER_LAT, CENTER_LONG, populate
+from stats import PERCENTILES, area_of
+
+hostel_store = backend(app).hostel_store
+
+def python_stats(group_by, bbox):
+    groups = {}
+    for hostel in hostel_store.get_all():
+        if bbox and not (bbox[1] <= hostel.lat <= bbox[3] and bbox[0] <= hostel.long <= bbox[2]):
+            continue
+        keys = [area_of(hostel.address)] if group_by == 'area' else {a.lower() for a in hostel.amenities}
+        for key in keys:
+            groups.setdefault(key, []).append(hostel)
+    result = {}
+    for key, members in groups.items():
+        for field in ('price_min', 'price_max'):
+            values = [getattr(h, field) for h in members]
+            cuts = statistics.quantiles(values, n=100, method='inclusive') if len(values) > 1 else values * 99
+            result[key, field] = (min(values), max(values), statistics.fmean(values),
+                                  [cuts[p - 1] for p in PERCENTILES])
+        result[key] = sum(h.is_verified for h in members)
+    return result
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hostels', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    hostel_store.clear()
+    populate(hostel_store, args.hostels)
+    viewport = (CENTER_LONG - 0.1, CENTER_LAT - 0.1, CENTER_LONG + 0.1, CENTER_LAT + 0.1)
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        print(f"{args.hostels} hostels (ms per request)")
+        for group_by in ('area', 'amenity'):
+            for bbox in (None, viewport):
+                url = f'/api/hostels/stats?group_by={group_by}'
+                if bbox:
+                    url += '&bbox=' + ','.join(map(str, bbox))
+                columnar = timed(lambda: hostel_store.stats(group_by, bbox), args.repeat)
+                python = timed(lambda: python_stats(group_by, bbox), max(1, args.repeat // 10))
+                client.get(url)
+                cached = timed(lambda: client.get(url), args.repeat * 10)
+                print(f"  {group_by:7s} {'viewport' if bbox else 'catalog ':8s}  columnar {columnar:7.2f}   "
+                      f"python {python:8.1f}   cached response {cached:6.3f}")
+    hostel_store.clear()
+
+if __name__ == '__main__':
+    main()
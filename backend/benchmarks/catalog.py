@@ -0,0 +1,55 @@
+"""Synthetic hostel catalogs for benchmarks."""
+import random
+from typing import Any, Dict, Iterator
+from models import HostelStore
+
+# Ahmedabad city centre
+CENTER_LAT = 23.0225
+CENTER_LONG = 72.5714
+
+AREAS = ["Navrangpura", "Vastrapur", "Satellite", "Bopal", "Maninagar",
+         "Paldi", "Thaltej", "Bodakdev", "Prahlad Nagar", "Gota"]
+AMENITIES = ["WiFi", "AC", "Laundry", "Meals", "Gym", "Parking", "Security", "Hot Water"]
+NAME_WORDS = ["Stanza", "Zolo", "Urban", "Comfort", "Scholars", "Green", "Royal",
+              "Sunrise", "Nest", "Campus", "Living", "Stay", "Residency", "House"]
+COMMENTS = ["Clean rooms and friendly staff", "Food could be better", "Great WiFi, noisy at night",
+            "Close to campus", "Decent place, good food", "Water supply issues in summer"]
+
+def hostel_rows(count: int, spread_deg: float = 0.25, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """`count` hostel creation bodies scattered within `spread_deg` of the centre."""
+    rng = random.Random(seed)
+    for _ in range(count):
+        price_min = rng.randrange(3000, 20000, 500)
+        area = rng.choice(AREAS)
+        yield dict(
+            name=f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {rng.randrange(1000)}",
+            address=f"{rng.randrange(1, 500)} Main Road, {area}, Ahmedabad",
+            price_min=price_min,
+            price_max=price_min + rng.randrange(0, 10000, 500),
+            lat=CENTER_LAT + rng.uniform(-spread_deg, spread_deg),
+            long=CENTER_LONG + rng.uniform(-spread_deg, spread_deg),
+            amenities=rng.sample(AMENITIES, rng.randrange(1, 5)),
+            images=[f"https://example.com/hostels/{rng.randrange(10 ** 6)}.jpg"],
+            is_verified=rng.random() < 0.6,
+        )
+
+def populate(store: HostelStore, count: int, spread_deg: float = 0.25,
+             seed: int = 42) -> HostelStore:
+    """Fill `store` with `count` hostels scattered within `spread_deg` of the centre."""
+    for row in hostel_rows(count, spread_deg, seed):
+        store.create(**row)
+    return store
+
+def add_reviews(store: HostelStore, count: int, seed: int = 7) -> HostelStore:
+    """
+    Add `count` reviews spread over the store's hostels, skewed so that a
+    few popular hostels get most of them.
+    """
+    rng = random.Random(seed)
+    ids = sorted(hostel.id for hostel in store.get_all())
+    for _ in range(count if ids else 0):
+        # Pareto-distributed rank: the top 20 hostels get about half the reviews.
+        rank = min(int((rng.paretovariate(1.2) - 1) * 20), len(ids) - 1)
+        store.add_review(ids[rank * 7919 % len(ids)], f"user-{rng.randrange(10 ** 5)}",
+                         rng.choice([1.0, 2.0, 2.5, 3.0, 3.5, 4.0, 4.5, 5.0]), rng.choice(COMMENTS))
+    return store
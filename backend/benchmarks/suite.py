@@ -0,0 +1,276 @@
+"""
+Performance suite: microbenchmarks of store operations, serialization and
+validation, load tests through the Flask test client and, optionally, over
+HTTP, reported as JSON so results can be compared across commits.
+
+    python -m benchmarks.suite --hostels 10000 --reviews 50000 --output before.json
+    python -m benchmarks.suite --hostels 10000 --reviews 50000 --output after.json
+    python -m benchmarks.suite --compare before.json after.json
+
+Every case reports operations per second, p50/p95/p99 latency and the peak
+memory allocated while it runs (traced over a separate, shorter run). The
+startup cases (bench_startup) time --startup-runs fresh processes each, up
+to the first response, so slower imports or initialization show up as
+regressions too. The
+catalog is generated by benchmarks.catalog with a fixed seed, so runs with
+the same parameters use the same data. `--http sync` or `--http async` also
+starts bench_serving's server with as many hostels and drives it with
+keep-alive connections. `--compare` exits with status 1 when a case lost
+more than `--threshold` of its throughput; only compare reports from the
+same machine, and raise the threshold where run-to-run noise is high.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from benchmarks.bench_serving import load, urls, wait_for_port
+from benchmarks.bench_startup import SCENARIOS as STARTUP_CASES, startup_cases
+from benchmarks.catalog import AMENITIES, CENTER_LAT, CENTER_LONG, add_reviews, hostel_rows, populate
+from models import HostelStore
+from serializers import JSON_BACKEND, encode_hostel
+from validation import validate_hostel_create, validate_hostel_query
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (microseconds) from per-call times in seconds."""
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e6, 2)
+
+    return {"ops_per_sec": round(len(latencies) / elapsed, 1),
+            "p50_us": pct(0.5), "p95_us": pct(0.95), "p99_us": pct(0.99)}
+
+def measure(fn: Callable[[Any], Any], inputs: Sequence[Any], seconds: float) -> Dict[str, float]:
+    """
+    Call `fn` on `inputs` in turn (cycling) for about `seconds`, timing each
+    call, then again for up to 200 calls under tracemalloc for peak memory.
+    """
+    perf_counter = time.perf_counter
+    latencies = []
+    count = len(inputs)
+    start = perf_counter()
+    deadline = start + seconds
+    i = 0
+    while True:
+        call_start = perf_counter()
+        fn(inputs[i % count])
+        now = perf_counter()
+        latencies.append(now - call_start)
+        i += 1
+        if now >= deadline and i >= 20:
+            break
+    result = summarize(latencies, perf_counter() - start)
+
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for j in range(min(i, 200)):
+        fn(inputs[(i + j) % count])
+    result["peak_alloc_kb"] = round((tracemalloc.get_traced_memory()[1] - baseline) / 1024, 1)
+    tracemalloc.stop()
+    return result
+
+def micro_cases(store: HostelStore, hostels: int, seed: int) -> Dict[str, Any]:
+    """(function, inputs) per microbenchmark; mutating cases come last."""
+    rng = random.Random(seed)
+    ids = [rng.randrange(1, hostels + 1) for _ in range(1000)]
+    sample = [store.get_by_id(hostel_id) for hostel_id in ids]
+    points = [(CENTER_LAT + rng.uniform(-0.2, 0.2), CENTER_LONG + rng.uniform(-0.2, 0.2)) for _ in range(200)]
+    words = ["stanza", "zolo liv", "green nest", "wifi", "navrangpura", "campus st"]
+    rows = list(hostel_rows(1000, seed=seed + 1))
+    query_args = [{"limit": "20", "price_min": str(rng.randrange(3000, 15000, 500)),
+                   "amenities": ",".join(rng.sample(AMENITIES, 2)), "sort": "-price_max"}
+                  for _ in range(100)]
+    filtered = [validate_hostel_query(args) for args in query_args]
+    boxes = [(long - 0.02, lat - 0.02, long + 0.02, lat + 0.02) for lat, long in points]
+    reviewed = [hostel_id for hostel_id, reviews in store.reviews.items() if len(reviews) > 20] or ids
+    return {
+        "store.get_by_id": (store.get_by_id, ids),
+        "store.query.page": (lambda _: store.query(limit=20), [None]),
+        "store.query.filtered": (lambda q: store.query(**q), filtered),
+        "store.query.bbox": (lambda bbox: store.query(limit=50, bbox=bbox, sort='price_min'), boxes),
+        "store.nearby": (lambda p: store.nearby(p[0], p[1], 2000, 20), points),
+        "store.search": (lambda q: store.search(q, 10), words),
+        "store.get_reviews": (lambda hostel_id: store.get_reviews(hostel_id, 20), reviewed),
+        "hostel.to_dict": (lambda h: h.to_dict(), sample),
+        "serializers.encode_hostel": (encode_hostel, sample),
+        "validation.hostel_create": (validate_hostel_create, rows),
+        "validation.hostel_query": (validate_hostel_query, query_args),
+        "store.update": (lambda hostel_id: store.update(hostel_id, price_max=40000), ids),
+        "store.add_review": (lambda hostel_id: store.add_review(hostel_id, "bench", 4.0, "ok"), ids),
+        "store.create": (lambda row: store.create(**row), rows),
+    }
+
+def load_cases(hostels: int) -> Dict[str, Any]:
+    """(function, inputs) per in-process load test through the Flask test client."""
+    from app import app
+    client = app.test_client()
+    read_mix = urls(20000, hostels)
+    rng = random.Random(3)
+    rows = list(hostel_rows(500, seed=5))
+
+    def mixed(i):
+        # 90% reads, 10% writes: creates and price updates.
+        roll = i % 10
+        if roll == 0:
+            return client.post('/api/hostels', json=rows[i % len(rows)])
+        if roll == 5:
+            return client.put(f'/api/hostels/{rng.randrange(1, hostels + 1)}', json={"price_max": 35000})
+        return client.get(read_mix[i % len(read_mix)])
+
+    for path in read_mix[:2000]:
+        client.get(path)
+    return {
+        "load.test_client.reads": (client.get, read_mix),
+        "load.test_client.read_write": (mixed, list(range(10000))),
+    }
+
+def http_cases(mode: str, hostels: int, connections: Sequence[int], seconds: float,
+               port: int) -> Dict[str, Dict[str, float]]:
+    """Load test bench_serving's server in `mode` over HTTP."""
+    results = {}
+    proc = subprocess.Popen([sys.executable, '-m', 'benchmarks.bench_serving', '--serve', mode,
+                             '--port', str(port), '--hostels', str(hostels)], cwd=BACKEND)
+    try:
+        wait_for_port(port, proc)
+        paths = urls(20000, hostels)
+        asyncio.run(load(port, paths, 4, 1))
+        for n in connections:
+            rps, p50, p95, p99, errors = asyncio.run(load(port, paths, n, seconds))
+            results[f"load.http.{mode}.c{n}"] = {
+                "ops_per_sec": round(rps, 1), "p50_us": round(p50 * 1e3, 2), "p95_us": round(p95 * 1e3, 2),
+                "p99_us": round(p99 * 1e3, 2), "errors": errors, "server_peak_rss_mb": peak_rss_mb(proc.pid)}
+    finally:
+        proc.terminate()
+        proc.wait()
+    return results
+
+def peak_rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """Peak resident set size of a process (this one by default), if the OS reports it."""
+    if pid is None:
+        kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return round((kb / 1024 if sys.platform != 'darwin' else kb / 2 ** 20), 1)
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+def git_revision() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BACKEND, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BACKEND,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+    return {"commit": commit, "dirty": dirty}
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> bool:
+    """Print throughput and p99 changes per case; returns whether any case regressed."""
+    regressed = False
+    print(f"{'case':32s} {'before':>12s} {'after':>12s} {'change':>8s} {'p99 change':>11s}")
+    for name, after in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:32s} {'-':>12s} {after['ops_per_sec']:12.0f}      new")
+            continue
+        change = after["ops_per_sec"] / before["ops_per_sec"] - 1
+        p99 = after["p99_us"] / before["p99_us"] - 1 if before["p99_us"] else 0.0
+        flag = ''
+        if change < -threshold:
+            flag, regressed = '  REGRESSION', True
+        print(f"{name:32s} {before['ops_per_sec']:12.0f} {after['ops_per_sec']:12.0f} "
+              f"{change * 100:+7.1f}% {p99 * 100:+10.1f}%{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hostels', type=int, default=10000)
+    parser.add_argument('--reviews', type=int, default=50000)
+    parser.add_argument('--spread', type=float, default=0.25, help="catalog spread in degrees around Ahmedabad")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--seconds', type=float, default=1.0, help="per microbenchmark and load test")
+    parser.add_argument('--only', nargs='+', default=[], help="run the cases whose names contain any of these")
+    parser.add_argument('--http', nargs='+', choices=['sync', 'async'], default=[],
+                        help="also load test bench_serving's server over HTTP")
+    parser.add_argument('--connections', type=int, nargs='+', default=[16])
+    parser.add_argument('--startup-runs', type=int, default=5, help="processes started per startup case")
+    parser.add_argument('--port', type=int, default=5079)
+    parser.add_argument('--output', help="write the JSON report here")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help="compare two reports instead of running")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="throughput loss that counts as a regression (default 0.1)")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path) as f:
+                reports.append(json.load(f))
+        sys.exit(1 if compare(*reports, args.threshold) else 0)
+
+    def selected(name):
+        return not args.only or any(part in name for part in args.only)
+
+    report = {"meta": {**git_revision(), "python": platform.python_version(),
+                       "platform": platform.platform(), "cpus": os.cpu_count(),
+                       "json_backend": JSON_BACKEND, "hostels": args.hostels, "reviews": args.reviews,
+                       "spread_deg": args.spread, "seed": args.seed, "seconds": args.seconds,
+                       "started": datetime.now(timezone.utc).isoformat(timespec='seconds')},
+              "results": {}}
+
+    def record(name, result):
+        report["results"][name] = result
+        print(f"{name:32s} {result['ops_per_sec']:12.0f} ops/s   p50 {result['p50_us']:9.1f} us   "
+              f"p95 {result['p95_us']:9.1f} us   p99 {result['p99_us']:9.1f} us", flush=True)
+
+    store = HostelStore()
+    populate(store, args.hostels, args.spread, args.seed)
+    add_reviews(store, args.reviews, args.seed)
+    for name, (fn, inputs) in micro_cases(store, args.hostels, args.seed).items():
+        if selected(name):
+            record(name, measure(fn, inputs, args.seconds))
+    del store
+
+    if any(selected(name) for name in ("load.test_client.reads", "load.test_client.read_write")):
+        from app import app, backend
+        hostel_store = backend(app).hostel_store
+        hostel_store.clear()
+        populate(hostel_store, args.hostels, args.spread, args.seed)
+        add_reviews(hostel_store, args.reviews, args.seed)
+        for name, (fn, inputs) in load_cases(args.hostels).items():
+            if selected(name):
+                record(name, measure(fn, inputs, args.seconds))
+
+    startup = [name for name in STARTUP_CASES if selected(name)]
+    if startup:
+        for name, result in startup_cases(args.hostels, args.startup_runs, startup).items():
+            record(name, result)
+
+    for mode in args.http:
+        for name, result in http_cases(mode, args.hostels, args.connections, args.seconds, args.port).items():
+            record(name, result)
+
+    report["meta"]["peak_rss_mb"] = peak_rss_mb()
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+if __name__ == '__main__':
+    main()
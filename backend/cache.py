@@ -0,0 +1,247 @@
+"""Cache of encoded JSON response bodies, invalidated by HostelStore changes."""
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Optional, Tuple
+from models import Hostel, HostelStore
+from serializers import encode_hostel
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it only gzip is offered
+    brotli = None
+
+# Content codings offered, most preferred first.
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+# Smaller bodies are always sent as they are: compressing them saves less
+# than the time it takes.
+COMPRESS_MIN_SIZE = 1024
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag (unquoted) for a response body."""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+@dataclass
+class CachedBody:
+    """An encoded response body with its ETag."""
+    body: bytes
+    etag: str
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """`body` in a content coding of ENCODINGS."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    # mtime=0 keeps the output the same for the same body, as its strong ETag requires.
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+def negotiate_encoding(accept_encoding: str, size: int) -> Optional[str]:
+    """
+    The content coding to send a `size`-byte body in, given the request's
+    Accept-Encoding header: the offered coding with the highest q-value,
+    preferring brotli on ties, or None to send it uncompressed.
+    """
+    if size < COMPRESS_MIN_SIZE or not accept_encoding:
+        return None
+    qualities: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        coding, _, params = item.partition(';')
+        quality = 1.0
+        name, _, value = params.partition('=')
+        if name.strip().lower() == 'q':
+            try:
+                quality = float(value)
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    """
+    ETag of a body sent in `encoding` (None for uncompressed): each coding
+    gets its own, the plain one suffixed with the coding, so caches never
+    mix them up.
+    """
+    return etag if encoding is None else f'{etag}-{encoding}'
+
+class CompressionCache:
+    """
+    LRU of compressed response bodies, by ETag and content coding, holding
+    at most `max_bytes` of compressed data.
+
+    ETags are hashes of the uncompressed body, so an entry can never be
+    stale: a hot response is compressed once, however many times it is
+    rebuilt or served, and entries for bodies that changed just age out.
+    With `enabled=False` every response is compressed from scratch.
+
+    `observe(encoding, seconds)`, if given, is called with the time taken
+    by every miss.
+    """
+
+    def __init__(self, max_bytes: int = 32 << 20, enabled: bool = True,
+                 observe: Optional[Callable[[str, float], None]] = None):
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.observe = observe
+        self.size = 0
+        self.entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.entries.clear()
+            self.size = 0
+
+    def compressed(self, cached: CachedBody, encoding: str) -> bytes:
+        """`cached`'s body in `encoding`, compressed on a miss."""
+        key = (cached.etag, encoding)
+        with self._lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                return data
+        start = time.perf_counter()
+        data = compress(cached.body, encoding)
+        if self.observe is not None:
+            self.observe(encoding, time.perf_counter() - start)
+        if self.enabled:
+            with self._lock:
+                if key not in self.entries:
+                    self.entries[key] = data
+                    self.size += len(data)
+                    while self.size > self.max_bytes:
+                        self.size -= len(self.entries.popitem(last=False)[1])
+        return data
+
+class ResponseCache:
+    """
+    LRU caches of encoded hostels and assembled response bodies.
+
+    Hostel entries are dropped when that hostel changes; assembled bodies
+    (lists, search results, ...) may contain any hostel, so every change to
+    the store drops all of them. With `enabled=False` nothing is stored and
+    every call encodes from scratch (concurrent identical ones still share
+    a build, see below).
+
+    Entries are also validated on read, so an encoding that raced with a
+    write is never served: a hostel entry is only used for the exact Hostel
+    object it was encoded from (stored hostels are copy-on-write), and an
+    assembled body only for the store version it was built at.
+
+    With `coalesce`, concurrent misses for the same body at the same store
+    version are coalesced (single flight): the first request builds it and
+    the others wait for its result instead of each building their own copy,
+    so a burst of identical requests after a write costs one build.
+
+    `observe(kind, seconds)`, if given, is called with the time taken by
+    every miss: kind 'hostel' for encoding a hostel, or the first element of
+    the key (e.g. 'list') for building a body. `observe_coalesced(kind)` is
+    called for every request that waited for another's build.
+    """
+
+    def __init__(self, store: HostelStore, enabled: bool = True,
+                 max_hostels: int = 100000, max_bodies: int = 1024,
+                 observe: Optional[Callable[[str, float], None]] = None,
+                 coalesce: bool = False, observe_coalesced: Optional[Callable[[str], None]] = None):
+        self.store = store
+        self.enabled = enabled
+        self.coalesce = coalesce
+        self.observe = observe
+        self.observe_coalesced = observe_coalesced
+        self.max_hostels = max_hostels
+        self.max_bodies = max_bodies
+        self.hostels: "OrderedDict[int, Tuple[Hostel, CachedBody]]" = OrderedDict()
+        self.bodies: "OrderedDict[Hashable, Tuple[int, CachedBody]]" = OrderedDict()
+        # Bodies being built: key -> (store version, result).
+        self.flights: Dict[Hashable, Tuple[int, Future]] = {}
+        self._lock = threading.Lock()
+        store.subscribe(self.invalidate)
+
+    def invalidate(self, hostel_id: Optional[int] = None) -> None:
+        """Drop cached data for a hostel (or for every hostel when None)."""
+        with self._lock:
+            if hostel_id is None:
+                self.hostels.clear()
+            else:
+                self.hostels.pop(hostel_id, None)
+            self.bodies.clear()
+
+    def hostel(self, hostel: Hostel) -> CachedBody:
+        """Encoded JSON object for a single hostel."""
+        with self._lock:
+            entry = self.hostels.get(hostel.id)
+            if entry is not None and entry[0] is hostel:
+                self.hostels.move_to_end(hostel.id)
+                return entry[1]
+        start = time.perf_counter()
+        body = encode_hostel(hostel)
+        if self.observe is not None:
+            self.observe('hostel', time.perf_counter() - start)
+        cached = CachedBody(body, make_etag(body))
+        if self.enabled:
+            with self._lock:
+                self.hostels[hostel.id] = (hostel, cached)
+                if len(self.hostels) > self.max_hostels:
+                    self.hostels.popitem(last=False)
+        return cached
+
+    def body(self, key: Hashable, build: Callable[[], bytes]) -> CachedBody:
+        """Assembled response body for `key`, built with `build` on a miss."""
+        version = self.store.version
+        kind = str(key[0] if isinstance(key, tuple) else key)
+        flight = waiting_for = None
+        with self._lock:
+            entry = self.bodies.get(key)
+            if entry is not None and entry[0] == version:
+                self.bodies.move_to_end(key)
+                return entry[1]
+            if self.coalesce:
+                building = self.flights.get(key)
+                if building is not None and building[0] == version:
+                    waiting_for = building[1]
+                else:
+                    # A build for an older version is not waited for: it
+                    # finishes for its own requests, later ones get this one.
+                    flight = Future()
+                    self.flights[key] = (version, flight)
+        if waiting_for is not None:
+            if self.observe_coalesced is not None:
+                self.observe_coalesced(kind)
+            # Raises what the build raised, as building it here would have.
+            return waiting_for.result()
+        try:
+            start = time.perf_counter()
+            body = build()
+            if self.observe is not None:
+                self.observe(kind, time.perf_counter() - start)
+            cached = CachedBody(body, make_etag(body))
+        except BaseException as e:
+            if flight is not None:
+                with self._lock:
+                    self._land(key, flight)
+                flight.set_exception(e)
+            raise
+        with self._lock:
+            if self.enabled:
+                self.bodies[key] = (version, cached)
+                if len(self.bodies) > self.max_bodies:
+                    self.bodies.popitem(last=False)
+            if flight is not None:
+                self._land(key, flight)
+        if flight is not None:
+            flight.set_result(cached)
+        return cached
+
+    def _land(self, key: Hashable, flight: Future) -> None:
+        """Stop requests from waiting for a finished build (under the lock)."""
+        building = self.flights.get(key)
+        if building is not None and building[1] is flight:
+            del self.flights[key]
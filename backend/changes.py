@@ -0,0 +1,72 @@
+"""Bounded log of hostel changes, for clients that sync the catalog incrementally."""
+import secrets
+import threading
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+from models import HostelStore
+
+# Changes kept; clients further behind than this must resync.
+CHANGE_LOG_SIZE = 10000
+
+class ChangeLog:
+    """
+    The ids of the last `size` hostels changed in a store, with the store
+    version each change produced.
+
+    A client that has the catalog as of version v asks for the ids changed
+    since v and refetches just those. The log can answer while v is within
+    it: not after a clear or once v has been pushed out by newer changes,
+    and not for versions of another log (store versions restart at 0 with
+    the process, so each log has a random `epoch` that clients pass back).
+
+    The store calls `record` from its change listeners while holding its
+    write lock; readers take the log's own lock only.
+    """
+
+    def __init__(self, store: HostelStore, size: int = CHANGE_LOG_SIZE):
+        self.store = store
+        self.epoch = secrets.token_hex(8)
+        self.entries: Deque[Tuple[int, int]] = deque(maxlen=size)
+        # The oldest version changes can be listed since.
+        self.floor = store.version
+        self.version = store.version
+        self._cond = threading.Condition(threading.Lock())
+        store.subscribe(self.record)
+
+    def record(self, hostel_id: Optional[int]) -> None:
+        """Note a change of the store (hostel_id None: every hostel was removed)."""
+        with self._cond:
+            self.version = self.store.version
+            if hostel_id is None:
+                self.entries.clear()
+                self.floor = self.version
+            else:
+                if len(self.entries) == self.entries.maxlen:
+                    self.floor = self.entries[0][0]
+                self.entries.append((self.version, hostel_id))
+            self._cond.notify_all()
+
+    def since(self, version: int, epoch: Optional[str] = None) -> Optional[Tuple[List[int], int]]:
+        """
+        (ids of the hostels changed after `version`, oldest change first, and
+        the version they bring the client to), or None if the client has to
+        resync: `version` is outside the log or `epoch` is not this log's.
+        """
+        with self._cond:
+            if (epoch is not None and epoch != self.epoch) or not self.floor <= version <= self.version:
+                return None
+            ids: List[int] = []
+            seen = set()
+            for entry_version, hostel_id in reversed(self.entries):
+                if entry_version <= version:
+                    break
+                if hostel_id not in seen:
+                    seen.add(hostel_id)
+                    ids.append(hostel_id)
+            ids.reverse()
+            return ids, self.version
+
+    def wait(self, version: int, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for a change after `version`; whether one came."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.version > version, timeout)
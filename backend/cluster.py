@@ -0,0 +1,139 @@
+"""
+Multi-process launcher: one writer process and N read-replica workers.
+
+    python cluster.py --workers 4 --port 5000
+
+The writer runs the full app (app.py, with its store and persistence
+settings) on a private port and publishes the catalog into a shared
+directory whenever it changes (shared_catalog.CatalogPublisher). The
+workers accept connections on the public port (a socket shared through
+fork) and serve reads from the memory-mapped catalog, forwarding writes
+and other requests to the writer (replica.py). Dead workers are
+restarted, and so is a dead writer if its hostels are persisted
+(VERISTAY_DATA_DIR or VERISTAY_DATABASE): an in-memory writer would come
+back with only the demo data and publish it over the live catalog, so the
+cluster stops instead. If the writer exits before publishing the first
+generation, the launcher exits with status 1. SIGINT/SIGTERM stops them
+all.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+def listen(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+    return sock
+
+def serve(sock: socket.socket, wsgi_app) -> None:
+    """Serve `wsgi_app` on an already listening socket with a threaded WSGI server."""
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    host, port = sock.getsockname()[:2]
+    make_server(host, port, wsgi_app, threaded=True, fd=sock.fileno()).serve_forever()
+
+def child_signals() -> None:
+    """Children inherit the launcher's handlers through fork; restore the defaults."""
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+def run_writer(sock: socket.socket, catalog_dir: str, publish_interval: float, ready) -> None:
+    child_signals()
+    from app import app, warm_up
+    from shared_catalog import CatalogPublisher
+    state = warm_up(app)
+    CatalogPublisher(state.hostel_store, state.response_cache, catalog_dir, publish_interval).start()
+    ready.set()
+    serve(sock, app)
+
+def run_worker(sock: socket.socket, catalog_dir: str, writer_port: int) -> None:
+    child_signals()
+    import replica
+    serve(sock, replica.configure(catalog_dir, ('127.0.0.1', writer_port)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--catalog-dir', default=os.environ.get('VERISTAY_CATALOG_DIR'),
+                        help="where catalog generations are published (default: a temporary directory)")
+    parser.add_argument('--publish-interval', type=float, default=0.2,
+                        help="seconds to coalesce writes before publishing a generation")
+    args = parser.parse_args()
+
+    persistent = bool(os.environ.get('VERISTAY_DATA_DIR') or os.environ.get('VERISTAY_DATABASE'))
+    catalog_dir = args.catalog_dir or tempfile.mkdtemp(prefix='veristay-catalog-')
+    context = multiprocessing.get_context('fork')
+    public = listen(args.host, args.port)
+    private = listen('127.0.0.1', 0)
+    writer_port = private.getsockname()[1]
+
+    ready = context.Event()
+    writer: Optional[multiprocessing.Process] = None
+    workers: Dict[int, multiprocessing.Process] = {}
+    stopping = False
+
+    def start_writer():
+        process = context.Process(target=run_writer, name='veristay-writer',
+                                  args=(private, catalog_dir, args.publish_interval, ready))
+        process.start()
+        return process
+
+    def start_worker(n):
+        process = context.Process(target=run_worker, name=f'veristay-worker-{n}',
+                                  args=(public, catalog_dir, writer_port))
+        process.start()
+        return process
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    writer = start_writer()
+    # The first generation is published before workers start.
+    while not ready.wait(0.5):
+        if stopping:
+            writer.terminate()
+            writer.join()
+            return
+        if not writer.is_alive():
+            print(f"veristay: the writer exited (code {writer.exitcode}) before publishing the catalog",
+                  file=sys.stderr, flush=True)
+            sys.exit(1)
+    for n in range(args.workers):
+        workers[n] = start_worker(n)
+    print(f"veristay: writer on 127.0.0.1:{writer_port}, {args.workers} workers on "
+          f"{args.host}:{args.port}, catalog in {catalog_dir}", flush=True)
+
+    while not stopping:
+        time.sleep(0.5)
+        if not writer.is_alive() and not stopping:
+            if not persistent:
+                print("veristay: the writer died and its hostels were only in memory; stopping", flush=True)
+                break
+            writer = start_writer()
+        for n, process in list(workers.items()):
+            if not process.is_alive() and not stopping:
+                workers[n] = start_worker(n)
+
+    for process in [writer, *workers.values()]:
+        process.terminate()
+    for process in [writer, *workers.values()]:
+        process.join()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Columnar (NumPy) mirrors of hostel fields, kept up to date by HostelStore."""
+from typing import Dict, Iterable, List
+import numpy as np
+
+
+class ColumnIndex:
+    """
+    A row per item in NumPy column arrays, for vectorized scans of the
+    whole catalog.
+
+    Subclasses name their columns and dtypes in COLUMNS and fill a row in
+    `add`, starting from `_row(item_id)`; every column, `ids`, the `live`
+    mask and the one-hot `amenities` matrix (a column per case-insensitive
+    amenity seen so far, see `_set_amenities`) grow together by doubling.
+    Updates rewrite an item's row in place; removed rows are marked dead
+    and reused by later additions, so scans look at the first `size` rows
+    and mask them with `live`.
+    """
+
+    COLUMNS: Dict[str, type] = {}
+
+    def __init__(self, capacity: int = 1024, amenity_capacity: int = 16):
+        self.rows: Dict[int, int] = {}
+        self.free: List[int] = []
+        # Rows ever used; scans only look at these.
+        self.size = 0
+        self.ids = np.zeros(capacity, np.int64)
+        self.live = np.zeros(capacity, np.bool_)
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype))
+        self.vocabulary: Dict[str, int] = {}
+        self.amenities = np.zeros((capacity, amenity_capacity), np.bool_)
+        self.amenity_counts = np.zeros(capacity, np.int64)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _grow_rows(self) -> None:
+        capacity = 2 * len(self.ids)
+        for name in ('ids', 'live', 'amenities', 'amenity_counts', *self.COLUMNS):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _row(self, item_id: int) -> int:
+        """The row of an item, allocating (and marking live) a new one if needed."""
+        row = self.rows.get(item_id)
+        if row is None:
+            if self.free:
+                row = self.free.pop()
+            else:
+                if self.size == len(self.ids):
+                    self._grow_rows()
+                row = self.size
+                self.size += 1
+            self.rows[item_id] = row
+            self.ids[row] = item_id
+            self.live[row] = True
+        return row
+
+    def _column(self, amenity: str) -> int:
+        column = self.vocabulary.get(amenity)
+        if column is None:
+            column = self.vocabulary[amenity] = len(self.vocabulary)
+            if column == self.amenities.shape[1]:
+                grown = np.zeros((len(self.amenities), 2 * column), np.bool_)
+                grown[:, :column] = self.amenities
+                self.amenities = grown
+        return column
+
+    def _set_amenities(self, row: int, amenities: Iterable[str]) -> None:
+        columns = [self._column(a) for a in {a.lower() for a in amenities}]
+        self.amenities[row] = False
+        self.amenities[row, columns] = True
+        self.amenity_counts[row] = len(columns)
+
+    def remove(self, item_id: int) -> None:
+        row = self.rows.pop(item_id, None)
+        if row is not None:
+            self.live[row] = False
+            self.free.append(row)
+
+    def clear(self) -> None:
+        self.rows.clear()
+        self.free.clear()
+        self.size = 0
+        self.live[:] = False
+        self.vocabulary.clear()
+        self.amenities[:] = False
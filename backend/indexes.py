@@ -0,0 +1,779 @@
+"""In-memory secondary indexes maintained by HostelStore."""
+import bisect
+import heapq
+import math
+import re
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+EARTH_RADIUS_M = 6371000.0
+METERS_PER_DEGREE_LAT = 111320.0
+
+def haversine_m(lat1: float, long1: float, lat2: float, long2: float) -> float:
+    """Great-circle distance between two points in meters."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(long2 - long1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """
+    Uniform lat/long grid index.
+
+    Points are bucketed into square cells of `cell_deg` degrees, so bounding
+    box and nearest-neighbour queries only visit the cells around the query
+    instead of every hostel.
+    """
+
+    def __init__(self, cell_deg: float = 0.01):
+        self.cell_deg = cell_deg
+        self.points: Dict[int, Tuple[float, float]] = {}
+        self.cells: Dict[Tuple[int, int], Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _cell(self, lat: float, long: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(long / self.cell_deg))
+
+    def add(self, item_id: int, lat: float, long: float) -> None:
+        """Index a point, replacing any previous position of the same id."""
+        if item_id in self.points:
+            self.remove(item_id)
+        self.points[item_id] = (lat, long)
+        self.cells.setdefault(self._cell(lat, long), set()).add(item_id)
+
+    def remove(self, item_id: int) -> None:
+        """Remove a point from the index if present."""
+        point = self.points.pop(item_id, None)
+        if point is None:
+            return
+        key = self._cell(*point)
+        bucket = self.cells[key]
+        bucket.discard(item_id)
+        if not bucket:
+            del self.cells[key]
+
+    def clear(self) -> None:
+        self.points.clear()
+        self.cells.clear()
+
+    def _cells_in_range(self, i0: int, j0: int, i1: int, j1: int) -> Iterator[Set[int]]:
+        """Yield occupied cells in an inclusive cell-index window."""
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.cells):
+            # The window is larger than the occupied area: walk occupied cells instead.
+            for (i, j), bucket in self.cells.items():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    yield bucket
+            return
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                bucket = self.cells.get((i, j))
+                if bucket:
+                    yield bucket
+
+    def estimate_bbox(self, min_long: float, min_lat: float,
+                      max_long: float, max_lat: float) -> int:
+        """Upper bound on the number of points inside the bounding box."""
+        i0, j0 = self._cell(min_lat, min_long)
+        i1, j1 = self._cell(max_lat, max_long)
+        return sum(len(bucket) for bucket in self._cells_in_range(i0, j0, i1, j1))
+
+    def within_bbox(self, min_long: float, min_lat: float,
+                    max_long: float, max_lat: float) -> Iterator[int]:
+        """Yield ids of points inside the bounding box (edges inclusive)."""
+        i0, j0 = self._cell(min_lat, min_long)
+        i1, j1 = self._cell(max_lat, max_long)
+        points = self.points
+        for bucket in self._cells_in_range(i0, j0, i1, j1):
+            for item_id in bucket:
+                lat, long = points[item_id]
+                if min_lat <= lat <= max_lat and min_long <= long <= max_long:
+                    yield item_id
+
+    def nearest(self, lat: float, long: float, radius_m: float,
+                limit: int) -> List[Tuple[float, int]]:
+        """
+        Return up to `limit` (distance_m, id) pairs within `radius_m`, closest first.
+
+        Cells are visited in rings of growing Chebyshev distance around the
+        query cell; the search stops once the ring is farther away than the
+        current k-th best distance or the radius.
+        """
+        if limit <= 0 or not self.points:
+            return []
+        radius_deg = radius_m / METERS_PER_DEGREE_LAT
+        # Narrowest cell width inside the search window, used to bound ring distance.
+        widest_lat = min(abs(lat) + radius_deg, 89.9)
+        cell_m = self.cell_deg * METERS_PER_DEGREE_LAT * math.cos(math.radians(widest_lat))
+        ci, cj = self._cell(lat, long)
+        max_ring = math.ceil(radius_m / cell_m) + 1
+        points = self.points
+        best: List[Tuple[float, int]] = []  # max-heap of (-distance, id)
+
+        def consider(bucket: Set[int]) -> None:
+            for item_id in bucket:
+                plat, plong = points[item_id]
+                dist = haversine_m(lat, long, plat, plong)
+                if dist > radius_m:
+                    continue
+                if len(best) < limit:
+                    heapq.heappush(best, (-dist, item_id))
+                elif dist < -best[0][0]:
+                    heapq.heapreplace(best, (-dist, item_id))
+
+        if (2 * max_ring + 1) ** 2 > len(self.cells):
+            for bucket in self._cells_in_range(ci - max_ring, cj - max_ring,
+                                               ci + max_ring, cj + max_ring):
+                consider(bucket)
+        else:
+            for ring in range(max_ring + 1):
+                if ring == 0:
+                    ring_cells = [(ci, cj)]
+                else:
+                    ring_cells = [(ci + di, cj + dj)
+                                  for di in (-ring, ring) for dj in range(-ring, ring + 1)]
+                    ring_cells += [(ci + di, cj + dj)
+                                   for dj in (-ring, ring) for di in range(-ring + 1, ring)]
+                for key in ring_cells:
+                    bucket = self.cells.get(key)
+                    if bucket:
+                        consider(bucket)
+                # Anything in the next ring is at least `ring` full cells away.
+                if len(best) == limit and -best[0][0] <= ring * cell_m:
+                    break
+
+        return sorted((-neg_dist, item_id) for neg_dist, item_id in best)
+
+
+# Map clusters cover zoom levels 0 to MAX_CLUSTER_ZOOM (a street or two
+# across); every 256px map tile is split into 2**CLUSTER_CELL_BITS cells a
+# side, so a cluster stands for the points in a 64px square on screen.
+MAX_CLUSTER_ZOOM = 16
+CLUSTER_CELL_BITS = 2
+# Web Mercator stops short of the poles.
+MAX_MERCATOR_LAT = 85.0511287798
+
+class Cluster(NamedTuple):
+    """The points in one cell of a zoom level."""
+    count: int
+    lat: float                      # centroid
+    long: float
+    price_min: int                  # lowest price of any point
+    hostel_id: Optional[int]        # the point's id when there is only one
+
+def mercator_xy(lat: float, long: float) -> Tuple[float, float]:
+    """Web Mercator position of a point as fractions (0-1) of the world; y grows southwards."""
+    sin_lat = math.sin(math.radians(min(max(lat, -MAX_MERCATOR_LAT), MAX_MERCATOR_LAT)))
+    return (long + 180.0) / 360.0, 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+def cluster_cell(lat: float, long: float, zoom: int,
+                 cell_bits: int = CLUSTER_CELL_BITS) -> Tuple[int, int]:
+    """(x, y) of the cell holding a point at a zoom level."""
+    n = 1 << (zoom + cell_bits)
+    x, y = mercator_xy(lat, long)
+    return min(int(x * n), n - 1), min(int(y * n), n - 1)
+
+def cluster_window(zoom: int, min_long: float, min_lat: float, max_long: float, max_lat: float,
+                   cell_bits: int = CLUSTER_CELL_BITS) -> Tuple[int, int, int, int]:
+    """Inclusive (x0, y0, x1, y1) range of the cells a bounding box touches."""
+    x0, y0 = cluster_cell(max_lat, min_long, zoom, cell_bits)
+    x1, y1 = cluster_cell(min_lat, max_long, zoom, cell_bits)
+    return x0, y0, x1, y1
+
+def window_bbox(zoom: int, x0: int, y0: int, x1: int, y1: int,
+                cell_bits: int = CLUSTER_CELL_BITS) -> Tuple[float, float, float, float]:
+    """(min_long, min_lat, max_long, max_lat) covered by a range of cells."""
+    n = 1 << (zoom + cell_bits)
+
+    def lat(y: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return x0 / n * 360.0 - 180.0, lat(y1 + 1), (x1 + 1) / n * 360.0 - 180.0, lat(y0)
+
+def make_cluster(cell: List) -> Cluster:
+    """A cluster from a cell's [count, lat sum, long sum, lowest price, id sum]."""
+    count, lat_sum, long_sum, price_min, id_sum = cell
+    return Cluster(count, round(lat_sum / count, 6), round(long_sum / count, 6), price_min,
+                   id_sum if count == 1 else None)
+
+def cluster_points(points: Iterable[Tuple[int, float, float, int]], zoom: int,
+                   window: Tuple[int, int, int, int], cell_bits: int = CLUSTER_CELL_BITS) -> List[Cluster]:
+    """
+    Cluster (id, lat, long, price) points at one zoom level from scratch,
+    keeping the cells within an inclusive (x0, y0, x1, y1) window, in cell order.
+    """
+    x0, y0, x1, y1 = window
+    cells: Dict[Tuple[int, int], List] = {}
+    for item_id, lat, long, price in points:
+        key = cluster_cell(lat, long, zoom, cell_bits)
+        if not (x0 <= key[0] <= x1 and y0 <= key[1] <= y1):
+            continue
+        cell = cells.get(key)
+        if cell is None:
+            cells[key] = [1, lat, long, price, item_id]
+        else:
+            cell[0] += 1
+            cell[1] += lat
+            cell[2] += long
+            cell[3] = min(cell[3], price)
+            cell[4] += item_id
+    return [make_cluster(cells[key]) for key in sorted(cells)]
+
+class ClusterIndex:
+    """
+    Map clusters of points at every zoom level, like a pyramid of vector
+    tiles.
+
+    At zoom z the Web Mercator world is a grid of 2**(z + cell_bits) cells
+    a side, each splitting into four at the next zoom. Every occupied cell
+    keeps [count, lat sum, long sum, lowest price, id sum]: the centroid
+    follows from the sums, and with one point the id sum is its id. Adding
+    or removing a point updates one cell per level, and a viewport query
+    only visits cells in view, so its cost follows the clusters shown, not
+    the points under them. A removal that takes away a cell's lowest price
+    recomputes it from the four cells below (or, at the finest level, from
+    the points in the cell).
+    """
+
+    def __init__(self, max_zoom: int = MAX_CLUSTER_ZOOM, cell_bits: int = CLUSTER_CELL_BITS):
+        self.max_zoom = max_zoom
+        self.cell_bits = cell_bits
+        # id -> (finest cell x, y, lat, long, price)
+        self.points: Dict[int, Tuple[int, int, float, float, int]] = {}
+        self.levels: List[Dict[Tuple[int, int], List]] = [{} for _ in range(max_zoom + 1)]
+        # Points (id -> price) of each cell of the finest level.
+        self.members: Dict[Tuple[int, int], Dict[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def add(self, item_id: int, lat: float, long: float, price: int) -> None:
+        """Index a point, replacing any previous position or price of the same id."""
+        if item_id in self.points:
+            self.remove(item_id)
+        x, y = cluster_cell(lat, long, self.max_zoom, self.cell_bits)
+        self.points[item_id] = (x, y, lat, long, price)
+        self.members.setdefault((x, y), {})[item_id] = price
+        for zoom in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - zoom
+            key = (x >> shift, y >> shift)
+            cell = self.levels[zoom].get(key)
+            if cell is None:
+                self.levels[zoom][key] = [1, lat, long, price, item_id]
+            else:
+                cell[0] += 1
+                cell[1] += lat
+                cell[2] += long
+                if price < cell[3]:
+                    cell[3] = price
+                cell[4] += item_id
+
+    def remove(self, item_id: int) -> None:
+        """Remove a point from the index if present."""
+        point = self.points.pop(item_id, None)
+        if point is None:
+            return
+        x, y, lat, long, price = point
+        members = self.members[(x, y)]
+        del members[item_id]
+        if not members:
+            del self.members[(x, y)]
+        for zoom in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - zoom
+            key = (x >> shift, y >> shift)
+            level = self.levels[zoom]
+            cell = level[key]
+            if cell[0] == 1:
+                del level[key]
+                continue
+            cell[0] -= 1
+            cell[1] -= lat
+            cell[2] -= long
+            cell[4] -= item_id
+            if price == cell[3]:
+                if zoom == self.max_zoom:
+                    cell[3] = min(members.values())
+                else:
+                    below = self.levels[zoom + 1]
+                    cx, cy = key[0] * 2, key[1] * 2
+                    cell[3] = min(child[3] for child in (below.get((cx, cy)), below.get((cx + 1, cy)),
+                                                         below.get((cx, cy + 1)), below.get((cx + 1, cy + 1)))
+                                  if child is not None)
+
+    def clear(self) -> None:
+        self.points.clear()
+        self.members.clear()
+        for level in self.levels:
+            level.clear()
+
+    def clusters(self, zoom: int, min_long: float, min_lat: float,
+                 max_long: float, max_lat: float) -> List[Cluster]:
+        """
+        Clusters of the cells a bounding box touches at a zoom level (the
+        finest level for deeper zooms), in cell order.
+        """
+        zoom = min(zoom, self.max_zoom)
+        level = self.levels[zoom]
+        x0, y0, x1, y1 = cluster_window(zoom, min_long, min_lat, max_long, max_lat, self.cell_bits)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(level):
+            # The window is larger than the occupied area: walk occupied cells instead.
+            keys = sorted(key for key in level if x0 <= key[0] <= x1 and y0 <= key[1] <= y1)
+        else:
+            keys = [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1) if (x, y) in level]
+        return [make_cluster(level[key]) for key in keys]
+
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase alphanumeric tokens."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class TextIndex:
+    """
+    Inverted index over hostel name, address and amenities.
+
+    Each term maps to a posting dict of {id: weight}, where the weight is the
+    sum of the field weights the term appears in, and to the same ids grouped
+    by weight in sorted lists ("impacts") so ranked search can visit the best
+    matches first, lowest id first among equals, and stop early. A sorted
+    vocabulary allows prefix lookups, so partially typed words match
+    (typeahead).
+    """
+
+    NAME_WEIGHT = 3
+    AMENITY_WEIGHT = 2
+    ADDRESS_WEIGHT = 1
+    # Prefix matches score lower than whole-word matches.
+    PREFIX_FACTOR = 0.5
+    # Cap on vocabulary terms a short prefix expands into. Filtering and
+    # ranked search share it, so both see the same set of matches.
+    MAX_PREFIX_TERMS = 50
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.impacts: Dict[str, Dict[int, List[int]]] = {}
+        self.vocabulary: List[str] = []
+        self.doc_terms: Dict[int, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def add(self, item_id: int, name: str, address: str, amenities: Iterable[str]) -> None:
+        """Index a document, replacing any previous version of the same id."""
+        if item_id in self.doc_terms:
+            self.remove(item_id)
+        # Count each term once per field; amenities together form one field.
+        weights = dict.fromkeys(tokenize(name), self.NAME_WEIGHT)
+        for field_text, field_weight in ((address, self.ADDRESS_WEIGHT),
+                                         (' '.join(amenities), self.AMENITY_WEIGHT)):
+            for token in set(tokenize(field_text)):
+                weights[token] = weights.get(token, 0) + field_weight
+        postings, impacts = self.postings, self.impacts
+        for term, weight in weights.items():
+            posting = postings.get(term)
+            if posting is None:
+                posting = postings[term] = {}
+                impacts[term] = {}
+                bisect.insort(self.vocabulary, term)
+            posting[item_id] = weight
+            by_weight = impacts[term]
+            ids = by_weight.get(weight)
+            if ids is None:
+                by_weight[weight] = [item_id]
+            elif ids[-1] < item_id:
+                ids.append(item_id)
+            else:
+                bisect.insort(ids, item_id)
+        self.doc_terms[item_id] = tuple(weights)
+
+    def remove(self, item_id: int) -> None:
+        """Remove a document from the index if present."""
+        for term in self.doc_terms.pop(item_id, ()):
+            posting = self.postings[term]
+            impacts = self.impacts[term]
+            weight = posting.pop(item_id)
+            ids = impacts[weight]
+            del ids[bisect.bisect_left(ids, item_id)]
+            if not ids:
+                del impacts[weight]
+            if not posting:
+                del self.postings[term]
+                del self.impacts[term]
+                del self.vocabulary[bisect.bisect_left(self.vocabulary, term)]
+
+    def clear(self) -> None:
+        self.postings.clear()
+        self.impacts.clear()
+        self.vocabulary.clear()
+        self.doc_terms.clear()
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        terms = []
+        for term in self.vocabulary[start:start + self.MAX_PREFIX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def _factor(self, term: str, token: str) -> float:
+        return 1.0 if term == token else self.PREFIX_FACTOR
+
+    def _expand(self, query: str) -> List[Tuple[int, str, List[str]]]:
+        """
+        Expand each query token into its first MAX_PREFIX_TERMS matching
+        vocabulary terms, most selective token first. Returns [] if any token
+        matches nothing.
+        """
+        expanded = []
+        for token in set(tokenize(query)):
+            terms = self._prefix_terms(token)
+            if not terms:
+                return []
+            size = sum(len(self.postings[term]) for term in terms)
+            expanded.append((size, token, terms))
+        expanded.sort()
+        return expanded
+
+    def _probe(self, item_id: int, token: str, terms: List[str]) -> float:
+        """Best score of one token for one document (0 if it does not match)."""
+        best = 0.0
+        for term in terms:
+            weight = self.postings[term].get(item_id)
+            if weight is not None and weight * self._factor(term, token) > best:
+                best = weight * self._factor(term, token)
+        return best
+
+    def estimate(self, query: str) -> int:
+        """Upper bound on the number of documents matching the query."""
+        expanded = self._expand(query)
+        return expanded[0][0] if expanded else 0
+
+    def matcher(self, query: str) -> Callable[[int], bool]:
+        """Predicate telling whether a document matches every query token."""
+        expanded = self._expand(query)
+        token_postings = [[self.postings[term] for term in terms] for _, _, terms in expanded]
+        if not expanded:
+            return lambda item_id: False
+        return lambda item_id: all(any(item_id in posting for posting in postings)
+                                   for postings in token_postings)
+
+    def matching(self, query: str) -> Set[int]:
+        """Ids of documents where every query token prefixes some term."""
+        expanded = self._expand(query)
+        if not expanded:
+            return set()
+        _, token, terms = expanded[0]
+        ids: Set[int] = set()
+        for term in terms:
+            ids.update(self.postings[term])
+        for _, token, terms in expanded[1:]:
+            postings = [self.postings[term] for term in terms]
+            ids = {i for i in ids if any(i in posting for posting in postings)}
+        return ids
+
+    def search(self, query: str, limit: int) -> List[Tuple[float, int]]:
+        """
+        Return up to `limit` (score, id) pairs, best match first.
+
+        The most selective token's postings are visited in descending impact
+        order and the other tokens are probed per candidate. The scan stops as
+        soon as no unvisited document can beat the current k-th best score, so
+        common words do not require touching every posting. Equal scores are
+        ordered by id, so pages of a ranked search are stable.
+        """
+        expanded = self._expand(query)
+        if not expanded or limit <= 0:
+            return []
+        _, token, terms = expanded[0]
+        others = [(other_token, other_terms) for _, other_token, other_terms in expanded[1:]]
+        others_max = sum(max(max(self.impacts[term]) * self._factor(term, other_token)
+                             for term in other_terms)
+                         for other_token, other_terms in others)
+        levels: Dict[float, List[List[int]]] = {}
+        for term in terms:
+            for weight, bucket in self.impacts[term].items():
+                levels.setdefault(weight * self._factor(term, token), []).append(bucket)
+
+        # Min-heap of (score, -id): the worst kept hit is the lowest score and,
+        # among equal scores, the highest id, so ties always go to lower ids.
+        best: List[Tuple[float, int]] = []
+        seen: Set[int] = set()
+        for level_score in sorted(levels, reverse=True):
+            bound = level_score + others_max
+            if len(best) == limit and bound < best[0][0]:
+                break
+            buckets = levels[level_score]
+            # Ids ascend within a level, so once one cannot beat the k-th
+            # best hit, neither can the rest of the level.
+            for item_id in buckets[0] if len(buckets) == 1 else heapq.merge(*buckets):
+                if len(best) == limit and (bound, -item_id) <= best[0]:
+                    break
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                score = level_score
+                for other_token, other_terms in others:
+                    other_score = self._probe(item_id, other_token, other_terms)
+                    if not other_score:
+                        break
+                    score += other_score
+                else:
+                    if len(best) < limit:
+                        heapq.heappush(best, (score, -item_id))
+                    elif (score, -item_id) > best[0]:
+                        heapq.heapreplace(best, (score, -item_id))
+        return sorted(((score, -neg_id) for score, neg_id in best),
+                      key=lambda hit: (-hit[0], hit[1]))
+
+
+class PriceIndex:
+    """
+    Sorted (price, id) lists over both ends of each price range.
+
+    A hostel's range [price_min, price_max] overlaps a budget [low, high]
+    when price_min <= high and price_max >= low; each condition is a prefix
+    or suffix of one sorted list, so its size is known in O(log n). For
+    narrow budgets, the sorted range widths bound how far below `low` an
+    overlapping range can start, which turns the overlap into a single
+    window of `by_min`.
+    """
+
+    def __init__(self):
+        self.ranges: Dict[int, Tuple[int, int]] = {}
+        self.by_min: List[Tuple[int, int]] = []
+        self.by_max: List[Tuple[int, int]] = []
+        self.widths: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ranges)
+
+    def add(self, item_id: int, price_min: int, price_max: int) -> None:
+        """Index a price range, replacing any previous range of the same id."""
+        if item_id in self.ranges:
+            self.remove(item_id)
+        self.ranges[item_id] = (price_min, price_max)
+        bisect.insort(self.by_min, (price_min, item_id))
+        bisect.insort(self.by_max, (price_max, item_id))
+        bisect.insort(self.widths, price_max - price_min)
+
+    def add_many(self, items: Iterable[Tuple[int, int, int]]) -> None:
+        """
+        Index many (id, price_min, price_max) ranges at once, e.g. when
+        loading a catalog. Sorts once instead of inserting one by one.
+        """
+        items = list(items)
+        for item_id, _, _ in items:
+            self.remove(item_id)
+        for item_id, price_min, price_max in items:
+            self.ranges[item_id] = (price_min, price_max)
+            self.by_min.append((price_min, item_id))
+            self.by_max.append((price_max, item_id))
+            self.widths.append(price_max - price_min)
+        self.by_min.sort()
+        self.by_max.sort()
+        self.widths.sort()
+
+    def remove(self, item_id: int) -> None:
+        """Remove a price range from the index if present."""
+        price_range = self.ranges.pop(item_id, None)
+        if price_range is None:
+            return
+        del self.by_min[bisect.bisect_left(self.by_min, (price_range[0], item_id))]
+        del self.by_max[bisect.bisect_left(self.by_max, (price_range[1], item_id))]
+        del self.widths[bisect.bisect_left(self.widths, price_range[1] - price_range[0])]
+
+    def clear(self) -> None:
+        self.ranges.clear()
+        self.by_min.clear()
+        self.by_max.clear()
+        self.widths.clear()
+
+    def _min_at_most(self, high: int) -> int:
+        return bisect.bisect_right(self.by_min, (high, math.inf))
+
+    def _max_at_least(self, low: int) -> int:
+        return bisect.bisect_left(self.by_max, (low, -math.inf))
+
+    def count_min_at_most(self, high: int) -> int:
+        """Number of ranges with price_min <= high."""
+        return self._min_at_most(high)
+
+    def count_max_at_least(self, low: int) -> int:
+        """Number of ranges with price_max >= low."""
+        return len(self.by_max) - self._max_at_least(low)
+
+    def _window(self, low: int, high: int) -> Tuple[int, int]:
+        widest = self.widths[-1] if self.widths else 0
+        return (bisect.bisect_left(self.by_min, (low - widest, -math.inf)),
+                bisect.bisect_right(self.by_min, (high, math.inf)))
+
+    def count_window(self, low: int, high: int) -> int:
+        """Number of ranges starting in [low - widest range, high], a superset of the overlaps."""
+        start, stop = self._window(low, high)
+        return max(0, stop - start)
+
+    def ids_window(self, low: int, high: int) -> Iterator[int]:
+        start, stop = self._window(low, high)
+        return (item_id for _, item_id in self.by_min[start:stop])
+
+    def ids_min_at_most(self, high: int) -> Iterator[int]:
+        return (item_id for _, item_id in self.by_min[:self._min_at_most(high)])
+
+    def ids_max_at_least(self, low: int) -> Iterator[int]:
+        return (item_id for _, item_id in self.by_max[self._max_at_least(low):])
+
+    def ids_sorted(self, field: str, after: Optional[Tuple[int, int]] = None,
+                   descending: bool = False) -> Iterator[int]:
+        """Ids in ('price_min' or 'price_max', id) order after a page key; see walk."""
+        entries = self.by_min if field == 'price_min' else self.by_max
+        return (item_id for _, item_id in walk(entries, after, descending))
+
+
+def walk(entries: Sequence[Any], after: Any = None, descending: bool = False) -> Iterator[Any]:
+    """
+    Entries of a sorted list from just after `after` (from the start when
+    None) onwards, or from just before it backwards when `descending`: the
+    rest of a keyset-paginated listing, found in O(log n) and read lazily.
+    """
+    if descending:
+        stop = len(entries) if after is None else bisect.bisect_left(entries, after)
+        return (entries[i] for i in range(stop - 1, -1, -1))
+    start = 0 if after is None else bisect.bisect_right(entries, after)
+    return (entries[i] for i in range(start, len(entries)))
+
+
+class IdIndex:
+    """Sorted list of ids, for walking the catalog in id order."""
+
+    def __init__(self):
+        self.ids: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, item_id: int) -> None:
+        """Index an id; ids are usually new and the largest, which appends."""
+        if not self.ids or item_id > self.ids[-1]:
+            self.ids.append(item_id)
+            return
+        i = bisect.bisect_left(self.ids, item_id)
+        if i == len(self.ids) or self.ids[i] != item_id:
+            self.ids.insert(i, item_id)
+
+    def add_many(self, items: Iterable[int]) -> None:
+        """Index many new ids at once, sorting once."""
+        self.ids.extend(items)
+        self.ids.sort()
+
+    def remove(self, item_id: int) -> None:
+        """Remove an id from the index if present."""
+        i = bisect.bisect_left(self.ids, item_id)
+        if i < len(self.ids) and self.ids[i] == item_id:
+            del self.ids[i]
+
+    def clear(self) -> None:
+        self.ids.clear()
+
+    def ids_sorted(self, after: Optional[int] = None, descending: bool = False) -> Iterator[int]:
+        """Ids after (before, when `descending`) `after`; see walk."""
+        return walk(self.ids, after, descending)
+
+
+class SortedIndex:
+    """Sorted (value, id) list over one numeric field, for lower-bound filters."""
+
+    def __init__(self):
+        self.values: Dict[int, float] = {}
+        self.entries: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def add(self, item_id: int, value: float) -> None:
+        """Index a value, replacing any previous value of the same id."""
+        self.remove(item_id)
+        self.values[item_id] = value
+        bisect.insort(self.entries, (value, item_id))
+
+    def add_many(self, items: Iterable[Tuple[int, float]]) -> None:
+        """Index many (id, value) pairs at once, sorting once."""
+        items = list(items)
+        for item_id, _ in items:
+            self.remove(item_id)
+        for item_id, value in items:
+            self.values[item_id] = value
+            self.entries.append((value, item_id))
+        self.entries.sort()
+
+    def remove(self, item_id: int) -> None:
+        """Remove a value from the index if present."""
+        value = self.values.pop(item_id, None)
+        if value is not None:
+            del self.entries[bisect.bisect_left(self.entries, (value, item_id))]
+
+    def clear(self) -> None:
+        self.values.clear()
+        self.entries.clear()
+
+    def _at_least(self, low: float) -> int:
+        return bisect.bisect_left(self.entries, (low, -math.inf))
+
+    def count_at_least(self, low: float) -> int:
+        """Number of values >= low."""
+        return len(self.entries) - self._at_least(low)
+
+    def ids_at_least(self, low: float) -> Iterator[int]:
+        return (item_id for _, item_id in self.entries[self._at_least(low):])
+
+
+class PostingIndex:
+    """Maps keys (e.g. amenities, verification flag) to the set of ids carrying them."""
+
+    def __init__(self):
+        self.postings: Dict[Hashable, Set[int]] = {}
+        self.doc_keys: Dict[int, Tuple[Hashable, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_keys)
+
+    def add(self, item_id: int, keys: Iterable[Hashable]) -> None:
+        """Index a document's keys, replacing any previous keys of the same id."""
+        if item_id in self.doc_keys:
+            self.remove(item_id)
+        keys = tuple(set(keys))
+        for key in keys:
+            self.postings.setdefault(key, set()).add(item_id)
+        self.doc_keys[item_id] = keys
+
+    def add_many(self, items: Iterable[Tuple[int, Tuple[Hashable, ...]]]) -> None:
+        """Index many new documents (ids not in the index yet) from (id, distinct keys) pairs."""
+        postings, doc_keys = self.postings, self.doc_keys
+        for item_id, keys in items:
+            for key in keys:
+                posting = postings.get(key)
+                if posting is None:
+                    postings[key] = {item_id}
+                else:
+                    posting.add(item_id)
+            doc_keys[item_id] = keys
+
+    def remove(self, item_id: int) -> None:
+        """Remove a document from the index if present."""
+        for key in self.doc_keys.pop(item_id, ()):
+            posting = self.postings[key]
+            posting.discard(item_id)
+            if not posting:
+                del self.postings[key]
+
+    def clear(self) -> None:
+        self.postings.clear()
+        self.doc_keys.clear()
+
+    def get(self, key: Hashable) -> Set[int]:
+        """Ids carrying `key` (do not mutate the returned set)."""
+        return self.postings.get(key, set())
@@ -0,0 +1,317 @@
+"""
+Request and store instrumentation, exposed in the Prometheus text format.
+
+Metrics are kept per process in plain Python structures: an observation is
+a bisect into the bucket bounds and a few additions under a lock, cheap
+enough to leave on in production (see benchmarks/bench_metrics.py).
+"""
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Counter
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Bucket upper bounds in seconds, for whole requests and for store operations.
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OPERATION_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                     0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...] = (), amount: float = 1) -> None:
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self.values.items())
+        for labels, value in items:
+            yield f'{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}'
+
+class Gauge:
+    """A value read from a callback when the metrics are rendered."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self) -> Iterable[str]:
+        yield f'{self.name} {_format_value(self.read())}'
+
+class Histogram:
+    """Counts of observations per bucket, with their sum, per label set."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = REQUEST_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Per label set: a count per bucket (the last one is +Inf), then the sum.
+        self.series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self.series.items())
+        names = self.labels + ('le',)
+        for labels, series in items:
+            total = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                total += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield f'{self.name}_bucket{_format_labels(names, labels + (le,))} {total}'
+            yield f'{self.name}_sum{_format_labels(self.labels, labels)} {repr(series[-1])}'
+            yield f'{self.name}_count{_format_labels(self.labels, labels)} {total}'
+
+class Registry:
+    """The metrics of a process, rendered in registration order."""
+
+    def __init__(self):
+        self.metrics: List[Any] = []
+
+    def register(self, metric):
+        """Add a metric, replacing any registered under the same name (an app created again)."""
+        for i, registered in enumerate(self.metrics):
+            if registered.name == metric.name:
+                self.metrics[i] = metric
+                return metric
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return ('\n'.join(lines) + '\n').encode()
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REGISTRY = Registry()
+REQUESTS = REGISTRY.register(Counter(
+    'veristay_http_requests_total', 'HTTP requests by route and status.', ('method', 'route', 'status')))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'veristay_http_request_duration_seconds', 'Time to produce a response, by route.', ('method', 'route')))
+REQUEST_BYTES = REGISTRY.register(Counter(
+    'veristay_http_request_bytes_total', 'Request body bytes received, by route.', ('method', 'route')))
+RESPONSE_BYTES = REGISTRY.register(Counter(
+    'veristay_http_response_bytes_total',
+    'Response body bytes sent, by route (streamed bodies are not counted).', ('method', 'route')))
+OPERATION_SECONDS = REGISTRY.register(Histogram(
+    'veristay_store_operation_seconds', 'Time spent in store and index operations.', ('operation',),
+    OPERATION_BUCKETS))
+BUILD_SECONDS = REGISTRY.register(Histogram(
+    'veristay_response_build_seconds',
+    'Time to encode a hostel or assemble a response body on a cache miss, by kind.', ('kind',),
+    OPERATION_BUCKETS))
+
+COALESCED = REGISTRY.register(Counter(
+    'veristay_response_builds_coalesced_total',
+    'Requests that waited for an identical response body being built instead of building it, by kind.',
+    ('kind',)))
+SHED = REGISTRY.register(Counter(
+    'veristay_http_requests_shed_total',
+    'Requests turned away with 503 by admission control, by reason (queue_full or timeout).', ('reason',)))
+
+def observe_request(method: str, route: str, status: int, seconds: float,
+                    request_bytes: int, response_bytes: Optional[int]) -> None:
+    """Record one finished request."""
+    labels = (method, route)
+    REQUESTS.inc((method, route, str(status)))
+    REQUEST_SECONDS.observe(labels, seconds)
+    if request_bytes:
+        REQUEST_BYTES.inc(labels, request_bytes)
+    if response_bytes:
+        RESPONSE_BYTES.inc(labels, response_bytes)
+
+# Where the app puts the matched URL rule in the WSGI environ (see RequestMetrics).
+ROUTE_KEY = 'veristay.route'
+
+class RequestMetrics:
+    """
+    WSGI middleware recording every request passing through `wsgi_app`.
+
+    Requests are labelled with the URL rule the app stores in
+    environ[ROUTE_KEY] (so /api/hostels/1 and /api/hostels/2 share series),
+    or 'unmatched'. Streamed responses are timed until the app returns their
+    body iterator and their size is not counted. With a `profiler`, each
+    request is sampled by it.
+    """
+
+    def __init__(self, wsgi_app: Callable, profiler: Optional["SlowRequestProfiler"] = None):
+        self.wsgi_app = wsgi_app
+        self.profiler = profiler
+
+    def __call__(self, environ, start_response):
+        started = []
+
+        def recording_start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+            return start_response(status, headers, exc_info)
+
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin()
+        start = time.perf_counter()
+        try:
+            return self.wsgi_app(environ, recording_start_response)
+        finally:
+            elapsed = time.perf_counter() - start
+            method = environ['REQUEST_METHOD']
+            route = environ.get(ROUTE_KEY, 'unmatched')
+            status, length = 500, None
+            if started:
+                status = int(started[0][:3])
+                for name, value in started[1]:
+                    if name.lower() == 'content-length':
+                        length = int(value)
+                        break
+            observe_request(method, route, status, elapsed, int(environ.get('CONTENT_LENGTH') or 0), length)
+            if profiler is not None:
+                profiler.end(f'{method} {route}', elapsed)
+
+def observe_build(kind: str, seconds: float) -> None:
+    """Record a response cache miss (see ResponseCache `observe`)."""
+    BUILD_SECONDS.observe((kind,), seconds)
+
+def observe_coalesced(kind: str) -> None:
+    """Record a request served by another's build (see ResponseCache `observe_coalesced`)."""
+    COALESCED.inc((kind,))
+
+def observe_shed(reason: str) -> None:
+    """Record a request shed by admission control (see admission.AdmissionControl)."""
+    SHED.inc((reason,))
+
+def timed(fn: Callable, operation: str) -> Callable:
+    """Wrap `fn` to record its duration as `operation`."""
+    labels = (operation,)
+    observe = OPERATION_SECONDS.observe
+    perf_counter = time.perf_counter
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            observe(labels, perf_counter() - start)
+
+    wrapper.timed_operation = operation
+    return wrapper
+
+def instrument(obj: Any, methods: Iterable[str], prefix: str = '') -> None:
+    """
+    Time the named methods of one object (a store or one of its indexes) by
+    shadowing them with timed wrappers on the instance; methods it does not
+    have are skipped, and so are methods already timed (every Backend over
+    a shared store instruments it again).
+    """
+    for name in methods:
+        method = getattr(obj, name, None)
+        if method is not None and not hasattr(method, 'timed_operation'):
+            setattr(obj, name, timed(method, prefix + name))
+
+class SlowRequestProfiler:
+    """
+    Sampling profiler for slow requests.
+
+    While a request runs, a background thread samples its thread's stack
+    every `interval` seconds. When a request takes longer than `threshold`
+    seconds its samples are written to `directory` as folded stacks (one
+    "frame;frame;... count" line per distinct stack), the input format of
+    flamegraph.pl and speedscope. Requests that got no samples (shorter than
+    about one interval) are not written.
+    """
+
+    def __init__(self, directory: str, threshold: float, interval: float = 0.005):
+        self.directory = directory
+        self.threshold = threshold
+        self.interval = interval
+        self.active: Dict[int, _Counter] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='veristay-profiler', daemon=True)
+            self._thread.start()
+
+    def begin(self) -> None:
+        """Start sampling the calling thread."""
+        with self._lock:
+            self.active[threading.get_ident()] = _Counter()
+
+    def end(self, label: str, seconds: float) -> Optional[str]:
+        """Stop sampling the calling thread; returns the path written for a slow request."""
+        with self._lock:
+            samples = self.active.pop(threading.get_ident(), None)
+        if not samples or seconds < self.threshold:
+            return None
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', label).strip('_')
+        path = os.path.join(self.directory, f'{time.time_ns() // 1000000}-{name}-{seconds * 1000:.0f}ms.folded')
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f'{label};{stack} {count}\n')
+        return path
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self.active:
+                    continue
+                frames = sys._current_frames()
+                for ident, samples in self.active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[fold(frame)] += 1
+
+def fold(frame) -> str:
+    """A stack as 'outermost;...;innermost' frames of file:function."""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    parts.reverse()
+    return ';'.join(parts)
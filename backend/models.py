@@ -1,23 +1,78 @@
 """Data models for the application."""
-from datetime import datetime
-from typing import Dict, List, Optional
-from dataclasses import dataclass, field, asdict
+import bisect
+import heapq
+import itertools
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from dataclasses import dataclass, field, replace
+from concurrency import ReadWriteLock
+from indexes import Cluster, ClusterIndex, GeoIndex, IdIndex, PostingIndex, PriceIndex, SortedIndex, TextIndex
 
-@dataclass
+if TYPE_CHECKING:
+    from storage import Storage
+
+_EPOCH = datetime(1970, 1, 1)
+
+def now_us() -> int:
+    """Current UTC time as integer microseconds since the epoch."""
+    return time.time_ns() // 1000
+
+def format_timestamp(ts: int) -> str:
+    """Render epoch microseconds as the naive UTC ISO string the API returns."""
+    return (_EPOCH + timedelta(microseconds=ts)).isoformat()
+
+# Canonical amenity tuples. Catalogs reuse a small vocabulary ("WiFi", "AC",
+# ...) in a handful of combinations, so hostels with the same amenities share
+# one tuple of interned strings instead of each holding its own list.
+_amenity_sets: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+def intern_amenities(amenities: Iterable[str]) -> Tuple[str, ...]:
+    """Return the shared canonical tuple for an amenity list, keeping its order."""
+    key = tuple(sys.intern(a) for a in amenities)
+    return _amenity_sets.setdefault(key, key)
+
+@dataclass(slots=True)
 class Review:
     """Review model for a hostel."""
     id: int
     user_id: str
     rating: float
     comment: str
-    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    created_ts: int = field(default_factory=now_us)
+
+    @property
+    def created_at(self) -> str:
+        return format_timestamp(self.created_ts)
 
     def to_dict(self) -> Dict:
-        return asdict(self)
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'rating': self.rating,
+            'comment': self.comment,
+            'created_at': self.created_at,
+        }
 
-@dataclass
+def star_bucket(rating: float) -> int:
+    """Histogram bucket (0-4) of a 1-5 rating; half stars count as the star below."""
+    return min(4, max(0, int(rating) - 1))
+
+@dataclass(slots=True)
 class Hostel:
-    """Hostel item model."""
+    """
+    Hostel item model.
+
+    Stored compactly: slotted (no per-instance __dict__), amenities as a
+    shared interned tuple, images as a tuple and timestamps as epoch
+    microseconds that are only formatted when serialized.
+
+    Reviews are kept by the store, not on the hostel; the hostel carries
+    running rating aggregates (count, total and a 1-5 star histogram) that
+    are updated per review, so its size does not grow with its reviews.
+    """
     id: int
     name: str
     address: str
@@ -25,103 +80,663 @@ class Hostel:
     price_max: int
     lat: float
     long: float
-    amenities: List[str] = field(default_factory=list)
-    images: List[str] = field(default_factory=list)
+    amenities: Tuple[str, ...] = ()
+    images: Tuple[str, ...] = ()
     is_verified: bool = False
-    reviews: List[Review] = field(default_factory=list)
-    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
-    updated_at: str = field(default_factory=lambda: datetime.utcnow().isoformat())
+    rating_count: int = 0
+    rating_total: float = 0.0
+    rating_histogram: Tuple[int, int, int, int, int] = (0, 0, 0, 0, 0)
+    created_ts: int = field(default_factory=now_us)
+    updated_ts: int = -1
+
+    def __post_init__(self) -> None:
+        self.amenities = intern_amenities(self.amenities)
+        self.images = tuple(self.images)
+        if self.updated_ts < 0:
+            self.updated_ts = self.created_ts
+
+    @property
+    def created_at(self) -> str:
+        return format_timestamp(self.created_ts)
+
+    @property
+    def updated_at(self) -> str:
+        return format_timestamp(self.updated_ts)
+
+    @property
+    def rating_average(self) -> Optional[float]:
+        return self.rating_total / self.rating_count if self.rating_count else None
+
+    def with_ratings(self, ratings: Iterable[float]) -> 'Hostel':
+        """A copy of this hostel with `ratings` added to its rating aggregates."""
+        count, total, histogram = self.rating_count, self.rating_total, list(self.rating_histogram)
+        for rating in ratings:
+            count += 1
+            total += rating
+            histogram[star_bucket(rating)] += 1
+        return replace(self, rating_count=count, rating_total=total,
+                       rating_histogram=tuple(histogram))
+
+    def rating_summary(self) -> Dict:
+        average = self.rating_average
+        return {
+            'count': self.rating_count,
+            'average': round(average, 2) if average is not None else None,
+            'histogram': list(self.rating_histogram),
+        }
 
     def to_dict(self) -> Dict:
-        """Convert hostel to dictionary, handling nested objects."""
-        data = asdict(self)
-        data['reviews'] = [review.to_dict() for review in self.reviews]
-        return data
+        """
+        Convert hostel to dictionary, handling nested objects.
+
+        Fields are extracted by hand rather than with dataclasses.asdict, which
+        deep-copies recursively; only the lists are shallow-copied.
+        """
+        return {
+            'id': self.id,
+            'name': self.name,
+            'address': self.address,
+            'price_min': self.price_min,
+            'price_max': self.price_max,
+            'lat': self.lat,
+            'long': self.long,
+            'amenities': list(self.amenities),
+            'images': list(self.images),
+            'is_verified': self.is_verified,
+            'rating': self.rating_summary(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+        }
 
     def update(self, name: Optional[str] = None, address: Optional[str] = None,
                price_min: Optional[int] = None, price_max: Optional[int] = None,
                lat: Optional[float] = None, long: Optional[float] = None,
                amenities: Optional[List[str]] = None, images: Optional[List[str]] = None,
                is_verified: Optional[bool] = None) -> None:
-        """Update hostel fields."""
+        """
+        Update hostel fields. Raises ValueError, leaving the hostel unchanged,
+        if the new price range would be inverted.
+        """
+        if (self.price_min if price_min is None else price_min) > \
+                (self.price_max if price_max is None else price_max):
+            raise ValueError("Minimum price cannot be greater than maximum price")
         if name is not None: self.name = name
         if address is not None: self.address = address
         if price_min is not None: self.price_min = price_min
         if price_max is not None: self.price_max = price_max
         if lat is not None: self.lat = lat
         if long is not None: self.long = long
-        if amenities is not None: self.amenities = amenities
-        if images is not None: self.images = images
+        if amenities is not None: self.amenities = intern_amenities(amenities)
+        if images is not None: self.images = tuple(images)
         if is_verified is not None: self.is_verified = is_verified
-        self.updated_at = datetime.utcnow().isoformat()
+        self.updated_ts = now_us()
+
+# Sortable fields for list queries, mapped to (key type, key function). Every
+# key is paired with the hostel id so that (key, id) is unique and can be used
+# as a keyset pagination cursor.
+SORT_FIELDS: Dict[str, Tuple[type, Callable[[Hostel], Any]]] = {
+    'id': (int, lambda hostel: hostel.id),
+    'name': (str, lambda hostel: hostel.name.lower()),
+    'price_min': (int, lambda hostel: hostel.price_min),
+    'price_max': (int, lambda hostel: hostel.price_max),
+    'created_at': (int, lambda hostel: hostel.created_ts),
+    # Unrated hostels sort as 0.
+    'rating': (float, lambda hostel: hostel.rating_total / hostel.rating_count
+               if hostel.rating_count else 0.0),
+}
+
+@dataclass
+class IndexStep:
+    """One filter of a planned query, backed by a secondary index."""
+    name: str
+    estimate: int
+    ids: Callable[[], Iterable[int]]
+    matches: Callable[[Hostel], bool]
 
 class HostelStore:
-    """In-memory storage for hostels."""
+    """
+    In-memory storage for hostels.
+
+    Safe to share between threads: reads take a shared lock and writes an
+    exclusive one, so ids stay unique and indexes consistent. Hostels are
+    copy-on-write: update and add_review install a new Hostel object instead
+    of mutating the stored one, so a hostel returned by a read never changes
+    underneath a caller that is still serializing it. `version` increases on
+    every change.
+
+    Reviews live in per-hostel lists in `reviews`, ordered by id (ids are
+    assigned in order under the write lock); lists are only ever appended
+    to, so a page read under the read lock stays valid afterwards.
+
+    With a `storage` backend (see storage.py) the store is loaded from it on
+    construction, and every change is appended to it under the write lock
+    and committed after the lock is released.
+
+    A store bulk-loaded by `restore` (recovery, snapshot preloads) defers
+    the DEFERRABLE indexes, which only serve search, text filters, map
+    clusters, similar hostels and statistics: each is built from the stored
+    hostels by the first read that needs it, under the read lock, and until
+    then writes skip it.
+    """
+
+    # Fraction of the catalog above which the planner prefers a full scan.
+    SCAN_THRESHOLD = 0.5
+    DEFERRABLE = ('text', 'clustering', 'similarity', 'statistics')
     
-    def __init__(self):
+    def __init__(self, storage: Optional["Storage"] = None):
+        # The NumPy-backed indexes are imported here rather than at the top:
+        # every module imports models, and most (validation, serializers,
+        # the app factory) never need NumPy until a store is built.
+        from similarity import SimilarityIndex
+        from stats import StatsIndex
         self.hostels: Dict[int, Hostel] = {}
         self.next_id: int = 1
         self.next_review_id: int = 1
+        self.ids = IdIndex()
+        self.geo = GeoIndex()
+        self.text = TextIndex()
+        self.prices = PriceIndex()
+        self.amenities = PostingIndex()
+        self.verified = PostingIndex()
+        self.ratings = SortedIndex()
+        self.clustering = ClusterIndex()
+        self.similarity = SimilarityIndex()
+        self.statistics = StatsIndex()
+        # DEFERRABLE indexes not built yet (see restore).
+        self.deferred: Set[str] = set()
+        self._build_lock = threading.Lock()
+        self.reviews: Dict[int, List[Review]] = {}
+        self.version: int = 0
+        self.lock = ReadWriteLock()
+        self.listeners: List[Callable[[Optional[int]], None]] = []
+        self.storage = storage
+        if storage is not None:
+            storage.recover(self)
+
+    def __len__(self) -> int:
+        return len(self.hostels)
+
+    def subscribe(self, listener: Callable[[Optional[int]], None]) -> None:
+        """
+        Call `listener(hostel_id)` after a hostel changes (None after clear).
+        Listeners run while the write lock is held and must not call back
+        into the store.
+        """
+        self.listeners.append(listener)
+
+    def _changed(self, hostel_id: Optional[int]) -> None:
+        self.version += 1
+        for listener in self.listeners:
+            listener(hostel_id)
+
+    def _index(self, hostel: Hostel) -> None:
+        """Add or refresh a hostel in every secondary index."""
+        self.ids.add(hostel.id)
+        self.geo.add(hostel.id, hostel.lat, hostel.long)
+        self.prices.add(hostel.id, hostel.price_min, hostel.price_max)
+        self.amenities.add(hostel.id, (a.lower() for a in hostel.amenities))
+        self.verified.add(hostel.id, (hostel.is_verified,))
+        for name in self.DEFERRABLE:
+            if name not in self.deferred:
+                self._index_derived(name, hostel)
+        self._index_rating(hostel)
+
+    def _index_derived(self, name: str, hostel: Hostel) -> None:
+        """Add or refresh a hostel in one DEFERRABLE index."""
+        if name == 'text':
+            self.text.add(hostel.id, hostel.name, hostel.address, hostel.amenities)
+        elif name == 'clustering':
+            self.clustering.add(hostel.id, hostel.lat, hostel.long, hostel.price_min)
+        elif name == 'similarity':
+            self.similarity.add(hostel.id, hostel.price_min, hostel.price_max, hostel.lat, hostel.long,
+                                hostel.amenities)
+        else:
+            self.statistics.add(hostel.id, hostel.price_min, hostel.price_max, hostel.lat, hostel.long,
+                                hostel.address, hostel.amenities, hostel.is_verified)
+
+    def _built(self, name: str) -> Any:
+        """
+        A DEFERRABLE index, built first if it was deferred. Called with the
+        read (or write) lock held, so the hostels do not change meanwhile.
+        """
+        if name in self.deferred:
+            with self._build_lock:
+                if name in self.deferred:
+                    for hostel in self.hostels.values():
+                        self._index_derived(name, hostel)
+                    self.deferred.discard(name)
+        return getattr(self, name)
+
+    def _index_rating(self, hostel: Hostel) -> None:
+        if hostel.rating_count:
+            self.ratings.add(hostel.id, hostel.rating_average)
+
+    @property
+    def _indexes(self) -> Tuple[Any, ...]:
+        return (self.ids, self.geo, self.text, self.prices, self.amenities, self.verified, self.ratings,
+                self.clustering, self.similarity, self.statistics)
+
+    def _log(self, op: str, *args: Any) -> int:
+        """Append a change to storage (write lock held); returns its sequence number."""
+        return self.storage.append(op, *args) if self.storage is not None else 0
+
+    def _commit(self, lsn: int) -> None:
+        """Wait until a logged change is durable (write lock released)."""
+        if self.storage is not None:
+            self.storage.commit(lsn)
+
+    def _index_many(self, hostels: List[Hostel]) -> None:
+        """
+        Index new hostels in bulk: prices are sorted in once rather than per
+        hostel, and amenity keys are lowercased once per shared amenity tuple.
+        """
+        deferred = self.deferred
+        amenity_keys: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        for hostel in hostels:
+            self.geo.add(hostel.id, hostel.lat, hostel.long)
+            for name in self.DEFERRABLE:
+                if name not in deferred:
+                    self._index_derived(name, hostel)
+        for hostel in hostels:
+            if hostel.amenities not in amenity_keys:
+                amenity_keys[hostel.amenities] = tuple({a.lower() for a in hostel.amenities})
+        self.amenities.add_many((h.id, amenity_keys[h.amenities]) for h in hostels)
+        self.verified.add_many((h.id, (h.is_verified,)) for h in hostels)
+        self.ids.add_many(h.id for h in hostels)
+        self.prices.add_many((h.id, h.price_min, h.price_max) for h in hostels)
+        self.ratings.add_many((h.id, h.rating_average) for h in hostels if h.rating_count)
+
+    def restore(self, items: Iterable[Tuple[Hostel, List[Review]]],
+                next_id: int, next_review_id: int) -> None:
+        """
+        Bulk-load (hostel, reviews) pairs into an empty store during
+        recovery, building the filter indexes in one pass and deferring the
+        DEFERRABLE ones to their first use.
+        """
+        for hostel, reviews in items:
+            self.hostels[hostel.id] = hostel
+            if reviews:
+                self.reviews[hostel.id] = reviews
+        if self.hostels:
+            self.deferred.update(self.DEFERRABLE)
+        self._index_many(list(self.hostels.values()))
+        self.next_id = next_id
+        self.next_review_id = next_review_id
+
+    def replay(self, op: str, *args: Any) -> None:
+        """Re-apply a change read back from storage during recovery."""
+        if op == 'create':
+            hostel, = args
+            self.hostels[hostel.id] = hostel
+            self._index(hostel)
+            self.next_id = max(self.next_id, hostel.id + 1)
+        elif op == 'update':
+            hostel_id, fields, updated_ts = args
+            hostel = replace(self.hostels[hostel_id])
+            hostel.update(**fields)
+            hostel.updated_ts = updated_ts
+            self.hostels[hostel_id] = hostel
+            self._index(hostel)
+        elif op == 'review':
+            hostel_id, review = args
+            self._append_review(hostel_id, review)
+            self.next_review_id = max(self.next_review_id, review.id + 1)
+        elif op == 'delete':
+            hostel_id, = args
+            self._remove(hostel_id)
+        elif op == 'clear':
+            self._clear()
+        else:
+            raise ValueError(f"Unknown storage operation: {op}")
+
+    def _remove(self, hostel_id: int) -> None:
+        """Remove a hostel, its reviews and its index entries."""
+        del self.hostels[hostel_id]
+        self.reviews.pop(hostel_id, None)
+        for index in self._indexes:
+            index.remove(hostel_id)
+
+    def _append_review(self, hostel_id: int, review: Review) -> Hostel:
+        """Store a review and install the hostel with updated rating aggregates."""
+        self.reviews.setdefault(hostel_id, []).append(review)
+        hostel = self.hostels[hostel_id].with_ratings((review.rating,))
+        self.hostels[hostel_id] = hostel
+        self._index_rating(hostel)
+        return hostel
+
+    def _clear(self) -> None:
+        self.hostels.clear()
+        self.reviews.clear()
+        for index in self._indexes:
+            index.clear()
+        self.deferred.clear()
+        self.next_id = 1
 
     def create(self, name: str, address: str, price_min: int, price_max: int,
                lat: float, long: float, amenities: List[str], images: List[str],
                is_verified: bool = False) -> Hostel:
         """Create a new hostel."""
-        hostel = Hostel(
-            id=self.next_id,
-            name=name,
-            address=address,
-            price_min=price_min,
-            price_max=price_max,
-            lat=lat,
-            long=long,
-            amenities=amenities,
-            images=images,
-            is_verified=is_verified
-        )
-        self.hostels[self.next_id] = hostel
-        self.next_id += 1
+        with self.lock.write():
+            hostel = Hostel(
+                id=self.next_id,
+                name=name,
+                address=address,
+                price_min=price_min,
+                price_max=price_max,
+                lat=lat,
+                long=long,
+                amenities=amenities,
+                images=images,
+                is_verified=is_verified
+            )
+            self.hostels[self.next_id] = hostel
+            self._index(hostel)
+            self.next_id += 1
+            lsn = self._log('create', hostel)
+            self._changed(hostel.id)
+        self._commit(lsn)
         return hostel
 
+    def create_many(self, rows: List[Dict[str, Any]]) -> List[Hostel]:
+        """
+        Create hostels from already validated `create` keyword dicts in one
+        write: the lock is taken once, indexes are built in bulk and storage
+        is committed once for the whole batch.
+        """
+        lsn = 0
+        with self.lock.write():
+            hostels = []
+            for row in rows:
+                hostel = Hostel(id=self.next_id, **row)
+                self.hostels[hostel.id] = hostel
+                hostels.append(hostel)
+                self.next_id += 1
+                lsn = self._log('create', hostel)
+            self._index_many(hostels)
+            for hostel in hostels:
+                self._changed(hostel.id)
+        self._commit(lsn)
+        return hostels
+
     def get_all(self) -> List[Hostel]:
         """Get all hostels."""
-        return list(self.hostels.values())
+        with self.lock.read():
+            return list(self.hostels.values())
+
+    def iter_all(self) -> Iterator[Hostel]:
+        """
+        Iterate over all hostels in id order without holding the lock while
+        the caller consumes them. Hostels deleted meanwhile are skipped.
+        """
+        with self.lock.read():
+            ids = sorted(self.hostels)
+        for hostel_id in ids:
+            hostel = self.hostels.get(hostel_id)
+            if hostel is not None:
+                yield hostel
+
+    def query(self, limit: int, after: Optional[Tuple[Any, int]] = None,
+              q: Optional[str] = None, price_min: Optional[int] = None,
+              price_max: Optional[int] = None, amenities: Optional[List[str]] = None,
+              amenity_mode: str = 'all', is_verified: Optional[bool] = None,
+              bbox: Optional[Tuple[float, float, float, float]] = None,
+              rating_min: Optional[float] = None,
+              sort: str = 'id') -> Tuple[List[Hostel], Optional[Tuple[Any, int]]]:
+        """
+        Get one page of hostels matching the given filters.
+
+        Pagination is keyset based: `after` is the (sort key, id) pair of the
+        last hostel on the previous page, so pages stay stable while hostels
+        are created or deleted concurrently. Filters are planned by `_plan`.
+
+        When the sort order is kept by an index (id, price_min, price_max) and
+        the filters are expected to match often enough, the index is walked
+        from the cursor and every filter checked per hostel, stopping once the
+        page is full: a page then costs about `limit` divided by the share of
+        matching hostels. Otherwise the most selective filter's ids are
+        scanned, keeping only the best `limit + 1` in memory. Returns the page
+        and the key to pass as `after` for the next page (None when there are
+        no more results).
+        """
+        descending = sort.startswith('-')
+        field = sort.lstrip('-')
+        _, sort_key = SORT_FIELDS[field]
+
+        def page_key(hostel: Hostel) -> Tuple[Any, int]:
+            return (sort_key(hostel), hostel.id)
+
+        with self.lock.read():
+            steps = self._plan(q=q, price_min=price_min, price_max=price_max,
+                               amenities=amenities, amenity_mode=amenity_mode,
+                               is_verified=is_verified, bbox=bbox, rating_min=rating_min)
+            filters = [step for step in steps if step.name != 'scan']
+            # Walking visits about (limit + 1) * n / matches hostels, scanning
+            # the best filter about `matches` of them.
+            ordered = None
+            if not filters or (limit + 1) * len(self.hostels) <= filters[0].estimate ** 2:
+                ordered = self._ids_sorted(field, after, descending)
+            if ordered is not None:
+                candidates = map(self.hostels.__getitem__, ordered)
+                for step in filters:
+                    candidates = filter(step.matches, candidates)
+                page = list(itertools.islice(candidates, limit + 1))
+                return self._page(page, limit, page_key)
+            candidates = self.hostels.values()
+            if steps and steps[0].name != 'scan':
+                candidates = map(self.hostels.__getitem__, steps[0].ids())
+                steps = steps[1:]
+            for step in steps:
+                if step.name != 'scan':
+                    candidates = filter(step.matches, candidates)
+            if after is not None:
+                if descending:
+                    candidates = (h for h in candidates if page_key(h) < after)
+                else:
+                    candidates = (h for h in candidates if page_key(h) > after)
+
+            select = heapq.nlargest if descending else heapq.nsmallest
+            page = select(limit + 1, candidates, key=page_key)
+        return self._page(page, limit, page_key)
+
+    @staticmethod
+    def _page(hostels: List[Hostel], limit: int,
+              page_key: Callable[[Hostel], Tuple[Any, int]]) -> Tuple[List[Hostel], Optional[Tuple[Any, int]]]:
+        """A page and its next key from up to `limit + 1` hostels in page order."""
+        if len(hostels) <= limit:
+            return hostels, None
+        hostels = hostels[:limit]
+        return hostels, page_key(hostels[-1])
+
+    def _ids_sorted(self, field: str, after: Optional[Tuple[Any, int]],
+                    descending: bool) -> Optional[Iterator[int]]:
+        """Ids in page order after `after` from an index kept in `field` order, or None."""
+        if field == 'id':
+            return self.ids.ids_sorted(None if after is None else after[1], descending)
+        if field in ('price_min', 'price_max'):
+            return self.prices.ids_sorted(field, after, descending)
+        return None
+
+    def explain(self, **filters) -> List[Tuple[str, int]]:
+        """Describe the query plan for the given filters as (index, estimate) pairs."""
+        with self.lock.read():
+            return [(step.name, step.estimate) for step in self._plan(**filters)]
+
+    def _plan(self, q: Optional[str] = None, price_min: Optional[int] = None,
+              price_max: Optional[int] = None, amenities: Optional[List[str]] = None,
+              amenity_mode: str = 'all', is_verified: Optional[bool] = None,
+              bbox: Optional[Tuple[float, float, float, float]] = None,
+              rating_min: Optional[float] = None) -> List[IndexStep]:
+        """
+        Plan a filtered query.
+
+        Each filter becomes an IndexStep with a cheap size estimate from its
+        index. Steps are ordered most selective first: the first one produces
+        the candidate ids and the rest are checked per candidate. When even
+        the best index would yield more than SCAN_THRESHOLD of the catalog, a
+        'scan' step is put first instead, since walking the hostel map is
+        cheaper than fetching that many ids. Price bounds match overlapping
+        price ranges; `amenity_mode` is 'all' or 'any'; `rating_min` matches
+        rated hostels whose average rating is at least that.
+        """
+        steps: List[IndexStep] = []
+        if q:
+            text = self._built('text')
+            text_match = text.matcher(q)
+            steps.append(IndexStep('text', text.estimate(q),
+                                   lambda: text.matching(q),
+                                   lambda h: text_match(h.id)))
+        if bbox is not None:
+            min_long, min_lat, max_long, max_lat = bbox
+            steps.append(IndexStep('geo', self.geo.estimate_bbox(*bbox),
+                                   lambda: self.geo.within_bbox(*bbox),
+                                   lambda h: min_lat <= h.lat <= max_lat and min_long <= h.long <= max_long))
+        if price_max is not None:
+            steps.append(IndexStep('price_min', self.prices.count_min_at_most(price_max),
+                                   lambda: self.prices.ids_min_at_most(price_max),
+                                   lambda h: h.price_min <= price_max))
+        if price_min is not None:
+            steps.append(IndexStep('price_max', self.prices.count_max_at_least(price_min),
+                                   lambda: self.prices.ids_max_at_least(price_min),
+                                   lambda h: h.price_max >= price_min))
+        if price_min is not None and price_max is not None:
+            steps.append(IndexStep('price_window', self.prices.count_window(price_min, price_max),
+                                   lambda: self.prices.ids_window(price_min, price_max),
+                                   lambda h: h.price_min <= price_max and h.price_max >= price_min))
+        if amenities:
+            postings = [self.amenities.get(a.lower()) for a in amenities]
+            if amenity_mode == 'any':
+                steps.append(IndexStep('amenities', sum(len(p) for p in postings),
+                                       lambda: set().union(*postings),
+                                       lambda h: any(h.id in p for p in postings)))
+            else:
+                postings.sort(key=len)
+                steps.append(IndexStep('amenities', len(postings[0]),
+                                       lambda: postings[0].intersection(*postings[1:]),
+                                       lambda h: all(h.id in p for p in postings)))
+        if is_verified is not None:
+            verified = self.verified.get(is_verified)
+            steps.append(IndexStep('is_verified', len(verified),
+                                   lambda: verified,
+                                   lambda h: h.id in verified))
+        if rating_min is not None:
+            steps.append(IndexStep('rating', self.ratings.count_at_least(rating_min),
+                                   lambda: self.ratings.ids_at_least(rating_min),
+                                   lambda h: h.rating_count > 0 and h.rating_average >= rating_min))
+        steps.sort(key=lambda step: step.estimate)
+        if steps and steps[0].estimate > len(self.hostels) * self.SCAN_THRESHOLD:
+            steps.insert(0, IndexStep('scan', len(self.hostels),
+                                      lambda: self.hostels.keys(), lambda h: True))
+        return steps
+
+    def nearby(self, lat: float, long: float, radius_m: float,
+               limit: int) -> List[Tuple[Hostel, float]]:
+        """Get the closest hostels within `radius_m`, with distances in meters."""
+        with self.lock.read():
+            return [(self.hostels[hostel_id], dist)
+                    for dist, hostel_id in self.geo.nearest(lat, long, radius_m, limit)]
+
+    def clusters(self, zoom: int, bbox: Tuple[float, float, float, float]) -> List[Cluster]:
+        """Map clusters of the hostels in a bbox at a zoom level; see ClusterIndex."""
+        with self.lock.read():
+            return self._built('clustering').clusters(zoom, *bbox)
+
+    def similar(self, hostel_id: int, limit: int) -> Optional[List[Tuple[Hostel, float]]]:
+        """
+        The hostels most like one (see similarity.py), most similar first,
+        with their similarity score; None if the hostel does not exist.
+        """
+        from similarity import similarity_score
+        with self.lock.read():
+            if hostel_id not in self.hostels:
+                return None
+            return [(self.hostels[other_id], similarity_score(dist))
+                    for dist, other_id in self._built('similarity').similar(hostel_id, limit)]
+
+    def stats(self, group_by: str,
+              bbox: Optional[Tuple[float, float, float, float]] = None) -> Dict[str, Any]:
+        """Price, verification and amenity statistics by area or amenity; see stats.py."""
+        with self.lock.read():
+            return self._built('statistics').stats(group_by, bbox)
+
+    def search(self, q: str, limit: int) -> List[Hostel]:
+        """Get the hostels best matching a text query, best first."""
+        with self.lock.read():
+            return [self.hostels[hostel_id] for _, hostel_id in self._built('text').search(q, limit)]
+
+    def get_reviews(self, hostel_id: int, limit: int,
+                    after: Optional[int] = None) -> Optional[Tuple[List[Review], Optional[int]]]:
+        """
+        Get one page of a hostel's reviews, newest first, or None if the
+        hostel does not exist. `after` is the id of the last review of the
+        previous page; returns the page and the id to pass as `after` next
+        (None on the last page).
+        """
+        with self.lock.read():
+            if hostel_id not in self.hostels:
+                return None
+            reviews = self.reviews.get(hostel_id, [])
+            end = len(reviews)
+            if after is not None:
+                end = bisect.bisect_left(reviews, after, key=lambda review: review.id)
+            start = max(0, end - limit)
+            page = reviews[start:end][::-1]
+        return page, (page[-1].id if start > 0 and page else None)
 
     def get_by_id(self, hostel_id: int) -> Optional[Hostel]:
         """Get a hostel by ID."""
+        # A single dict lookup is atomic, and stored hostels are never mutated.
         return self.hostels.get(hostel_id)
 
     def update(self, hostel_id: int, **kwargs) -> Optional[Hostel]:
         """Update a hostel."""
-        hostel = self.get_by_id(hostel_id)
+        with self.lock.write():
+            hostel = self.hostels.get(hostel_id)
+            if hostel:
+                hostel = replace(hostel)
+                hostel.update(**kwargs)
+                self.hostels[hostel_id] = hostel
+                self._index(hostel)
+                lsn = self._log('update', hostel_id, kwargs, hostel.updated_ts)
+                self._changed(hostel_id)
         if hostel:
-            hostel.update(**kwargs)
+            self._commit(lsn)
         return hostel
 
     def delete(self, hostel_id: int) -> bool:
         """Delete a hostel."""
-        if hostel_id in self.hostels:
-            del self.hostels[hostel_id]
-            return True
-        return False
+        with self.lock.write():
+            if hostel_id not in self.hostels:
+                return False
+            self._remove(hostel_id)
+            lsn = self._log('delete', hostel_id)
+            self._changed(hostel_id)
+        self._commit(lsn)
+        return True
         
     def add_review(self, hostel_id: int, user_id: str, rating: float, comment: str) -> Optional[Review]:
         """Add a review to a hostel."""
-        hostel = self.get_by_id(hostel_id)
-        if not hostel:
-            return None
-            
-        review = Review(
-            id=self.next_review_id,
-            user_id=user_id,
-            rating=rating,
-            comment=comment
-        )
-        hostel.reviews.append(review)
-        self.next_review_id += 1
+        with self.lock.write():
+            hostel = self.hostels.get(hostel_id)
+            if not hostel:
+                return None
+                
+            review = Review(
+                id=self.next_review_id,
+                user_id=user_id,
+                rating=rating,
+                comment=comment
+            )
+            self._append_review(hostel_id, review)
+            self.next_review_id += 1
+            lsn = self._log('review', hostel_id, review)
+            self._changed(hostel_id)
+        self._commit(lsn)
         return review
 
     def clear(self) -> None:
         """Clear all hostels (useful for testing)."""
-        self.hostels.clear()
-        self.next_id = 1
+        with self.lock.write():
+            self._clear()
+            lsn = self._log('clear')
+            self._changed(None)
+        self._commit(lsn)
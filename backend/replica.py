@@ -0,0 +1,199 @@
+"""
+Read-replica worker app for the multi-process deployment (cluster.py).
+
+Each worker serves list (without `q` or `fields`), detail (without
+`fields`) and nearby requests from the shared, memory-mapped catalog
+(shared_catalog.py) and proxies every other request (writes, full-text
+search, field projections, map clusters, similar hostels, statistics,
+reviews, export, the change feed, ...) to the single writer process over
+HTTP. Responses match app.py byte for byte, including ETags; reads may
+trail the writer by one publish interval.
+"""
+import http.client
+import queue
+from typing import Iterator, Optional, Tuple
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+from cache import CachedBody, CompressionCache, encoded_etag, make_etag, negotiate_encoding
+from serializers import dumps
+from shared_catalog import SharedCatalog
+from validation import (
+    validate_hostel_id,
+    validate_hostel_query,
+    validate_nearby_query,
+    encode_cursor,
+    ValidationError,
+)
+
+replica = Flask(__name__)
+CORS(replica)
+
+catalog: Optional[SharedCatalog] = None
+writer_address: Tuple[str, int] = ('127.0.0.1', 5001)
+
+# Proxied responses are buffered up to this size, and streamed beyond it.
+PROXY_BUFFER_LIMIT = 1 << 20
+PROXY_TIMEOUT = 60
+# Requests that can safely be sent to the writer twice.
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+HOP_BY_HOP = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+              'te', 'trailers', 'transfer-encoding', 'upgrade', 'host', 'content-length'}
+
+_connections: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+
+# Bodies are assembled from the catalog on every request, but hot ones keep
+# their ETag, so their compressed forms are cached per worker.
+compression_cache = CompressionCache()
+
+
+def configure(catalog_dir: str, writer: Tuple[str, int]) -> Flask:
+    """Point this worker at a catalog directory and the writer's address."""
+    global catalog, writer_address
+    catalog = SharedCatalog(catalog_dir)
+    writer_address = writer
+    while not _connections.empty():
+        _connections.get_nowait().close()
+    return replica
+
+
+def cached_response(body: bytes, etag: str) -> Response:
+    """
+    JSON response with a strong ETag, or 304 if the client already has it;
+    compressed if the client accepts it and the body is large enough.
+    """
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding', ''), len(body))
+    if request.if_none_match.contains(encoded_etag(etag, encoding)):
+        response = Response(status=304)
+    else:
+        response = Response(body, status=200, mimetype='application/json')
+        if encoding is not None:
+            response.set_data(compression_cache.compressed(CachedBody(body, etag), encoding))
+            response.content_encoding = encoding
+    response.set_etag(encoded_etag(etag, encoding))
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@replica.route('/api/hostels', methods=['GET'])
+def get_hostels():
+    """A page of hostels from the catalog; text queries and projections go to the writer."""
+    if request.args.get('q', '').strip() or request.args.get('fields'):
+        return proxy()
+    try:
+        query = validate_hostel_query(request.args)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    generation = catalog.current()
+    positions, next_key = generation.query(**query)
+    next_cursor = encode_cursor(query['sort'], next_key) if next_key else None
+    body = b''.join([b'{"hostels":[', b','.join([generation.body(pos) for pos in positions]),
+                     b'],"count":', str(len(positions)).encode(),
+                     b',"next_cursor":', dumps(next_cursor), b'}'])
+    return cached_response(body, make_etag(body))
+
+
+@replica.route('/api/hostels/nearby', methods=['GET'])
+def get_nearby_hostels():
+    """The closest hostels from the catalog, with their distance in meters."""
+    try:
+        query = validate_nearby_query(request.args)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    generation = catalog.current()
+    hostels = [b''.join([generation.body(pos)[:-1], b',"dist_meters":', dumps(round(dist, 1)), b'}'])
+               for pos, dist in generation.nearby(**query)]
+    body = b'{"hostels":[' + b','.join(hostels) + b'],"count":' + str(len(hostels)).encode() + b'}'
+    return cached_response(body, make_etag(body))
+
+
+@replica.route('/api/hostels/<hostel_id>', methods=['GET'])
+def get_hostel(hostel_id):
+    """A single hostel from the catalog; projections go to the writer."""
+    if request.args.get('fields'):
+        return proxy()
+    try:
+        id_int = validate_hostel_id(hostel_id)
+    except ValidationError as e:
+        return jsonify({"error": str(e)}), 400
+    generation = catalog.current()
+    pos = generation.position(id_int)
+    if pos is None:
+        return jsonify({"error": "Hostel not found"}), 404
+    return cached_response(b'{"hostel":' + generation.body(pos) + b'}', generation.etag(pos))
+
+
+@replica.route('/api/hostels/search', methods=['GET'])
+@replica.route('/api/hostels/export', methods=['GET'])
+@replica.route('/api/hostels/changes', methods=['GET'])
+@replica.route('/api/hostels/clusters', methods=['GET'])
+@replica.route('/api/hostels/stats', methods=['GET'])
+@replica.route('/api/hostels/changes/stream', methods=['GET'])
+@replica.route('/api/hostels/<hostel_id>/reviews', methods=['GET'])
+@replica.route('/api/hostels/<hostel_id>/similar', methods=['GET'])
+@replica.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+@replica.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE', 'OPTIONS'])
+def proxy(**_):
+    """Forward the request to the writer and relay its response."""
+    path = request.path
+    if request.query_string:
+        path += '?' + request.query_string.decode('latin-1')
+    headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_BY_HOP}
+    body = request.get_data()
+    # A pooled keep-alive connection may have been closed by the writer, so
+    # idempotent requests are retried once. Others get a new connection and
+    # are retried only if they could not be sent: one that fails after
+    # being sent may already have been applied.
+    idempotent = request.method in IDEMPOTENT_METHODS
+    for attempt in range(2):
+        conn = None
+        if idempotent:
+            try:
+                conn = _connections.get_nowait()
+            except queue.Empty:
+                pass
+        if conn is None:
+            conn = http.client.HTTPConnection(*writer_address, timeout=PROXY_TIMEOUT)
+        sent = False
+        try:
+            conn.request(request.method, path, body=body, headers=headers)
+            sent = True
+            upstream = conn.getresponse()
+            break
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            if attempt or (sent and not idempotent):
+                return jsonify({"error": "Writer unavailable"}), 502
+    response_headers = [(name, value) for name, value in upstream.getheaders()
+                        if name.lower() not in HOP_BY_HOP]
+    length = upstream.getheader('Content-Length')
+    if length is not None and int(length) <= PROXY_BUFFER_LIMIT:
+        try:
+            data = upstream.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            return jsonify({"error": "Writer unavailable"}), 502
+        _connections.put(conn)
+        return Response(data, status=upstream.status, headers=response_headers)
+
+    finished = False
+
+    def stream() -> Iterator[bytes]:
+        nonlocal finished
+        while True:
+            chunk = upstream.read1(1 << 16)
+            if not chunk:
+                break
+            yield chunk
+        finished = True
+
+    def release() -> None:
+        # A response the client abandoned leaves its body unread on the connection.
+        if finished:
+            _connections.put(conn)
+        else:
+            conn.close()
+
+    response = Response(stream(), status=upstream.status, headers=response_headers)
+    response.call_on_close(release)
+    return response
@@ -0,0 +1,56 @@
+"""JSON encoding of API payloads straight to bytes."""
+import json
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Dict, Tuple
+from models import Hostel
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library
+    orjson = None
+
+def dumps_stdlib(data: Any) -> bytes:
+    """Encode data as compact JSON bytes with the standard library."""
+    return json.dumps(data, separators=(',', ':')).encode()
+
+if orjson is not None:
+    JSON_BACKEND = 'orjson'
+    dumps = orjson.dumps
+    loads = orjson.loads
+else:
+    JSON_BACKEND = 'json'
+    dumps = dumps_stdlib
+    loads = json.loads
+
+# Every hostel field, in the order Hostel.to_dict emits them, with how to
+# read it. Projections read only the requested ones, so e.g. leaving out
+# `rating` and the timestamps skips building the summary and formatting.
+HOSTEL_FIELDS: Dict[str, Callable[[Hostel], Any]] = {
+    'id': attrgetter('id'),
+    'name': attrgetter('name'),
+    'address': attrgetter('address'),
+    'price_min': attrgetter('price_min'),
+    'price_max': attrgetter('price_max'),
+    'lat': attrgetter('lat'),
+    'long': attrgetter('long'),
+    'amenities': lambda hostel: list(hostel.amenities),
+    'images': lambda hostel: list(hostel.images),
+    'is_verified': attrgetter('is_verified'),
+    'rating': Hostel.rating_summary,
+    'created_at': attrgetter('created_at'),
+    'updated_at': attrgetter('updated_at'),
+}
+
+@lru_cache(maxsize=256)
+def hostel_encoder(fields: Tuple[str, ...]) -> Callable[[Hostel], bytes]:
+    """Encoder of only `fields` of a hostel (HOSTEL_FIELDS names, in its order)."""
+    getters = [(name, HOSTEL_FIELDS[name]) for name in fields]
+
+    def encode(hostel: Hostel) -> bytes:
+        return dumps({name: get(hostel) for name, get in getters})
+    return encode
+
+# A hostel's body in responses, with every field (its reviews are paged
+# separately): the same encoder as projections, so the two cannot drift.
+encode_hostel: Callable[[Hostel], bytes] = hostel_encoder(tuple(HOSTEL_FIELDS))
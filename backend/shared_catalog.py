@@ -0,0 +1,368 @@
+"""
+Read-only catalog snapshots shared by worker processes through mmap.
+
+A writer publishes the catalog as numbered generation files
+(`catalog-000001.bin`, ...) in a directory, then atomically repoints the
+`CURRENT` file at the newest one. Readers memory-map the current
+generation and answer list, detail and nearby reads straight from it:
+every column is a numpy array over the mapping and every hostel's JSON body
+is stored pre-encoded, so N workers share one copy of the data in the page
+cache and build nothing per process.
+
+File layout: an 8-byte magic, the length of a JSON header, the header
+(generation, store version, count, amenity vocabulary and the offset, dtype
+and shape of each section), then the 8-byte aligned sections:
+
+* columns in id order: `id`, `price_min`, `price_max`, `lat`, `long`,
+  `is_verified`, `rating_count`, `rating` (the SORT_FIELDS key),
+  `created_ts`, and `amenities` (one bit per vocabulary entry);
+* `body_offsets` / `bodies`: each hostel's encoded JSON, with `etags`;
+* `name_offsets` / `names`: lowercased names, the `name` sort key;
+* `order_<field>`: row positions sorted by (key, id) for each sort field.
+"""
+import bisect
+import glob
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from cache import CachedBody, ResponseCache
+from indexes import EARTH_RADIUS_M, METERS_PER_DEGREE_LAT
+from models import SORT_FIELDS, Hostel, HostelStore
+
+MAGIC = b'VSTAYCT1'
+HEADER = struct.Struct('<8sQ')
+POINTER = 'CURRENT'
+GENERATION_FILE = re.compile(r'^catalog-(\d+)\.bin$')
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def write_catalog(path: str, hostels: List[Hostel], bodies: List[CachedBody],
+                  generation: int, version: int) -> None:
+    """Write one catalog generation for `hostels` (and their cached bodies) to `path`."""
+    rows = sorted(zip(hostels, bodies), key=lambda row: row[0].id)
+    hostels = [hostel for hostel, _ in rows]
+    n = len(hostels)
+    vocabulary = sorted({a.lower() for hostel in hostels for a in hostel.amenities})
+    bit = {amenity: i for i, amenity in enumerate(vocabulary)}
+    words = max(1, (len(vocabulary) + 63) // 64)
+
+    def column(values, dtype):
+        return np.fromiter(values, dtype, n)
+
+    masks = np.zeros((n, words), np.uint64)
+    bits = [{bit[a.lower()] for a in hostel.amenities} for hostel in hostels]
+    for word in range(words):
+        masks[:, word] = [sum(1 << (i - 64 * word) for i in row if 0 <= i - 64 * word < 64)
+                          for row in bits]
+    rating_key = SORT_FIELDS['rating'][1]
+    sections: Dict[str, np.ndarray] = {
+        'id': column((h.id for h in hostels), np.int64),
+        'price_min': column((h.price_min for h in hostels), np.int64),
+        'price_max': column((h.price_max for h in hostels), np.int64),
+        'lat': column((h.lat for h in hostels), np.float64),
+        'long': column((h.long for h in hostels), np.float64),
+        'is_verified': column((h.is_verified for h in hostels), np.bool_),
+        'rating_count': column((h.rating_count for h in hostels), np.int64),
+        'rating': column((rating_key(h) for h in hostels), np.float64),
+        'created_ts': column((h.created_ts for h in hostels), np.int64),
+        'amenities': masks,
+        'etags': np.array([cached.etag.encode() for _, cached in rows], dtype='S32').reshape(n),
+    }
+    for name, offsets_name, blobs in (
+            ('bodies', 'body_offsets', [cached.body for _, cached in rows]),
+            ('names', 'name_offsets', [h.name.lower().encode() for h in hostels])):
+        offsets = np.zeros(n + 1, np.int64)
+        np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+        sections[name] = np.frombuffer(b''.join(blobs), np.uint8)
+        sections[offsets_name] = offsets
+    ids = sections['id']
+    for field in SORT_FIELDS:
+        if field == 'id':
+            continue
+        if field == 'name':
+            order = sorted(range(n), key=lambda i: (hostels[i].name.lower(), hostels[i].id))
+            sections['order_name'] = np.array(order, np.int64)
+        else:
+            source = {'created_at': 'created_ts'}.get(field, field)
+            sections['order_' + field] = np.lexsort((ids, sections[source])).astype(np.int64)
+
+    layout, offset = {}, 0
+    for name, array in sections.items():
+        array = np.ascontiguousarray(array)
+        sections[name] = array
+        layout[name] = [offset, array.dtype.str, list(array.shape)]
+        offset = _align(offset + array.nbytes)
+    header = json.dumps({'generation': generation, 'version': version, 'count': n,
+                         'amenities': vocabulary, 'sections': layout}).encode()
+    base = _align(HEADER.size + len(header))
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(header)) + header)
+        for name, array in sections.items():
+            f.seek(base + layout[name][0])
+            f.write(array.tobytes())
+        f.truncate(base + offset)
+
+
+def _haversine_m(lat: float, long: float, lats: np.ndarray, longs: np.ndarray) -> np.ndarray:
+    """indexes.haversine_m from one point to arrays of points."""
+    phi1 = np.radians(lat)
+    phi2 = np.radians(lats)
+    dlambda = np.radians(longs - long)
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+class CatalogGeneration:
+    """One memory-mapped catalog generation. Positions index its id-ordered rows."""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, length = HEADER.unpack_from(self.mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        meta = json.loads(self.mm[HEADER.size:HEADER.size + length])
+        base = _align(HEADER.size + length)
+        self.path = path
+        self.generation: int = meta['generation']
+        self.version: int = meta['version']
+        self.count: int = meta['count']
+        self.amenity_bits = {amenity: i for i, amenity in enumerate(meta['amenities'])}
+        self.columns: Dict[str, np.ndarray] = {}
+        for name, (offset, dtype, shape) in meta['sections'].items():
+            dtype = np.dtype(dtype)
+            count = int(np.prod(shape))
+            self.columns[name] = np.frombuffer(self.mm, dtype, count, base + offset).reshape(shape)
+        self.view = memoryview(self.mm)
+        self.bodies_start = base + meta['sections']['bodies'][0]
+        self.names_start = base + meta['sections']['names'][0]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def position(self, hostel_id: int) -> Optional[int]:
+        """Row position of a hostel, or None if it is not in this generation."""
+        ids = self.columns['id']
+        pos = int(np.searchsorted(ids, hostel_id))
+        return pos if pos < self.count and ids[pos] == hostel_id else None
+
+    def body(self, pos: int) -> memoryview:
+        """The encoded JSON of the hostel at `pos`, as a view into the mapping."""
+        offsets = self.columns['body_offsets']
+        return self.view[self.bodies_start + int(offsets[pos]):self.bodies_start + int(offsets[pos + 1])]
+
+    def etag(self, pos: int) -> str:
+        return self.columns['etags'][pos].decode()
+
+    def sort_key(self, sort: str, pos: int) -> Tuple[Any, int]:
+        """The (key, id) pair HostelStore.query pages by, for the hostel at `pos`."""
+        field = sort.lstrip('-')
+        hostel_id = int(self.columns['id'][pos])
+        if field == 'id':
+            return hostel_id, hostel_id
+        if field == 'name':
+            offsets = self.columns['name_offsets']
+            start = self.names_start
+            return bytes(self.view[start + int(offsets[pos]):start + int(offsets[pos + 1])]).decode(), hostel_id
+        column = self.columns[{'created_at': 'created_ts'}.get(field, field)]
+        return column[pos].item(), hostel_id
+
+    def query(self, limit: int, after: Optional[Tuple[Any, int]] = None,
+              price_min: Optional[int] = None, price_max: Optional[int] = None,
+              amenities: Optional[List[str]] = None, amenity_mode: str = 'all',
+              is_verified: Optional[bool] = None,
+              bbox: Optional[Tuple[float, float, float, float]] = None,
+              rating_min: Optional[float] = None,
+              sort: str = 'id') -> Tuple[List[int], Optional[Tuple[Any, int]]]:
+        """
+        HostelStore.query (without `q`) over this generation, returning row
+        positions instead of hostels. Filters are evaluated as vectorized
+        masks over the columns; keyset pagination bisects the sort order.
+        """
+        c = self.columns
+        mask: Optional[np.ndarray] = None
+
+        def narrow(condition: np.ndarray) -> None:
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+
+        if price_max is not None:
+            narrow(c['price_min'] <= price_max)
+        if price_min is not None:
+            narrow(c['price_max'] >= price_min)
+        if is_verified is not None:
+            narrow(c['is_verified'] == is_verified)
+        if bbox is not None:
+            min_long, min_lat, max_long, max_lat = bbox
+            narrow((c['lat'] >= min_lat) & (c['lat'] <= max_lat)
+                   & (c['long'] >= min_long) & (c['long'] <= max_long))
+        if rating_min is not None:
+            narrow((c['rating_count'] > 0) & (c['rating'] >= rating_min))
+        if amenities:
+            wanted = np.zeros(c['amenities'].shape[1], np.uint64)
+            names = {a.lower() for a in amenities}
+            for name in names & self.amenity_bits.keys():
+                i = self.amenity_bits[name]
+                wanted[i // 64] |= np.uint64(1 << (i % 64))
+            if amenity_mode == 'any':
+                narrow((c['amenities'] & wanted).any(axis=1))
+            elif not names <= self.amenity_bits.keys():
+                # An amenity no hostel has: nothing matches them all.
+                narrow(np.zeros(self.count, np.bool_))
+            else:
+                narrow(((c['amenities'] & wanted) == wanted).all(axis=1))
+
+        descending = sort.startswith('-')
+        field = sort.lstrip('-')
+        order = np.arange(self.count) if field == 'id' else c['order_' + field]
+        if after is not None:
+            # (key, id) pairs are unique, so the page starts just past `after`.
+            search = bisect.bisect_left if descending else bisect.bisect_right
+            split = search(range(self.count), tuple(after),
+                           key=lambda i: self.sort_key(field, int(order[i])))
+            order = order[:split] if descending else order[split:]
+        if descending:
+            order = order[::-1]
+        if mask is not None:
+            order = order[mask[order]]
+        page = [int(pos) for pos in order[:limit + 1]]
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        return page, self.sort_key(field, page[-1])
+
+    def nearby(self, lat: float, long: float, radius_m: float,
+               limit: int) -> List[Tuple[int, float]]:
+        """HostelStore.nearby over this generation: (position, distance) pairs."""
+        lats, longs = self.columns['lat'], self.columns['long']
+        radius_deg = radius_m / METERS_PER_DEGREE_LAT
+        candidates = np.nonzero((lats >= lat - radius_deg) & (lats <= lat + radius_deg))[0]
+        distances = _haversine_m(lat, long, lats[candidates], longs[candidates])
+        within = distances <= radius_m
+        candidates, distances = candidates[within], distances[within]
+        best = np.lexsort((self.columns['id'][candidates], distances))[:limit]
+        return [(int(candidates[i]), float(distances[i])) for i in best]
+
+
+class SharedCatalog:
+    """The current generation in a catalog directory, reopened when a new one is published."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.pointer = os.path.join(directory, POINTER)
+        self._lock = threading.Lock()
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._generation: Optional[CatalogGeneration] = None
+
+    def current(self) -> CatalogGeneration:
+        """The newest published generation (a stat of CURRENT per call)."""
+        while True:
+            st = os.stat(self.pointer)
+            stamp = (st.st_ino, st.st_mtime_ns)
+            if stamp == self._stamp:
+                return self._generation
+            with self._lock:
+                if stamp != self._stamp:
+                    with open(self.pointer) as f:
+                        name = f.read().strip()
+                    try:
+                        self._generation = CatalogGeneration(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        # Two generations were published since CURRENT was
+                        # read, and this one is gone: read it again.
+                        continue
+                    self._stamp = stamp
+                return self._generation
+
+
+class CatalogPublisher:
+    """
+    Publishes `store` into a catalog directory whenever it changes.
+
+    Changes are coalesced: after the first change the publisher waits
+    `min_interval` seconds so that a burst of writes yields one generation.
+    Hostel bodies come from the response cache, so only hostels that changed
+    since the last generation are re-encoded. The store is read through its
+    public API (`get_all` and `version`), so HostelStore and SqlHostelStore
+    can both be published.
+
+    After the pointer moves, the previous generation is kept, for readers
+    that read its name but have not opened it yet, and older ones are
+    unlinked; readers still mapping them keep their pages until they move
+    on.
+    """
+
+    def __init__(self, store: HostelStore, cache: ResponseCache, directory: str,
+                 min_interval: float = 0.2):
+        self.store = store
+        self.cache = cache
+        self.directory = directory
+        self.min_interval = min_interval
+        os.makedirs(directory, exist_ok=True)
+        existing = [int(m.group(1)) for m in map(GENERATION_FILE.match, os.listdir(directory)) if m]
+        self.generation = max(existing, default=0)
+        self.published_version: Optional[int] = None
+        self._changed = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        store.subscribe(lambda hostel_id: self._changed.set())
+
+    def snapshot(self) -> Tuple[List[Hostel], int]:
+        """The store's hostels and the version they were read at."""
+        while True:
+            version = self.store.version
+            hostels = self.store.get_all()
+            if self.store.version == version:
+                return hostels, version
+
+    def publish(self) -> int:
+        """Write a new generation if the store changed; return the current generation."""
+        hostels, version = self.snapshot()
+        if version == self.published_version:
+            return self.generation
+        bodies = [self.cache.hostel(hostel) for hostel in hostels]
+        generation = self.generation + 1
+        name = f'catalog-{generation:06d}.bin'
+        write_catalog(os.path.join(self.directory, name + '.tmp'), hostels, bodies, generation, version)
+        os.replace(os.path.join(self.directory, name + '.tmp'), os.path.join(self.directory, name))
+        pointer = os.path.join(self.directory, POINTER)
+        with open(pointer + '.tmp', 'w') as f:
+            f.write(name)
+        os.replace(pointer + '.tmp', pointer)
+        for path in glob.glob(os.path.join(self.directory, 'catalog-*.bin')):
+            match = GENERATION_FILE.match(os.path.basename(path))
+            if match and int(match.group(1)) < self.generation:
+                os.unlink(path)
+        self.generation, self.published_version = generation, version
+        return generation
+
+    def start(self) -> None:
+        """Publish now, then in a background thread after every change."""
+        self.publish()
+
+        def run():
+            while True:
+                self._changed.wait()
+                if self._stopped:
+                    return
+                time.sleep(self.min_interval)
+                self._changed.clear()
+                self.publish()
+
+        self._thread = threading.Thread(target=run, name='catalog-publisher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped = True
+        self._changed.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,116 @@
+"""
+Similar hostel recommendations over price, location and amenities.
+
+Two hostels are compared on three features, each scaled so that 1 is a
+noticeable difference, and their distance is the sum:
+
+*   price: the mean difference of log price_min and log price_max, in
+    doublings (a hostel twice as expensive is 1 away);
+*   location: kilometres apart over DISTANCE_SCALE_KM;
+*   amenities: 1 minus the Jaccard similarity of the (case-insensitive)
+    amenity sets.
+
+`distance` computes it for one pair; SimilarityIndex keeps the features of
+every hostel in NumPy arrays and computes it against all of them at once.
+"""
+import math
+from typing import FrozenSet, Iterable, List, NamedTuple, Tuple
+import numpy as np
+from columns import ColumnIndex
+from indexes import METERS_PER_DEGREE_LAT
+
+PRICE_SCALE = math.log(2)
+DISTANCE_SCALE_KM = 5.0
+KM_PER_DEGREE = METERS_PER_DEGREE_LAT / 1000
+
+
+class Features(NamedTuple):
+    log_price_min: float
+    log_price_max: float
+    lat: float
+    long: float
+    amenities: FrozenSet[str]
+
+
+def features(price_min: int, price_max: int, lat: float, long: float, amenities: Iterable[str]) -> Features:
+    return Features(math.log1p(price_min), math.log1p(price_max), lat, long,
+                    frozenset(a.lower() for a in amenities))
+
+
+def distance(a: Features, b: Features) -> float:
+    """How different `b` is from `a` (0 for identical features)."""
+    price = (abs(b.log_price_min - a.log_price_min) + abs(b.log_price_max - a.log_price_max)) / (2 * PRICE_SCALE)
+    # Equirectangular: accurate to well under 1% over a city.
+    dlat = (b.lat - a.lat) * KM_PER_DEGREE
+    dlong = (b.long - a.long) * math.cos(math.radians(a.lat)) * KM_PER_DEGREE
+    union = len(a.amenities | b.amenities)
+    amenities = 1 - len(a.amenities & b.amenities) / union if union else 0.0
+    return price + math.hypot(dlat, dlong) / DISTANCE_SCALE_KM + amenities
+
+
+def similarity_score(dist: float) -> float:
+    """A distance as a score from 1 (identical) down towards 0."""
+    return 1 / (1 + dist)
+
+
+class SimilarityIndex(ColumnIndex):
+    """
+    Hostel features as rows of NumPy arrays, for top-k similarity queries.
+
+    Each hostel has a row (see ColumnIndex): its log prices and lat/long in
+    one column array each, and its one-hot amenities. A query computes the
+    distance from one row to every row in a few vectorized operations and
+    selects the closest with argpartition, so it costs a pass over
+    contiguous arrays instead of a Python loop over hostels.
+    """
+
+    COLUMNS = {'log_price_min': np.float64, 'log_price_max': np.float64,
+               'lats': np.float64, 'longs': np.float64}
+
+    def add(self, item_id: int, price_min: int, price_max: int, lat: float, long: float,
+            amenities: Iterable[str]) -> None:
+        """Index a hostel's features, replacing any previous ones of the same id."""
+        row = self._row(item_id)
+        self.log_price_min[row] = math.log1p(price_min)
+        self.log_price_max[row] = math.log1p(price_max)
+        self.lats[row] = lat
+        self.longs[row] = long
+        self._set_amenities(row, amenities)
+
+    def distances(self, row: int) -> np.ndarray:
+        """`distance` from a row to every row in use (dead rows included)."""
+        n = self.size
+        price = np.abs(self.log_price_min[:n] - self.log_price_min[row])
+        price += np.abs(self.log_price_max[:n] - self.log_price_max[row])
+        price /= 2 * PRICE_SCALE
+        lat, long = self.lats[row], self.longs[row]
+        dlat = (self.lats[:n] - lat) * KM_PER_DEGREE
+        dlong = (self.longs[:n] - long) * (math.cos(math.radians(lat)) * KM_PER_DEGREE)
+        # np.hypot is several times slower than this on large arrays.
+        km = np.sqrt(dlat * dlat + dlong * dlong)
+        # Only the query's own amenity columns can intersect.
+        columns = np.flatnonzero(self.amenities[row])
+        shared = self.amenities[:n, columns].sum(axis=1)
+        union = self.amenity_counts[:n] + len(columns) - shared
+        amenities = 1 - shared / np.maximum(union, 1)
+        amenities[union == 0] = 0.0
+        return price + km / DISTANCE_SCALE_KM + amenities
+
+    def similar(self, item_id: int, limit: int) -> List[Tuple[float, int]]:
+        """
+        (distance, id) of the `limit` hostels closest to `item_id`, closest
+        first (ties by id); empty for an id not in the index.
+        """
+        row = self.rows.get(item_id)
+        k = min(limit, len(self.rows) - 1)
+        if row is None or k <= 0:
+            return []
+        dists = self.distances(row)
+        dists[~self.live[:self.size]] = np.inf
+        dists[row] = np.inf
+        candidates = np.argpartition(dists, k - 1)[:k] if k < self.size else np.arange(self.size)
+        # argpartition leaves a tie across the k-th place to chance; break it by id.
+        kth = dists[candidates].max()
+        candidates = np.union1d(candidates, np.flatnonzero(dists == kth))
+        order = candidates[np.lexsort((self.ids[candidates], dists[candidates]))][:k]
+        return [(float(dists[i]), int(self.ids[i])) for i in order]
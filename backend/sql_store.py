@@ -0,0 +1,523 @@
+"""SQL-backed hostel storage with the same interface as HostelStore."""
+import heapq
+import sqlite3
+import threading
+from contextlib import contextmanager
+from math import cos, radians
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from indexes import (MAX_CLUSTER_ZOOM, METERS_PER_DEGREE_LAT, Cluster, TextIndex, cluster_points,
+                     cluster_window, haversine_m, tokenize, window_bbox)
+from models import SORT_FIELDS, Hostel, Review, now_us, star_bucket
+from serializers import dumps, loads
+from similarity import distance, features, similarity_score
+from stats import area_of, summarize
+
+# Portable DDL: apart from the `?` parameter style (psycopg uses `%s`), these
+# statements run unchanged on PostgreSQL.
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS hostels (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        name_key TEXT NOT NULL,
+        address TEXT NOT NULL,
+        price_min INTEGER NOT NULL,
+        price_max INTEGER NOT NULL,
+        lat DOUBLE PRECISION NOT NULL,
+        long DOUBLE PRECISION NOT NULL,
+        amenities TEXT NOT NULL,
+        images TEXT NOT NULL,
+        is_verified BOOLEAN NOT NULL,
+        search_text TEXT NOT NULL,
+        rating_count INTEGER NOT NULL DEFAULT 0,
+        rating_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+        rating_average DOUBLE PRECISION NOT NULL DEFAULT 0,
+        rating_1 INTEGER NOT NULL DEFAULT 0,
+        rating_2 INTEGER NOT NULL DEFAULT 0,
+        rating_3 INTEGER NOT NULL DEFAULT 0,
+        rating_4 INTEGER NOT NULL DEFAULT 0,
+        rating_5 INTEGER NOT NULL DEFAULT 0,
+        created_ts BIGINT NOT NULL,
+        updated_ts BIGINT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS hostel_amenities (
+        hostel_id INTEGER NOT NULL REFERENCES hostels (id) ON DELETE CASCADE,
+        amenity TEXT NOT NULL,
+        PRIMARY KEY (amenity, hostel_id)
+    )""",
+    """CREATE TABLE IF NOT EXISTS reviews (
+        id INTEGER PRIMARY KEY,
+        hostel_id INTEGER NOT NULL REFERENCES hostels (id) ON DELETE CASCADE,
+        user_id TEXT NOT NULL,
+        rating DOUBLE PRECISION NOT NULL,
+        comment TEXT NOT NULL,
+        created_ts BIGINT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS hostels_name_key ON hostels (name_key, id)",
+    "CREATE INDEX IF NOT EXISTS hostels_price_min ON hostels (price_min, id)",
+    "CREATE INDEX IF NOT EXISTS hostels_price_max ON hostels (price_max, id)",
+    "CREATE INDEX IF NOT EXISTS hostels_is_verified ON hostels (is_verified, id)",
+    "CREATE INDEX IF NOT EXISTS hostels_location ON hostels (lat, long)",
+    "CREATE INDEX IF NOT EXISTS hostels_created_ts ON hostels (created_ts, id)",
+    "CREATE INDEX IF NOT EXISTS hostels_rating ON hostels (rating_average, id)",
+    "CREATE INDEX IF NOT EXISTS hostel_amenities_hostel ON hostel_amenities (hostel_id)",
+    "CREATE INDEX IF NOT EXISTS reviews_hostel ON reviews (hostel_id, id)",
+]
+
+# Columns of `hostels` added after its first release, with the definition
+# `_migrate` adds them under: SQLite only adds a NOT NULL column that has a
+# default, and every row gets its real value back-filled straight after.
+ADDED_COLUMNS = {
+    'name_key': "TEXT NOT NULL DEFAULT ''",
+    'search_text': "TEXT NOT NULL DEFAULT ''",
+    'rating_count': "INTEGER NOT NULL DEFAULT 0",
+    'rating_total': "DOUBLE PRECISION NOT NULL DEFAULT 0",
+    'rating_average': "DOUBLE PRECISION NOT NULL DEFAULT 0",
+    **{f'rating_{star}': "INTEGER NOT NULL DEFAULT 0" for star in range(1, 6)},
+    'created_ts': "BIGINT NOT NULL DEFAULT 0",
+    'updated_ts': "BIGINT NOT NULL DEFAULT 0",
+}
+
+HOSTEL_COLUMNS = ("id, name, address, price_min, price_max, lat, long, amenities, images, "
+                  "is_verified, created_ts, updated_ts, rating_count, rating_total, "
+                  "rating_1, rating_2, rating_3, rating_4, rating_5")
+REVIEW_COLUMNS = "id, user_id, rating, comment, created_ts"
+
+# SQL expression for each sort field of SORT_FIELDS. Names sort by name_key,
+# the name lowered in Python: SQL lower() only folds ASCII, and keyset
+# cursors carry the Python key.
+SORT_COLUMNS = {
+    'id': 'id',
+    'name': 'name_key',
+    'price_min': 'price_min',
+    'price_max': 'price_max',
+    'created_at': 'created_ts',
+    'rating': 'rating_average',
+}
+
+def search_text(name: str, address: str, amenities: Iterable[str]) -> str:
+    """Space-separated tokens with a leading space, so `LIKE '% tok%'` is a word-prefix match."""
+    return ' ' + ' '.join(tokenize(' '.join([name, address, *amenities])))
+
+
+class SqlHostelStore:
+    """
+    Hostel storage in a SQL database (stdlib sqlite3).
+
+    Each thread gets its own connection, opened on first use and reused
+    after that. Filters, sorting and keyset pagination run in SQL against
+    indexes on price, verification, location, amenities and rating. Rating
+    aggregates are columns of the hostel row, updated in the same
+    transaction as each review insert, so hostel reads never touch the
+    reviews table. Rows are converted to fresh Hostel objects on every read.
+
+    `version` and `subscribe` mirror HostelStore for the response cache;
+    they only see changes made through this object.
+    """
+
+    def __init__(self, path: str = 'veristay.db'):
+        self.path = path
+        self.version: int = 0
+        self.listeners: List[Callable[[Optional[int]], None]] = []
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        with self._write() as conn:
+            self._migrate(conn)
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Bring a `hostels` table created by an earlier version up to SCHEMA.
+
+        Missing columns are added with their ADDED_COLUMNS definition, then the
+        derived ones are back-filled: keys from each row, rating aggregates from
+        its reviews, and timestamps from the time of the upgrade.
+        """
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(hostels)")}
+        missing = [column for column in ADDED_COLUMNS if columns and column not in columns]
+        if not missing:
+            return
+        for column in missing:
+            conn.execute(f"ALTER TABLE hostels ADD COLUMN {column} {ADDED_COLUMNS[column]}")
+        if 'name_key' in missing or 'search_text' in missing:
+            conn.executemany(
+                "UPDATE hostels SET name_key = ?, search_text = ? WHERE id = ?",
+                [(name.lower(), search_text(name, address, loads(amenities)), hostel_id)
+                 for hostel_id, name, address, amenities
+                 in conn.execute("SELECT id, name, address, amenities FROM hostels").fetchall()])
+        if any(column.startswith('rating_') for column in missing):
+            ratings: Dict[int, List[float]] = {}
+            for hostel_id, rating in conn.execute("SELECT hostel_id, rating FROM reviews"):
+                row = ratings.setdefault(hostel_id, [0, 0.0, 0, 0, 0, 0, 0])
+                row[0] += 1
+                row[1] += rating
+                row[2 + star_bucket(rating)] += 1
+            conn.executemany(
+                "UPDATE hostels SET rating_count = ?, rating_total = ?, rating_average = ?, "
+                "rating_1 = ?, rating_2 = ?, rating_3 = ?, rating_4 = ?, rating_5 = ? WHERE id = ?",
+                [(count, total, total / count, *stars, hostel_id)
+                 for hostel_id, (count, total, *stars) in ratings.items()])
+        if 'created_ts' in missing or 'updated_ts' in missing:
+            ts = now_us()
+            conn.execute("UPDATE hostels SET created_ts = ? WHERE created_ts = 0", (ts,))
+            conn.execute("UPDATE hostels SET updated_ts = ? WHERE updated_ts = 0", (ts,))
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM hostels").fetchone()[0]
+
+    def _conn(self) -> sqlite3.Connection:
+        """This thread's connection, opened on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode: write transactions are opened explicitly by _write.
+            conn = sqlite3.connect(self.path, uri=self.path.startswith('file:'), timeout=30,
+                                   isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA foreign_keys=ON')
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """
+        A write transaction on this thread's connection. It takes the write
+        lock up front, so a read-modify-write inside it cannot interleave
+        with another writer.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        """Close every pooled connection."""
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def subscribe(self, listener: Callable[[Optional[int]], None]) -> None:
+        """Call `listener(hostel_id)` after a hostel changes (None after clear)."""
+        self.listeners.append(listener)
+
+    def _changed(self, hostel_id: Optional[int]) -> None:
+        self.version += 1
+        for listener in self.listeners:
+            listener(hostel_id)
+
+    # Row conversion
+
+    @staticmethod
+    def _hostel(row: Tuple) -> Hostel:
+        return Hostel(id=row[0], name=row[1], address=row[2], price_min=row[3],
+                      price_max=row[4], lat=row[5], long=row[6], amenities=loads(row[7]),
+                      images=loads(row[8]), is_verified=bool(row[9]), created_ts=row[10],
+                      updated_ts=row[11], rating_count=row[12], rating_total=row[13],
+                      rating_histogram=tuple(row[14:19]))
+
+    def _select(self, where: str = '', params: Sequence[Any] = (), tail: str = '') -> List[Hostel]:
+        sql = f"SELECT {HOSTEL_COLUMNS} FROM hostels"
+        if where:
+            sql += f" WHERE {where}"
+        return [self._hostel(row) for row in self._conn().execute(f"{sql} {tail}", params)]
+
+    def _set_amenities(self, conn: sqlite3.Connection, hostel_id: int, amenities: Iterable[str]) -> None:
+        conn.execute("DELETE FROM hostel_amenities WHERE hostel_id = ?", (hostel_id,))
+        conn.executemany("INSERT INTO hostel_amenities (hostel_id, amenity) VALUES (?, ?)",
+                         [(hostel_id, amenity) for amenity in {a.lower() for a in amenities}])
+
+    # Writes
+
+    def _insert(self, conn: sqlite3.Connection, row: Dict[str, Any], ts: int) -> Hostel:
+        """Insert one hostel from `create` keyword arguments inside a write transaction."""
+        hostel = Hostel(id=0, created_ts=ts, **row)
+        cursor = conn.execute(
+            "INSERT INTO hostels (name, name_key, address, price_min, price_max, lat, long, "
+            "amenities, images, is_verified, search_text, created_ts, updated_ts) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (hostel.name, hostel.name.lower(), hostel.address, hostel.price_min, hostel.price_max, hostel.lat,
+             hostel.long, dumps(list(hostel.amenities)).decode(),
+             dumps(list(hostel.images)).decode(), hostel.is_verified,
+             search_text(hostel.name, hostel.address, hostel.amenities), ts, ts))
+        hostel.id = cursor.lastrowid
+        self._set_amenities(conn, hostel.id, hostel.amenities)
+        return hostel
+
+    def create(self, name: str, address: str, price_min: int, price_max: int,
+               lat: float, long: float, amenities: List[str], images: List[str],
+               is_verified: bool = False) -> Hostel:
+        """Create a new hostel."""
+        with self._write() as conn:
+            hostel = self._insert(conn, dict(
+                name=name, address=address, price_min=price_min, price_max=price_max,
+                lat=lat, long=long, amenities=amenities, images=images,
+                is_verified=is_verified), now_us())
+        self._changed(hostel.id)
+        return hostel
+
+    def create_many(self, rows: List[Dict[str, Any]]) -> List[Hostel]:
+        """Create hostels from validated `create` keyword dicts in one transaction."""
+        ts = now_us()
+        with self._write() as conn:
+            hostels = [self._insert(conn, row, ts) for row in rows]
+        for hostel in hostels:
+            self._changed(hostel.id)
+        return hostels
+
+    def update(self, hostel_id: int, **kwargs) -> Optional[Hostel]:
+        """Update a hostel."""
+        with self._write() as conn:
+            found = self._select("id = ?", (hostel_id,))
+            if not found:
+                return None
+            hostel = found[0]
+            hostel.update(**kwargs)
+            conn.execute(
+                "UPDATE hostels SET name = ?, name_key = ?, address = ?, price_min = ?, "
+                "price_max = ?, lat = ?, long = ?, amenities = ?, images = ?, is_verified = ?, "
+                "search_text = ?, updated_ts = ? WHERE id = ?",
+                (hostel.name, hostel.name.lower(), hostel.address, hostel.price_min, hostel.price_max, hostel.lat,
+                 hostel.long, dumps(list(hostel.amenities)).decode(),
+                 dumps(list(hostel.images)).decode(), hostel.is_verified,
+                 search_text(hostel.name, hostel.address, hostel.amenities),
+                 hostel.updated_ts, hostel_id))
+            if 'amenities' in kwargs:
+                self._set_amenities(conn, hostel_id, hostel.amenities)
+        self._changed(hostel_id)
+        return hostel
+
+    def delete(self, hostel_id: int) -> bool:
+        """Delete a hostel."""
+        with self._write() as conn:
+            deleted = conn.execute("DELETE FROM hostels WHERE id = ?", (hostel_id,)).rowcount
+        if deleted:
+            self._changed(hostel_id)
+        return bool(deleted)
+
+    def add_review(self, hostel_id: int, user_id: str, rating: float, comment: str) -> Optional[Review]:
+        """Add a review to a hostel and update its rating aggregates."""
+        bucket = f"rating_{star_bucket(rating) + 1}"
+        with self._write() as conn:
+            updated = conn.execute(
+                f"UPDATE hostels SET rating_count = rating_count + 1, "
+                f"rating_total = rating_total + ?, "
+                f"rating_average = (rating_total + ?) / (rating_count + 1), "
+                f"{bucket} = {bucket} + 1 WHERE id = ?", (rating, rating, hostel_id)).rowcount
+            if not updated:
+                return None
+            ts = now_us()
+            cursor = conn.execute(
+                "INSERT INTO reviews (hostel_id, user_id, rating, comment, created_ts) "
+                "VALUES (?, ?, ?, ?, ?)", (hostel_id, user_id, rating, comment, ts))
+        self._changed(hostel_id)
+        return Review(id=cursor.lastrowid, user_id=user_id, rating=rating, comment=comment,
+                      created_ts=ts)
+
+    def clear(self) -> None:
+        """Clear all hostels (useful for testing)."""
+        with self._write() as conn:
+            for table in ('reviews', 'hostel_amenities', 'hostels'):
+                conn.execute(f"DELETE FROM {table}")
+        self._changed(None)
+
+    # Reads
+
+    def get_all(self) -> List[Hostel]:
+        """Get all hostels."""
+        return self._select(tail="ORDER BY id")
+
+    def iter_all(self, batch_size: int = 500) -> Iterator[Hostel]:
+        """Iterate over all hostels in id order, fetching `batch_size` rows at a time."""
+        after = 0
+        while True:
+            batch = self._select("id > ?", (after, batch_size), "ORDER BY id LIMIT ?")
+            yield from batch
+            if len(batch) < batch_size:
+                return
+            after = batch[-1].id
+
+    def get_reviews(self, hostel_id: int, limit: int,
+                    after: Optional[int] = None) -> Optional[Tuple[List[Review], Optional[int]]]:
+        """Get one page of a hostel's reviews, newest first; see HostelStore.get_reviews."""
+        conn = self._conn()
+        if conn.execute("SELECT 1 FROM hostels WHERE id = ?", (hostel_id,)).fetchone() is None:
+            return None
+        rows = conn.execute(
+            f"SELECT {REVIEW_COLUMNS} FROM reviews WHERE hostel_id = ? AND id < ? "
+            f"ORDER BY id DESC LIMIT ?",
+            (hostel_id, after if after is not None else 2 ** 63 - 1, limit + 1)).fetchall()
+        page = [Review(id=row[0], user_id=row[1], rating=row[2], comment=row[3],
+                       created_ts=row[4]) for row in rows[:limit]]
+        return page, (page[-1].id if len(rows) > limit else None)
+
+    def get_by_id(self, hostel_id: int) -> Optional[Hostel]:
+        """Get a hostel by ID."""
+        found = self._select("id = ?", (hostel_id,))
+        return found[0] if found else None
+
+    def _filters(self, q: Optional[str] = None, price_min: Optional[int] = None,
+                 price_max: Optional[int] = None, amenities: Optional[List[str]] = None,
+                 amenity_mode: str = 'all', is_verified: Optional[bool] = None,
+                 bbox: Optional[Tuple[float, float, float, float]] = None,
+                 rating_min: Optional[float] = None) -> Tuple[List[str], List[Any]]:
+        """WHERE conditions and parameters with the same meaning as HostelStore._plan."""
+        conditions: List[str] = []
+        params: List[Any] = []
+        for token in set(tokenize(q or '')):
+            conditions.append("search_text LIKE ?")
+            params.append(f"% {token}%")
+        if price_max is not None:
+            conditions.append("price_min <= ?")
+            params.append(price_max)
+        if price_min is not None:
+            conditions.append("price_max >= ?")
+            params.append(price_min)
+        if amenities:
+            # Correlated EXISTS probes hit the (amenity, hostel_id) primary key
+            # per candidate, so an ordered, LIMITed page can stop early.
+            wanted = sorted({a.lower() for a in amenities})
+            probe = "EXISTS (SELECT 1 FROM hostel_amenities WHERE hostel_id = hostels.id AND amenity {})"
+            if amenity_mode == 'any':
+                conditions.append(probe.format(f"IN ({','.join('?' * len(wanted))})"))
+            else:
+                conditions += [probe.format("= ?")] * len(wanted)
+            params += wanted
+        if is_verified is not None:
+            conditions.append("is_verified = ?")
+            params.append(is_verified)
+        if bbox is not None:
+            min_long, min_lat, max_long, max_lat = bbox
+            conditions.append("lat BETWEEN ? AND ? AND long BETWEEN ? AND ?")
+            params += [min_lat, max_lat, min_long, max_long]
+        if rating_min is not None:
+            conditions.append("rating_average >= ? AND rating_count > 0")
+            params.append(rating_min)
+        return conditions, params
+
+    def query(self, limit: int, after: Optional[Tuple[Any, int]] = None,
+              sort: str = 'id', **filters) -> Tuple[List[Hostel], Optional[Tuple[Any, int]]]:
+        """
+        Get one page of hostels matching the given filters; see
+        HostelStore.query. The database orders by (sort key, id) and the
+        keyset condition uses a row-value comparison, so a page costs an
+        index range scan rather than an OFFSET.
+        """
+        descending = sort.startswith('-')
+        field = sort.lstrip('-')
+        column = SORT_COLUMNS[field]
+        conditions, params = self._filters(**filters)
+        if after is not None:
+            conditions.append(f"({column}, id) {'<' if descending else '>'} (?, ?)")
+            params += list(after)
+        direction = 'DESC' if descending else 'ASC'
+        page = self._select(' AND '.join(conditions), [*params, limit + 1],
+                            f"ORDER BY {column} {direction}, id {direction} LIMIT ?")
+        if len(page) <= limit:
+            return page, None
+        page = page[:limit]
+        _, sort_key = SORT_FIELDS[field]
+        return page, (sort_key(page[-1]), page[-1].id)
+
+    def explain(self, **filters) -> List[str]:
+        """The database's query plan for a filtered list query."""
+        conditions, params = self._filters(**filters)
+        sql = "SELECT id FROM hostels"
+        if conditions:
+            sql += " WHERE " + ' AND '.join(conditions)
+        return [row[-1] for row in self._conn().execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+    def nearby(self, lat: float, long: float, radius_m: float,
+               limit: int) -> List[Tuple[Hostel, float]]:
+        """Get the closest hostels within `radius_m`, with distances in meters."""
+        dlat = radius_m / METERS_PER_DEGREE_LAT
+        dlong = radius_m / (METERS_PER_DEGREE_LAT * max(cos(radians(lat)), 1e-6))
+        rows = self._conn().execute(
+            "SELECT id, lat, long FROM hostels WHERE lat BETWEEN ? AND ? AND long BETWEEN ? AND ?",
+            (lat - dlat, lat + dlat, long - dlong, long + dlong)).fetchall()
+        nearest = sorted((dist, hostel_id) for hostel_id, plat, plong in rows
+                         if (dist := haversine_m(lat, long, plat, plong)) <= radius_m)[:limit]
+        if not nearest:
+            return []
+        ids = [hostel_id for _, hostel_id in nearest]
+        by_id = {h.id: h for h in self._select(f"id IN ({','.join('?' * len(ids))})", ids)}
+        return [(by_id[hostel_id], dist) for dist, hostel_id in nearest]
+
+    def clusters(self, zoom: int, bbox: Tuple[float, float, float, float]) -> List[Cluster]:
+        """
+        Map clusters of the hostels in a bbox at a zoom level, like
+        HostelStore.clusters, but aggregated on each call from the hostels
+        in the cells the bbox touches (found with the location index).
+        """
+        zoom = min(zoom, MAX_CLUSTER_ZOOM)
+        window = cluster_window(zoom, *bbox)
+        min_long, min_lat, max_long, max_lat = window_bbox(zoom, *window)
+        rows = self._conn().execute(
+            "SELECT id, lat, long, price_min FROM hostels WHERE lat BETWEEN ? AND ? AND long BETWEEN ? AND ?",
+            (min_lat, max_lat, min_long, max_long)).fetchall()
+        return cluster_points(rows, zoom, window)
+
+    def similar(self, hostel_id: int, limit: int) -> Optional[List[Tuple[Hostel, float]]]:
+        """
+        The hostels most like one, like HostelStore.similar, but scored on
+        each call by a scan of every hostel's features.
+        """
+        target = self.get_by_id(hostel_id)
+        if target is None:
+            return None
+        origin = features(target.price_min, target.price_max, target.lat, target.long, target.amenities)
+        rows = self._conn().execute(
+            "SELECT id, price_min, price_max, lat, long, amenities FROM hostels WHERE id != ?", (hostel_id,))
+        nearest = heapq.nsmallest(limit, ((distance(origin, features(*row[1:5], loads(row[5]))), row[0])
+                                          for row in rows))
+        if not nearest:
+            return []
+        ids = [other_id for _, other_id in nearest]
+        by_id = {h.id: h for h in self._select(f"id IN ({','.join('?' * len(ids))})", ids)}
+        return [(by_id[other_id], similarity_score(dist)) for dist, other_id in nearest]
+
+    def stats(self, group_by: str,
+              bbox: Optional[Tuple[float, float, float, float]] = None) -> Dict[str, Any]:
+        """
+        Price, verification and amenity statistics by area or amenity, like
+        HostelStore.stats, from the hostels (in `bbox`) read on each call.
+        """
+        conditions, params = self._filters(bbox=bbox)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self._conn().execute(
+            f"SELECT price_min, price_max, is_verified, address, amenities FROM hostels{where}", params).fetchall()
+        groups: Dict[str, List[int]] = {}
+        for pos, row in enumerate(rows):
+            keys = [area_of(row[3])] if group_by == 'area' else {a.lower() for a in loads(row[4])}
+            for key in keys:
+                groups.setdefault(key, []).append(pos)
+        prices = {'price_min': np.array([row[0] for row in rows], np.int64),
+                  'price_max': np.array([row[1] for row in rows], np.int64)}
+        verified = np.array([bool(row[2]) for row in rows], np.bool_)
+        return summarize(group_by, prices, verified,
+                         [(key, np.array(members, np.int64)) for key, members in groups.items()])
+
+    def search(self, q: str, limit: int) -> List[Hostel]:
+        """
+        Get the hostels best matching a text query, best first. Candidates
+        matching every word come from SQL and are ranked with the same
+        weights as HostelStore.search.
+        """
+        conditions, params = self._filters(q=q)
+        if not conditions:
+            return []
+        candidates = self._select(' AND '.join(conditions), params)
+        index = TextIndex()
+        for hostel in candidates:
+            index.add(hostel.id, hostel.name, hostel.address, hostel.amenities)
+        by_id = {hostel.id: hostel for hostel in candidates}
+        return [by_id[hostel_id] for _, hostel_id in index.search(q, limit)]
@@ -0,0 +1,156 @@
+"""
+Market statistics of the catalog: price distributions, verification and
+amenity prevalence, by area or by amenity.
+
+A hostel's area is the part of its address before the city ("12 Main
+Road, Paldi, Ahmedabad" is in Paldi), compared case-insensitively and
+named in title case; an address without commas is an area of its own.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from columns import ColumnIndex
+
+PERCENTILES = (25, 50, 75, 90)
+HISTOGRAM_BINS = 10
+PRICE_FIELDS = ('price_min', 'price_max')
+
+
+def area_of(address: str) -> str:
+    """The area of an address (see above)."""
+    parts = [part for part in (' '.join(p.split()) for p in address.split(',')) if part]
+    if not parts:
+        return ''
+    return (parts[-2] if len(parts) > 1 else parts[0]).title()
+
+
+def histogram_edges(values: np.ndarray) -> np.ndarray:
+    """
+    HISTOGRAM_BINS + 1 edges of equal-width bins covering `values`, on round
+    numbers: widths of 1, 2 or 5 times a power of ten, from a multiple of
+    the width.
+    """
+    low, high = int(values.min()), int(values.max())
+    magnitude = 10 ** max(0, math.floor(math.log10(max(1, (high - low) / HISTOGRAM_BINS))))
+    while True:
+        for width in (magnitude, 2 * magnitude, 5 * magnitude):
+            start = low // width * width
+            if start + width * HISTOGRAM_BINS >= high:  # the last bin includes its right edge
+                return start + width * np.arange(HISTOGRAM_BINS + 1, dtype=np.int64)
+        magnitude *= 10
+
+
+def distribution(values: np.ndarray, edges: np.ndarray) -> Dict[str, Any]:
+    """
+    Min, max, mean, PERCENTILES and histogram of `values`, as np.percentile
+    and np.histogram would give them, from a single sort (several times
+    faster than np.percentile's partitioning for a handful of percentiles).
+    """
+    ordered = np.sort(values)
+    n = len(ordered)
+    # Linear interpolation between the closest ranks.
+    positions = np.array(PERCENTILES) / 100 * (n - 1)
+    below = positions.astype(np.int64)
+    above = np.minimum(below + 1, n - 1)
+    percentiles = ordered[below] + (ordered[above] - ordered[below]) * (positions - below)
+    # Bins are half-open except the last, which includes its right edge.
+    bounds = np.searchsorted(ordered, edges, 'left')
+    bounds[-1] = np.searchsorted(ordered, edges[-1], 'right')
+    return {"min": int(ordered[0]), "max": int(ordered[-1]), "mean": round(float(ordered.mean()), 1),
+            **{f"p{p}": round(float(v), 1) for p, v in zip(PERCENTILES, percentiles)},
+            "histogram": np.diff(bounds).tolist()}
+
+
+def summarize(group_by: str, prices: Dict[str, np.ndarray], verified: np.ndarray,
+              groups: Iterable[Tuple[str, np.ndarray]]) -> Dict[str, Any]:
+    """
+    Statistics of a set of hostels, overall and per group: count, share of
+    the set, verified count and ratio, and for price_min and price_max the
+    min, max, mean, percentiles and a histogram over bins shared by every
+    group (`edges`). `groups` are (name, positions in the arrays); groups
+    come out largest first.
+    """
+    total = len(verified)
+    if not total:
+        return {"group_by": group_by, "count": 0, "edges": {field: [] for field in PRICE_FIELDS},
+                "overall": None, "groups": []}
+    edges = {field: histogram_edges(values) for field, values in prices.items()}
+
+    def stats(rows: Optional[np.ndarray]) -> Dict[str, Any]:
+        select = (lambda values: values) if rows is None else (lambda values: values[rows])
+        count = total if rows is None else len(rows)
+        verified_count = int(select(verified).sum())
+        return {"count": count, "share": round(count / total, 4), "verified": verified_count,
+                "verified_ratio": round(verified_count / count, 4),
+                **{field: distribution(select(values), edges[field]) for field, values in prices.items()}}
+
+    rows = [{"name": name, **stats(members)} for name, members in groups if len(members)]
+    rows.sort(key=lambda group: (-group['count'], group['name']))
+    return {"group_by": group_by, "count": total,
+            "edges": {field: values.tolist() for field, values in edges.items()},
+            "overall": stats(None), "groups": rows}
+
+
+def group_positions(keys: np.ndarray) -> List[np.ndarray]:
+    """Positions of each distinct value of `keys`, in value order."""
+    order = np.argsort(keys, kind='stable')
+    return np.split(order, np.flatnonzero(np.diff(keys[order])) + 1) if len(keys) else []
+
+
+class StatsIndex(ColumnIndex):
+    """
+    Prices, location, verification, area and amenities of every hostel as
+    NumPy columns (see ColumnIndex), so that statistics of the whole
+    catalog or of a viewport are a few vectorized passes rather than a
+    walk over Hostel objects.
+    """
+
+    COLUMNS = {'price_min': np.int64, 'price_max': np.int64, 'lats': np.float64,
+               'longs': np.float64, 'verified': np.bool_, 'area': np.int64}
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.area_codes: Dict[str, int] = {}
+        self.area_names: List[str] = []
+
+    def add(self, item_id: int, price_min: int, price_max: int, lat: float, long: float,
+            address: str, amenities: Iterable[str], is_verified: bool) -> None:
+        """Index a hostel, replacing any previous row of the same id."""
+        row = self._row(item_id)
+        self.price_min[row] = price_min
+        self.price_max[row] = price_max
+        self.lats[row] = lat
+        self.longs[row] = long
+        self.verified[row] = is_verified
+        area = area_of(address)
+        code = self.area_codes.get(area)
+        if code is None:
+            code = self.area_codes[area] = len(self.area_names)
+            self.area_names.append(area)
+        self.area[row] = code
+        self._set_amenities(row, amenities)
+
+    def clear(self) -> None:
+        super().clear()
+        self.area_codes.clear()
+        self.area_names.clear()
+
+    def stats(self, group_by: str,
+              bbox: Optional[Tuple[float, float, float, float]] = None) -> Dict[str, Any]:
+        """Statistics of the hostels (in `bbox`, edges inclusive) by area or amenity; see summarize."""
+        n = self.size
+        mask = self.live[:n].copy()
+        if bbox is not None:
+            min_long, min_lat, max_long, max_lat = bbox
+            lats, longs = self.lats[:n], self.longs[:n]
+            mask &= (lats >= min_lat) & (lats <= max_lat) & (longs >= min_long) & (longs <= max_long)
+        rows = np.flatnonzero(mask)
+        if group_by == 'area':
+            codes = self.area[rows]
+            groups = [(self.area_names[codes[members[0]]], members) for members in group_positions(codes)]
+        else:
+            matrix = self.amenities[rows]
+            groups = [(amenity, np.flatnonzero(matrix[:, column]))
+                      for amenity, column in self.vocabulary.items()]
+        prices = {field: getattr(self, field)[rows] for field in PRICE_FIELDS}
+        return summarize(group_by, prices, self.verified[rows], groups)
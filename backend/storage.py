@@ -0,0 +1,339 @@
+"""Durable storage for HostelStore: append-only write-ahead log plus snapshots."""
+import glob
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Any, List, Optional, Tuple
+from models import Hostel, HostelStore, Review
+from serializers import dumps, loads
+
+# Write-ahead log frame: payload length, crc32 of payload, then the JSON payload.
+FRAME = struct.Struct('<II')
+# Snapshot header: magic, format version, first WAL segment to replay, hostel
+# count, next hostel id, next review id.
+SNAPSHOT_MAGIC = b'VSTAYSN1'
+SNAPSHOT_HEADER = struct.Struct('<8sIQQQQ')
+# Snapshot index entry per hostel: id, byte offset and length of its record.
+SNAPSHOT_ENTRY = struct.Struct('<QQI')
+
+def hostel_to_record(hostel: Hostel, reviews: List[Review]) -> List[Any]:
+    """Compact positional encoding of a hostel and its reviews."""
+    return [hostel.id, hostel.name, hostel.address, hostel.price_min, hostel.price_max,
+            hostel.lat, hostel.long, hostel.amenities, hostel.images, hostel.is_verified,
+            hostel.created_ts, hostel.updated_ts,
+            [review_to_record(review) for review in reviews]]
+
+def hostel_from_record(record: List[Any]) -> Tuple[Hostel, List[Review]]:
+    """Inverse of hostel_to_record; rating aggregates are recomputed from the reviews."""
+    (hostel_id, name, address, price_min, price_max, lat, long, amenities, images,
+     is_verified, created_ts, updated_ts, review_records) = record
+    hostel = Hostel(id=hostel_id, name=name, address=address, price_min=price_min,
+                    price_max=price_max, lat=lat, long=long, amenities=amenities,
+                    images=images, is_verified=is_verified,
+                    created_ts=created_ts, updated_ts=updated_ts)
+    reviews = [review_from_record(r) for r in review_records]
+    if reviews:
+        hostel = hostel.with_ratings(review.rating for review in reviews)
+    return hostel, reviews
+
+def review_to_record(review: Review) -> List[Any]:
+    return [review.id, review.user_id, review.rating, review.comment, review.created_ts]
+
+def review_from_record(record: List[Any]) -> Review:
+    review_id, user_id, rating, comment, created_ts = record
+    return Review(id=review_id, user_id=user_id, rating=rating, comment=comment,
+                  created_ts=created_ts)
+
+def encode_change(op: str, *args: Any) -> List[Any]:
+    """Log record for a HostelStore change: [op, *args] with models as records."""
+    if op == 'create':
+        return [op, hostel_to_record(args[0], [])]
+    if op == 'review':
+        return [op, args[0], review_to_record(args[1])]
+    return [op, *args]
+
+def decode_change(record: List[Any]) -> Tuple[str, List[Any]]:
+    """Inverse of encode_change: the op and the arguments for HostelStore.replay."""
+    op, *args = record
+    if op == 'create':
+        args = [hostel_from_record(args[0])[0]]
+    elif op == 'review':
+        args = [args[0], review_from_record(args[1])]
+    return op, args
+
+
+def load_snapshot(store: HostelStore, path: str) -> int:
+    """
+    Bulk-load a snapshot file into an empty store; returns the first WAL
+    segment the snapshot does not cover.
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, fmt, first_segment, count, next_id, next_review_id = \
+                SNAPSHOT_HEADER.unpack_from(mm, 0)
+            if magic != SNAPSHOT_MAGIC or fmt != 1:
+                raise ValueError(f"{path} is not a hostel snapshot")
+            table = memoryview(mm)[SNAPSHOT_HEADER.size:
+                                   SNAPSHOT_HEADER.size + count * SNAPSHOT_ENTRY.size]
+            try:
+                # Records are decoded straight out of the mapping as the
+                # store indexes them, without reading the file into memory.
+                store.restore((hostel_from_record(loads(mm[offset:offset + length]))
+                               for _, offset, length in SNAPSHOT_ENTRY.iter_unpack(table)),
+                              next_id, next_review_id)
+            finally:
+                table.release()
+    return first_segment
+
+
+def write_snapshot(path: str, items: List[Tuple[Hostel, List[Review]]], first_segment: int,
+                   next_id: int, next_review_id: int) -> None:
+    """Atomically replace the snapshot file at `path` with the given (hostel, reviews) pairs."""
+    records = [dumps(hostel_to_record(hostel, reviews)) for hostel, reviews in items]
+    offset = SNAPSHOT_HEADER.size + len(records) * SNAPSHOT_ENTRY.size
+    table = bytearray()
+    for (hostel, _), record in zip(items, records):
+        table += SNAPSHOT_ENTRY.pack(hostel.id, offset, len(record))
+        offset += len(record)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, 1, first_segment, len(records),
+                                     next_id, next_review_id))
+        f.write(table)
+        f.writelines(records)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    dir_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def save_snapshot(store: HostelStore, path: str) -> None:
+    """
+    Write a store's hostels and reviews to a snapshot file, for preloading
+    other stores with load_snapshot (see create_app's SNAPSHOT).
+    """
+    with store.lock.read():
+        hostels = list(store.hostels.values())
+        # Review lists are append-only: their current lengths pin them.
+        review_counts = {hostel_id: len(reviews) for hostel_id, reviews in store.reviews.items()}
+        next_id, next_review_id = store.next_id, store.next_review_id
+    items = [(hostel, store.reviews.get(hostel.id, [])[:review_counts.get(hostel.id, 0)])
+             for hostel in hostels]
+    write_snapshot(path, items, 1, next_id, next_review_id)
+
+
+class Storage:
+    """
+    Storage backend interface. The base class keeps nothing (in-memory only).
+
+    HostelStore calls `append` with each change while holding its
+    write lock, then `commit` with the returned sequence number after
+    releasing it, so concurrent writers can share one fsync.
+    """
+
+    def recover(self, store: HostelStore) -> None:
+        """Load persisted state into an empty store and attach to it."""
+
+    def append(self, op: str, *args: Any) -> int:
+        """Log a change (see HostelStore.replay); returns its sequence number."""
+        return 0
+
+    def commit(self, lsn: int) -> None:
+        """Block until the record with sequence number `lsn` is durable."""
+
+    def close(self) -> None:
+        """Flush and release resources."""
+
+
+class LogStorage(Storage):
+    """
+    File-backed storage in a directory of WAL segments and one snapshot.
+
+    Every change is appended to the current segment (`wal-<n>.log`) as a
+    length- and crc-framed JSON record. Commits use group commit: the first
+    writer to need durability fsyncs everything appended so far, and writers
+    arriving meanwhile wait for that fsync instead of issuing their own.
+
+    Every `snapshot_every` records the store is compacted: the log rotates to
+    a new segment, the hostels are written to `snapshot.bin` (a binary header
+    and offset table, then one JSON record per hostel, decoded out of an
+    mmap) and the
+    older segments are deleted. Recovery loads the snapshot, replays the
+    remaining segments and discards a torn record at the tail of the last
+    one; a bad record anywhere else raises ValueError.
+    """
+
+    def __init__(self, path: str, fsync: bool = True, snapshot_every: int = 100000):
+        self.path = path
+        self.fsync = fsync
+        self.snapshot_every = snapshot_every
+        self.store: Optional[HostelStore] = None
+        self._file = None
+        self._segment = 0
+        self._lsn = 0
+        self._since_snapshot = 0
+        self._io_lock = threading.Lock()
+        self._sync_cond = threading.Condition()
+        self._synced_lsn = 0
+        self._syncing = False
+        self._compacting = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.path, 'snapshot.bin')
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.path, f'wal-{segment:06d}.log')
+
+    def _segments(self) -> List[int]:
+        names = glob.glob(os.path.join(self.path, 'wal-*.log'))
+        return sorted(int(os.path.basename(name)[4:10]) for name in names)
+
+    # Recovery
+
+    def recover(self, store: HostelStore) -> None:
+        self.store = store
+        first_segment = self._load_snapshot(store)
+        segments = [s for s in self._segments() if s >= first_segment]
+        for segment in segments:
+            self._replay_segment(store, self._segment_path(segment), last=segment == segments[-1])
+        self._segment = max(segments[-1] if segments else 0, first_segment)
+        self._open_segment(self._segment)
+
+    def _load_snapshot(self, store: HostelStore) -> int:
+        """Restore the snapshot if present; returns the first segment to replay."""
+        if not os.path.exists(self.snapshot_path):
+            return 1
+        return load_snapshot(store, self.snapshot_path)
+
+    def _replay_segment(self, store: HostelStore, path: str, last: bool) -> None:
+        """
+        Re-apply a segment's records. A bad record can only be a torn write
+        at the tail of the last segment, which is truncated away; in an
+        earlier segment (closed and synced before the log rotated) it is
+        corruption, and dropping it would lose acknowledged writes.
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        pos = 0
+        while pos + FRAME.size <= len(data):
+            length, crc = FRAME.unpack_from(data, pos)
+            payload = data[pos + FRAME.size:pos + FRAME.size + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                break
+            op, args = decode_change(loads(payload))
+            store.replay(op, *args)
+            pos += FRAME.size + length
+        if pos < len(data):
+            if not last:
+                raise ValueError(f"{path}: corrupt log record at byte {pos}")
+            # Torn write from a crash: drop the incomplete tail.
+            with open(path, 'r+b') as f:
+                f.truncate(pos)
+
+    # Logging
+
+    def _open_segment(self, segment: int) -> None:
+        self._segment = segment
+        self._file = open(self._segment_path(segment), 'ab')
+
+    def append(self, op: str, *args: Any) -> int:
+        payload = dumps(encode_change(op, *args))
+        with self._io_lock:
+            self._file.write(FRAME.pack(len(payload), zlib.crc32(payload)))
+            self._file.write(payload)
+            self._lsn += 1
+            self._since_snapshot += 1
+            return self._lsn
+
+    def commit(self, lsn: int) -> None:
+        if not self.fsync:
+            with self._io_lock:
+                self._file.flush()
+        else:
+            with self._sync_cond:
+                while self._synced_lsn < lsn:
+                    if self._syncing:
+                        self._sync_cond.wait()
+                        continue
+                    # Become the leader: sync everything appended so far.
+                    self._syncing = True
+                    self._sync_cond.release()
+                    try:
+                        with self._io_lock:
+                            self._file.flush()
+                            target = self._lsn
+                            # A duplicate descriptor stays valid if compaction
+                            # rotates the segment while we sync.
+                            fd = os.dup(self._file.fileno())
+                        try:
+                            os.fsync(fd)
+                        finally:
+                            os.close(fd)
+                    finally:
+                        self._sync_cond.acquire()
+                        self._syncing = False
+                    self._synced_lsn = max(self._synced_lsn, target)
+                    self._sync_cond.notify_all()
+        if self._since_snapshot >= self.snapshot_every and self._compacting.acquire(blocking=False):
+            threading.Thread(target=self._compact_locked, daemon=True).start()
+
+    # Compaction
+
+    def compact(self) -> None:
+        """Write a snapshot of the attached store and drop the log it covers."""
+        with self._compacting:
+            self._compact()
+
+    def _compact_locked(self) -> None:
+        try:
+            self._compact()
+        finally:
+            self._compacting.release()
+
+    def _compact(self) -> None:
+        store = self.store
+        # Holding the read lock blocks writers, so the captured hostels match
+        # exactly the records logged before the rotation. Stored hostels are
+        # copy-on-write, so they can be encoded after the lock is released.
+        with store.lock.read():
+            with self._io_lock:
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                covered = self._segment
+                self._open_segment(covered + 1)
+                self._since_snapshot = 0
+            hostels = list(store.hostels.values())
+            # Review lists are append-only: their current lengths pin them.
+            review_counts = {hostel_id: len(reviews) for hostel_id, reviews in store.reviews.items()}
+            next_id, next_review_id = store.next_id, store.next_review_id
+        items = [(hostel, store.reviews.get(hostel.id, [])[:review_counts.get(hostel.id, 0)])
+                 for hostel in hostels]
+        self.write_snapshot(items, covered + 1, next_id, next_review_id)
+        for segment in self._segments():
+            if segment <= covered:
+                os.remove(self._segment_path(segment))
+
+    def write_snapshot(self, items: List[Tuple[Hostel, List[Review]]], first_segment: int,
+                       next_id: int, next_review_id: int) -> None:
+        """Atomically replace snapshot.bin with the given (hostel, reviews) pairs."""
+        write_snapshot(self.snapshot_path, items, first_segment, next_id, next_review_id)
+
+    def close(self) -> None:
+        with self._compacting:
+            with self._io_lock:
+                if self._file is not None:
+                    self._file.flush()
+                    if self.fsync:
+                        os.fsync(self._file.fileno())
+                    self._file.close()
+                    self._file = None
@@ -0,0 +1,160 @@
+"""Tests for admission control (bounded in-flight requests with a queue and 503 shedding)."""
+import asyncio
+import json
+import threading
+import time
+import pytest
+from admission import AdmissionControl
+from app import create_app
+
+class BlockingApp:
+    """A WSGI app whose requests wait until released, counting how many are inside."""
+    def __init__(self):
+        self.release = threading.Event()
+        self.entered = threading.Semaphore(0)
+
+    def __call__(self, environ, start_response):
+        self.entered.release()
+        self.release.wait(5)
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+def call(app, path='/api/hostels'):
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started['status'], started['headers'] = status, dict(headers)
+
+    result = app({'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}, start_response)
+    try:
+        body = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return started['status'], started['headers'], body
+
+def in_thread(app, results, path='/api/hostels'):
+    thread = threading.Thread(target=lambda: results.append(call(app, path)))
+    thread.start()
+    return thread
+
+class TestAdmissionControl:
+    def test_full_queue_is_shed_at_once(self):
+        """Test a request finding every slot and queue place taken gets 503 and Retry-After at once."""
+        inner, shed = BlockingApp(), []
+        app = AdmissionControl(inner, limit=1, queue=1, timeout=5, retry_after=2,
+                               exempt=['/api/health'], on_shed=shed.append)
+        results = []
+        first = in_thread(app, results)
+        inner.entered.acquire(timeout=5)
+        queued = in_thread(app, results)
+        while app.waiting < 1:
+            time.sleep(0.001)
+
+        start = time.perf_counter()
+        status, headers, body = call(app)
+        assert time.perf_counter() - start < 0.5
+        assert status.startswith('503') and headers['Retry-After'] == '2'
+        assert headers['Access-Control-Allow-Origin'] == '*' and json.loads(body)['error']
+        assert shed == ['queue_full']
+        # Exempt paths skip the queue.
+        health = in_thread(app, results, '/api/health')
+        inner.entered.acquire(timeout=5)
+
+        inner.release.set()
+        for thread in (first, queued, health):
+            thread.join(5)
+        assert [status for status, _, _ in results] == ['200 OK'] * 3
+        assert app.active == 0 and app.waiting == 0
+
+    def test_queued_requests_run_when_a_slot_frees_or_time_out(self):
+        """Test a queued request is let in when one finishes, and shed if none does in time."""
+        inner, shed = BlockingApp(), []
+        app = AdmissionControl(inner, limit=1, queue=4, timeout=0.05, on_shed=shed.append)
+        results = []
+        first = in_thread(app, results)
+        inner.entered.acquire(timeout=5)
+        assert call(app)[0].startswith('503') and shed == ['timeout']
+
+        app.timeout = 5
+        queued = in_thread(app, results)
+        while app.waiting < 1:
+            time.sleep(0.001)
+        inner.release.set()
+        first.join(5)
+        queued.join(5)
+        assert [status for status, _, _ in results] == ['200 OK', '200 OK']
+        assert app.active == 0
+
+    def test_slot_is_held_until_the_response_is_closed(self):
+        """Test a streamed body keeps its slot until the server closes it."""
+        def streaming(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return iter([b'a', b'b'])
+        app = AdmissionControl(streaming, limit=1, queue=0, timeout=0)
+        result = app({'PATH_INFO': '/api/hostels/export'}, lambda status, headers: None)
+        assert next(iter(result)) == b'a'
+        assert call(app)[0].startswith('503')
+        result.close()
+        assert app.active == 0 and call(app)[0] == '200 OK'
+
+    def test_coroutines_share_the_slots_and_queue(self):
+        """Test acquire_async waits for a slot a thread frees, and is shed when the queue is full or times out."""
+        inner = BlockingApp()
+        app = AdmissionControl(inner, limit=1, queue=1, timeout=5)
+        results = []
+        first = in_thread(app, results)
+        inner.entered.acquire(timeout=5)
+
+        async def scenario():
+            waiting = asyncio.ensure_future(app.acquire_async())
+            while app.waiting < 1:
+                await asyncio.sleep(0.001)
+            assert await app.acquire_async() == 'queue_full'
+            inner.release.set()
+            assert await waiting is None
+            app.timeout = 0.05
+            assert await app.acquire_async() == 'timeout'
+            app.release()
+
+        asyncio.run(scenario())
+        first.join(5)
+        assert results[0][0] == '200 OK'
+        assert app.active == 0 and app.waiting == 0
+
+def shed_count(text):
+    """Requests recorded under the 'shed' route in rendered metrics."""
+    for line in text.splitlines():
+        if line.startswith('veristay_http_requests_total{method="GET",route="shed",status="503"}'):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+class TestAppAdmission:
+    @pytest.fixture
+    def client(self):
+        app = create_app({'TESTING': True, 'SEED_DEMO_DATA': False, 'METRICS': True,
+                          'MAX_IN_FLIGHT': 1, 'MAX_QUEUED': 0, 'QUEUE_TIMEOUT_MS': 0})
+        with app.test_client() as client:
+            yield app, client
+
+    def test_open_streams_do_not_take_slots(self, client):
+        """Test subscribers to the change stream and the export never shed ordinary requests."""
+        app, client = client
+        stream = client.get('/api/hostels/changes/stream', buffered=False)
+        export = client.get('/api/hostels/export', buffered=False)
+        next(iter(stream.response))
+        assert app.extensions['veristay_admission'].active == 0
+        assert client.get('/api/hostels').status_code == 200
+        stream.close()
+        export.close()
+
+    def test_shed_requests_are_recorded_as_shed(self, client):
+        """Test 503s from admission control show up under the 'shed' route in /api/metrics."""
+        app, client = client
+        admission = app.extensions['veristay_admission']
+        before = client.get('/api/metrics').get_data(as_text=True)
+        admission.active = 1  # a request in progress
+        assert client.get('/api/hostels').status_code == 503
+        admission.active = 0
+        after = client.get('/api/metrics').get_data(as_text=True)
+        assert shed_count(after) == shed_count(before) + 1
@@ -1,7 +1,18 @@
 """Tests for the Hostel API."""
 import pytest
+import gzip
 import json
-from app import app, hostel_store
+import threading
+import time
+from datetime import datetime
+from app import backend, create_app, warm_up
+from cache import ResponseCache
+from models import HostelStore
+from serializers import dumps, encode_hostel
+from storage import LogStorage, save_snapshot
+
+app = create_app({'SEED_DEMO_DATA': False})
+hostel_store, response_cache = backend(app).hostel_store, backend(app).response_cache
 
 @pytest.fixture
 def client():
@@ -79,6 +90,59 @@ class TestCreateHostel:
         response = client.post('/api/hostels', json=data)
         assert response.status_code == 400
 
+    def test_create_hostel_reports_all_errors(self, client):
+        """Test every invalid field is named in one response."""
+        response = client.post('/api/hostels', json={"name": "", "price_min": "x", "lat": 200})
+        assert response.status_code == 400
+        assert set(response.get_json()['errors']) == {
+            'name', 'address', 'price_min', 'price_max', 'lat', 'long'}
+
+def bulk_row(i, **overrides):
+    row = {"name": f"Bulk Hostel {i}", "address": "Bopal, Ahmedabad", "price_min": 5000 + i,
+           "price_max": 9000, "lat": 23.0, "long": 72.5, "amenities": ["WiFi"], "images": []}
+    row.update(overrides)
+    return row
+
+class TestBulkImportExport:
+    def test_bulk_ndjson_reports_bad_rows(self, client):
+        """Test NDJSON rows are created in order and invalid rows are reported by number."""
+        lines = [json.dumps(bulk_row(1)), json.dumps(bulk_row(2, price_min=-1)), "",
+                 "{not json", json.dumps(bulk_row(3))]
+        response = client.post('/api/hostels/bulk', data="\n".join(lines) + "\n",
+                               content_type='application/x-ndjson')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['created'] == 2 and data['failed'] == 2
+        assert [e['row'] for e in data['errors']] == [2, 4]
+        assert [h.name for h in hostel_store.get_all()] == ["Bulk Hostel 1", "Bulk Hostel 3"]
+        assert [h.id for h in hostel_store.search("bulk", 5)] == [1, 2]
+
+    def test_bulk_json_array_in_batches(self, client, monkeypatch):
+        """Test a JSON array body larger than one batch is fully imported."""
+        monkeypatch.setattr('app.BULK_BATCH_SIZE', 7)
+        response = client.post('/api/hostels/bulk', json=[bulk_row(i) for i in range(20)])
+        assert response.get_json() == {"created": 20, "failed": 0, "errors": []}
+        page = client.get('/api/hostels?price_max=5004&sort=-price_min').get_json()
+        assert [h['name'] for h in page['hostels']] == [f"Bulk Hostel {i}" for i in range(4, -1, -1)]
+
+    def test_bulk_rejects_invalid_bodies(self, client):
+        """Test a non-array JSON body or an all-invalid import fails with 400."""
+        assert client.post('/api/hostels/bulk', json={"name": "x"}).status_code == 400
+        response = client.post('/api/hostels/bulk', data="{bad\n", content_type='application/x-ndjson')
+        assert response.status_code == 400
+        assert response.get_json()['failed'] == 1
+
+    def test_export_streams_catalog(self, client):
+        """Test export returns every hostel as one NDJSON line, in id order."""
+        client.post('/api/hostels/bulk', json=[bulk_row(i) for i in range(250)])
+        response = client.get('/api/hostels/export')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert response.is_streamed
+        lines = response.get_data().splitlines()
+        assert [json.loads(line)['id'] for line in lines] == list(range(1, 251))
+        assert lines[0] == encode_hostel(hostel_store.get_by_id(1))
+
 class TestGetHostels:
     def test_get_all_hostels(self, client):
         """Test getting all hostels."""
@@ -111,6 +175,544 @@ class TestGetHostels:
         response = client.get('/api/hostels/999')
         assert response.status_code == 404
 
+class TestListHostels:
+    @pytest.fixture
+    def catalog(self, client):
+        """Create a small catalog with varied prices and amenities."""
+        rows = [
+            ("Alpha House", "Navrangpura", 5000, 8000, ["WiFi", "AC"], True),
+            ("Beta Stay", "Vastrapur", 9000, 12000, ["WiFi"], False),
+            ("Gamma PG", "Navrangpura", 3000, 4000, ["Laundry"], True),
+            ("Delta Rooms", "Satellite", 15000, 20000, ["WiFi", "AC", "Gym"], True),
+            ("Epsilon Inn", "Bopal", 7000, 9500, ["AC"], False),
+        ]
+        for name, address, price_min, price_max, amenities, verified in rows:
+            client.post('/api/hostels', json={
+                "name": name, "address": address, "price_min": price_min,
+                "price_max": price_max, "lat": 23.0, "long": 72.5,
+                "amenities": amenities, "images": [], "is_verified": verified
+            })
+
+    def test_pagination_with_cursor(self, client, catalog):
+        """Test walking all pages with the returned cursor."""
+        seen = []
+        cursor = None
+        while True:
+            url = '/api/hostels?limit=2' + (f'&cursor={cursor}' if cursor else '')
+            data = client.get(url).get_json()
+            assert data['count'] <= 2
+            seen.extend(h['name'] for h in data['hostels'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        assert seen == ["Alpha House", "Beta Stay", "Gamma PG", "Delta Rooms", "Epsilon Inn"]
+
+    def test_cursor_stable_under_concurrent_changes(self, client, catalog):
+        """Test that deleting and creating hostels does not shift later pages."""
+        first = client.get('/api/hostels?limit=2&sort=price_min').get_json()
+        assert [h['name'] for h in first['hostels']] == ["Gamma PG", "Alpha House"]
+        client.delete(f"/api/hostels/{first['hostels'][0]['id']}")
+        client.post('/api/hostels', json={
+            "name": "Cheap Bunk", "address": "Paldi", "price_min": 1000, "price_max": 2000,
+            "lat": 23.0, "long": 72.5, "amenities": [], "images": []
+        })
+        second = client.get(f"/api/hostels?limit=2&sort=price_min&cursor={first['next_cursor']}").get_json()
+        assert [h['name'] for h in second['hostels']] == ["Epsilon Inn", "Beta Stay"]
+
+    def test_filters(self, client, catalog):
+        """Test combining text, price, amenity and verification filters."""
+        data = client.get('/api/hostels?q=navrang').get_json()
+        assert {h['name'] for h in data['hostels']} == {"Alpha House", "Gamma PG"}
+
+        data = client.get('/api/hostels?price_min=8500&price_max=10000').get_json()
+        assert {h['name'] for h in data['hostels']} == {"Beta Stay", "Epsilon Inn"}
+
+        data = client.get('/api/hostels?amenities=wifi,AC&is_verified=true').get_json()
+        assert {h['name'] for h in data['hostels']} == {"Alpha House", "Delta Rooms"}
+
+        data = client.get('/api/hostels?amenities=Gym,Laundry&amenity_mode=any').get_json()
+        assert {h['name'] for h in data['hostels']} == {"Gamma PG", "Delta Rooms"}
+
+    def test_filters_follow_updates(self, client, catalog):
+        """Test price and amenity indexes are refreshed on update and delete."""
+        hostels = client.get('/api/hostels').get_json()['hostels']
+        ids = {h['name']: h['id'] for h in hostels}
+        client.put(f"/api/hostels/{ids['Gamma PG']}", json={
+            "price_min": 25000, "price_max": 30000, "amenities": ["Gym"]})
+        client.delete(f"/api/hostels/{ids['Delta Rooms']}")
+        data = client.get('/api/hostels?price_max=4500').get_json()
+        assert data['count'] == 0
+        data = client.get('/api/hostels?amenities=gym&price_min=26000').get_json()
+        assert [h['name'] for h in data['hostels']] == ["Gamma PG"]
+
+    def test_sort_descending(self, client, catalog):
+        """Test sorting by a field in descending order."""
+        data = client.get('/api/hostels?sort=-price_max&limit=3').get_json()
+        assert [h['name'] for h in data['hostels']] == ["Delta Rooms", "Beta Stay", "Epsilon Inn"]
+        assert data['next_cursor'] is not None
+
+    @pytest.mark.parametrize("params", [
+        "limit=0", "limit=abc", "sort=popularity", "is_verified=maybe", "amenity_mode=some",
+        "price_min=10&price_max=5", "cursor=not-a-cursor",
+    ])
+    def test_invalid_query(self, client, params):
+        """Test invalid query parameters are rejected."""
+        response = client.get(f'/api/hostels?{params}')
+        assert response.status_code == 400
+
+    def test_cursor_from_other_sort_rejected(self, client, catalog):
+        """Test a cursor cannot be reused with a different sort order."""
+        cursor = client.get('/api/hostels?limit=1&sort=name').get_json()['next_cursor']
+        response = client.get(f'/api/hostels?limit=1&sort=price_min&cursor={cursor}')
+        assert response.status_code == 400
+
+class TestGeoQueries:
+    @pytest.fixture
+    def city(self, client):
+        """Create hostels at known points around Ahmedabad."""
+        points = [
+            ("Navrangpura", 23.0365, 72.5611),
+            ("Vastrapur", 23.0450, 72.5250),
+            ("Maninagar", 22.9962, 72.6030),
+            ("Gandhinagar", 23.2156, 72.6369),
+        ]
+        for name, lat, long in points:
+            client.post('/api/hostels', json={
+                "name": name, "address": f"{name}, Gujarat", "price_min": 1000,
+                "price_max": 2000, "lat": lat, "long": long, "amenities": [], "images": []
+            })
+
+    def test_nearby_sorted_by_distance(self, client, city):
+        """Test nearby returns the closest hostels first with distances."""
+        response = client.get('/api/hostels/nearby?lat=23.0225&long=72.5714&radius_m=10000')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [h['name'] for h in data['hostels']] == ["Navrangpura", "Maninagar", "Vastrapur"]
+        distances = [h['dist_meters'] for h in data['hostels']]
+        assert distances == sorted(distances)
+        assert 1500 < distances[0] < 2500
+
+    def test_nearby_limit(self, client, city):
+        """Test nearby honours the limit."""
+        data = client.get('/api/hostels/nearby?lat=23.0225&long=72.5714&radius_m=50000&limit=2').get_json()
+        assert data['count'] == 2
+
+    def test_nearby_follows_updates(self, client, city):
+        """Test moved and deleted hostels are reflected in nearby results."""
+        hostels = client.get('/api/hostels').get_json()['hostels']
+        ids = {h['name']: h['id'] for h in hostels}
+        client.put(f"/api/hostels/{ids['Gandhinagar']}", json={"lat": 23.0226, "long": 72.5715})
+        client.delete(f"/api/hostels/{ids['Navrangpura']}")
+        data = client.get('/api/hostels/nearby?lat=23.0225&long=72.5714&radius_m=3000').get_json()
+        assert [h['name'] for h in data['hostels']] == ["Gandhinagar"]
+
+    def test_bbox_filter(self, client, city):
+        """Test the bbox filter on the list endpoint."""
+        data = client.get('/api/hostels?bbox=72.50,23.00,72.58,23.10').get_json()
+        assert {h['name'] for h in data['hostels']} == {"Navrangpura", "Vastrapur"}
+
+    def test_clusters(self, client, city):
+        """Test clusters merge at low zoom, split at high zoom and follow updates."""
+        url = '/api/hostels/clusters?bbox=72.4,22.9,72.7,23.3&zoom='
+        hostels = {h.id: h for h in hostel_store.get_all()}
+        low = client.get(url + '5').get_json()
+        assert low['zoom'] == 5 and low['count'] == 1
+        assert low['clusters'][0]['count'] == len(hostels) and low['clusters'][0]['hostel_id'] is None
+        high = client.get(url + '18').get_json()['clusters']
+        assert len(high) >= 4 and sum(c['count'] for c in high) == len(hostels)
+        singles = [c for c in high if c['count'] == 1]
+        assert singles and all((c['lat'], c['long']) == (hostels[c['hostel_id']].lat, hostels[c['hostel_id']].long)
+                               for c in singles)
+
+        # A viewport panned within the same cells gets the same body.
+        etag = client.get(url + '5').headers['ETag']
+        assert client.get('/api/hostels/clusters?bbox=72.41,22.91,72.71,23.31&zoom=5').headers['ETag'] == etag
+        client.put(f'/api/hostels/{max(hostels)}', json={"price_min": 500})
+        assert client.get(url + '5').get_json()['clusters'][0]['price_min'] == 500
+
+    @pytest.mark.parametrize("url", [
+        '/api/hostels/clusters?bbox=72,23,73,24',
+        '/api/hostels/clusters?bbox=72,23,73,24&zoom=23',
+        '/api/hostels/clusters?bbox=73,23,72,24&zoom=5',
+        '/api/hostels/nearby?lat=23.0',
+        '/api/hostels/nearby?lat=123&long=72',
+        '/api/hostels/nearby?lat=23&long=72&radius_m=0',
+        '/api/hostels?bbox=1,2,3',
+        '/api/hostels?bbox=72.6,23.0,72.5,23.1',
+    ])
+    def test_invalid_geo_query(self, client, url):
+        """Test invalid geo parameters are rejected."""
+        assert client.get(url).status_code == 400
+
+class TestSearchHostels:
+    @pytest.fixture
+    def catalog(self, client):
+        """Create hostels with overlapping words in different fields."""
+        rows = [
+            ("Green Nest", "Satellite Road", ["WiFi"]),
+            ("Satellite Residency", "Bopal", ["Gym"]),
+            ("Campus House", "Near Green Park", ["Gym", "WiFi"]),
+        ]
+        for name, address, amenities in rows:
+            client.post('/api/hostels', json={
+                "name": name, "address": address, "price_min": 1000, "price_max": 2000,
+                "lat": 23.0, "long": 72.5, "amenities": amenities, "images": []
+            })
+
+    def test_ranked_by_field(self, client, catalog):
+        """Test name matches rank above address matches."""
+        data = client.get('/api/hostels/search?q=satellite').get_json()
+        assert [h['name'] for h in data['hostels']] == ["Satellite Residency", "Green Nest"]
+
+    def test_prefix_typeahead(self, client, catalog):
+        """Test partially typed words match."""
+        data = client.get('/api/hostels/search?q=gre').get_json()
+        assert [h['name'] for h in data['hostels']] == ["Green Nest", "Campus House"]
+
+    def test_all_terms_required(self, client, catalog):
+        """Test every query token must match."""
+        data = client.get('/api/hostels/search?q=green wifi').get_json()
+        assert [h['name'] for h in data['hostels']] == ["Green Nest", "Campus House"]
+        data = client.get('/api/hostels/search?q=gym green').get_json()
+        assert [h['name'] for h in data['hostels']] == ["Campus House"]
+
+    def test_index_follows_updates(self, client, catalog):
+        """Test renamed and deleted hostels are reindexed."""
+        hostels = client.get('/api/hostels').get_json()['hostels']
+        ids = {h['name']: h['id'] for h in hostels}
+        client.put(f"/api/hostels/{ids['Green Nest']}", json={"name": "Blue Nest"})
+        client.delete(f"/api/hostels/{ids['Campus House']}")
+        assert client.get('/api/hostels/search?q=green').get_json()['count'] == 0
+        data = client.get('/api/hostels/search?q=blue').get_json()
+        assert [h['name'] for h in data['hostels']] == ["Blue Nest"]
+
+    def test_missing_query(self, client):
+        """Test q is required."""
+        assert client.get('/api/hostels/search?q=%20').status_code == 400
+
+class TestSimilarHostels:
+    def test_similar_ranked_by_price_location_and_amenities(self, client):
+        """Test the closest match in price, place and amenities comes first, with scores."""
+        def create(name, price_min, lat, amenities):
+            return client.post('/api/hostels', json={
+                "name": name, "address": "Koramangala", "price_min": price_min, "price_max": price_min + 2000,
+                "lat": lat, "long": 77.6, "amenities": amenities, "images": []}).get_json()['hostel']['id']
+        base = create("Base", 6000, 12.93, ["WiFi", "AC"])
+        twin = create("Twin", 6000, 12.931, ["wifi", "AC"])
+        pricier = create("Pricier", 12000, 12.93, ["WiFi", "AC"])
+        create("Far", 6000, 13.5, ["Gym"])
+
+        response = client.get(f'/api/hostels/{base}/similar?limit=2&fields=name')
+        assert response.status_code == 200
+        data = response.get_json()
+        assert [(h['id'], h['name']) for h in data['hostels']] == [(twin, "Twin"), (pricier, "Pricier")]
+        assert data['count'] == 2 and 1 > data['hostels'][0]['similarity'] > data['hostels'][1]['similarity'] > 0
+        assert set(client.get(f'/api/hostels/{base}/similar').get_json()['hostels'][0]) == \
+               set(client.get(f'/api/hostels/{twin}').get_json()['hostel']) | {'similarity'}
+
+        client.put(f'/api/hostels/{twin}', json={"price_min": 30000, "price_max": 40000})
+        assert client.get(f'/api/hostels/{base}/similar?limit=1').get_json()['hostels'][0]['id'] == pricier
+        client.delete(f'/api/hostels/{pricier}')
+        assert pricier not in [h['id'] for h in client.get(f'/api/hostels/{base}/similar').get_json()['hostels']]
+
+    @pytest.mark.parametrize("url,status", [
+        ('/api/hostels/999/similar', 404),
+        ('/api/hostels/abc/similar', 400),
+        ('/api/hostels/1/similar?limit=0', 400),
+        ('/api/hostels/1/similar?fields=owner', 400),
+    ])
+    def test_invalid_similar_query(self, client, sample_hostel, url, status):
+        """Test unknown hostels and bad parameters."""
+        assert client.get(url.replace('/1/', f"/{sample_hostel['id']}/")).status_code == status
+
+class TestStats:
+    def test_stats_by_area_and_amenity(self, client):
+        """Test group statistics, the bbox filter and recomputation after a change."""
+        for name, area, price, lat, amenities, verified in [
+                ("A", "Paldi", 4000, 12.90, ["WiFi"], True), ("B", "paldi", 6000, 12.91, ["WiFi", "AC"], False),
+                ("C", "Bopal", 9000, 12.92, ["AC"], True)]:
+            client.post('/api/hostels', json={
+                "name": name, "address": f"1 Main Road, {area}, Bengaluru", "price_min": price,
+                "price_max": price + 1000, "lat": lat, "long": 77.6, "amenities": amenities,
+                "images": [], "is_verified": verified})
+        bbox = 'bbox=77.5,12.8,77.7,13.0'
+        data = client.get(f'/api/hostels/stats?{bbox}').get_json()
+        assert data['group_by'] == 'area' and data['count'] == 3
+        paldi, bopal = data['groups']
+        assert (paldi['name'], paldi['count'], paldi['verified'], paldi['verified_ratio']) == ("Paldi", 2, 1, 0.5)
+        assert paldi['price_min']['min'] == 4000 and paldi['price_min']['p50'] == 5000.0
+        assert (bopal['name'], bopal['share']) == ("Bopal", round(1 / 3, 4))
+        assert data['edges']['price_min'][0] <= 4000 and sum(data['overall']['price_min']['histogram']) == 3
+
+        by_amenity = client.get(f'/api/hostels/stats?group_by=amenity&{bbox}').get_json()
+        assert [(g['name'], g['count']) for g in by_amenity['groups']] == [("ac", 2), ("wifi", 2)]
+
+        response = client.get(f'/api/hostels/stats?{bbox}')
+        assert client.get(f'/api/hostels/stats?{bbox}',
+                          headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+        client.delete(f"/api/hostels/{hostel_store.query(limit=1, sort='-id')[0][0].id}")
+        assert client.get(f'/api/hostels/stats?{bbox}').get_json()['count'] == 2
+
+    @pytest.mark.parametrize("url", ['/api/hostels/stats?group_by=owner', '/api/hostels/stats?bbox=1,2,3'])
+    def test_invalid_stats_query(self, client, url):
+        """Test unknown groupings and malformed viewports."""
+        assert client.get(url).status_code == 400
+
+class TestResponseCache:
+    def test_detail_etag_and_304(self, client, sample_hostel):
+        """Test conditional GET of a hostel returns 304 while unchanged."""
+        url = f"/api/hostels/{sample_hostel['id']}"
+        response = client.get(url)
+        etag = response.headers['ETag']
+        assert etag
+        cached = client.get(url, headers={'If-None-Match': etag})
+        assert cached.status_code == 304
+        assert cached.data == b''
+
+        client.put(url, json={"name": "Renamed"})
+        changed = client.get(url, headers={'If-None-Match': etag})
+        assert changed.status_code == 200
+        assert changed.get_json()['hostel']['name'] == "Renamed"
+        assert changed.headers['ETag'] != etag
+
+    def test_list_invalidated_by_changes(self, client, sample_hostel):
+        """Test cached list pages are dropped on create, review and delete."""
+        etag = client.get('/api/hostels').headers['ETag']
+        assert client.get('/api/hostels', headers={'If-None-Match': etag}).status_code == 304
+
+        hostel_store.add_review(sample_hostel['id'], "user-1", 4.5, "Clean rooms")
+        response = client.get('/api/hostels', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert response.get_json()['hostels'][0]['rating']['count'] == 1
+
+        client.delete(f"/api/hostels/{sample_hostel['id']}")
+        assert client.get('/api/hostels').get_json()['count'] == 0
+
+    def test_cached_body_matches_uncached(self, client, sample_hostel):
+        """Test cached and freshly encoded responses are identical."""
+        cached = client.get('/api/hostels?limit=5').data
+        response_cache.enabled = False
+        try:
+            response_cache.invalidate()
+            fresh = client.get('/api/hostels?limit=5').data
+        finally:
+            response_cache.enabled = True
+        assert cached == fresh
+        assert len(response_cache.hostels) == 0
+
+    @pytest.mark.parametrize("coalesce", [True, False])
+    def test_concurrent_misses_share_one_build(self, coalesce):
+        """Test identical concurrent misses wait for one build (or each build, with coalescing off)."""
+        builds, waiting, started, release = [], [], threading.Event(), threading.Event()
+        cache = ResponseCache(HostelStore(), coalesce=coalesce, observe_coalesced=waiting.append)
+
+        def build():
+            builds.append(1)
+            started.set()
+            release.wait(5)
+            return b'{"hostels":[]}'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.body(('list',), build)))
+                   for _ in range(8)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while len(builds) + len(waiting) < 8:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        assert len(results) == 8 and len({r.etag for r in results}) == 1
+        assert len(builds) == (1 if coalesce else 8) and len(waiting) == 8 - len(builds)
+        assert cache.flights == {}
+
+    def test_failed_build_fails_its_waiters_and_is_not_reused(self):
+        """Test requests waiting for a build that raised get its error, and the next one builds again."""
+        started, joined, release, errors = threading.Event(), threading.Event(), threading.Event(), []
+        cache = ResponseCache(HostelStore(), coalesce=True, observe_coalesced=lambda kind: joined.set())
+
+        def failing():
+            started.set()
+            release.wait(5)
+            raise ValueError("boom")
+
+        def request(build):
+            try:
+                cache.body(('list',), build)
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=request, args=(failing,))
+        leader.start()
+        started.wait(5)
+        waiter = threading.Thread(target=request, args=(lambda: b'unused',))
+        waiter.start()
+        joined.wait(5)
+        release.set()
+        leader.join(5)
+        waiter.join(5)
+        assert len(errors) == 2
+        assert cache.body(('list',), lambda: b'[]').body == b'[]'
+
+class TestFieldProjection:
+    def test_list_fields(self, client, sample_hostel):
+        """Test a list projection has only the requested fields, id first, in API order."""
+        response = client.get('/api/hostels?fields=price_min, name,lat')
+        assert response.status_code == 200
+        hostel = response.get_json()['hostels'][0]
+        assert list(hostel) == ['id', 'name', 'price_min', 'lat']
+        assert hostel == {key: sample_hostel[key] for key in hostel}
+        # Every field is the same as no projection.
+        every = ','.join(sample_hostel)
+        assert client.get(f'/api/hostels?fields={every}').data == client.get('/api/hostels').data
+
+    def test_detail_fields(self, client, sample_hostel):
+        """Test a detail projection, its ETag and its invalidation."""
+        url = f"/api/hostels/{sample_hostel['id']}?fields=rating"
+        response = client.get(url)
+        assert response.get_json() == {'hostel': {'id': sample_hostel['id'], 'rating': sample_hostel['rating']}}
+        assert client.get(url, headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+        hostel_store.add_review(sample_hostel['id'], "user-1", 5.0, "Great")
+        assert client.get(url).get_json()['hostel']['rating']['count'] == 1
+
+    @pytest.mark.parametrize("url", ['/api/hostels?fields=name,owner', '/api/hostels/1?fields=nope'])
+    def test_unknown_fields(self, client, sample_hostel, url):
+        """Test unknown field names are rejected."""
+        response = client.get(url)
+        assert response.status_code == 400
+        assert 'Unknown fields' in response.get_json()['error']
+
+class TestCompression:
+    @pytest.fixture
+    def catalog(self, client):
+        for i in range(30):
+            hostel_store.create(name=f"Hostel {i}", address="Navrangpura, Ahmedabad", price_min=1000,
+                                price_max=2000, lat=23.0, long=72.5, amenities=["WiFi", "AC"], images=[])
+
+    def test_gzip_negotiated(self, client, catalog):
+        """Test large bodies are gzipped for clients accepting it, with their own ETag."""
+        plain = client.get('/api/hostels')
+        assert 'Content-Encoding' not in plain.headers
+        assert plain.headers['Vary'] == 'Accept-Encoding'
+        compressed = client.get('/api/hostels', headers={'Accept-Encoding': 'gzip, deflate'})
+        assert compressed.headers['Content-Encoding'] == 'gzip'
+        assert len(compressed.data) < len(plain.data) // 3
+        assert gzip.decompress(compressed.data) == plain.data
+        etag = compressed.headers['ETag']
+        assert etag == plain.headers['ETag'][:-1] + '-gzip"'
+        assert client.get('/api/hostels', headers={'Accept-Encoding': 'gzip',
+                                                    'If-None-Match': etag}).status_code == 304
+        # The plain ETag does not match the compressed representation.
+        assert client.get('/api/hostels', headers={'Accept-Encoding': 'gzip',
+                                                    'If-None-Match': plain.headers['ETag']}).status_code == 200
+
+    @pytest.mark.parametrize("accept", ['gzip;q=0', 'identity', 'compress, deflate'])
+    def test_not_compressed_unless_accepted(self, client, catalog, accept):
+        """Test codings the client refuses or does not name are not used."""
+        response = client.get('/api/hostels', headers={'Accept-Encoding': accept})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_small_bodies_not_compressed(self, client, sample_hostel):
+        """Test bodies under the size threshold are sent as they are."""
+        response = client.get(f"/api/hostels/{sample_hostel['id']}", headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_json()['hostel']['id'] == sample_hostel['id']
+
+class TestSerialization:
+    def test_to_dict_layout(self, client, sample_hostel):
+        """Test the serialized hostel keeps the original API field layout."""
+        hostel_store.add_review(sample_hostel['id'], "user-1", 4.0, "Nice")
+        hostel = hostel_store.get_by_id(sample_hostel['id'])
+        data = hostel.to_dict()
+        assert list(data) == ['id', 'name', 'address', 'price_min', 'price_max', 'lat', 'long',
+                              'amenities', 'images', 'is_verified', 'rating',
+                              'created_at', 'updated_at']
+        assert data['amenities'] == ["WiFi"]
+        assert data['images'] == ["http://example.com/image.jpg"]
+        assert data['rating'] == {'count': 1, 'average': 4.0, 'histogram': [0, 0, 0, 1, 0]}
+        assert encode_hostel(hostel) == dumps(data)  # same fields, same order
+
+    def test_timestamps_render_as_utc_iso(self, client, sample_hostel):
+        """Test epoch timestamps render like datetime.utcnow().isoformat()."""
+        created = datetime.fromisoformat(sample_hostel['created_at'])
+        assert abs((datetime.utcnow() - created).total_seconds()) < 60
+        assert sample_hostel['updated_at'] == sample_hostel['created_at']
+
+    def test_amenity_lists_are_shared(self, client):
+        """Test hostels with the same amenities share one interned tuple."""
+        first = hostel_store.create(name="A", address="X", price_min=1, price_max=2, lat=0.0,
+                                    long=0.0, amenities=["WiFi", "AC"], images=[])
+        second = hostel_store.create(name="B", address="Y", price_min=1, price_max=2, lat=0.0,
+                                     long=0.0, amenities=["WiFi", "AC"], images=[])
+        assert first.amenities is second.amenities
+
+class TestReviews:
+    def test_add_review_updates_aggregates(self, client, sample_hostel):
+        """Test posting reviews returns the review and the running rating summary."""
+        url = f"/api/hostels/{sample_hostel['id']}/reviews"
+        response = client.post(url, json={"user_id": "user-1", "rating": 5, "comment": "Great"})
+        assert response.status_code == 201
+        assert response.get_json()['review']['rating'] == 5
+        data = client.post(url, json={"user_id": "user-2", "rating": 2.5}).get_json()
+        assert data['rating'] == {'count': 2, 'average': 3.75, 'histogram': [0, 1, 0, 0, 1]}
+        detail = client.get(f"/api/hostels/{sample_hostel['id']}").get_json()['hostel']
+        assert detail['rating'] == data['rating'] and 'reviews' not in detail
+
+    @pytest.mark.parametrize("body", [
+        {"rating": 4}, {"user_id": "u", "rating": 0}, {"user_id": "u", "rating": 6},
+        {"user_id": "u", "rating": "5"}, {"user_id": "u", "rating": True},
+        {"user_id": "u", "rating": 4, "comment": "x" * 2001},
+    ])
+    def test_add_review_invalid(self, client, sample_hostel, body):
+        """Test malformed reviews are rejected."""
+        response = client.post(f"/api/hostels/{sample_hostel['id']}/reviews", json=body)
+        assert response.status_code == 400
+
+    def test_reviews_for_missing_hostel(self, client):
+        """Test both review endpoints return 404 for an unknown hostel."""
+        assert client.get('/api/hostels/999/reviews').status_code == 404
+        response = client.post('/api/hostels/999/reviews', json={"user_id": "u", "rating": 4})
+        assert response.status_code == 404
+
+    def test_review_pages_newest_first(self, client, sample_hostel):
+        """Test walking review pages with the returned cursor."""
+        url = f"/api/hostels/{sample_hostel['id']}/reviews"
+        for i in range(5):
+            client.post(url, json={"user_id": f"user-{i}", "rating": 3})
+        seen = []
+        cursor = None
+        while True:
+            data = client.get(url + '?limit=2' + (f'&cursor={cursor}' if cursor else '')).get_json()
+            seen.extend(r['user_id'] for r in data['reviews'])
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        assert seen == [f"user-{i}" for i in reversed(range(5))]
+        assert client.get(url + '?limit=0').status_code == 400
+        assert client.get(url + '?cursor=not-a-cursor').status_code == 400
+
+    def test_review_page_cache_invalidated(self, client, sample_hostel):
+        """Test a cached review page reflects a newly added review."""
+        url = f"/api/hostels/{sample_hostel['id']}/reviews"
+        assert client.get(url).get_json()['count'] == 0
+        client.post(url, json={"user_id": "user-1", "rating": 4})
+        assert client.get(url).get_json()['count'] == 1
+
+    def test_rating_filter_and_sort(self, client):
+        """Test rating_min filters out unrated hostels and sort=-rating orders by average."""
+        for name, ratings in [("Low", [2]), ("High", [5, 4]), ("Unrated", [])]:
+            hostel = hostel_store.create(name=name, address="X", price_min=1, price_max=2,
+                                         lat=23.0, long=72.5, amenities=[], images=[])
+            for rating in ratings:
+                hostel_store.add_review(hostel.id, "user", rating, "")
+        data = client.get('/api/hostels?rating_min=3').get_json()
+        assert [h['name'] for h in data['hostels']] == ["High"]
+        data = client.get('/api/hostels?sort=-rating').get_json()
+        assert [h['name'] for h in data['hostels']] == ["High", "Low", "Unrated"]
+        assert client.get('/api/hostels?rating_min=9').status_code == 400
+
 class TestUpdateHostel:
     def test_update_hostel(self, client, sample_hostel):
         """Test updating hostel."""
@@ -126,6 +728,20 @@ class TestUpdateHostel:
         response = client.put(f'/api/hostels/{hostel_id}', json={"price_min": -100})
         assert response.status_code == 400
 
+    def test_update_cannot_invert_price_range(self, client, sample_hostel):
+        """Test a single price bound is checked against the stored one and indexes stay intact."""
+        hostel_id = sample_hostel['id']
+        response = client.put(f'/api/hostels/{hostel_id}', json={"price_min": 9000})
+        assert response.status_code == 400
+        response = client.put(f'/api/hostels/{hostel_id}', json={"price_max": 4000})
+        assert response.status_code == 400
+        hostel = client.get(f'/api/hostels/{hostel_id}').get_json()['hostel']
+        assert (hostel['price_min'], hostel['price_max']) == (5000, 8000)
+        data = client.get('/api/hostels?price_min=7000&price_max=7500').get_json()
+        assert [h['id'] for h in data['hostels']] == [hostel_id]
+        response = client.put(f'/api/hostels/{hostel_id}', json={"price_min": 9000, "price_max": 9500})
+        assert response.status_code == 200
+
 class TestDeleteHostel:
     def test_delete_hostel(self, client, sample_hostel):
         """Test deleting hostel."""
@@ -136,3 +752,66 @@ class TestDeleteHostel:
         # Verify it's gone
         get_response = client.get(f'/api/hostels/{hostel_id}')
         assert get_response.status_code == 404
+
+class TestAppFactory:
+    def test_store_is_built_on_first_use(self):
+        """Test creating an app builds nothing until a request needs the store."""
+        built = []
+
+        def make_store():
+            built.append(HostelStore())
+            return built[-1]
+
+        lazy_app = create_app({'HOSTEL_STORE': make_store, 'METRICS': False})
+        assert built == [] and lazy_app.extensions['veristay'].backend is None
+        client = lazy_app.test_client()
+        assert client.get('/api/health').status_code == 200
+        assert built == []
+        data = client.get('/api/hostels').get_json()
+        assert len(built) == 1 and backend(lazy_app).hostel_store is built[0]
+        # Seeded on first use, once.
+        assert data['count'] == 2
+        client.get('/api/hostels/search?q=wifi')
+        assert len(built) == 1
+
+    def test_apps_have_their_own_stores(self):
+        """Test two apps given different stores do not share hostels or cached bodies."""
+        first = create_app({'HOSTEL_STORE': HostelStore(), 'SEED_DEMO_DATA': False, 'METRICS': False})
+        second = create_app({'HOSTEL_STORE': HostelStore(), 'SEED_DEMO_DATA': False, 'METRICS': False})
+        first.test_client().post('/api/hostels', json={
+            "name": "Only Here", "address": "Paldi", "price_min": 1000, "price_max": 2000,
+            "lat": 23.0, "long": 72.5, "amenities": [], "images": []})
+        assert first.test_client().get('/api/hostels').get_json()['count'] == 1
+        assert second.test_client().get('/api/hostels').get_json()['count'] == 0
+
+    def test_warm_up_builds_the_backend_and_first_page(self):
+        """Test warm_up (or WARM_UP) builds the store and caches the first catalog page."""
+        warm_app = create_app({'HOSTEL_STORE': HostelStore, 'WARM_UP': True, 'METRICS': False})
+        state = warm_app.extensions['veristay'].backend
+        assert state is not None and len(state.hostel_store) == 2
+        cached = warm_up(warm_app).hostels_body({})
+        response = warm_app.test_client().get('/api/hostels')
+        assert response.get_data() == cached.body and response.get_etag()[0] == cached.etag
+
+    def test_snapshot_preload(self, tmp_path):
+        """Test SNAPSHOT preloads an empty in-memory store instead of seeding it."""
+        source = HostelStore()
+        hostel = source.create(name="From Snapshot", address="Paldi", price_min=1000, price_max=2000,
+                               lat=23.0, long=72.5, amenities=["WiFi"], images=[])
+        source.add_review(hostel.id, "user-1", 4.0, "Fine")
+        save_snapshot(source, str(tmp_path / 'catalog.bin'))
+
+        preloaded = create_app({'HOSTEL_STORE': HostelStore, 'SNAPSHOT': str(tmp_path / 'catalog.bin'),
+                                'METRICS': False})
+        client = preloaded.test_client()
+        data = client.get('/api/hostels').get_json()
+        assert [h['name'] for h in data['hostels']] == ["From Snapshot"]
+        assert client.get(f"/api/hostels/{hostel.id}/reviews").get_json()['count'] == 1
+
+    def test_snapshot_preload_needs_an_in_memory_store(self, tmp_path):
+        """Test SNAPSHOT is refused for a store with durable storage of its own."""
+        save_snapshot(HostelStore(), str(tmp_path / 'catalog.bin'))
+        durable = create_app({'HOSTEL_STORE': lambda: HostelStore(LogStorage(str(tmp_path / 'data'))),
+                              'SNAPSHOT': str(tmp_path / 'catalog.bin'), 'METRICS': False})
+        with pytest.raises(ValueError):
+            backend(durable)
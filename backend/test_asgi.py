@@ -0,0 +1,234 @@
+"""Tests for the ASGI serving mode."""
+import asyncio
+import json
+import threading
+import time
+import pytest
+from app import app, backend
+from asgi import application
+
+# asgi.py serves the module-level app.
+hostel_store = backend(app).hostel_store
+
+async def request(method, path, query=b'', body=b'', headers=()):
+    """One request through the ASGI app: (status, headers, body chunks)."""
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query,
+             'headers': [(k.encode(), v.encode()) for k, v in headers], 'http_version': '1.1',
+             'scheme': 'http', 'server': ('testserver', 80), 'client': ('127.0.0.1', 1234),
+             'root_path': ''}
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    start = sent[0]
+    chunks = [m['body'] for m in sent[1:] if m['body'] or not m.get('more_body')]
+    return start['status'], dict(start['headers']), chunks
+
+def call(method, path, query=b'', body=b'', headers=()):
+    """Run one request through the ASGI app; return (status, headers, body chunks)."""
+    return asyncio.run(request(method, path, query, body, headers))
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+    hostel_store.clear()
+
+@pytest.fixture
+def catalog(client):
+    for i in range(150):
+        hostel_store.create(name=f"Hostel {i}", address="Navrangpura", price_min=1000 + i,
+                            price_max=2000 + i, lat=23.0 + i / 1000, long=72.5,
+                            amenities=["WiFi"], images=[])
+
+class TestAsgi:
+    @pytest.mark.parametrize("path,query", [
+        ('/api/hostels', b'limit=20&sort=-price_min'),
+        ('/api/hostels/nearby', b'lat=23.05&long=72.5&limit=5'),
+        ('/api/hostels/search', b'q=hostel&limit=3'),
+        ('/api/hostels/clusters', b'bbox=72.4,22.9,72.7,23.3&zoom=13'),
+        ('/api/hostels/7', b''),
+        ('/api/hostels/7/reviews', b'limit=2'),
+        ('/api/hostels/7/similar', b'limit=5&fields=name,price_min'),
+        ('/api/hostels/stats', b'group_by=amenity'),
+        ('/api/hostels', b'limit=0'),
+        ('/api/hostels/999', b''),
+    ])
+    def test_reads_match_flask(self, client, catalog, path, query):
+        """Test natively served reads return the same status, body and ETag as Flask."""
+        status, headers, chunks = call('GET', path, query)
+        expected = client.get(path, query_string=query.decode())
+        assert status == expected.status_code
+        assert json.loads(b''.join(chunks)) == expected.get_json()
+        assert headers.get(b'etag', b'').decode() == expected.headers.get('ETag', '')
+        assert headers[b'access-control-allow-origin'] == b'*'
+
+    def test_etag_revalidation(self, client, catalog):
+        """Test a matching If-None-Match gets 304 with no body."""
+        _, headers, _ = call('GET', '/api/hostels', b'limit=5')
+        status, _, chunks = call('GET', '/api/hostels', b'limit=5',
+                                 headers=[('if-none-match', headers[b'etag'].decode())])
+        assert status == 304 and chunks == [b'']
+
+    def test_compressed_reads_match_flask(self, client, catalog):
+        """Test gzip negotiation and projections match the Flask app's."""
+        query = b'limit=100&fields=name,price_min'
+        status, headers, chunks = call('GET', '/api/hostels', query, headers=[('accept-encoding', 'gzip')])
+        expected = client.get('/api/hostels', query_string=query.decode(), headers={'Accept-Encoding': 'gzip'})
+        assert status == 200 and headers[b'content-encoding'] == b'gzip'
+        assert b''.join(chunks) == expected.data
+        assert headers[b'etag'].decode() == expected.headers['ETag']
+
+    def test_change_feed(self, client, catalog):
+        """Test the change feed matches Flask's, and its stream ends when the client goes."""
+        version = hostel_store.version
+        hostel_store.update(3, name="Renamed")
+        status, headers, chunks = call('GET', '/api/hostels/changes', f'since={version}'.encode())
+        assert status == 200
+        assert b''.join(chunks) == client.get(f'/api/hostels/changes?since={version}').data
+        assert call('GET', '/api/hostels/changes', b'since=999999')[0] == 410
+
+        status, headers, chunks = call('GET', '/api/hostels/changes/stream',
+                                       headers=[('last-event-id', str(version))])
+        assert status == 200 and headers[b'content-type'] == b'text/event-stream'
+        assert chunks[0].startswith(f'id: {hostel_store.version}\nevent: changes\n'.encode())
+        assert b'"Renamed"' in chunks[0] and chunks[-1] == b''
+
+    def test_export_streams_chunks(self, client, catalog):
+        """Test the export is streamed in several body messages matching Flask's output."""
+        status, headers, chunks = call('GET', '/api/hostels/export')
+        assert status == 200 and headers[b'content-type'] == b'application/x-ndjson'
+        assert len(chunks) == 3
+        assert b''.join(chunks) == client.get('/api/hostels/export').data
+
+    def test_reads_wait_for_writers_off_the_loop(self, client, catalog):
+        """Test a read waiting for the store's write lock leaves the event loop running."""
+        locked, release = threading.Event(), threading.Event()
+
+        def writer():
+            with hostel_store.lock.write():
+                locked.set()
+                release.wait(5)
+
+        async def scenario():
+            read = asyncio.ensure_future(request('GET', '/api/hostels', b'limit=5'))
+            ticks = 0
+            start = time.monotonic()
+            while time.monotonic() - start < 0.3:
+                await asyncio.sleep(0.01)
+                ticks += 1
+            assert not read.done()
+            release.set()
+            return ticks, await read
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        locked.wait(5)
+        try:
+            ticks, (status, _, _) = asyncio.run(scenario())
+        finally:
+            release.set()
+            thread.join()
+        assert ticks >= 10 and status == 200
+
+    def test_writes_go_through_flask(self, client):
+        """Test writes and unknown paths are handled by the bridged Flask app."""
+        body = json.dumps({"name": "Bridge House", "address": "Paldi", "price_min": 1,
+                           "price_max": 2, "lat": 23.0, "long": 72.5}).encode()
+        status, _, chunks = call('POST', '/api/hostels', body=body,
+                                 headers=[('content-type', 'application/json')])
+        assert status == 201
+        hostel_id = json.loads(b''.join(chunks))['hostel']['id']
+        status, _, chunks = call('GET', f'/api/hostels/{hostel_id}')
+        assert status == 200 and json.loads(b''.join(chunks))['hostel']['name'] == "Bridge House"
+        status, _, chunks = call('PUT', f'/api/hostels/{hostel_id}', body=b'{"price_min": 5}',
+                                 headers=[('content-type', 'application/json')])
+        assert status == 400 and b'Minimum price' in b''.join(chunks)
+        assert call('GET', '/api/unknown')[0] == 404
+
+    def test_bridged_bodies_are_streamed(self, client, monkeypatch):
+        """Test the Flask app reads a request body as it arrives, and large responses go out in chunks."""
+        import asgi
+        rows = [json.dumps({"name": f"Streamed {i}", "address": "Bopal", "price_min": 1, "price_max": 2,
+                            "lat": 23.0, "long": 72.5}).encode() + b'\n' for i in range(30)]
+        scope = {'type': 'http', 'method': 'POST', 'path': '/api/hostels/bulk', 'query_string': b'',
+                 'headers': [(b'content-type', b'application/x-ndjson')], 'root_path': ''}
+        received, sent, entered = [], [], []
+
+        def flask_app(environ, start_response):
+            entered.append(len(received))
+            return app(environ, start_response)
+
+        async def receive():
+            # One row per message.
+            received.append(len(received))
+            return {'type': 'http.request', 'body': rows[len(received) - 1], 'more_body': len(received) < len(rows)}
+
+        async def send(message):
+            sent.append(message)
+
+        monkeypatch.setattr(asgi.api, 'app', flask_app)
+        asyncio.run(application(scope, receive, send))
+        assert sent[0]['status'] == 200 and json.loads(sent[1]['body'])['created'] == 30
+        # The app was called before any of the body had been received.
+        assert entered == [0] and len(received) == len(rows)
+
+        def large(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return iter([b'x' * asgi.BRIDGE_BUFFER_LIMIT, b'y' * 10, b'z' * 10])
+        monkeypatch.setattr(asgi.api, 'app', large)
+        status, _, chunks = call('POST', '/api/large')
+        assert status == 200 and chunks == [b'x' * asgi.BRIDGE_BUFFER_LIMIT + b'y' * 10, b'z' * 10, b'']
+
+    def test_backend_is_built_off_the_loop(self, client, monkeypatch):
+        """Test a first native read without lifespan startup builds the backend on the thread pool."""
+        import app as api
+        lazy = app.extensions['veristay']
+        built = lazy.backend
+        threads = []
+
+        def build_backend(config):
+            threads.append(threading.current_thread().name)
+            return built
+        monkeypatch.setattr(lazy, 'backend', None)
+        monkeypatch.setattr(api, 'build_backend', build_backend)
+        assert call('GET', '/api/hostels')[0] == 200
+        assert threads and threads[0].startswith('veristay-asgi')
+
+    def test_native_reads_are_recorded(self, client, catalog):
+        """Test natively served reads show up in /api/metrics under their Flask rule."""
+        def count(text):
+            for line in text.splitlines():
+                if line.startswith('veristay_http_requests_total{method="GET",'
+                                   'route="/api/hostels/<hostel_id>",status="404"}'):
+                    return float(line.rsplit(' ', 1)[1])
+            return 0
+        before = count(client.get('/api/metrics').get_data(as_text=True))
+        call('GET', '/api/hostels/999')
+        status, _, chunks = call('GET', '/api/metrics')
+        assert status == 200 and count(b''.join(chunks).decode()) == before + 1
+
+    def test_native_reads_take_admission_slots(self, client, catalog, monkeypatch):
+        """Test native reads are limited by the Flask app's admission control and shed with 503."""
+        import asgi
+        from admission import AdmissionControl
+        from app import ADMISSION_EXEMPT
+        admission = AdmissionControl(app.wsgi_app, limit=1, queue=0, timeout=0, retry_after=3,
+                                     exempt=ADMISSION_EXEMPT)
+        monkeypatch.setattr(asgi, 'ADMISSION', admission)
+        assert call('GET', '/api/hostels/7')[0] == 200
+        assert admission.active == 0
+        admission.active = 1  # a request in progress
+        status, headers, chunks = call('GET', '/api/hostels/7')
+        assert status == 503 and headers[b'retry-after'] == b'3'
+        assert json.loads(b''.join(chunks))['error']
+        # Long-lived streams neither take slots nor are shed.
+        assert call('GET', '/api/hostels/export')[0] == 200
+        assert admission.active == 1
@@ -0,0 +1,99 @@
+"""Tests for the change log and the change feed endpoints."""
+import json
+import pytest
+from app import backend, create_app
+from changes import ChangeLog
+from models import HostelStore
+
+def create(store, name):
+    return store.create(name=name, address="Paldi", price_min=1000, price_max=2000, lat=23.0,
+                        long=72.5, amenities=["WiFi"], images=[])
+
+app = create_app({'SEED_DEMO_DATA': False})
+hostel_store, change_log = backend(app).hostel_store, backend(app).change_log
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
+    hostel_store.clear()
+
+class TestChangeLog:
+    def test_changed_ids_since_version(self):
+        """Test each changed hostel is listed once, in order of its last change."""
+        store = HostelStore()
+        log = ChangeLog(store)
+        first, second = create(store, "A"), create(store, "B")
+        version = store.version
+        store.update(second.id, name="B2")
+        third = create(store, "C")
+        store.add_review(first.id, "user-1", 4.0, "")
+        store.update(second.id, name="B3")
+        assert log.since(version) == ([third.id, first.id, second.id], store.version)
+        assert log.since(store.version) == ([], store.version)
+        assert log.since(0, log.epoch) == ([third.id, first.id, second.id], store.version)
+
+    def test_resync_required(self):
+        """Test versions outside the log, of another log or from before a clear get None."""
+        store = HostelStore()
+        create(store, "Before")
+        log = ChangeLog(store, size=3)
+        assert log.since(0) is None  # before the log started
+        for name in "ABC":
+            create(store, name)
+        assert log.since(1) is not None
+        create(store, "D")
+        assert log.since(1) is None and log.since(2) is not None
+        assert log.since(store.version + 1) is None
+        assert log.since(store.version, epoch='other') is None
+        store.clear()
+        assert log.since(3) is None and log.since(store.version) == ([], store.version)
+
+class TestChangesEndpoint:
+    def test_delta_since_version(self, client):
+        """Test a client catches up with created, updated and deleted hostels."""
+        kept, removed = create(hostel_store, "Kept"), create(hostel_store, "Removed")
+        start = client.get('/api/hostels/changes').get_json()
+        assert start['count'] == 0 and start['version'] == hostel_store.version
+
+        hostel_store.update(kept.id, name="Kept Renamed")
+        added = create(hostel_store, "Added")
+        hostel_store.delete(removed.id)
+        response = client.get('/api/hostels/changes', query_string={
+            'since': start['version'], 'epoch': start['epoch'], 'fields': 'name'})
+        assert response.status_code == 200
+        assert response.get_json() == {
+            "hostels": [{"id": kept.id, "name": "Kept Renamed"}, {"id": added.id, "name": "Added"}],
+            "count": 2, "deleted": [removed.id], "version": hostel_store.version, "epoch": change_log.epoch}
+        full = client.get(f"/api/hostels/changes?since={start['version']}").get_json()
+        assert full['hostels'][0] == client.get(f'/api/hostels/{kept.id}').get_json()['hostel']
+
+    def test_resync_and_invalid_queries(self, client):
+        """Test 410 with the version to resync from, and 400 for bad parameters."""
+        create(hostel_store, "A")
+        version = hostel_store.version
+        hostel_store.clear()
+        response = client.get(f'/api/hostels/changes?since={version}')
+        assert response.status_code == 410
+        body = response.get_json()
+        assert body['resync'] is True and body['version'] == hostel_store.version
+        assert client.get(f"/api/hostels/changes?since={body['version']}&epoch=nope").status_code == 410
+        assert client.get('/api/hostels/changes?since=-1').status_code == 400
+        assert client.get('/api/hostels/changes?fields=owner').status_code == 400
+
+    def test_event_stream(self, client):
+        """Test the stream sends the current delta at once, then each change."""
+        version = hostel_store.version
+        response = client.get('/api/hostels/changes/stream', headers={'Last-Event-ID': str(version)},
+                              buffered=False)
+        assert response.status_code == 200
+        assert response.mimetype == 'text/event-stream'
+        events = iter(response.response)
+        first = next(events).decode()
+        assert first.startswith(f'id: {version}\nevent: changes\ndata: ')
+        hostel = create(hostel_store, "Streamed")
+        lines = next(events).decode().splitlines()
+        assert lines[:2] == [f'id: {hostel_store.version}', 'event: changes']
+        assert json.loads(lines[2].removeprefix('data: '))['hostels'][0]['id'] == hostel.id
+        response.close()
@@ -0,0 +1,105 @@
+"""Concurrency tests for HostelStore."""
+import random
+import threading
+import time
+import pytest
+from concurrency import ReadWriteLock
+from models import HostelStore
+
+class TestReadWriteLock:
+    def test_readers_share_writers_exclude(self):
+        """Test readers overlap while a writer runs alone."""
+        lock = ReadWriteLock()
+        active = {'readers': 0, 'max_readers': 0, 'writer_overlap': False}
+        guard = threading.Lock()
+        barrier = threading.Barrier(4)
+
+        def reader():
+            barrier.wait()
+            with lock.read():
+                with guard:
+                    active['readers'] += 1
+                    active['max_readers'] = max(active['max_readers'], active['readers'])
+                time.sleep(0.05)
+                with guard:
+                    active['readers'] -= 1
+
+        def writer():
+            barrier.wait()
+            time.sleep(0.01)
+            with lock.write():
+                if active['readers']:
+                    active['writer_overlap'] = True
+
+        threads = [threading.Thread(target=reader) for _ in range(3)] + [threading.Thread(target=writer)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert active['max_readers'] > 1
+        assert not active['writer_overlap']
+
+class TestStoreStress:
+    THREADS = 8
+    OPS = 300
+
+    def test_concurrent_mutations_and_reads(self):
+        """Hammer the store from many threads and check ids and reads stay consistent."""
+        store = HostelStore()
+        created, review_ids, errors = [], [], []
+        guard = threading.Lock()
+
+        def make(price):
+            # Every write keeps name, price_min and price_max in lockstep so a
+            # torn read (half-applied update) is detectable.
+            return dict(name=f"H{price}", address="Paldi", price_min=price, price_max=price,
+                        lat=23.0, long=72.5, amenities=["WiFi"], images=[])
+
+        def check(hostels):
+            for hostel in hostels:
+                if hostel.name != f"H{hostel.price_min}" or hostel.price_min != hostel.price_max:
+                    errors.append(f"torn read: {hostel}")
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(self.OPS):
+                op = rng.random()
+                try:
+                    if op < 0.3:
+                        hostel = store.create(**make(rng.randrange(1000)))
+                        with guard:
+                            created.append(hostel.id)
+                    elif op < 0.45 and created:
+                        price = rng.randrange(1000)
+                        store.update(rng.choice(created), name=f"H{price}",
+                                     price_min=price, price_max=price)
+                    elif op < 0.55 and created:
+                        store.delete(rng.choice(created))
+                    elif op < 0.7 and created:
+                        review = store.add_review(rng.choice(created), "u", 4.0, "ok")
+                        if review:
+                            with guard:
+                                review_ids.append(review.id)
+                    elif op < 0.85:
+                        check(store.get_all())
+                    else:
+                        page, _ = store.query(limit=20, price_max=rng.randrange(1000), amenities=["wifi"])
+                        check(page)
+                except Exception as e:  # surface errors from worker threads
+                    errors.append(repr(e))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(self.THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert errors == []
+        assert len(created) == len(set(created))
+        assert len(review_ids) == len(set(review_ids))
+        hostels = store.get_all()
+        check(hostels)
+        ids = {h.id for h in hostels}
+        assert set(store.geo.points) == set(store.prices.ranges) == set(store.text.doc_terms) == ids
+        page, _ = store.query(limit=len(ids) + 1, amenities=["wifi"])
+        assert {h.id for h in page} == ids
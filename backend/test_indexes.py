@@ -0,0 +1,193 @@
+"""Tests for the in-memory secondary indexes."""
+import random
+import pytest
+from indexes import ClusterIndex, GeoIndex, PriceIndex, TextIndex, cluster_points, cluster_window, haversine_m
+from models import SORT_FIELDS, HostelStore
+
+@pytest.fixture
+def points():
+    """Random points scattered around Ahmedabad."""
+    rng = random.Random(42)
+    return {i: (23.0225 + rng.uniform(-0.3, 0.3), 72.5714 + rng.uniform(-0.3, 0.3))
+            for i in range(1, 2001)}
+
+class TestGeoIndex:
+    def test_nearest_matches_linear_scan(self, points):
+        """Test k-nearest results agree with a brute-force scan."""
+        index = GeoIndex()
+        for item_id, (lat, long) in points.items():
+            index.add(item_id, lat, long)
+        for lat, long, radius in [(23.0225, 72.5714, 5000), (23.3, 72.3, 20000), (22.0, 71.0, 1000)]:
+            expected = sorted(
+                (haversine_m(lat, long, plat, plong), item_id)
+                for item_id, (plat, plong) in points.items()
+                if haversine_m(lat, long, plat, plong) <= radius
+            )[:10]
+            assert index.nearest(lat, long, radius, 10) == expected
+
+    def test_bbox_matches_linear_scan(self, points):
+        """Test bounding box results agree with a brute-force scan."""
+        index = GeoIndex()
+        for item_id, (lat, long) in points.items():
+            index.add(item_id, lat, long)
+        bbox = (72.5, 22.9, 72.65, 23.1)
+        expected = {i for i, (lat, long) in points.items()
+                    if bbox[1] <= lat <= bbox[3] and bbox[0] <= long <= bbox[2]}
+        assert set(index.within_bbox(*bbox)) == expected
+        assert set(index.within_bbox(-180, -90, 180, 90)) == set(points)
+
+    def test_move_and_remove(self):
+        """Test re-adding moves a point and removing drops empty cells."""
+        index = GeoIndex()
+        index.add(1, 23.0, 72.0)
+        index.add(1, 10.0, 10.0)
+        assert list(index.within_bbox(71.9, 22.9, 72.1, 23.1)) == []
+        index.remove(1)
+        assert len(index) == 0
+        assert index.cells == {}
+
+class TestClusterIndex:
+    def test_incremental_matches_from_scratch(self, points):
+        """Test clusters kept up through moves, price changes and removals match a rebuild."""
+        rng = random.Random(5)
+        index = ClusterIndex()
+        current = {}
+        for item_id, (lat, long) in points.items():
+            current[item_id] = (lat, long, rng.randrange(3000, 20000, 500))
+            index.add(item_id, *current[item_id])
+        for item_id in rng.sample(sorted(points), 600):
+            if rng.random() < 0.5:
+                index.remove(item_id)
+                del current[item_id]
+            else:
+                lat, long, _ = current[item_id]
+                current[item_id] = (lat + rng.uniform(-0.01, 0.01), long, rng.randrange(1000, 20000, 500))
+                index.add(item_id, *current[item_id])
+        rows = [(item_id, lat, long, price) for item_id, (lat, long, price) in current.items()]
+        for zoom, bbox in [(0, (-180, -85, 180, 85)), (9, (72.0, 22.5, 73.0, 23.5)),
+                           (12, (72.5, 22.95, 72.6, 23.05)), (16, (72.55, 23.0, 72.57, 23.02)),
+                           (19, (72.55, 23.0, 72.56, 23.01))]:
+            expected = cluster_points(rows, min(zoom, 16), cluster_window(min(zoom, 16), *bbox))
+            actual = index.clusters(zoom, *bbox)
+            assert [(c.count, c.price_min, c.hostel_id) for c in actual] == \
+                   [(c.count, c.price_min, c.hostel_id) for c in expected]
+            for got, want in zip(actual, expected):
+                assert got.lat == pytest.approx(want.lat, abs=1e-6)
+                assert got.long == pytest.approx(want.long, abs=1e-6)
+        assert sum(c.count for c in index.clusters(0, -180, -85, 180, 85)) == len(current)
+
+    def test_remove_all_drops_cells(self):
+        """Test removing every point leaves no cells at any level."""
+        index = ClusterIndex()
+        index.add(1, 23.0, 72.5, 5000)
+        index.add(2, 23.0, 72.5, 4000)
+        index.remove(2)
+        assert index.clusters(16, 72.4, 22.9, 72.6, 23.1)[0][:5] == (1, 23.0, 72.5, 5000, 1)
+        index.remove(1)
+        assert not index.members and not any(index.levels)
+
+class TestTextIndex:
+    def test_matching_is_prefix_and(self):
+        """Test every query token must prefix a term of the document."""
+        index = TextIndex()
+        index.add(1, "Sunrise Nest", "Paldi, Ahmedabad", ["WiFi"])
+        index.add(2, "Sunrise House", "Gota, Ahmedabad", ["AC"])
+        assert index.matching("sun ahm") == {1, 2}
+        assert index.matching("sunrise wi") == {1}
+        assert index.matching("nest ac") == set()
+        assert index.matching("!!") == set()
+
+    def test_prefix_cap_shared_by_matching_and_search(self):
+        """Test a prefix of many terms matches the same documents whether filtered or ranked."""
+        index = TextIndex()
+        for i in range(TextIndex.MAX_PREFIX_TERMS + 10):
+            index.add(i, f"Stay{i:03d}", "Paldi", [])
+        ids = index.matching("st")
+        assert len(ids) == TextIndex.MAX_PREFIX_TERMS
+        assert {item_id for _, item_id in index.search("st", 100)} == ids
+        assert index.estimate("st") == len(ids)
+        assert all(index.matcher("st")(item_id) == (item_id in ids) for item_id in range(60))
+
+    def test_equal_scores_ordered_by_id(self):
+        """Test tied hits come back lowest id first, whatever the insertion order."""
+        index = TextIndex()
+        for item_id in [907, 5, 300, 12, 64, 1000, 2, 77]:
+            index.add(item_id, "Zolo Stay", "Bopal", [])
+        assert [item_id for _, item_id in index.search("zolo", 3)] == [2, 5, 12]
+        assert [item_id for _, item_id in index.search("zolo st", 5)] == [2, 5, 12, 64, 77]
+
+    def test_remove_prunes_vocabulary(self):
+        """Test removing the last document for a term drops the term."""
+        index = TextIndex()
+        index.add(1, "Zolo Stay", "Bopal", [])
+        index.add(1, "Urban Stay", "Bopal", [])
+        assert "zolo" not in index.vocabulary
+        index.remove(1)
+        assert index.vocabulary == []
+        assert index.postings == {}
+
+class TestPriceIndex:
+    def test_overlap_counts(self):
+        """Test range-end counts and ids agree with the stored ranges."""
+        index = PriceIndex()
+        ranges = {1: (1000, 2000), 2: (1500, 5000), 3: (6000, 9000), 4: (2000, 2000)}
+        for item_id, (low, high) in ranges.items():
+            index.add(item_id, low, high)
+        index.add(3, 7000, 9000)
+        assert index.count_min_at_most(2000) == 3
+        assert set(index.ids_min_at_most(2000)) == {1, 2, 4}
+        assert index.count_max_at_least(5000) == 2
+        assert set(index.ids_max_at_least(5000)) == {2, 3}
+        # Widest range is 3500 (id 2), so the window for [5000, 5600] starts at 1500.
+        assert set(index.ids_window(5000, 5600)) == {2, 4}
+        index.remove(2)
+        assert set(index.ids_max_at_least(5000)) == {3}
+        assert len(index.by_min) == len(index.by_max) == len(index.widths) == 3
+        assert index.widths[-1] == 2000
+
+class TestQueryPlanner:
+    @pytest.fixture
+    def store(self):
+        store = HostelStore()
+        for i in range(100):
+            store.create(name=f"Hostel {i}", address="Paldi", price_min=1000 * i,
+                         price_max=1000 * i + 500, lat=23.0, long=72.5,
+                         amenities=["WiFi"] + (["Gym"] if i % 20 == 0 else []),
+                         images=[], is_verified=i % 2 == 0)
+        return store
+
+    def test_most_selective_index_first(self, store):
+        """Test the planner drives the query from the smallest index result."""
+        plan = store.explain(amenities=["wifi", "gym"], is_verified=True, price_min=10000)
+        assert [name for name, _ in plan] == ["amenities", "is_verified", "price_max"]
+        assert plan[0][1] == 5
+        plan = store.explain(price_max=2500, is_verified=True, amenities=["wifi"])
+        assert plan[0] == ("price_min", 3)
+        plan = store.explain(price_min=50100, price_max=50200)
+        assert plan[0] == ("price_window", 1)
+
+    def test_planned_results_match_scan(self, store):
+        """Test planned queries return the same hostels as a plain scan."""
+        page, _ = store.query(limit=100, amenities=["Gym"], price_min=30000, is_verified=True)
+        expected = [h for h in store.get_all() if "Gym" in h.amenities
+                    and h.price_max >= 30000 and h.is_verified]
+        assert page == expected
+
+    @pytest.mark.parametrize("sort", ["id", "-id", "price_min", "-price_max", "name"])
+    @pytest.mark.parametrize("filters", [{}, {"is_verified": True}, {"amenities": ["gym"]}])
+    def test_pages_match_sorted_scan(self, store, sort, filters):
+        """Test paging (walking the sort index or not) yields the filtered catalog in sort order."""
+        store.delete(40)
+        store.update(7, price_min=99000, price_max=99500)
+        seen, after = [], None
+        while True:
+            page, after = store.query(limit=7, after=after, sort=sort, **filters)
+            seen.extend(page)
+            if after is None:
+                break
+        _, sort_key = SORT_FIELDS[sort.lstrip('-')]
+        expected = sorted((h for h in store.get_all()
+                           if h.is_verified or "is_verified" not in filters
+                           if "Gym" in h.amenities or "amenities" not in filters),
+                          key=lambda h: (sort_key(h), h.id), reverse=sort.startswith('-'))
+        assert seen == expected
@@ -0,0 +1,131 @@
+"""Tests for request/store metrics and the slow request profiler."""
+import os
+import time
+import pytest
+import metrics
+from app import backend, create_app
+
+@pytest.fixture
+def app():
+    # A fresh app per test: the store gauges follow the latest app's store.
+    return create_app({'TESTING': True, 'SEED_DEMO_DATA': False, 'METRICS': True})
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        yield client
+
+def sample(text, name, **labels):
+    """The value of one sample in rendered metrics, or None."""
+    wanted = name + ('{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}' if labels else '')
+    for line in text.splitlines():
+        if line.rsplit(' ', 1)[0] == wanted:
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+class TestRegistry:
+    def test_histogram_buckets_are_cumulative(self):
+        """Test bucket counts, sum and count of a histogram."""
+        registry = metrics.Registry()
+        histogram = registry.register(metrics.Histogram('t_seconds', 'Test.', ('op',), (0.1, 1.0)))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(('a',), value)
+        text = registry.render().decode()
+        assert '# TYPE t_seconds histogram' in text
+        assert sample(text, 't_seconds_bucket', op='a', le='0.1') == 2
+        assert sample(text, 't_seconds_bucket', op='a', le='1.0') == 3
+        assert sample(text, 't_seconds_bucket', op='a', le='+Inf') == 4
+        assert sample(text, 't_seconds_count', op='a') == 4
+        assert sample(text, 't_seconds_sum', op='a') == pytest.approx(3.65)
+
+    def test_counter_escapes_labels(self):
+        """Test label values are escaped in the text format."""
+        registry = metrics.Registry()
+        counter = registry.register(metrics.Counter('t_total', 'Test.', ('path',)))
+        counter.inc(('say "hi"\\',), 2)
+        assert 't_total{path="say \\"hi\\"\\\\"} 2' in registry.render().decode()
+
+    def test_registering_a_name_again_replaces_the_metric(self):
+        """Test a metric registered again (by a re-created app) is rendered once, the latest one."""
+        registry = metrics.Registry()
+        registry.register(metrics.Gauge('t_items', 'Test.', lambda: 1))
+        registry.register(metrics.Gauge('t_items', 'Test.', lambda: 2))
+        text = registry.render().decode()
+        assert text.count('# TYPE t_items') == 1 and sample(text, 't_items') == 2
+
+    def test_instrument_times_instance_methods(self):
+        """Test instrumented methods keep their results and record their timings."""
+        class Thing:
+            def double(self, x):
+                return 2 * x
+        thing = Thing()
+        metrics.instrument(thing, ['double', 'missing'], prefix='thing.')
+        assert thing.double(4) == 8
+        text = metrics.REGISTRY.render().decode()
+        assert sample(text, 'veristay_store_operation_seconds_count', operation='thing.double') >= 1
+
+    def test_instrumenting_again_does_not_wrap_twice(self):
+        """Test a store instrumented by a second Backend records each call once."""
+        class Thing:
+            def double(self, x):
+                return 2 * x
+        thing = Thing()
+        metrics.instrument(thing, ['double'], prefix='twice.')
+        wrapped = thing.double
+        metrics.instrument(thing, ['double'], prefix='twice.')
+        assert thing.double is wrapped
+        thing.double(1)
+        text = metrics.REGISTRY.render().decode()
+        assert sample(text, 'veristay_store_operation_seconds_count', operation='twice.double') == 1
+
+class TestMetricsEndpoint:
+    def test_requests_store_operations_and_builds_are_recorded(self, app, client):
+        """Test /api/metrics covers routes, sizes, store operations and serialization."""
+        created = client.post('/api/hostels', json={
+            "name": "Metric Stay", "address": "Paldi", "price_min": 5000, "price_max": 8000,
+            "lat": 23.0, "long": 72.5, "amenities": ["WiFi"], "images": []}).get_json()['hostel']
+        client.get(f"/api/hostels/{created['id']}")
+        client.get('/api/hostels?limit=5')
+        client.get('/api/hostels/nearby?lat=23.0&long=72.5&radius_m=1000')
+        client.get('/api/nope')
+        response = client.get('/api/metrics')
+        assert response.status_code == 200
+        assert response.content_type.startswith('text/plain')
+        text = response.get_data(as_text=True)
+        assert sample(text, 'veristay_http_requests_total',
+                      method='GET', route='/api/hostels/<hostel_id>', status='200') >= 1
+        assert sample(text, 'veristay_http_requests_total',
+                      method='GET', route='unmatched', status='404') >= 1
+        assert sample(text, 'veristay_http_request_duration_seconds_count',
+                      method='POST', route='/api/hostels') >= 1
+        assert sample(text, 'veristay_http_request_bytes_total', method='POST', route='/api/hostels') > 0
+        assert sample(text, 'veristay_http_response_bytes_total', method='GET', route='/api/hostels') > 0
+        for operation in ('create', 'query', 'nearby', 'get_by_id', 'geo.nearest', '_plan'):
+            assert sample(text, 'veristay_store_operation_seconds_count', operation=operation) >= 1
+        for kind in ('hostel', 'list', 'nearby'):
+            assert sample(text, 'veristay_response_build_seconds_count', kind=kind) >= 1
+        assert sample(text, 'veristay_hostels') == len(backend(app).hostel_store)
+
+class TestSlowRequestProfiler:
+    def test_slow_requests_are_dumped_as_folded_stacks(self, tmp_path):
+        """Test only requests over the threshold are written, with their stacks."""
+        profiler = metrics.SlowRequestProfiler(str(tmp_path), threshold=0.05, interval=0.002)
+        profiler.start()
+
+        def busy_handler(seconds):
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                pass
+
+        profiler.begin()
+        busy_handler(0.01)
+        assert profiler.end('GET /fast', 0.01) is None
+        profiler.begin()
+        busy_handler(0.1)
+        path = profiler.end('GET /api/hostels', 0.1)
+        assert os.listdir(tmp_path) == [os.path.basename(path)]
+        with open(path) as f:
+            lines = f.read().splitlines()
+        assert lines and all(line.startswith('GET /api/hostels;') for line in lines)
+        assert any('test_metrics.py:busy_handler' in line for line in lines)
+        assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) >= 10
@@ -0,0 +1,316 @@
+"""Tests for mmap-shared catalog generations, checked against the in-memory HostelStore."""
+import os
+import random
+import pytest
+from cache import ResponseCache
+from models import HostelStore
+from serializers import encode_hostel
+from shared_catalog import CatalogPublisher, SharedCatalog
+
+AREAS = ["Navrangpura", "Vastrapur", "Satellite", "Bopal", "Maninagar"]
+AMENITIES = ["WiFi", "AC", "Laundry", "Meals", "Gym", "Hot Water"]
+
+@pytest.fixture
+def store():
+    """An in-memory store with a random catalog, some of it rated."""
+    rng = random.Random(11)
+    store = HostelStore()
+    for i in range(300):
+        price_min = rng.randrange(3000, 20000, 500)
+        store.create(name=f"{rng.choice(['Zolo', 'stanza', 'Urban'])} Stay {rng.randrange(50)}",
+                     address=f"{rng.choice(AREAS)}, Ahmedabad",
+                     price_min=price_min, price_max=price_min + rng.randrange(0, 8000, 500),
+                     lat=23.0225 + rng.uniform(-0.1, 0.1), long=72.5714 + rng.uniform(-0.1, 0.1),
+                     amenities=rng.sample(AMENITIES, rng.randrange(0, 4)),
+                     images=[], is_verified=rng.random() < 0.5)
+    for hostel_id in [rng.randrange(1, 301) for _ in range(200)]:
+        store.add_review(hostel_id, "user-1", rng.choice([1.0, 2.5, 3.0, 4.0, 5.0]), "")
+    store.delete(5)
+    return store
+
+@pytest.fixture
+def published(store, tmp_path):
+    publisher = CatalogPublisher(store, ResponseCache(store), str(tmp_path))
+    publisher.publish()
+    return publisher, SharedCatalog(str(tmp_path))
+
+def all_pages(query, **filters):
+    results, after = [], None
+    while True:
+        page, after = query(limit=25, after=after, **filters)
+        results += page
+        if after is None:
+            return results
+
+class TestSharedCatalog:
+    @pytest.mark.parametrize('filters', [
+        {},
+        {'sort': '-price_min'},
+        {'sort': 'name'},
+        {'sort': '-name', 'is_verified': False},
+        {'sort': 'created_at'},
+        {'sort': '-rating', 'rating_min': 3.0},
+        {'price_min': 8000, 'price_max': 10000},
+        {'amenities': ['wifi', 'Gym']},
+        {'amenities': ['wifi', 'Sauna']},
+        {'amenities': ['gym', 'ac', 'sauna'], 'amenity_mode': 'any', 'sort': '-id'},
+        {'bbox': (72.55, 23.0, 72.6, 23.05), 'sort': 'price_max'},
+    ])
+    def test_query_pages_match_memory_store(self, store, published, filters):
+        """Test every page, cursor and body agrees with HostelStore.query."""
+        generation = published[1].current()
+        expected = all_pages(store.query, **filters)
+        positions = all_pages(generation.query, **filters)
+        assert [bytes(generation.body(pos)) for pos in positions] == [encode_hostel(h) for h in expected]
+        first = store.query(limit=7, **filters)
+        page, after = generation.query(limit=7, **filters)
+        assert after == first[1]
+
+    def test_lookup_and_nearby(self, store, published):
+        """Test id lookups and nearest-first results agree with the store."""
+        generation = published[1].current()
+        assert generation.position(5) is None and generation.position(999) is None
+        pos = generation.position(7)
+        assert bytes(generation.body(pos)) == encode_hostel(store.get_by_id(7))
+        expected = store.nearby(23.03, 72.57, 3000, 15)
+        actual = generation.nearby(23.03, 72.57, 3000, 15)
+        assert [int(generation.columns['id'][pos]) for pos, _ in actual] == [h.id for h, _ in expected]
+        assert [round(d, 3) for _, d in actual] == [round(d, 3) for _, d in expected]
+
+    def test_new_generation_replaces_old(self, store, published, tmp_path):
+        """Test readers switch to a newly published generation and files older than the previous one are removed."""
+        publisher, catalog = published
+        first = catalog.current()
+        assert publisher.publish() == first.generation  # unchanged store: nothing written
+        store.update(7, name="Renamed Stay")
+        store.create(name="New", address="Paldi", price_min=1, price_max=2, lat=23.0,
+                     long=72.5, amenities=["Sauna"], images=[])
+        publisher.publish()
+        current = catalog.current()
+        assert current.generation == first.generation + 1 and len(current) == len(first) + 1
+        assert b'Renamed Stay' in bytes(current.body(current.position(7)))
+        assert b'Renamed Stay' not in bytes(first.body(first.position(7)))
+        assert sorted(os.listdir(tmp_path)) == ['CURRENT', f'catalog-{first.generation:06d}.bin',
+                                                f'catalog-{current.generation:06d}.bin']
+        store.delete(7)
+        publisher.publish()
+        assert sorted(os.listdir(tmp_path)) == ['CURRENT', f'catalog-{current.generation:06d}.bin',
+                                                f'catalog-{current.generation + 1:06d}.bin']
+
+    def test_reader_retries_a_generation_removed_under_it(self, store, published, tmp_path, monkeypatch):
+        """Test a reader whose generation was unlinked after it read CURRENT opens the newer one."""
+        import shared_catalog
+        publisher, catalog = published
+        opened = []
+
+        def generation(path):
+            if not opened:
+                # Two publishes land between reading CURRENT and opening its file.
+                for i in range(2):
+                    store.update(7, name=f"Stay {i}")
+                    publisher.publish()
+            opened.append(path)
+            return real(path)
+
+        real = shared_catalog.CatalogGeneration
+        monkeypatch.setattr(shared_catalog, 'CatalogGeneration', generation)
+        assert catalog.current().generation == publisher.generation
+        assert len(opened) == 2
+
+    def test_sql_store(self, store, tmp_path):
+        """Test a SqlHostelStore is published like the in-memory store."""
+        from sql_store import SqlHostelStore
+        sql = SqlHostelStore(str(tmp_path / 'hostels.db'))
+        for hostel in store.get_all()[:50]:
+            sql.create(hostel.name, hostel.address, hostel.price_min, hostel.price_max, hostel.lat,
+                       hostel.long, hostel.amenities, hostel.images, hostel.is_verified)
+        publisher = CatalogPublisher(sql, ResponseCache(sql), str(tmp_path / 'catalog'))
+        publisher.publish()
+        generation = SharedCatalog(str(tmp_path / 'catalog')).current()
+        assert len(generation) == 50 and generation.version == sql.version
+        positions, _ = generation.query(limit=100, sort='price_min')
+        assert [generation.body(pos) for pos in positions] == [
+            encode_hostel(hostel) for hostel in sql.query(limit=100, sort='price_min')[0]]
+        sql.close()
+
+    def test_empty_store(self, tmp_path):
+        """Test an empty catalog can be published and queried."""
+        store = HostelStore()
+        CatalogPublisher(store, ResponseCache(store), str(tmp_path)).publish()
+        generation = SharedCatalog(str(tmp_path)).current()
+        assert generation.query(limit=10) == ([], None)
+        assert generation.nearby(23.0, 72.5, 1000, 5) == []
+
+@pytest.fixture
+def writer(tmp_path):
+    """app.py served on a private port, with its catalog published to tmp_path."""
+    import threading
+    from werkzeug.serving import make_server
+    from app import app, backend
+    import replica
+    hostel_store, response_cache = backend(app).hostel_store, backend(app).response_cache
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    publisher = CatalogPublisher(hostel_store, response_cache, str(tmp_path))
+    publisher.publish()
+    replica.configure(str(tmp_path), ('127.0.0.1', server.server_port))
+    yield publisher, app.test_client(), replica.replica.test_client()
+    server.shutdown()
+    hostel_store.clear()
+
+class TestReplica:
+    HOSTEL = {"name": "Replica Stay", "address": "Paldi", "price_min": 5000, "price_max": 8000,
+              "lat": 23.01, "long": 72.56, "amenities": ["WiFi"], "images": []}
+
+    def test_writes_are_proxied_and_reads_match_writer(self, writer):
+        """Test a proxied create becomes readable from the catalog once published."""
+        publisher, direct, client = writer
+        response = client.post('/api/hostels', json=self.HOSTEL)
+        assert response.status_code == 201
+        hostel_id = response.get_json()['hostel']['id']
+        assert client.get(f'/api/hostels/{hostel_id}').status_code == 404  # not yet published
+        publisher.publish()
+        for path in [f'/api/hostels/{hostel_id}', '/api/hostels?limit=5&sort=-price_min',
+                     '/api/hostels/nearby?lat=23.01&long=72.56&radius_m=1000',
+                     # Projections are proxied to the writer.
+                     '/api/hostels?limit=5&fields=name', f'/api/hostels/{hostel_id}?fields=price_min',
+                     f'/api/hostels/{hostel_id}/similar']:
+            from_replica, from_writer = client.get(path), direct.get(path)
+            assert from_replica.status_code == 200
+            assert from_replica.data == from_writer.data
+            assert from_replica.headers['ETag'] == from_writer.headers['ETag']
+        etag = client.get(f'/api/hostels/{hostel_id}').headers['ETag']
+        assert client.get(f'/api/hostels/{hostel_id}', headers={'If-None-Match': etag}).status_code == 304
+
+    def test_errors_and_proxied_reads(self, writer):
+        """Test validation errors locally and search/update errors through the writer."""
+        _, _, client = writer
+        assert client.get('/api/hostels?limit=0').status_code == 400
+        assert client.get('/api/hostels/abc').status_code == 400
+        assert client.put('/api/hostels/999', json={"name": "x"}).status_code == 404
+        assert client.get('/api/hostels/search?q=replica').get_json()['count'] == 0
+        assert client.get('/api/health').get_json()['status'] == 'healthy'
+
+    def test_streamed_responses_release_their_connection(self, writer, monkeypatch):
+        """Test a fully read stream returns its connection to the pool and an abandoned one closes it."""
+        import replica
+        _, direct, client = writer
+        monkeypatch.setattr(replica, 'PROXY_BUFFER_LIMIT', 0)
+        while not replica._connections.empty():
+            replica._connections.get_nowait().close()
+        response = client.get('/api/hostels/search?q=stay', buffered=False)
+        assert b''.join(response.response) == direct.get('/api/hostels/search?q=stay').data
+        response.close()
+        assert replica._connections.qsize() == 1
+        response = client.get('/api/hostels/search?q=stay', buffered=False)
+        response.close()
+        assert replica._connections.qsize() == 0
+
+    def test_writer_unavailable(self, tmp_path):
+        """Test proxied requests fail with 502 when the writer is down."""
+        import socket
+        import replica
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        store = HostelStore()
+        CatalogPublisher(store, ResponseCache(store), str(tmp_path)).publish()
+        client = replica.configure(str(tmp_path), ('127.0.0.1', port)).test_client()
+        assert client.post('/api/hostels', json=self.HOSTEL).status_code == 502
+        assert client.get('/api/hostels').get_json() == {"hostels": [], "count": 0, "next_cursor": None}
+
+    @pytest.fixture
+    def silent_writer(self, tmp_path, monkeypatch):
+        """A writer that reads each request and then hangs up (or, with `hang`, never answers)."""
+        import socket
+        import threading
+        import replica
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(8)
+        state = {'requests': 0, 'hang': False, 'open': []}
+
+        def accept():
+            while True:
+                try:
+                    conn, _ = server.accept()
+                except OSError:
+                    return
+                conn.recv(65536)
+                state['requests'] += 1
+                if state['hang']:
+                    state['open'].append(conn)
+                else:
+                    conn.close()
+
+        threading.Thread(target=accept, daemon=True).start()
+        monkeypatch.setattr(replica, 'PROXY_TIMEOUT', 0.2)
+        store = HostelStore()
+        CatalogPublisher(store, ResponseCache(store), str(tmp_path)).publish()
+        yield replica.configure(str(tmp_path), server.getsockname()).test_client(), state
+        server.close()
+        for conn in state['open']:
+            conn.close()
+
+    def test_only_idempotent_requests_are_retried(self, silent_writer):
+        """Test a POST the writer may have received is not sent again, while a PUT is retried."""
+        client, state = silent_writer
+        assert client.post('/api/hostels', json=self.HOSTEL).status_code == 502
+        assert state['requests'] == 1
+        assert client.put('/api/hostels/1', json={"name": "x"}).status_code == 502
+        assert state['requests'] == 3
+
+    def test_writer_timeout(self, silent_writer):
+        """Test a writer that never answers gives 502, not a server error."""
+        client, state = silent_writer
+        state['hang'] = True
+        assert client.get('/api/hostels/search?q=x').status_code == 502
+
+class TestCluster:
+    def run_cluster(self, tmp_path, **env):
+        import socket
+        import subprocess
+        import sys
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        environ = {k: v for k, v in os.environ.items() if not k.startswith('VERISTAY_')}
+        environ.update(env, VERISTAY_CATALOG_DIR=str(tmp_path / 'catalog'))
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        proc = subprocess.Popen([sys.executable, 'cluster.py', '--workers', '1', '--host', '127.0.0.1',
+                                 '--port', str(port)], cwd=backend_dir, env=environ,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return proc, port
+
+    def test_sql_writer(self, tmp_path):
+        """Test the cluster starts with a SQLite writer and its workers serve the catalog."""
+        import json
+        import time
+        import urllib.request
+        proc, port = self.run_cluster(tmp_path, VERISTAY_DATABASE=str(tmp_path / 'hostels.db'))
+        try:
+            deadline = time.monotonic() + 30
+            while True:
+                assert proc.poll() is None, proc.stderr.read().decode()
+                try:
+                    with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/hostels', timeout=5) as response:
+                        body = json.load(response)
+                    break
+                except OSError:
+                    assert time.monotonic() < deadline
+                    time.sleep(0.2)
+            assert body['count'] == 2  # the demo hostels
+        finally:
+            proc.terminate()
+            proc.wait(10)
+
+    def test_exits_when_the_writer_dies_at_startup(self, tmp_path):
+        """Test the launcher exits non-zero, rather than waiting forever, if the writer fails to start."""
+        # A snapshot cannot preload a SQLite store, so the writer raises.
+        proc, _ = self.run_cluster(tmp_path, VERISTAY_DATABASE=str(tmp_path / 'hostels.db'),
+                                   VERISTAY_SNAPSHOT=str(tmp_path / 'missing.snapshot'))
+        try:
+            assert proc.wait(30) == 1
+            assert b'writer exited' in proc.stderr.read()
+        finally:
+            proc.kill()
@@ -0,0 +1,59 @@
+"""Tests for the similar hostel index, checked against the pairwise distance."""
+import random
+import pytest
+from similarity import SimilarityIndex, distance, features
+
+AMENITIES = ["WiFi", "AC", "Laundry", "Meals", "Gym", "Hot Water", "Parking", "CCTV",
+             "Housekeeping", "Power Backup", "Study Room", "RO Water", "Lift", "TV",
+             "Fridge", "Geyser", "Mess", "Terrace"]
+
+def random_hostel(rng):
+    price_min = rng.randrange(3000, 20000, 500)
+    return (price_min, price_min + rng.randrange(0, 8000, 500), 23.0225 + rng.uniform(-0.1, 0.1),
+            72.5714 + rng.uniform(-0.1, 0.1), rng.sample(AMENITIES, rng.randrange(0, 6)))
+
+def brute_force(current, item_id, limit):
+    origin = features(*current[item_id])
+    return sorted((distance(origin, features(*row)), other_id)
+                  for other_id, row in current.items() if other_id != item_id)[:limit]
+
+class TestSimilarityIndex:
+    def test_incremental_matches_brute_force(self):
+        """Test top-k results kept up through updates, removals and reuse match a full scan."""
+        rng = random.Random(3)
+        index = SimilarityIndex(capacity=8, amenity_capacity=2)
+        current = {}
+        for item_id in range(1, 1501):
+            current[item_id] = random_hostel(rng)
+            index.add(item_id, *current[item_id])
+        for item_id in rng.sample(sorted(current), 400):
+            if rng.random() < 0.5:
+                index.remove(item_id)
+                del current[item_id]
+            else:
+                current[item_id] = random_hostel(rng)
+                index.add(item_id, *current[item_id])
+        for item_id in range(1501, 1601):  # reuses the removed rows
+            current[item_id] = random_hostel(rng)
+            index.add(item_id, *current[item_id])
+        assert len(index) == len(current) and index.size == 1500
+        for item_id in rng.sample(sorted(current), 20):
+            expected = brute_force(current, item_id, 10)
+            actual = index.similar(item_id, 10)
+            assert [other_id for _, other_id in actual] == [other_id for _, other_id in expected]
+            assert [d for d, _ in actual] == pytest.approx([d for d, _ in expected])
+
+    def test_ties_small_and_unknown(self):
+        """Test ties break by id, limits past the catalog and unknown ids."""
+        index = SimilarityIndex()
+        for item_id in [5, 3, 9, 1]:
+            index.add(item_id, 5000, 8000, 23.0, 72.5, ["WiFi", "wifi"])
+        assert index.similar(9, 2) == [(0.0, 1), (0.0, 3)]
+        assert [other_id for _, other_id in index.similar(1, 50)] == [3, 5, 9]
+        index.add(2, 10000, 16000, 23.0, 72.5, [])
+        # Twice the price (1) and no shared amenities (1).
+        assert index.similar(2, 1) == [(pytest.approx(2.0, abs=1e-3), 1)]
+        assert index.similar(7, 5) == []
+        index.clear()
+        index.add(1, 5000, 8000, 23.0, 72.5, [])
+        assert index.similar(1, 5) == []
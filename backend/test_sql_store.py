@@ -0,0 +1,216 @@
+"""Tests for the SQL-backed store, checked against the in-memory HostelStore."""
+import random
+import sqlite3
+import threading
+import pytest
+from models import HostelStore
+from sql_store import SqlHostelStore, search_text
+
+AREAS = ["Navrangpura", "Vastrapur", "Satellite", "Bopal", "Maninagar"]
+AMENITIES = ["WiFi", "AC", "Laundry", "Meals", "Gym", "Hot Water"]
+
+# The tables as the first release of SqlHostelStore created them.
+BASELINE_SCHEMA = """
+CREATE TABLE hostels (
+    id INTEGER PRIMARY KEY, name TEXT NOT NULL, address TEXT NOT NULL,
+    price_min INTEGER NOT NULL, price_max INTEGER NOT NULL, lat DOUBLE PRECISION NOT NULL,
+    long DOUBLE PRECISION NOT NULL, amenities TEXT NOT NULL, images TEXT NOT NULL,
+    is_verified BOOLEAN NOT NULL, search_text TEXT NOT NULL, created_ts BIGINT NOT NULL,
+    updated_ts BIGINT NOT NULL);
+CREATE TABLE hostel_amenities (
+    hostel_id INTEGER NOT NULL REFERENCES hostels (id) ON DELETE CASCADE,
+    amenity TEXT NOT NULL, PRIMARY KEY (amenity, hostel_id));
+CREATE TABLE reviews (
+    id INTEGER PRIMARY KEY, hostel_id INTEGER NOT NULL REFERENCES hostels (id) ON DELETE CASCADE,
+    user_id TEXT NOT NULL, rating DOUBLE PRECISION NOT NULL, comment TEXT NOT NULL,
+    created_ts BIGINT NOT NULL);
+"""
+
+@pytest.fixture
+def stores(tmp_path):
+    """An in-memory store and a SQL store holding the same random catalog."""
+    rng = random.Random(7)
+    memory, sql = HostelStore(), SqlHostelStore(str(tmp_path / 'hostels.db'))
+    for i in range(300):
+        price_min = rng.randrange(3000, 20000, 500)
+        row = dict(name=f"{rng.choice(['Zolo', 'Stanza', 'Urban', 'Élan', 'ürban'])} Stay {i}",
+                   address=f"{rng.choice(AREAS)}, Ahmedabad",
+                   price_min=price_min, price_max=price_min + rng.randrange(0, 8000, 500),
+                   lat=23.0225 + rng.uniform(-0.1, 0.1), long=72.5714 + rng.uniform(-0.1, 0.1),
+                   amenities=rng.sample(AMENITIES, rng.randrange(1, 4)),
+                   images=[f"https://example.com/{i}.jpg"], is_verified=rng.random() < 0.5)
+        memory.create(**row)
+        sql.create(**row)
+    for hostel_id in [3, 3, 10] + [rng.randrange(1, 301) for _ in range(200)]:
+        rating = rng.choice([1.0, 2.5, 3.0, 4.0, 4.5, 5.0])
+        memory.add_review(hostel_id, "user-1", rating, "Nice")
+        sql.add_review(hostel_id, "user-1", rating, "Nice")
+    yield memory, sql
+    sql.close()
+
+def layout(hostels):
+    """Hostel dicts without timestamps, which differ between the two stores."""
+    return [{k: v for k, v in h.to_dict().items() if k not in ('created_at', 'updated_at')}
+            for h in hostels]
+
+def review_layout(result):
+    reviews, after = result
+    return [(r.id, r.user_id, r.rating, r.comment) for r in reviews], after
+
+def all_pages(store, **query):
+    hostels, after = [], None
+    while True:
+        page, after = store.query(limit=25, after=after, **query)
+        hostels += page
+        if after is None:
+            return hostels
+
+class TestSqlHostelStore:
+    @pytest.mark.parametrize('query', [
+        {},
+        {'sort': '-price_min'},
+        {'sort': 'name'},
+        {'price_min': 8000, 'price_max': 10000},
+        {'amenities': ['wifi', 'Gym']},
+        {'amenities': ['gym', 'ac'], 'amenity_mode': 'any', 'sort': '-id'},
+        {'is_verified': True, 'sort': 'price_max'},
+        {'q': 'zol bop'},
+        {'bbox': (72.55, 23.0, 72.6, 23.05)},
+        {'rating_min': 3.5, 'sort': '-rating'},
+        {'sort': 'rating'},
+    ])
+    def test_query_matches_memory_store(self, stores, query):
+        """Test filtered, sorted keyset pages match HostelStore exactly."""
+        memory, sql = stores
+        expected = layout(all_pages(memory, **query))
+        assert expected
+        assert layout(all_pages(sql, **query)) == expected
+
+    def test_nearby_and_search_match_memory_store(self, stores):
+        """Test nearest neighbours and ranked search match HostelStore."""
+        memory, sql = stores
+        for lat, long, radius in [(23.0225, 72.5714, 3000), (23.1, 72.65, 8000)]:
+            expected = [(h.id, round(d, 3)) for h, d in memory.nearby(lat, long, radius, 10)]
+            assert [(h.id, round(d, 3)) for h, d in sql.nearby(lat, long, radius, 10)] == expected
+        for q in ['zolo', 'stay 1', 'hot wat', 'nomatch']:
+            assert [h.id for h in sql.search(q, 5)] == [h.id for h in memory.search(q, 5)]
+
+    def test_clusters_match_memory_store(self, stores):
+        """Test per-request clusters match the incrementally kept ones."""
+        memory, sql = stores
+        for zoom, bbox in [(3, (60.0, 10.0, 80.0, 30.0)), (12, (72.5, 22.95, 72.6, 23.05)),
+                           (15, (72.55, 23.0, 72.58, 23.03))]:
+            expected = [(c.count, c.price_min, c.hostel_id, round(c.lat, 5)) for c in memory.clusters(zoom, bbox)]
+            assert expected
+            assert [(c.count, c.price_min, c.hostel_id, round(c.lat, 5)) for c in sql.clusters(zoom, bbox)] == expected
+
+    def test_similar_matches_memory_store(self, stores):
+        """Test the scanned similar hostels match the vectorized index."""
+        memory, sql = stores
+        for hostel_id in [1, 77, 300]:
+            expected = [(h.id, round(score, 6)) for h, score in memory.similar(hostel_id, 8)]
+            assert [(h.id, round(score, 6)) for h, score in sql.similar(hostel_id, 8)] == expected
+        assert sql.similar(999, 8) is None and memory.similar(999, 8) is None
+
+    def test_stats_match_memory_store(self, stores):
+        """Test statistics read from SQL match the columnar index."""
+        memory, sql = stores
+        memory.delete(4)
+        sql.delete(4)
+        for group_by in ['area', 'amenity']:
+            for bbox in [None, (72.55, 23.0, 72.6, 23.05)]:
+                assert sql.stats(group_by, bbox) == memory.stats(group_by, bbox)
+
+    def test_writes(self, stores):
+        """Test update, review, delete and clear behave like HostelStore."""
+        memory, sql = stores
+        for store in stores:
+            store.update(5, name="Renamed", amenities=["Parking"])
+            store.add_review(5, "user-2", 5.0, "Great")
+            assert store.delete(6) and not store.delete(6)
+            assert store.update(6, name="Gone") is None
+            assert store.add_review(6, "user-2", 5.0, "Gone") is None
+        assert layout([sql.get_by_id(5)]) == layout([memory.get_by_id(5)])
+        assert review_layout(sql.get_reviews(5, 10)) == review_layout(memory.get_reviews(5, 10))
+        assert sql.get_by_id(6) is None
+        assert [h.id for h in sql.query(limit=10, amenities=['parking'])[0]] == [5]
+        sql.clear()
+        assert sql.get_all() == []
+        assert sql.create(name="First", address="Bopal", price_min=1, price_max=2,
+                          lat=23.0, long=72.5, amenities=[], images=[]).id == 1
+
+    def test_review_pages_match_memory_store(self, stores):
+        """Test review pages are newest first and keyset-paginated like HostelStore."""
+        memory, sql = stores
+        for store in stores:
+            assert store.get_reviews(999, 10) is None
+        first = review_layout(memory.get_reviews(3, 1))
+        assert first[1] is not None
+        assert review_layout(sql.get_reviews(3, 1)) == first
+        assert review_layout(sql.get_reviews(3, 5, after=first[1])) == review_layout(memory.get_reviews(3, 5, after=first[1]))
+
+    def test_list_does_not_read_reviews(self, stores):
+        """Test a list page is one query: rating aggregates live on the hostel row."""
+        _, sql = stores
+        statements = []
+        sql._conn().set_trace_callback(statements.append)
+        page, _ = sql.query(limit=50)
+        sql._conn().set_trace_callback(None)
+        assert page[2].rating_count >= 2
+        assert len(statements) == 1
+
+    def test_uses_indexes(self, stores):
+        """Test price and verification filters are answered from indexes."""
+        _, sql = stores
+        assert any('INDEX hostels_price_min' in step for step in sql.explain(price_max=5000))
+        assert any('INDEX hostels_is_verified' in step for step in sql.explain(is_verified=True))
+
+    def test_migrates_baseline_schema(self, tmp_path):
+        """Test a database from the first SQL schema gets every later column filled in on open."""
+        path = str(tmp_path / 'old.db')
+        conn = sqlite3.connect(path)
+        conn.executescript(BASELINE_SCHEMA)
+        for hostel_id, name in [(1, "Élan Stay"), (2, "Zolo Stay")]:
+            conn.execute("INSERT INTO hostels VALUES (?, ?, 'Bopal, Ahmedabad', 5000, 6000, 23.0, "
+                         "72.5, '[\"WiFi\"]', '[]', 0, ?, 1, 1)",
+                         (hostel_id, name, search_text(name, "Bopal, Ahmedabad", ["WiFi"])))
+        conn.executemany("INSERT INTO reviews (hostel_id, user_id, rating, comment, created_ts) "
+                         "VALUES (?, ?, ?, '', 1)", [(2, 'a', 5.0), (2, 'b', 3.5), (1, 'c', 2.0)])
+        conn.commit()
+        conn.close()
+
+        sql = SqlHostelStore(path)
+        fresh = SqlHostelStore(str(tmp_path / 'new.db'))
+        columns = [row[1] for row in sql._conn().execute("PRAGMA table_info(hostels)")]
+        assert sorted(columns) == sorted(row[1] for row in fresh._conn().execute("PRAGMA table_info(hostels)"))
+        assert [h.name for h in sql.query(limit=10, sort='name')[0]] == ["Zolo Stay", "Élan Stay"]
+        assert [h.id for h in sql.query(limit=10, sort='rating')[0]] == [1, 2]
+        assert [h.id for h in sql.query(q='wif', limit=10)[0]] == [1, 2]
+        zolo = sql.get_by_id(2)
+        assert (zolo.rating_count, zolo.rating_total, zolo.rating_histogram) == (2, 8.5, (0, 0, 1, 0, 1))
+        sql.add_review(2, 'd', 1.0, '')
+        assert sql.get_by_id(2).rating_count == 3
+        sql.close()
+        fresh.close()
+
+    def test_connection_per_thread(self, stores):
+        """Test each thread reuses its own connection and concurrent writes all land."""
+        memory, sql = stores
+        errors = []
+
+        def writer(n):
+            try:
+                assert sql._conn() is sql._conn()
+                for i in range(20):
+                    sql.add_review(1, f"user-{n}", 3.0, str(i))
+            except Exception as e:  # pragma: no cover - surfaced by the assert below
+                errors.append(e)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert not errors
+        assert sql.get_by_id(1).rating_count == 80 + memory.get_by_id(1).rating_count
+        assert len(sql._connections) == 5
@@ -0,0 +1,78 @@
+"""Tests for catalog statistics, checked against plain Python over the hostels."""
+import random
+import statistics
+import numpy as np
+import pytest
+from stats import PERCENTILES, StatsIndex, area_of, distribution, histogram_edges
+
+AREAS = ["Navrangpura", "Vastrapur", "satellite", "Bopal"]
+AMENITIES = ["WiFi", "AC", "Laundry", "Meals", "Gym"]
+
+def random_hostel(rng, i):
+    price_min = rng.randrange(3000, 20000, 500)
+    return dict(price_min=price_min, price_max=price_min + rng.randrange(0, 8000, 500),
+                lat=23.0 + rng.uniform(-0.1, 0.1), long=72.5 + rng.uniform(-0.1, 0.1),
+                address=f"{i} Main Road, {rng.choice(AREAS)}, Ahmedabad",
+                amenities=rng.sample(AMENITIES, rng.randrange(0, 4)), is_verified=rng.random() < 0.5)
+
+class TestStatsIndex:
+    def test_groups_match_python(self):
+        """Test per-group counts, verification and price statistics after updates and removals."""
+        rng = random.Random(9)
+        index = StatsIndex(capacity=4, amenity_capacity=1)
+        current = {}
+        for i in range(1, 401):
+            current[i] = random_hostel(rng, i)
+            index.add(i, **current[i])
+        for i in rng.sample(sorted(current), 100):
+            if rng.random() < 0.5:
+                index.remove(i)
+                del current[i]
+            else:
+                current[i] = random_hostel(rng, i)
+                index.add(i, **current[i])
+        bbox = (72.45, 22.95, 72.55, 23.05)
+        inside = {i: h for i, h in current.items()
+                  if bbox[1] <= h['lat'] <= bbox[3] and bbox[0] <= h['long'] <= bbox[2]}
+        for group_by, key in [('area', lambda h: [area_of(h['address'])]),
+                              ('amenity', lambda h: {a.lower() for a in h['amenities']})]:
+            result = index.stats(group_by, bbox)
+            assert result['count'] == len(inside) and result['overall']['count'] == len(inside)
+            expected = {}
+            for h in inside.values():
+                for name in key(h):
+                    expected.setdefault(name, []).append(h)
+            assert [g['name'] for g in result['groups']] == \
+                   sorted(expected, key=lambda name: (-len(expected[name]), name))
+            for group in result['groups']:
+                members = expected[group['name']]
+                prices = [h['price_min'] for h in members]
+                assert group['count'] == len(members)
+                assert group['verified'] == sum(h['is_verified'] for h in members)
+                assert group['price_min']['min'] == min(prices) and group['price_min']['max'] == max(prices)
+                assert group['price_min']['p50'] == pytest.approx(statistics.median(prices), abs=0.05)
+                assert sum(group['price_max']['histogram']) == len(members)
+        assert {g['name'] for g in index.stats('area')['groups']} == {"Navrangpura", "Vastrapur", "Satellite", "Bopal"}
+
+    def test_distribution_matches_numpy(self):
+        """Test percentiles and histograms from the sorted values match NumPy's."""
+        rng = np.random.default_rng(4)
+        for values in [rng.integers(3000, 20000, 501), np.array([7000]), np.array([5000, 5000, 9000])]:
+            edges = histogram_edges(values)
+            result = distribution(values, edges)
+            assert [result[f'p{p}'] for p in PERCENTILES] == \
+                   [round(float(v), 1) for v in np.percentile(values, PERCENTILES)]
+            assert result['histogram'] == np.histogram(values, edges)[0].tolist()
+
+    def test_areas_edges_and_empty(self):
+        """Test area names, round histogram edges and an empty selection."""
+        assert area_of("12 Main Road, prahlad  nagar, Ahmedabad") == "Prahlad Nagar"
+        assert area_of("Paldi") == area_of("Paldi, ") == "Paldi"
+        assert histogram_edges(np.array([10000, 12000])).tolist() == list(range(10000, 12001, 200))
+        index = StatsIndex()
+        index.add(1, 5000, 6000, 23.0, 72.5, "Paldi, Ahmedabad", ["WiFi"], True)
+        assert index.stats('amenity', (0.0, 0.0, 1.0, 1.0)) == {
+            "group_by": "amenity", "count": 0, "edges": {"price_min": [], "price_max": []},
+            "overall": None, "groups": []}
+        index.clear()
+        assert index.stats('area')['count'] == 0
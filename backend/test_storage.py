@@ -0,0 +1,162 @@
+"""Tests for write-ahead log and snapshot persistence."""
+import glob
+import os
+import threading
+import pytest
+from models import HostelStore
+from storage import LogStorage, load_snapshot, save_snapshot
+
+def make_store(path, **kwargs):
+    return HostelStore(LogStorage(str(path), **kwargs))
+
+def populate(store):
+    first = store.create(name="Stanza Living", address="Navrangpura, Ahmedabad",
+                         price_min=12000, price_max=18000, lat=23.0365, long=72.5611,
+                         amenities=["WiFi", "AC"], images=["a.jpg"], is_verified=True)
+    second = store.create(name="Your Space", address="Vastrapur, Ahmedabad",
+                          price_min=10000, price_max=15000, lat=23.0450, long=72.5250,
+                          amenities=["WiFi", "Gym"], images=[], is_verified=False)
+    third = store.create(name="Zolo Stays", address="Maninagar, Ahmedabad",
+                         price_min=8000, price_max=9000, lat=22.9962, long=72.6020,
+                         amenities=["Meals"], images=[])
+    store.update(second.id, price_min=11000, amenities=["WiFi", "Gym", "Laundry"])
+    store.add_review(first.id, "user-1", 4.5, "Clean rooms")
+    store.delete(third.id)
+
+def snapshot(store):
+    return {hostel.id: (hostel.to_dict(), [r.to_dict() for r in store.get_reviews(hostel.id, 100)[0]])
+            for hostel in store.get_all()}
+
+class TestLogStorage:
+    def test_recovers_from_log(self, tmp_path):
+        """Test a reopened store matches the original, including indexes and ids."""
+        store = make_store(tmp_path)
+        populate(store)
+        expected = snapshot(store)
+        store.storage.close()
+
+        recovered = make_store(tmp_path)
+        assert snapshot(recovered) == expected
+        assert [h.name for h in recovered.search("gym", 5)] == ["Your Space"]
+        assert [h.id for h in recovered.query(limit=10, price_max=11500)[0]] == [2]
+        assert recovered.create(name="Next", address="Bopal", price_min=1, price_max=2,
+                                lat=23.0, long=72.5, amenities=[], images=[]).id == 4
+        assert recovered.add_review(1, "user-2", 3.0, "OK").id == 2
+
+    def test_recovers_from_snapshot_and_log(self, tmp_path):
+        """Test compaction writes a snapshot, drops old segments and keeps later writes."""
+        store = make_store(tmp_path)
+        populate(store)
+        store.storage.compact()
+        assert os.path.exists(tmp_path / 'snapshot.bin')
+        assert [os.path.basename(p) for p in glob.glob(str(tmp_path / 'wal-*.log'))] == ['wal-000002.log']
+        store.update(1, name="Stanza Living Premium")
+        expected = snapshot(store)
+        store.storage.close()
+
+        recovered = make_store(tmp_path)
+        assert snapshot(recovered) == expected
+        assert [h.name for h in recovered.search("premium", 5)] == ["Stanza Living Premium"]
+        assert recovered.next_id == 4 and recovered.next_review_id == 2
+
+    def test_derived_indexes_are_built_on_first_use(self, tmp_path):
+        """Test a store recovered from a snapshot builds search, clusters, similar and stats lazily, with later writes."""
+        store = make_store(tmp_path)
+        populate(store)
+        store.storage.compact()
+        store.storage.close()
+
+        recovered = make_store(tmp_path)
+        assert recovered.deferred == set(HostelStore.DEFERRABLE)
+        assert len(recovered.text) == 0
+        # Writes before the first use are picked up by the build.
+        recovered.update(1, name="Stanza Living Premium")
+        recovered.delete(2)
+        recovered.create(name="Gym House", address="Bopal, Ahmedabad", price_min=7000, price_max=9000,
+                         lat=23.03, long=72.47, amenities=["Gym"], images=[])
+        fresh = HostelStore()
+        for hostel in recovered.get_all():
+            fresh.replay('create', hostel)  # indexed up front, keeping ids
+
+        assert [h.name for h in recovered.search("gym", 5)] == ["Gym House"]
+        assert [h.id for h in recovered.query(limit=10, q="premium")[0]] == [1]
+        assert recovered.clusters(12, (72.3, 22.8, 72.9, 23.3)) == fresh.clusters(12, (72.3, 22.8, 72.9, 23.3))
+        assert recovered.stats('amenity') == fresh.stats('amenity')
+        assert [(h.name, score) for h, score in recovered.similar(1, 5)] == \
+               [(h.name, score) for h, score in fresh.similar(1, 5)]
+        assert recovered.deferred == set()
+        recovered.storage.close()
+
+    def test_automatic_compaction(self, tmp_path):
+        """Test a snapshot is taken in the background after snapshot_every records."""
+        store = make_store(tmp_path, fsync=False, snapshot_every=5)
+        populate(store)
+        store.storage.close()
+        assert os.path.exists(tmp_path / 'snapshot.bin')
+        assert snapshot(make_store(tmp_path)) == snapshot(store)
+
+    def test_torn_tail_is_discarded(self, tmp_path):
+        """Test a partially written last record is dropped and the log stays usable."""
+        store = make_store(tmp_path)
+        populate(store)
+        expected = snapshot(store)
+        store.create(name="Half Written", address="Bopal", price_min=1, price_max=2,
+                     lat=23.0, long=72.5, amenities=[], images=[])
+        store.storage.close()
+        path = tmp_path / 'wal-000001.log'
+        os.truncate(path, os.path.getsize(path) - 10)
+
+        recovered = make_store(tmp_path)
+        assert snapshot(recovered) == expected
+        recovered.create(name="After Crash", address="Bopal", price_min=1, price_max=2,
+                         lat=23.0, long=72.5, amenities=[], images=[])
+        recovered.storage.close()
+        assert [h.name for h in make_store(tmp_path).get_all()][-1] == "After Crash"
+
+    def test_corrupt_earlier_segment_raises(self, tmp_path):
+        """Test a bad record before the last segment fails recovery instead of being truncated."""
+        store = make_store(tmp_path)
+        populate(store)
+        store.storage.close()
+        path = tmp_path / 'wal-000001.log'
+        data = bytearray(path.read_bytes())
+        data[len(data) // 2] ^= 0xff
+        path.write_bytes(bytes(data))
+        (tmp_path / 'wal-000002.log').write_bytes(b'')
+
+        with pytest.raises(ValueError, match="corrupt log record"):
+            make_store(tmp_path)
+        assert path.read_bytes() == bytes(data)
+
+    def test_concurrent_writers_share_commits(self, tmp_path):
+        """Test every acknowledged create from many threads survives a restart."""
+        store = make_store(tmp_path)
+        created = []
+
+        def writer(n):
+            for i in range(25):
+                created.append(store.create(name=f"Hostel {n}-{i}", address="Ahmedabad",
+                                            price_min=1, price_max=2, lat=23.0, long=72.5,
+                                            amenities=[], images=[]).id)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        store.storage.close()
+        assert sorted(make_store(tmp_path).hostels) == sorted(created) == list(range(1, 101))
+
+class TestSnapshotFile:
+    def test_saved_snapshot_preloads_an_empty_store(self, tmp_path):
+        """Test save_snapshot/load_snapshot round-trip hostels, reviews, indexes and ids."""
+        store = HostelStore()
+        populate(store)
+        save_snapshot(store, str(tmp_path / 'catalog.bin'))
+
+        loaded = HostelStore()
+        load_snapshot(loaded, str(tmp_path / 'catalog.bin'))
+        assert snapshot(loaded) == snapshot(store)
+        assert [h.name for h in loaded.search("gym", 5)] == ["Your Space"]
+        assert loaded.create(name="Next", address="Paldi", price_min=1, price_max=2, lat=23.0,
+                             long=72.5, amenities=[], images=[]).id == 4
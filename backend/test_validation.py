@@ -0,0 +1,76 @@
+"""Tests for the compiled request body validators."""
+import pytest
+from validation import ValidationError, validate_hostel_create, validate_hostel_update
+
+VALID = {"name": " Stanza Living ", "address": "Navrangpura", "price_min": 12000,
+         "price_max": 18000, "lat": 23.0365, "long": 72.5611}
+
+def errors(validator, data):
+    with pytest.raises(ValidationError) as info:
+        validator(data)
+    return info.value.errors
+
+class TestHostelCreate:
+    def test_converts_and_defaults(self):
+        """Test values are stripped and coerced and optional fields defaulted."""
+        fields = validate_hostel_create(dict(VALID, price_min="12000", price_max=18000.0, lat="23.5"))
+        assert fields == {"name": "Stanza Living", "address": "Navrangpura", "price_min": 12000,
+                          "price_max": 18000, "lat": 23.5, "long": 72.5611, "amenities": [],
+                          "images": [], "is_verified": False}
+        assert validate_hostel_create(VALID)["amenities"] is not validate_hostel_create(VALID)["amenities"]
+
+    def test_reports_every_error(self):
+        """Test all invalid and missing fields are reported together."""
+        assert errors(validate_hostel_create, {"name": " ", "price_min": -1, "price_max": "abc",
+                                               "lat": 91, "long": None, "images": ["a", 1]}) == {
+            "name": "Name must be a non-empty string",
+            "address": "address is required",
+            "price_min": "Prices cannot be negative",
+            "price_max": "Prices must be integers",
+            "lat": "Invalid coordinates",
+            "long": "Coordinates must be numbers",
+            "images": "Images must be a list of URL strings",
+        }
+
+    @pytest.mark.parametrize("overrides", [
+        {"price_max": "1e400"}, {"price_min": float("inf")}, {"lat": "nan"}, {"long": None},
+        {"amenities": "WiFi"},
+    ])
+    def test_rejects_bad_values(self, overrides):
+        """Test values int(), float() and the list checks refuse are rejected."""
+        assert set(errors(validate_hostel_create, dict(VALID, **overrides))) == set(overrides)
+
+    def test_coerces_like_int_float_and_bool(self):
+        """Test values are converted as int(), float() and bool() convert them."""
+        fields = validate_hostel_create(dict(VALID, price_min=True, price_max=5.5, lat=True,
+                                             is_verified="true"))
+        assert (fields["price_min"], fields["price_max"], fields["lat"], fields["is_verified"]) == (
+            1, 5, 1.0, True)
+        assert validate_hostel_create(dict(VALID, is_verified=1))["is_verified"] is True
+
+    def test_price_order(self):
+        """Test an inverted price range is reported on price_max."""
+        assert errors(validate_hostel_create, dict(VALID, price_min=20000)) == {
+            "price_max": "Minimum price cannot be greater than maximum price"}
+
+class TestHostelUpdate:
+    def test_partial(self):
+        """Test only the given fields are validated and returned."""
+        assert validate_hostel_update({"price_max": "20000", "is_verified": False}) == {
+            "price_max": 20000, "is_verified": False}
+
+    def test_price_order_when_both_given(self):
+        """Test the cross-field rule is applied when both bounds are updated."""
+        assert set(errors(validate_hostel_update, {"price_min": 9, "price_max": 5})) == {"price_max"}
+
+    def test_update_messages(self):
+        """Test updates name the invalid field as they always have."""
+        assert errors(validate_hostel_update, {"price_min": "x", "lat": 95, "long": "east"}) == {
+            "price_min": "price_min must be a non-negative integer",
+            "lat": "Invalid latitude", "long": "Invalid longitude"}
+
+    @pytest.mark.parametrize("data", [{}, [], "name"])
+    def test_rejects_empty_or_non_object(self, data):
+        """Test bodies that update nothing are rejected."""
+        with pytest.raises(ValidationError):
+            validate_hostel_update(data)
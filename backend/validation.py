@@ -1,134 +1,177 @@
 """Input validation for API requests."""
-from typing import Dict, Any, Tuple, Optional, List
+from typing import Dict, Any, Tuple, Optional, List, Mapping, NamedTuple, Callable
+import base64
+import json
+import math
 import re
+from models import SORT_FIELDS
+from serializers import HOSTEL_FIELDS
 
-class ValidationError(Exception):
-    """Custom validation error."""
-    pass
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+DEFAULT_SEARCH_LIMIT = 10
+DEFAULT_SIMILAR_LIMIT = 10
+DEFAULT_REVIEW_PAGE_SIZE = 20
+MAX_COMMENT_LENGTH = 2000
+DEFAULT_RADIUS_M = 5000
+MAX_RADIUS_M = 100000
+MAX_MAP_ZOOM = 22
+STATS_GROUPS = ('area', 'amenity')
+BULK_BATCH_SIZE = 1000
+MAX_BULK_ERRORS = 100
 
-def validate_hostel_create(data: Dict[str, Any]) -> Tuple[str, str, int, int, float, float, List[str], List[str], bool]:
+class ValidationError(Exception):
     """
-    Validate hostel creation data.
+    Custom validation error. `errors` maps each invalid field to its
+    message when a request body had one or more bad fields.
     """
-    if not isinstance(data, dict):
-        raise ValidationError("Request body must be a JSON object")
-    
-    required_fields = ['name', 'address', 'price_min', 'price_max', 'lat', 'long']
-    for field in required_fields:
-        if field not in data:
-            raise ValidationError(f"{field} is required")
-            
-    name = data['name']
-    if not isinstance(name, str) or not name.strip():
-        raise ValidationError("Name must be a non-empty string")
-        
-    address = data['address']
-    if not isinstance(address, str) or not address.strip():
-        raise ValidationError("Address must be a non-empty string")
-        
-    try:
-        price_min = int(data['price_min'])
-        price_max = int(data['price_max'])
-    except (ValueError, TypeError):
-        raise ValidationError("Prices must be integers")
-        
-    if price_min < 0 or price_max < 0:
-        raise ValidationError("Prices cannot be negative")
-    if price_min > price_max:
-        raise ValidationError("Minimum price cannot be greater than maximum price")
-        
-    try:
-        lat = float(data['lat'])
-        long = float(data['long'])
-    except (ValueError, TypeError):
-        raise ValidationError("Coordinates must be numbers")
-        
-    if not (-90 <= lat <= 90) or not (-180 <= long <= 180):
-        raise ValidationError("Invalid coordinates")
-        
-    amenities = data.get('amenities', [])
-    if not isinstance(amenities, list) or not all(isinstance(a, str) for a in amenities):
-        raise ValidationError("Amenities must be a list of strings")
-        
-    images = data.get('images', [])
-    if not isinstance(images, list) or not all(isinstance(i, str) for i in images):
-        raise ValidationError("Images must be a list of URL strings")
-        
-    is_verified = bool(data.get('is_verified', False))
-    
-    return name.strip(), address.strip(), price_min, price_max, lat, long, amenities, images, is_verified
-
-def validate_hostel_update(data: Dict[str, Any]) -> Dict[str, Any]:
+    def __init__(self, message: str, errors: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.errors = errors or {}
+
+class Field(NamedTuple):
+    """One field of a request body schema."""
+    kind: str                       # 'text', 'int', 'float', 'strings' or 'bool'
+    message: str = ''               # when the value cannot be converted
+    required: bool = False
+    default: Any = None             # used on create when the field is absent
+    min: Optional[float] = None
+    max: Optional[float] = None
+    range_message: Optional[str] = None   # when out of range; defaults to `message`
+    update_message: Optional[str] = None  # replaces both on partial updates
+
+# The hostel request body, shared by create, partial update and bulk rows.
+# Values are converted as int(), float() and bool() would, and the messages
+# are those the API has always returned.
+HOSTEL_SCHEMA: Dict[str, Field] = {
+    'name': Field('text', "Name must be a non-empty string", required=True),
+    'address': Field('text', "Address must be a non-empty string", required=True),
+    'price_min': Field('int', "Prices must be integers", required=True, min=0,
+                       range_message="Prices cannot be negative",
+                       update_message="price_min must be a non-negative integer"),
+    'price_max': Field('int', "Prices must be integers", required=True, min=0,
+                       range_message="Prices cannot be negative",
+                       update_message="price_max must be a non-negative integer"),
+    'lat': Field('float', "Coordinates must be numbers", required=True, min=-90, max=90,
+                 range_message="Invalid coordinates", update_message="Invalid latitude"),
+    'long': Field('float', "Coordinates must be numbers", required=True, min=-180, max=180,
+                  range_message="Invalid coordinates", update_message="Invalid longitude"),
+    'amenities': Field('strings', "Amenities must be a list of strings", default=()),
+    'images': Field('strings', "Images must be a list of URL strings", default=()),
+    'is_verified': Field('bool', default=False),
+}
+
+# (left, right, message): the left field may not exceed the right one.
+HOSTEL_ORDERED_FIELDS = [
+    ('price_min', 'price_max', "Minimum price cannot be greater than maximum price"),
+]
+
+_MISSING = object()
+
+def compile_schema(schema: Dict[str, Field], ordered: List[Tuple[str, str, str]],
+                   partial: bool = False) -> Callable[[Any], Dict[str, Any]]:
     """
-    Validate hostel update data.
+    Compile `schema` into a validator returning the converted fields as a
+    dict. With `partial`, absent fields are skipped (an update) instead of
+    being required or defaulted (a create). Every invalid field is collected
+    before raising, and `ordered` pairs are checked when both fields are
+    present and valid.
+
+    Bounds and messages are resolved once here, and fields are grouped by
+    kind, so validating a body is one plain loop per kind with no dispatch
+    on the field's kind or schema lookups per value.
     """
-    if not isinstance(data, dict):
-        raise ValidationError("Request body must be a JSON object")
-        
-    if not data:
-        raise ValidationError("At least one field must be provided for update")
-        
-    validated_data = {}
-    
-    if 'name' in data:
-        if not isinstance(data['name'], str) or not data['name'].strip():
-            raise ValidationError("Name must be a non-empty string")
-        validated_data['name'] = data['name'].strip()
-        
-    if 'address' in data:
-        if not isinstance(data['address'], str) or not data['address'].strip():
-            raise ValidationError("Address must be a non-empty string")
-        validated_data['address'] = data['address'].strip()
-        
-    if 'price_min' in data or 'price_max' in data:
-        # Note: Ideally we would validate their relation here, but we might only be updating one
-        # For simplicity, we just check types if present
-        if 'price_min' in data:
-            try:
-                val = int(data['price_min'])
-                if val < 0: raise ValueError
-                validated_data['price_min'] = val
-            except (ValueError, TypeError):
-                raise ValidationError("price_min must be a non-negative integer")
-                
-        if 'price_max' in data:
-            try:
-                val = int(data['price_max'])
-                if val < 0: raise ValueError
-                validated_data['price_max'] = val
-            except (ValueError, TypeError):
-                raise ValidationError("price_max must be a non-negative integer")
-
-    if 'lat' in data:
-        try:
-            val = float(data['lat'])
-            if not (-90 <= val <= 90): raise ValueError
-            validated_data['lat'] = val
-        except (ValueError, TypeError):
-            raise ValidationError("Invalid latitude")
-            
-    if 'long' in data:
-        try:
-            val = float(data['long'])
-            if not (-180 <= val <= 180): raise ValueError
-            validated_data['long'] = val
-        except (ValueError, TypeError):
-            raise ValidationError("Invalid longitude")
-            
-    if 'amenities' in data:
-        if not isinstance(data['amenities'], list) or not all(isinstance(a, str) for a in data['amenities']):
-            raise ValidationError("Amenities must be a list of strings")
-        validated_data['amenities'] = data['amenities']
-        
-    if 'images' in data:
-        if not isinstance(data['images'], list) or not all(isinstance(i, str) for i in data['images']):
-            raise ValidationError("Images must be a list of URL strings")
-        validated_data['images'] = data['images']
-        
-    if 'is_verified' in data:
-        validated_data['is_verified'] = bool(data['is_verified'])
-        
-    return validated_data
+    texts, numbers, lists, flags = [], [], [], []
+    for name, field in schema.items():
+        message = (partial and field.update_message) or field.message
+        missing = f"{name} is required" if field.required and not partial else None
+        if field.kind == 'text':
+            texts.append((name, message, missing))
+        elif field.kind in ('int', 'float'):
+            numbers.append((name, int if field.kind == 'int' else float,
+                            -math.inf if field.min is None else field.min,
+                            math.inf if field.max is None else field.max, message,
+                            (partial and field.update_message) or field.range_message or message,
+                            missing))
+        elif field.kind == 'strings':
+            lists.append((name, message, missing, field.default))
+        else:
+            flags.append((name, missing, field.default))
+
+    def validate(data: Any) -> Dict[str, Any]:
+        if type(data) is not dict:
+            raise ValidationError("Request body must be a JSON object")
+        if partial and not data:
+            raise ValidationError("At least one field must be provided for update")
+        fields: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        get = data.get
+        for name, message, missing in texts:
+            value = get(name, _MISSING)
+            if value is _MISSING:
+                if missing:
+                    errors[name] = missing
+            elif isinstance(value, str) and (value := value.strip()):
+                fields[name] = value
+            else:
+                errors[name] = message
+        for name, convert, low, high, message, range_message, missing in numbers:
+            value = get(name, _MISSING)
+            if value is _MISSING:
+                if missing:
+                    errors[name] = missing
+                continue
+            if type(value) is not convert:
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError, OverflowError):
+                    errors[name] = message
+                    continue
+            if low <= value <= high:  # False for NaN
+                fields[name] = value
+            else:
+                errors[name] = range_message
+        for name, message, missing, default in lists:
+            value = get(name, _MISSING)
+            if value is _MISSING:
+                if missing:
+                    errors[name] = missing
+                elif not partial:
+                    fields[name] = list(default)
+            elif isinstance(value, list):
+                for item in value:
+                    if not isinstance(item, str):
+                        errors[name] = message
+                        break
+                else:
+                    fields[name] = value
+            else:
+                errors[name] = message
+        for name, missing, default in flags:
+            value = get(name, _MISSING)
+            if value is not _MISSING:
+                fields[name] = bool(value)
+            elif missing:
+                errors[name] = missing
+            elif not partial:
+                fields[name] = default
+        for left, right, message in ordered:
+            if left in fields and right in fields and fields[left] > fields[right]:
+                errors[right] = message
+        if errors:
+            raise ValidationError('; '.join(errors.values()), errors)
+        return fields
+    return validate
+
+validate_hostel_create = compile_schema(HOSTEL_SCHEMA, HOSTEL_ORDERED_FIELDS)
+validate_hostel_create.__doc__ = """Validate a hostel creation body (or bulk row) into HostelStore.create keyword arguments."""
+
+validate_hostel_update = compile_schema(HOSTEL_SCHEMA, HOSTEL_ORDERED_FIELDS, partial=True)
+validate_hostel_update.__doc__ = """
+Validate a partial hostel update body into HostelStore.update keyword
+arguments. A price bound given alone is checked against the stored one by
+Hostel.update.
+"""
 
 def validate_hostel_id(hostel_id: str) -> int:
     """Validate and convert hostel ID."""
@@ -139,3 +182,224 @@ def validate_hostel_id(hostel_id: str) -> int:
         return id_int
     except ValueError:
         raise ValidationError("Hostel ID must be a valid integer")
+
+def encode_cursor(sort: str, key: Tuple[Any, int]) -> str:
+    """Encode a keyset position into an opaque cursor string."""
+    raw = json.dumps([sort, key[0], key[1]], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str, sort: str, key_type: Optional[type] = None) -> Tuple[Any, int]:
+    """
+    Decode a cursor produced by encode_cursor for the given sort order. The
+    key type defaults to that of the SORT_FIELDS entry for `sort`.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, value, id_int = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid cursor")
+    if cursor_sort != sort:
+        raise ValidationError("Cursor does not match sort order")
+    if key_type is None:
+        key_type, _ = SORT_FIELDS[sort.lstrip('-')]
+    if type(id_int) is not int or type(value) is not key_type:
+        raise ValidationError("Invalid cursor")
+    return value, id_int
+
+def _parse_bool(value: str, name: str) -> bool:
+    lowered = value.strip().lower()
+    if lowered in ('true', '1', 'yes'):
+        return True
+    if lowered in ('false', '0', 'no'):
+        return False
+    raise ValidationError(f"{name} must be true or false")
+
+def _parse_non_negative_int(value: str, name: str) -> int:
+    try:
+        val = int(value)
+        if val < 0: raise ValueError
+        return val
+    except (ValueError, TypeError):
+        raise ValidationError(f"{name} must be a non-negative integer")
+
+def validate_hostel_query(args: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    Validate list query parameters (limit, cursor, q, price_min, price_max,
+    amenities, amenity_mode, is_verified, bbox, rating_min, sort) into
+    keyword arguments for HostelStore.query.
+    """
+    query: Dict[str, Any] = {}
+
+    sort = args.get('sort', 'id')
+    if sort.lstrip('-') not in SORT_FIELDS or sort.startswith('--'):
+        raise ValidationError(f"sort must be one of: {', '.join(SORT_FIELDS)} (prefix with - for descending)")
+    query['sort'] = sort
+
+    limit = _parse_non_negative_int(args.get('limit', DEFAULT_PAGE_SIZE), 'limit')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValidationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    query['limit'] = limit
+
+    if args.get('cursor'):
+        query['after'] = decode_cursor(args['cursor'], sort)
+
+    q = args.get('q', '').strip()
+    if q:
+        query['q'] = q
+
+    for name in ('price_min', 'price_max'):
+        if args.get(name):
+            query[name] = _parse_non_negative_int(args[name], name)
+    if 'price_min' in query and 'price_max' in query and query['price_min'] > query['price_max']:
+        raise ValidationError("Minimum price cannot be greater than maximum price")
+
+    if args.get('amenities'):
+        amenities = [a.strip() for a in args['amenities'].split(',') if a.strip()]
+        if amenities:
+            query['amenities'] = amenities
+
+    amenity_mode = args.get('amenity_mode', 'all')
+    if amenity_mode not in ('all', 'any'):
+        raise ValidationError("amenity_mode must be all or any")
+    query['amenity_mode'] = amenity_mode
+
+    if args.get('is_verified'):
+        query['is_verified'] = _parse_bool(args['is_verified'], 'is_verified')
+
+    if args.get('bbox'):
+        query['bbox'] = _parse_bbox(args['bbox'])
+
+    if args.get('rating_min'):
+        query['rating_min'] = _parse_rating(args['rating_min'], 'rating_min')
+
+    return query
+
+def _parse_rating(value: Any, name: str) -> float:
+    """Parse a rating between 1 and 5 (half stars allowed)."""
+    try:
+        rating = float(value)
+    except (ValueError, TypeError):
+        raise ValidationError(f"{name} must be a number between 1 and 5")
+    if type(value) is bool or not 1 <= rating <= 5:
+        raise ValidationError(f"{name} must be a number between 1 and 5")
+    return rating
+
+def validate_review_create(data: Dict[str, Any]) -> Tuple[str, float, str]:
+    """Validate review creation data into (user_id, rating, comment)."""
+    if not isinstance(data, dict):
+        raise ValidationError("Request body must be a JSON object")
+    user_id = data.get('user_id')
+    if not isinstance(user_id, str) or not user_id.strip():
+        raise ValidationError("user_id must be a non-empty string")
+    if 'rating' not in data:
+        raise ValidationError("rating is required")
+    if isinstance(data['rating'], str):
+        raise ValidationError("rating must be a number between 1 and 5")
+    rating = _parse_rating(data['rating'], 'rating')
+    comment = data.get('comment', '')
+    if not isinstance(comment, str) or len(comment) > MAX_COMMENT_LENGTH:
+        raise ValidationError(f"comment must be a string of at most {MAX_COMMENT_LENGTH} characters")
+    return user_id.strip(), rating, comment.strip()
+
+def validate_review_query(args: Mapping[str, str]) -> Dict[str, Any]:
+    """Validate review list parameters (limit, cursor) for HostelStore.get_reviews."""
+    limit = _parse_non_negative_int(args.get('limit', DEFAULT_REVIEW_PAGE_SIZE), 'limit')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValidationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    query: Dict[str, Any] = {'limit': limit}
+    if args.get('cursor'):
+        _, query['after'] = decode_cursor(args['cursor'], 'reviews', int)
+    return query
+
+def _parse_bbox(value: str) -> Tuple[float, float, float, float]:
+    """Parse a "min_long,min_lat,max_long,max_lat" bounding box."""
+    try:
+        min_long, min_lat, max_long, max_lat = (float(v) for v in value.split(','))
+    except ValueError:
+        raise ValidationError("bbox must be min_long,min_lat,max_long,max_lat")
+    if not (-90 <= min_lat <= max_lat <= 90) or not (-180 <= min_long <= max_long <= 180):
+        raise ValidationError("Invalid bbox")
+    return min_long, min_lat, max_long, max_lat
+
+def validate_nearby_query(args: Mapping[str, str]) -> Dict[str, Any]:
+    """Validate nearby query parameters (lat, long, radius_m, limit)."""
+    if 'lat' not in args or 'long' not in args:
+        raise ValidationError("lat and long are required")
+    try:
+        lat = float(args['lat'])
+        long = float(args['long'])
+    except (ValueError, TypeError):
+        raise ValidationError("Coordinates must be numbers")
+    if not (-90 <= lat <= 90) or not (-180 <= long <= 180):
+        raise ValidationError("Invalid coordinates")
+
+    radius_m = _parse_non_negative_int(args.get('radius_m', DEFAULT_RADIUS_M), 'radius_m')
+    if not 1 <= radius_m <= MAX_RADIUS_M:
+        raise ValidationError(f"radius_m must be between 1 and {MAX_RADIUS_M}")
+
+    limit = _parse_non_negative_int(args.get('limit', DEFAULT_PAGE_SIZE), 'limit')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValidationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    return {"lat": lat, "long": long, "radius_m": radius_m, "limit": limit}
+
+def validate_search_query(args: Mapping[str, str]) -> Dict[str, Any]:
+    """Validate search query parameters (q, limit)."""
+    q = args.get('q', '').strip()
+    if not q:
+        raise ValidationError("q is required")
+    limit = _parse_non_negative_int(args.get('limit', DEFAULT_SEARCH_LIMIT), 'limit')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValidationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return {"q": q, "limit": limit}
+
+def validate_similar_query(args: Mapping[str, str]) -> Dict[str, Any]:
+    """Validate similar hostel query parameters (limit)."""
+    limit = _parse_non_negative_int(args.get('limit', DEFAULT_SIMILAR_LIMIT), 'limit')
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValidationError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return {"limit": limit}
+
+def validate_fields(args: Mapping[str, str]) -> Optional[Tuple[str, ...]]:
+    """
+    Validate the `fields` projection parameter: a comma-separated list of
+    hostel fields. Returns them in serialization order with `id` always
+    included, or None for every field (no parameter, or all of them).
+    """
+    if not args.get('fields'):
+        return None
+    names = {name.strip() for name in args['fields'].split(',') if name.strip()}
+    unknown = sorted(names - HOSTEL_FIELDS.keys())
+    if unknown:
+        raise ValidationError(f"Unknown fields: {', '.join(unknown)} "
+                              f"(fields may be: {', '.join(HOSTEL_FIELDS)})")
+    names.add('id')
+    if len(names) == len(HOSTEL_FIELDS):
+        return None
+    return tuple(name for name in HOSTEL_FIELDS if name in names)
+
+def validate_changes_query(args: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    Validate change feed query parameters (since, epoch). `since` is None
+    when absent, for a client starting to sync from the current version.
+    """
+    since = args.get('since')
+    epoch = args.get('epoch') or None
+    return {"since": _parse_non_negative_int(since, 'since') if since else None, "epoch": epoch}
+
+def validate_cluster_query(args: Mapping[str, str]) -> Dict[str, Any]:
+    """Validate map cluster query parameters (bbox, zoom)."""
+    if not args.get('bbox') or not args.get('zoom'):
+        raise ValidationError("bbox and zoom are required")
+    zoom = _parse_non_negative_int(args['zoom'], 'zoom')
+    if zoom > MAX_MAP_ZOOM:
+        raise ValidationError(f"zoom must be between 0 and {MAX_MAP_ZOOM}")
+    return {"zoom": zoom, "bbox": _parse_bbox(args['bbox'])}
+
+def validate_stats_query(args: Mapping[str, str]) -> Dict[str, Any]:
+    """Validate catalog statistics query parameters (group_by, bbox)."""
+    group_by = args.get('group_by', 'area')
+    if group_by not in STATS_GROUPS:
+        raise ValidationError(f"group_by must be one of: {', '.join(STATS_GROUPS)}")
+    bbox = _parse_bbox(args['bbox']) if args.get('bbox') else None
+    return {"group_by": group_by, "bbox": bbox}
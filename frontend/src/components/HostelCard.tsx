@@ -1,9 +1,9 @@
 import { MapPin, IndianRupee, ShieldCheck } from 'lucide-react';
-import type { Hostel } from '../types';
+import type { HostelSummary } from '../types';
 import { Link } from 'react-router-dom';
 
 interface Props {
-    hostel: Hostel;
+    hostel: HostelSummary;
 }
 
 export default function HostelCard({ hostel }: Props) {
@@ -0,0 +1,64 @@
+import { HOSTEL_SUMMARY_FIELDS } from '../types';
+import type { ClusterPage, HostelChanges, HostelSummary } from '../types';
+
+const API = 'http://localhost:5000/api/hostels';
+const FIELDS = HOSTEL_SUMMARY_FIELDS.join(',');
+
+interface Catalog {
+    hostels: Map<number, HostelSummary>;
+    version: number;
+    epoch: string;
+}
+
+// The catalog as of `version`, kept for the session so that coming back to
+// a page only fetches what changed since.
+let catalog: Catalog | null = null;
+
+async function fetchCatalog(): Promise<Catalog> {
+    // Take the version before paging: changes made meanwhile come again with the next delta.
+    const start: HostelChanges = await (await fetch(`${API}/changes`)).json();
+    const hostels = new Map<number, HostelSummary>();
+    let cursor: string | null = null;
+    do {
+        const query: string = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+        const response = await fetch(`${API}?limit=200&fields=${FIELDS}${query}`);
+        if (!response.ok) {
+            throw new Error('Failed to fetch hostels');
+        }
+        const page = await response.json();
+        for (const hostel of page.hostels as HostelSummary[]) {
+            hostels.set(hostel.id, hostel);
+        }
+        cursor = page.next_cursor;
+    } while (cursor);
+    return { hostels, version: start.version, epoch: start.epoch };
+}
+
+export async function loadHostels(): Promise<HostelSummary[]> {
+    const current = catalog;
+    if (current) {
+        const response = await fetch(`${API}/changes?since=${current.version}&epoch=${current.epoch}&fields=${FIELDS}`);
+        if (response.ok) {
+            const changes: HostelChanges = await response.json();
+            changes.hostels.forEach((hostel) => current.hostels.set(hostel.id, hostel));
+            changes.deleted.forEach((id) => current.hostels.delete(id));
+            current.version = changes.version;
+            return [...current.hostels.values()];
+        }
+        // 410: the server can no longer tell what changed; start over.
+        if (response.status !== 410) {
+            throw new Error('Failed to fetch hostel changes');
+        }
+    }
+    catalog = await fetchCatalog();
+    return [...catalog.hostels.values()];
+}
+
+// `bbox` in Leaflet's toBBoxString() order: min_long,min_lat,max_long,max_lat.
+export async function loadClusters(bbox: string, zoom: number): Promise<ClusterPage> {
+    const response = await fetch(`${API}/clusters?bbox=${bbox}&zoom=${zoom}`);
+    if (!response.ok) {
+        throw new Error('Failed to fetch map clusters');
+    }
+    return response.json();
+}
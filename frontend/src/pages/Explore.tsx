@@ -1,8 +1,9 @@
-import { useEffect, useState } from 'react';
-import { MapContainer, TileLayer, Marker, Popup } from 'react-leaflet';
+import { useCallback, useEffect, useMemo, useState } from 'react';
+import { MapContainer, TileLayer, Marker, Popup, useMapEvents } from 'react-leaflet';
 import 'leaflet/dist/leaflet.css';
-import type { Hostel } from '../types';
+import type { HostelCluster, HostelSummary } from '../types';
 import HostelCard from '../components/HostelCard';
+import { loadClusters, loadHostels } from '../lib/catalog';
 import { Loader2, Filter, Search, MapIcon, ListIcon } from 'lucide-react';
 import * as L from 'leaflet';
 
@@ -22,8 +23,72 @@ L.Icon.Default.mergeOptions({
 // Default: Ahmedabad Center
 const center = { lat: 23.0225, lng: 72.5714 };
 
+function HostelPopup({ hostel }: { hostel: HostelSummary }) {
+    return (
+        <Popup>
+            <div className="p-2 min-w-[220px]">
+                <h3 className="font-bold text-gray-900 mb-1.5 text-base">{hostel.name}</h3>
+                <p className="text-sm text-gray-600 mb-2 line-clamp-2">{hostel.address}</p>
+                <div className="flex justify-between items-center pt-2 border-t border-gray-100">
+                    <span className="text-primary-600 font-bold text-base">₹{hostel.price_min.toLocaleString('en-IN')}</span>
+                    {hostel.is_verified && (
+                        <span className="text-xs bg-green-100 text-green-700 px-2 py-1 rounded-md font-semibold">Verified</span>
+                    )}
+                </div>
+            </div>
+        </Popup>
+    );
+}
+
+function clusterIcon(cluster: HostelCluster) {
+    const size = cluster.count < 10 ? 36 : cluster.count < 100 ? 44 : 52;
+    return L.divIcon({
+        html: `<div class="flex flex-col items-center justify-center w-full h-full rounded-full bg-primary-600 text-white font-bold shadow-lg border-2 border-white leading-tight">
+            <span class="text-sm">${cluster.count}</span>
+            <span class="text-[10px] font-medium">₹${cluster.price_min.toLocaleString('en-IN')}+</span>
+        </div>`,
+        className: '',
+        iconSize: [size, size],
+    });
+}
+
+// Server-side clusters of the hostels in view, refetched as the map moves.
+function ClusterMarkers({ hostels }: { hostels: Map<number, HostelSummary> }) {
+    const [clusters, setClusters] = useState<HostelCluster[]>([]);
+    const refresh = useCallback((map: L.Map) => {
+        loadClusters(map.getBounds().toBBoxString(), map.getZoom())
+            .then((page) => setClusters(page.clusters))
+            .catch((error) => console.error("Error fetching map clusters:", error));
+    }, []);
+    const map = useMapEvents({ moveend: () => refresh(map) });
+    useEffect(() => refresh(map), [map, refresh, hostels]);
+
+    return (
+        <>
+            {clusters.map((cluster) => {
+                const hostel = cluster.hostel_id !== null ? hostels.get(cluster.hostel_id) : undefined;
+                if (hostel) {
+                    return (
+                        <Marker key={`h${hostel.id}`} position={[hostel.lat, hostel.long]}>
+                            <HostelPopup hostel={hostel} />
+                        </Marker>
+                    );
+                }
+                return (
+                    <Marker
+                        key={`c${cluster.lat},${cluster.long}`}
+                        position={[cluster.lat, cluster.long]}
+                        icon={clusterIcon(cluster)}
+                        eventHandlers={{ click: () => map.setZoomAround([cluster.lat, cluster.long], map.getZoom() + 2) }}
+                    />
+                );
+            })}
+        </>
+    );
+}
+
 export default function Explore() {
-    const [hostels, setHostels] = useState<Hostel[]>([]);
+    const [hostels, setHostels] = useState<HostelSummary[]>([]);
     const [loading, setLoading] = useState(true);
     const [searchTerm, setSearchTerm] = useState('');
     const [showMap, setShowMap] = useState(true);
@@ -31,13 +96,8 @@ export default function Explore() {
     useEffect(() => {
         async function fetchHostels() {
             try {
-                // Fetch from Flask Backend
-                const response = await fetch('http://localhost:5000/api/hostels');
-                if (!response.ok) {
-                    throw new Error('Failed to fetch hostels');
-                }
-                const data = await response.json();
-                setHostels(data.hostels || []);
+                // Fetched from the Flask backend once, then kept up to date with its change feed
+                setHostels(await loadHostels());
             } catch (error) {
                 console.error("Error fetching hostels:", error);
             } finally {
@@ -53,6 +113,7 @@ export default function Explore() {
         hostel.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
         hostel.address.toLowerCase().includes(searchTerm.toLowerCase())
     );
+    const hostelsById = useMemo(() => new Map(hostels.map((hostel) => [hostel.id, hostel])), [hostels]);
 
     return (
         <div className="flex h-[calc(100vh-80px)] bg-gray-50">
@@ -103,7 +164,7 @@ export default function Explore() {
                         </div>
                     ) : (
                         <div className="space-y-6">
-                            {filteredHostels.map((hostel: Hostel) => (
+                            {filteredHostels.map((hostel: HostelSummary) => (
                                 <HostelCard key={hostel.id} hostel={hostel} />
                             ))}
                             {filteredHostels.length === 0 && (
@@ -132,22 +193,12 @@ export default function Explore() {
                         attribution='&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
                         url="https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png"
                     />
-                    {filteredHostels.map((hostel: Hostel) => (
+                    {/* The whole catalog is clustered on the server; search results are few enough to pin one by one. */}
+                    {searchTerm ? filteredHostels.map((hostel: HostelSummary) => (
                         <Marker key={hostel.id} position={[hostel.lat, hostel.long]}>
-                            <Popup>
-                                <div className="p-2 min-w-[220px]">
-                                    <h3 className="font-bold text-gray-900 mb-1.5 text-base">{hostel.name}</h3>
-                                    <p className="text-sm text-gray-600 mb-2 line-clamp-2">{hostel.address}</p>
-                                    <div className="flex justify-between items-center pt-2 border-t border-gray-100">
-                                        <span className="text-primary-600 font-bold text-base">₹{hostel.price_min.toLocaleString('en-IN')}</span>
-                                        {hostel.is_verified && (
-                                            <span className="text-xs bg-green-100 text-green-700 px-2 py-1 rounded-md font-semibold">Verified</span>
-                                        )}
-                                    </div>
-                                </div>
-                            </Popup>
+                            <HostelPopup hostel={hostel} />
                         </Marker>
-                    ))}
+                    )) : !loading && <ClusterMarkers hostels={hostelsById} />}
                 </MapContainer>
             </div>
         </div>
@@ -1,12 +1,17 @@
 import { useEffect, useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import type { Hostel } from '../types';
+import { HOSTEL_SUMMARY_FIELDS } from '../types';
+import type { Hostel, Review, ReviewPage, SimilarHostel } from '../types';
+import HostelCard from '../components/HostelCard';
 import { Star, MapPin, IndianRupee, CheckCircle, ArrowLeft, Phone, Mail, Wifi, Wind, Droplet, Utensils, Shield, Users, Loader2 } from 'lucide-react';
 
 export default function HostelDetail() {
     const { id } = useParams();
     const navigate = useNavigate();
     const [hostel, setHostel] = useState<Hostel | null>(null);
+    const [reviews, setReviews] = useState<Review[]>([]);
+    const [reviewsCursor, setReviewsCursor] = useState<string | null>(null);
+    const [similar, setSimilar] = useState<SimilarHostel[]>([]);
     const [loading, setLoading] = useState(true);
     const [showContact, setShowContact] = useState(false);
 
@@ -19,6 +24,11 @@ export default function HostelDetail() {
                 if (!response.ok) throw new Error('Hostel not found');
                 const data = await response.json();
                 setHostel(data.hostel);
+                const page: ReviewPage = await (await fetch(`http://localhost:5000/api/hostels/${id}/reviews`)).json();
+                setReviews(page.reviews);
+                setReviewsCursor(page.next_cursor);
+                const related = await (await fetch(`http://localhost:5000/api/hostels/${id}/similar?limit=4&fields=${HOSTEL_SUMMARY_FIELDS.join(',')}`)).json();
+                setSimilar(related.hostels);
             } catch (error) {
                 console.error("Error fetching hostel:", error);
             } finally {
@@ -28,6 +38,18 @@ export default function HostelDetail() {
         getData();
     }, [id]);
 
+    async function loadMoreReviews() {
+        if (!reviewsCursor) return;
+        try {
+            const response = await fetch(`http://localhost:5000/api/hostels/${id}/reviews?cursor=${encodeURIComponent(reviewsCursor)}`);
+            const page: ReviewPage = await response.json();
+            setReviews(prev => [...prev, ...page.reviews]);
+            setReviewsCursor(page.next_cursor);
+        } catch (error) {
+            console.error("Error fetching reviews:", error);
+        }
+    }
+
     if (loading) {
         return (
             <div className="flex items-center justify-center min-h-[calc(100vh-80px)] bg-gray-50">
@@ -59,8 +81,6 @@ export default function HostelDetail() {
         );
     }
 
-    const reviews = hostel.reviews || [];
-
     const amenityIcons: Record<string, any> = {
         'WiFi': Wifi,
         'AC': Wind,
@@ -70,9 +90,8 @@ export default function HostelDetail() {
         'Gym': Users,
     };
 
-    const avgRating = reviews.length > 0
-        ? (reviews.reduce((sum, r) => sum + r.rating, 0) / reviews.length).toFixed(1)
-        : 'New';
+    const reviewCount = hostel.rating?.count ?? 0;
+    const avgRating = hostel.rating?.average != null ? hostel.rating.average.toFixed(1) : 'New';
 
     return (
         <div className="min-h-screen bg-gray-50 pb-12">
@@ -174,7 +193,7 @@ export default function HostelDetail() {
                                 Student Reviews
                             </h2>
                             <p className="text-gray-600 mb-8">
-                                {reviews.length > 0 ? `${reviews.length} reviews from verified students` : 'No reviews yet'}
+                                {reviewCount > 0 ? `${reviewCount} reviews from verified students` : 'No reviews yet'}
                             </p>
                             <div className="space-y-6">
                                 {reviews.map(review => (
@@ -197,6 +216,14 @@ export default function HostelDetail() {
                                         <p className="text-gray-700 leading-relaxed">{review.comment}</p>
                                     </div>
                                 ))}
+                                {reviewsCursor && (
+                                    <button
+                                        onClick={loadMoreReviews}
+                                        className="w-full bg-white border-2 border-gray-300 text-gray-700 py-3 rounded-xl font-semibold hover:border-primary-500 hover:text-primary-700 transition-all duration-300"
+                                    >
+                                        Show more reviews
+                                    </button>
+                                )}
                                 {reviews.length === 0 && (
                                     <div className="text-center py-16 bg-white rounded-3xl border-2 border-dashed border-gray-200">
                                         <div className="w-16 h-16 bg-gray-100 rounded-full flex items-center justify-center mx-auto mb-4">
@@ -208,6 +235,21 @@ export default function HostelDetail() {
                                 )}
                             </div>
                         </div>
+
+                        {/* Similar Stays */}
+                        {similar.length > 0 && (
+                            <div>
+                                <h2 className="text-3xl font-display font-bold text-gray-900 mb-2">
+                                    Similar Stays
+                                </h2>
+                                <p className="text-gray-600 mb-8">Close in price, location and amenities</p>
+                                <div className="grid grid-cols-1 sm:grid-cols-2 gap-6">
+                                    {similar.map(other => (
+                                        <HostelCard key={other.id} hostel={other} />
+                                    ))}
+                                </div>
+                            </div>
+                        )}
                     </div>
 
                     {/* Sidebar - Booking Card */}
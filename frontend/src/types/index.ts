@@ -6,6 +6,18 @@ export interface Review {
     created_at: string;
 }
 
+export interface RatingSummary {
+    count: number;
+    average: number | null;
+    histogram: number[];
+}
+
+export interface ReviewPage {
+    reviews: Review[];
+    count: number;
+    next_cursor: string | null;
+}
+
 export interface Hostel {
     id: number;
     name: string;
@@ -17,7 +29,40 @@ export interface Hostel {
     amenities: string[];
     images: string[];
     is_verified: boolean;
-    reviews: Review[];
+    rating: RatingSummary;
     // Optional frontend-only properties
     dist_meters?: number;
 }
+
+// The fields list views ask for with `?fields=`; `id` always comes back.
+export const HOSTEL_SUMMARY_FIELDS = ['name', 'address', 'price_min', 'lat', 'long', 'amenities', 'images', 'is_verified'] as const;
+
+export type HostelSummary = Pick<Hostel, 'id' | typeof HOSTEL_SUMMARY_FIELDS[number]>;
+
+// GET /api/hostels/<id>/similar: each hostel scored from 1 (identical) down towards 0.
+export type SimilarHostel = HostelSummary & { similarity: number };
+
+// GET /api/hostels/changes: hostels created or updated since a version, and ids deleted.
+export interface HostelChanges {
+    hostels: HostelSummary[];
+    count: number;
+    deleted: number[];
+    version: number;
+    epoch: string;
+}
+
+// GET /api/hostels/clusters: hostels in a map viewport grouped for a zoom level.
+export interface HostelCluster {
+    count: number;
+    lat: number;
+    long: number;
+    price_min: number;
+    // Set for clusters of a single hostel.
+    hostel_id: number | null;
+}
+
+export interface ClusterPage {
+    clusters: HostelCluster[];
+    count: number;
+    zoom: number;
+}